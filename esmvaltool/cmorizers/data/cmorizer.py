@@ -18,6 +18,8 @@ from esmvalcore._task import write_ncl_settings
 from esmvalcore.config import CFG
 from esmvalcore.config._logging import configure_logging
 
+from esmvaltool.cmorizers.data.manifest import Manifest
+from esmvaltool.cmorizers.data.scheduler import get_n_workers, run_jobs
 from esmvaltool.cmorizers.data.utilities import read_cmor_config
 
 logger = logging.getLogger(__name__)
@@ -113,6 +115,9 @@ class Formatter():
     def download(self, start_date, end_date, overwrite):
         """Download all datasets.
 
+        The datasets are downloaded concurrently, using at most
+        ``max_parallel_tasks`` processes.
+
         Parameters
         ----------
         start_date: datetime
@@ -127,17 +132,34 @@ class Formatter():
         logger.info("Downloading original data...")
         # master directory
         failed_datasets = []
+        jobs = {}
         for dataset in self.datasets:
             try:
-                self.download_dataset(dataset, start_date, end_date, overwrite)
+                jobs[dataset] = [
+                    self._get_download_job(dataset, start_date, end_date,
+                                           overwrite)
+                ]
             except ValueError:
                 logger.exception('Failed to download %s', dataset)
                 failed_datasets.append(dataset)
+        failed_datasets.extend(run_jobs(jobs, get_n_workers(self.config)))
         if failed_datasets:
             logger.error('Download failed for datasets %s', failed_datasets)
             return False
         return True
 
+    def _get_download_job(self, dataset, start_date, end_date, overwrite):
+        """Get the job that downloads a single dataset."""
+        if not self.has_downloader(dataset):
+            raise ValueError(
+                f'Dataset {dataset} does not have an automatic downloader')
+        dataset_module = self._dataset_to_module(dataset)
+        logger.debug("Download module: %s", dataset_module)
+        args = (dataset_module, self.config, dataset,
+                self.datasets_info['datasets'][dataset], start_date, end_date,
+                overwrite)
+        return (_download_dataset, args)
+
     def download_dataset(self, dataset, start_date, end_date, overwrite):
         """Download a single dataset.
 
@@ -152,26 +174,11 @@ class Formatter():
         overwrite: boolean
             If True, download again existing files
         """
-        if not self.has_downloader(dataset):
-            raise ValueError(
-                f'Dataset {dataset} does not have an automatic downloader')
-        dataset_module = self._dataset_to_module(dataset)
-        logger.info('Downloading %s', dataset)
-        logger.debug("Download module: %s", dataset_module)
-        try:
-            downloader = importlib.import_module(
-                f'.{dataset_module}',
-                package='esmvaltool.cmorizers.data.downloaders.datasets')
-        except ImportError:
-            logger.exception('Could not find cmorizer for %s', dataset)
-            raise
-
-        downloader.download_dataset(self.config, dataset,
-                                    self.datasets_info['datasets'][dataset],
-                                    start_date, end_date, overwrite)
-        logger.info('%s downloaded', dataset)
+        function, args = self._get_download_job(dataset, start_date,
+                                                end_date, overwrite)
+        function(*args)
 
-    def format(self, start, end, install):
+    def format(self, start, end, install, incremental=False):
         """Format all available datasets.
 
         Parameters
@@ -183,6 +190,10 @@ class Formatter():
         install: bool
             If True, automatically moves the data to the final location if
             there is no
+        incremental: bool
+            If True, write the data directly to the final location and only
+            regenerate output whose input files, formatter or configuration
+            changed since the last run.
         """
         logger.info("Running the CMORization scripts.")
         # datasets dictionary of Tier keys
@@ -192,16 +203,100 @@ class Formatter():
                            self.datasets, self.rawobs)
         logger.info("Processing datasets %s", datasets)
 
-        # loop through tier/datasets to be cmorized
+        # collect the jobs of all tier/datasets to be cmorized
         failed_datasets = []
+        jobs = {}
+        manifests = {}
         for dataset in datasets:
-            if not self.format_dataset(dataset, start, end, install):
+            dataset_jobs = self._get_format_jobs(dataset, start, end)
+            if dataset_jobs is None:
                 failed_datasets.append(dataset)
+                continue
+            if incremental:
+                manifest = self._get_manifest(dataset)
+                dataset_jobs, records = manifest.outdated(dataset_jobs)
+                manifests[dataset] = (manifest, records)
+            jobs[dataset] = dataset_jobs
+
+        untracked = {dataset: [] for dataset in manifests}
+
+        def _record_outputs(dataset, index, outputs):
+            if dataset not in manifests:
+                return
+            if outputs:
+                manifest, records = manifests[dataset]
+                manifest.record(*records[index], outputs)
+            else:
+                untracked[dataset].append(index)
+
+        # run them concurrently
+        try:
+            failed_jobs = run_jobs(jobs,
+                                   get_n_workers(self.config),
+                                   callback=_record_outputs)
+            for dataset, indices in untracked.items():
+                if dataset not in failed_jobs:
+                    self._record_untracked_outputs(dataset,
+                                                   *manifests[dataset],
+                                                   indices)
+        finally:
+            for manifest, _ in manifests.values():
+                manifest.save()
+        for dataset in jobs:
+            if dataset in failed_jobs:
+                logger.error('Formatting failed for dataset %s', dataset)
+                failed_datasets.append(dataset)
+                continue
+            logger.info('Formatting successful for dataset %s', dataset)
+            if install and not incremental:
+                self._install(dataset)
 
         if failed_datasets:
             raise Exception(
                 f'Format failed for datasets {" ".join(failed_datasets)}')
 
+    def _record_untracked_outputs(self, dataset, manifest, records, indices):
+        """Install the output of jobs that did not report their files.
+
+        This is the case for NCL formatters and for Python formatters that
+        do not use :func:`esmvaltool.cmorizers.data.utilities.save_variable`.
+        All files that are left in the output directory of the dataset are
+        moved to the final location. If they were written by a single job,
+        they are recorded as its output, otherwise these jobs are run again
+        next time.
+        """
+        if not indices:
+            return
+        tier = self._get_dataset_tier(dataset)
+        out_data_dir = Path(self.output_dir, tier, dataset)
+        outputs = sorted(
+            str(path) for path in out_data_dir.iterdir() if path.is_file())
+        if len(indices) == 1:
+            manifest.record(*records[indices[0]], outputs)
+        elif outputs:
+            logger.warning(
+                "Cannot attribute the output of %s jobs of dataset %s to "
+                "individual jobs, these jobs will be run again next time",
+                len(indices), dataset)
+            manifest.install(outputs)
+
+    def _get_install_dir(self, dataset):
+        """Get the final location of a formatted dataset."""
+        tier = self._get_dataset_tier(dataset)
+        rootpath = self.config['rootpath']
+        target_dir = rootpath.get('OBS', rootpath['default'])[0]
+        return os.path.join(target_dir, tier, dataset)
+
+    def _get_manifest(self, dataset):
+        """Get the manifest of the formatted files of a dataset."""
+        tier = self._get_dataset_tier(dataset)
+        out_data_dir = os.path.join(self.output_dir, tier, dataset)
+        return Manifest(self._get_install_dir(dataset),
+                        ignore={
+                            'out_dir': out_data_dir,
+                            'config': self.config,
+                        })
+
     @staticmethod
     def has_downloader(dataset):
         """Check if a given datasets has an automatic downloader.
@@ -260,6 +355,22 @@ class Formatter():
             If True, automatically moves the data to the final location if
             there is no data there.
         """
+        jobs = self._get_format_jobs(dataset, start, end)
+        if jobs is None:
+            return False
+        if run_jobs({dataset: jobs}, 1):
+            logger.error('Formatting failed for dataset %s', dataset)
+            return False
+        logger.info('Formatting successful for dataset %s', dataset)
+        if install:
+            self._install(dataset)
+        return True
+
+    def _get_format_jobs(self, dataset, start, end):
+        """Get the jobs that format a single dataset.
+
+        Returns None if the dataset or its formatter cannot be found.
+        """
         reformat_script_root = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), 'formatters',
             'datasets', self._dataset_to_module(dataset))
@@ -268,7 +379,7 @@ class Formatter():
             logger.error("Data for %s not found. Perhaps you are not"
                          " storing it in a RAWOBS/TierX/%s"
                          " (X=2 or 3) directory structure?", dataset, dataset)
-            return False
+            return None
 
         # in-data dir; build out-dir tree
         in_data_dir = os.path.join(self.rawobs, tier, dataset)
@@ -278,38 +389,31 @@ class Formatter():
         if not os.path.isdir(out_data_dir):
             os.makedirs(out_data_dir)
 
-        # all operations are done in the working dir now
-        os.chdir(out_data_dir)
         # figure out what language the script is in
         logger.info("Reformat script: %s", reformat_script_root)
         if os.path.isfile(reformat_script_root + '.ncl'):
             reformat_script = reformat_script_root + '.ncl'
-            success = self._run_ncl_script(in_data_dir, out_data_dir, dataset,
-                                           reformat_script, start, end)
-        elif os.path.isfile(reformat_script_root + '.py'):
-            success = self._run_pyt_script(in_data_dir, out_data_dir, dataset,
-                                           start, end)
-        else:
-            logger.error('Could not find formatter for %s', dataset)
-            return False
-        if success:
-            logger.info('Formatting successful for dataset %s', dataset)
+            return self._get_ncl_jobs(in_data_dir, out_data_dir, dataset,
+                                      reformat_script, start, end)
+        if os.path.isfile(reformat_script_root + '.py'):
+            return self._get_pyt_jobs(in_data_dir, out_data_dir, dataset,
+                                      start, end)
+        logger.error('Could not find formatter for %s', dataset)
+        return None
+
+    def _install(self, dataset):
+        """Move the formatted dataset to the OBS rootpath."""
+        tier = self._get_dataset_tier(dataset)
+        out_data_dir = os.path.join(self.output_dir, tier, dataset)
+        target_dir = self._get_install_dir(dataset)
+        if os.path.isdir(target_dir):
+            logger.info(
+                'Automatic installation of dataset %s skipped: '
+                'target folder %s already exists', dataset, target_dir)
         else:
-            logger.error('Formatting failed for dataset %s', dataset)
-            return False
-        if install:
-            rootpath = self.config['rootpath']
-            target_dir = rootpath.get('OBS', rootpath['default'])[0]
-            target_dir = os.path.join(target_dir, tier, dataset)
-            if os.path.isdir(target_dir):
-                logger.info(
-                    'Automatic installation of dataset %s skipped: '
-                    'target folder %s already exists', dataset, target_dir)
-            else:
-                logger.info('Installing dataset %s in folder %s', dataset,
-                            target_dir)
-                shutil.move(out_data_dir, target_dir)
-        return True
+            logger.info('Installing dataset %s in folder %s', dataset,
+                        target_dir)
+            shutil.move(out_data_dir, target_dir)
 
     def _get_dataset_tier(self, dataset):
         for tier in [2, 3]:
@@ -346,8 +450,8 @@ class Formatter():
         write_ncl_settings(settings, settings_filename)
         return settings_filename
 
-    def _run_ncl_script(self, in_dir, out_dir, dataset, script, start, end):
-        """Run the NCL cmorization mechanism."""
+    def _get_ncl_jobs(self, in_dir, out_dir, dataset, script, start, end):
+        """Get the job that runs the NCL cmorization mechanism."""
         logger.info("CMORizing dataset %s using NCL script %s", dataset,
                     script)
         project = {}
@@ -366,32 +470,59 @@ class Formatter():
         env['cmor_tables'] = str(
             Path(esmvalcore.cmor.__file__).parent / 'tables')
         logger.info("Using CMOR tables at %s", env['cmor_tables'])
-        # call NCL
-        ncl_call = ['ncl', script]
-        logger.info("Executing cmd: %s", ' '.join(ncl_call))
-        with subprocess.Popen(ncl_call,
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.STDOUT,
-                              env=env) as process:
-            output, err = process.communicate()
-        for oline in str(output.decode('utf-8')).split('\n'):
-            logger.info('[NCL] %s', oline)
-        if err:
-            logger.error('[NCL][subprocess.Popen ERROR] %s', err)
-            return False
-        return True
+        return [(_run_ncl_script, (script, env, out_dir))]
 
-    def _run_pyt_script(self, in_dir, out_dir, dataset, start, end):
-        """Run the Python cmorization mechanism."""
+    def _get_pyt_jobs(self, in_dir, out_dir, dataset, start, end):
+        """Get the jobs that run the Python cmorization mechanism.
+
+        Formatters can split their work into independent jobs, e.g. per year
+        or per variable, by providing a function ``get_jobs`` with the same
+        arguments as ``cmorization``. Otherwise, ``cmorization`` is run as a
+        single job.
+        """
         module_name = ('esmvaltool.cmorizers.data.formatters.datasets.' +
                        dataset.lower().replace("-", "_"))
         module = importlib.import_module(module_name)
         logger.info("CMORizing dataset %s using Python script %s", dataset,
                     module.__file__)
         cmor_cfg = read_cmor_config(dataset)
-        module.cmorization(in_dir, out_dir, cmor_cfg, self.config, start, end)
-        logger.info('CMORization of dataset %s finished!', dataset)
-        return True
+        args = (in_dir, out_dir, cmor_cfg, self.config, start, end)
+        if hasattr(module, 'get_jobs'):
+            return list(module.get_jobs(*args))
+        return [(module.cmorization, args)]
+
+
+def _download_dataset(dataset_module, config, dataset, dataset_info,
+                      start_date, end_date, overwrite):
+    """Download a single dataset using its downloader module."""
+    logger.info('Downloading %s', dataset)
+    try:
+        downloader = importlib.import_module(
+            f'.{dataset_module}',
+            package='esmvaltool.cmorizers.data.downloaders.datasets')
+    except ImportError:
+        logger.exception('Could not find cmorizer for %s', dataset)
+        raise
+
+    downloader.download_dataset(config, dataset, dataset_info, start_date,
+                                end_date, overwrite)
+    logger.info('%s downloaded', dataset)
+
+
+def _run_ncl_script(script, env, out_dir):
+    """Run an NCL cmorization script in the dataset output directory."""
+    ncl_call = ['ncl', script]
+    logger.info("Executing cmd: %s", ' '.join(ncl_call))
+    with subprocess.Popen(ncl_call,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT,
+                          cwd=out_dir,
+                          env=env) as process:
+        output, err = process.communicate()
+    for oline in str(output.decode('utf-8')).split('\n'):
+        logger.info('[NCL] %s', oline)
+    if err:
+        raise RuntimeError(f'[NCL][subprocess.Popen ERROR] {err}')
 
 
 class DataCommand():
@@ -471,6 +602,7 @@ class DataCommand():
                start=None,
                end=None,
                install=False,
+               incremental=False,
                **kwargs):
         """Format datasets.
 
@@ -488,12 +620,16 @@ class DataCommand():
             are YYYY, YYYYMM and YYYYMMDD.
         install : bool, optional
             If true, move processed data to the folder, by default False
+        incremental : bool, optional
+            If true, write processed data directly to the folder and only
+            process data whose input files, formatter or configuration
+            changed since the last run, by default False
         """
         start = self._parse_date(start)
         end = self._parse_date(end)
 
         self.formatter.start('formatting', datasets, config_file, kwargs)
-        self.formatter.format(start, end, install)
+        self.formatter.format(start, end, install, incremental)
 
     def prepare(self,
                 datasets,
@@ -502,6 +638,7 @@ class DataCommand():
                 end=None,
                 overwrite=False,
                 install=False,
+                incremental=False,
                 **kwargs):
         """Download and format a set of datasets.
 
@@ -521,13 +658,17 @@ class DataCommand():
             If true, move processed data to the folder, by default False
         overwrite : bool, optional
             If true, download already present data again
+        incremental : bool, optional
+            If true, write processed data directly to the folder and only
+            process data whose input files, formatter or configuration
+            changed since the last run, by default False
         """
         start = self._parse_date(start)
         end = self._parse_date(end)
 
         self.formatter.start('preparation', datasets, config_file, kwargs)
         if self.formatter.download(start, end, overwrite):
-            self.formatter.format(start, end, install)
+            self.formatter.format(start, end, install, incremental)
         else:
             logger.warning("Download failed, skipping format step")
 
@@ -2,6 +2,7 @@
 
 import logging
 import os
+import threading
 from collections.abc import Iterable
 
 import cdsapi
@@ -14,6 +15,9 @@ logger = logging.getLogger(__name__)
 class CDSDownloader(BaseDownloader):
     """Downloader class for the climate data store.
 
+    Inside `concurrent`, up to `max_connections` requests are submitted to
+    the CDS at the same time.
+
     Parameters
     ----------
     product_name : str
@@ -31,6 +35,8 @@ class CDSDownloader(BaseDownloader):
     extra_name : str, optional
         Some products have a subfix appended to their name for certain
         variables. This parameter is to specify it, by default ''
+    max_connections : int, optional
+        Maximum number of requests that run at the same time, by default 4
     """
     def __init__(self,
                  product_name,
@@ -39,10 +45,21 @@ class CDSDownloader(BaseDownloader):
                  dataset,
                  dataset_info,
                  overwrite,
-                 extra_name=''):
-        super().__init__(config, dataset, dataset_info, overwrite)
+                 extra_name='',
+                 max_connections=4):
+        super().__init__(config, dataset, dataset_info, overwrite,
+                         max_connections)
+        self._clients = threading.local()
+        self._clients.client = self._connect()
+        self._product_name = product_name
+        self._request_dict = request_dictionary
+        self.extra_name = extra_name
+
+    @staticmethod
+    def _connect():
+        """Create a CDS client."""
         try:
-            self._client = cdsapi.Client()
+            return cdsapi.Client()
         except Exception as ex:
             if str(ex).endswith(".cdsapirc"):
                 logger.error(
@@ -50,9 +67,13 @@ class CDSDownloader(BaseDownloader):
                     '".cdsapirc" file. More info in '
                     'https://cds.climate.copernicus.eu/api-how-to.')
             raise
-        self._product_name = product_name
-        self._request_dict = request_dictionary
-        self.extra_name = extra_name
+
+    @property
+    def _client(self):
+        """CDS client used by the current thread."""
+        if not hasattr(self._clients, 'client'):
+            self._clients.client = self._connect()
+        return self._clients.client
 
     def download(self,
                  year,
@@ -113,16 +134,24 @@ class CDSDownloader(BaseDownloader):
         if os.path.exists(filename):
             if self.overwrite:
                 os.remove(filename)
-            else:
+            elif self.manifest.is_complete(filename):
                 logger.info('File %s already downloaded. Skipping...',
                             filename)
                 return
+        self._submit(self._retrieve, filename, request)
+
+    def _retrieve(self, filename, request):
+        """Retrieve a request to a temporary file and move it into place."""
+        folder, basename = os.path.split(filename)
+        part_path = os.path.join(folder, f'.{basename}.part')
         try:
             self._client.retrieve(
                 self._product_name,
                 request,
-                filename,
+                part_path,
             )
         except Exception:
             logger.error('Failed request: %s', request)
             raise
+        os.replace(part_path, filename)
+        self.manifest.add(filename, self._product_name)
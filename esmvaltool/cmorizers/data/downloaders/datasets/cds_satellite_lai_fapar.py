@@ -53,8 +53,9 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         overwrite=overwrite,
     )
 
-    while loop_date <= end_date:
-        downloader.download(loop_date.year, loop_date.month)
-        loop_date += relativedelta.relativedelta(months=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            downloader.download(loop_date.year, loop_date.month)
+            loop_date += relativedelta.relativedelta(months=1)
 
     unpack_files_in_folder(downloader.local_folder)
@@ -2,6 +2,7 @@
 
 import calendar
 import datetime
+from contextlib import ExitStack
 
 from dateutil import relativedelta
 
@@ -61,24 +62,30 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         daily_downloaders[sensor] = get_downloader(config, dataset,
                                                    dataset_info, overwrite,
                                                    sensor, 'day')
-    while loop_date <= end_date:
-        for sensor, downloader in monthly_downloaders.items():
-            pattern = f'cds-satellite-soil-moisture_cdr_{sensor}_monthly'
-            downloader.download(loop_date.year,
-                                loop_date.month,
-                                file_pattern=pattern)
-        loop_date += relativedelta.relativedelta(months=1)
+    with ExitStack() as stack:
+        for downloader in monthly_downloaders.values():
+            stack.enter_context(downloader.concurrent())
+        while loop_date <= end_date:
+            for sensor, downloader in monthly_downloaders.items():
+                pattern = f'cds-satellite-soil-moisture_cdr_{sensor}_monthly'
+                downloader.download(loop_date.year,
+                                    loop_date.month,
+                                    file_pattern=pattern)
+            loop_date += relativedelta.relativedelta(months=1)
 
     loop_date = start_date
-    while loop_date <= end_date:
-        for sensor, downloader in daily_downloaders.items():
-            downloader.download(
-                loop_date.year, loop_date.month, [
-                    f'{i+1:02d}' for i in range(
-                        calendar.monthrange(loop_date.year, loop_date.month)
-                        [1])
-                ], f'cds-satellite-soil-moisture_cdr_{sensor}_daily')
-        loop_date += relativedelta.relativedelta(months=1)
+    with ExitStack() as stack:
+        for downloader in daily_downloaders.values():
+            stack.enter_context(downloader.concurrent())
+        while loop_date <= end_date:
+            for sensor, downloader in daily_downloaders.items():
+                downloader.download(
+                    loop_date.year, loop_date.month, [
+                        f'{i+1:02d}' for i in range(
+                            calendar.monthrange(loop_date.year,
+                                                loop_date.month)[1])
+                    ], f'cds-satellite-soil-moisture_cdr_{sensor}_daily')
+            loop_date += relativedelta.relativedelta(months=1)
     unpack_files_in_folder(downloader.local_folder)
 
 
@@ -53,12 +53,14 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
     )
 
     loop_date = start_date
-    while loop_date <= end_date:
-        downloader.download(
-            loop_date.year,
-            loop_date.month, [
-                f'{i+1:02d}' for i in range(
-                    calendar.monthrange(loop_date.year, loop_date.month)[1])
-            ],
-            file_format='nc')
-        loop_date += relativedelta.relativedelta(months=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            downloader.download(
+                loop_date.year,
+                loop_date.month, [
+                    f'{i+1:02d}' for i in range(
+                        calendar.monthrange(loop_date.year,
+                                            loop_date.month)[1])
+                ],
+                file_format='nc')
+            loop_date += relativedelta.relativedelta(months=1)
@@ -42,11 +42,12 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         end_date = datetime.datetime(2020, 1, 1)
 
     loop_date = start_date
-    while loop_date <= end_date:
-        year = loop_date.year
-        downloader.download_folder(
-            "http://orca.science.oregonstate.edu/data/1x2/monthly/"
-            f"eppley.r2018.m.chl.m.sst/hdf/eppley.m.{year}.tar",
-            wget_options=["--accept=tar"])
-        loop_date += relativedelta.relativedelta(years=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            year = loop_date.year
+            downloader.download_folder(
+                "http://orca.science.oregonstate.edu/data/1x2/monthly/"
+                f"eppley.r2018.m.chl.m.sst/hdf/eppley.m.{year}.tar",
+                wget_options=["--accept=tar"])
+            loop_date += relativedelta.relativedelta(years=1)
     unpack_files_in_folder(downloader.local_folder)
@@ -39,19 +39,20 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         overwrite=overwrite,
     )
 
-    while loop_date <= end_date:
-        year = loop_date.year
-        downloader.download_folder(
-            "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
-            f"MAIMNXINT.5.2.0/{year}/")
-        downloader.download_folder(
-            "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
-            f"MAIMCPASM.5.2.0/{year}/")
-        downloader.download_folder(
-            "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
-            f"MATMNXRAD.5.2.0/{year}/")
-        downloader.download_folder(
-            "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
-            f"MATMFXCHM.5.2.0/{year}/")
-
-        loop_date += relativedelta.relativedelta(years=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            year = loop_date.year
+            downloader.download_folder(
+                "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
+                f"MAIMNXINT.5.2.0/{year}/")
+            downloader.download_folder(
+                "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
+                f"MAIMCPASM.5.2.0/{year}/")
+            downloader.download_folder(
+                "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
+                f"MATMNXRAD.5.2.0/{year}/")
+            downloader.download_folder(
+                "https://goldsmr3.gesdisc.eosdis.nasa.gov/data/MERRA_MONTHLY/"
+                f"MATMFXCHM.5.2.0/{year}/")
+
+            loop_date += relativedelta.relativedelta(years=1)
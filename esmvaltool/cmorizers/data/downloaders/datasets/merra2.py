@@ -39,33 +39,34 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         overwrite=overwrite,
     )
 
-    while loop_date <= end_date:
-        year = loop_date.year
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2TMNXLND.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2IMNPANA.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2IMNPASM.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2TMNXRAD.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2TMNXSLV.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2SMNXSLV.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2TMNXFLX.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2TMNPCLD.5.12.4/{year}/")
-        downloader.download_folder(
-            "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
-            f"M2IMNXASM.5.12.4/{year}/")
-        loop_date += relativedelta.relativedelta(years=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            year = loop_date.year
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2TMNXLND.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2IMNPANA.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2IMNPASM.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2TMNXRAD.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2TMNXSLV.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2SMNXSLV.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2TMNXFLX.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr5.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2TMNPCLD.5.12.4/{year}/")
+            downloader.download_folder(
+                "https://goldsmr4.gesdisc.eosdis.nasa.gov/data/MERRA2_MONTHLY/"
+                f"M2IMNXASM.5.12.4/{year}/")
+            loop_date += relativedelta.relativedelta(years=1)
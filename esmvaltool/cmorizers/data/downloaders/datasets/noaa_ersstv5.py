@@ -43,7 +43,9 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
     base_path = ("https://www1.ncdc.noaa.gov/pub/data/cmb/ersst/v5/netcdf/"
                  "ersst.v5.{year}{month:02d}.nc")
 
-    while loop_date <= end_date:
-        downloader.download_folder(
-            base_path.format(year=loop_date.year, month=loop_date.month), [])
-        loop_date += relativedelta.relativedelta(months=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            downloader.download_folder(
+                base_path.format(year=loop_date.year, month=loop_date.month),
+                [])
+            loop_date += relativedelta.relativedelta(months=1)
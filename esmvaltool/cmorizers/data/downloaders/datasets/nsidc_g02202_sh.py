@@ -67,14 +67,15 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
         suffix = suffls[isuf]
         isuf += 1
 
-    while loop_date <= end_date:
+    with downloader.concurrent():
+        while loop_date <= end_date:
 
-        if loop_date > datels[isuf]:
-            suffix = suffls[isuf]
-            isuf += 1
+            if loop_date > datels[isuf]:
+                suffix = suffls[isuf]
+                isuf += 1
 
-        downloader.download_folder(
-            base_path.format(year=loop_date.year, month=loop_date.month,
-                             other=suffix), [])
-        loop_date += relativedelta.relativedelta(months=1)
-        # check loop_date is => next bin
+            downloader.download_folder(
+                base_path.format(year=loop_date.year, month=loop_date.month,
+                                 other=suffix), [])
+            loop_date += relativedelta.relativedelta(months=1)
+            # check loop_date is => next bin
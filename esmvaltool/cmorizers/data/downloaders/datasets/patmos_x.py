@@ -1,5 +1,6 @@
 """Script to download PATMOS-x."""
 
+import contextlib
 import os
 from datetime import datetime
 
@@ -43,11 +44,14 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
     base_path = (
         "https://www.ncei.noaa.gov/data/"
         "avhrr-reflectance-cloud-properties-patmos-extended/access/{year}/")
-    while loop_date <= end_date:
-
-        downloader.download_folder(
-            base_path.format(year=loop_date.year),
-            # ["--accept='*NOAA*.nc'", "--reject='*preliminary*'"]
-            [])
+    with downloader.concurrent():
+        while loop_date <= end_date:
+
+            downloader.download_folder(
+                base_path.format(year=loop_date.year),
+                # ["--accept='*NOAA*.nc'", "--reject='*preliminary*'"]
+                [])
+            loop_date += relativedelta.relativedelta(years=1)
+    # Not present if all folders were downloaded before
+    with contextlib.suppress(FileNotFoundError):
         os.remove(os.path.join(downloader.local_folder, 'index.html'))
-        loop_date += relativedelta.relativedelta(years=1)
@@ -1,5 +1,6 @@
 """Script to download PERSIANN-CDR."""
 
+import contextlib
 import os
 from datetime import datetime
 
@@ -46,5 +47,6 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
             overwrite=overwrite,
         )
         downloader.download_folder(base_path.format(year=loop_date.year), [])
-        os.remove(os.path.join(downloader.local_folder, 'index.html'))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(downloader.local_folder, 'index.html'))
         loop_date += relativedelta.relativedelta(years=1)
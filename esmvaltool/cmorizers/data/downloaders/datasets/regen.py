@@ -42,7 +42,8 @@ def download_dataset(config, dataset, dataset_info, start_date, end_date,
     base_path = ("http://dapds00.nci.org.au/thredds/fileServer/ks32/CLEX_Data/"
                  "REGEN_AllStns/v1-2019/REGEN_AllStns_{version}_{year}.nc")
     version = read_cmor_config(dataset)['attributes']['version']
-    while loop_date <= end_date:
-        downloader.download_folder(
-            base_path.format(year=loop_date.year, version=version), [])
-        loop_date += relativedelta.relativedelta(years=1)
+    with downloader.concurrent():
+        while loop_date <= end_date:
+            downloader.download_folder(
+                base_path.format(year=loop_date.year, version=version), [])
+            loop_date += relativedelta.relativedelta(years=1)
@@ -1,6 +1,121 @@
 """Downloader base class."""
 
+import json
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadManifest():
+    """Record of the files that were downloaded completely.
+
+    The manifest is stored as a hidden file in the download folder, with one
+    line per downloaded file or folder, so that it is kept up to date even if
+    a download is interrupted.
+
+    Parameters
+    ----------
+    folder : str
+        Download folder
+    """
+
+    filename = '.download_manifest.jsonl'
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, self.filename)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._folders = set()
+        if os.path.isfile(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    record = json.loads(line)
+                    if 'folder' in record:
+                        self._folders.add(record['folder'])
+                    else:
+                        self._files[record['file']] = record
+
+    def _key(self, local_path):
+        return os.path.relpath(local_path, self.folder)
+
+    def is_complete(self, local_path):
+        """Check if a file has been downloaded completely.
+
+        Downloaders only move files to their final path once they are
+        complete, so existing files without a record (e.g., files that were
+        downloaded before the manifest was used) are assumed to be complete.
+
+        Parameters
+        ----------
+        local_path : str
+            Path to the downloaded file
+
+        Returns
+        -------
+        bool
+            True if the file exists and has the recorded size
+        """
+        if not os.path.isfile(local_path):
+            return False
+        record = self._files.get(self._key(local_path))
+        return record is None or record['size'] == os.path.getsize(local_path)
+
+    def add(self, local_path, source):
+        """Record a completely downloaded file.
+
+        Parameters
+        ----------
+        local_path : str
+            Path to the downloaded file
+        source : str
+            Remote path or request the file was downloaded from
+        """
+        record = {
+            'file': self._key(local_path),
+            'source': source,
+            'size': os.path.getsize(local_path),
+        }
+        with self._lock:
+            self._files[record['file']] = record
+            self._write(record)
+
+    def is_folder_complete(self, source):
+        """Check if a remote folder has been downloaded completely.
+
+        Parameters
+        ----------
+        source : str
+            Remote path of the folder
+
+        Returns
+        -------
+        bool
+            True if all files of the folder have been downloaded
+        """
+        return source in self._folders
+
+    def add_folder(self, source):
+        """Record a completely downloaded remote folder.
+
+        Parameters
+        ----------
+        source : str
+            Remote path of the folder
+        """
+        with self._lock:
+            self._folders.add(source)
+            self._write({'folder': source})
+
+    def _write(self, record):
+        """Append a record to the manifest file."""
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record) + '\n')
 
 
 class BaseDownloader():
@@ -16,13 +131,25 @@ class BaseDownloader():
         Dataset information from the datasets.yml file
     overwrite : bool
         Overwrite already downloaded files
+    max_connections : int, optional
+        Maximum number of files that are downloaded at the same time, by
+        default 4
     """
-    def __init__(self, config, dataset, dataset_info, overwrite):
+    def __init__(self,
+                 config,
+                 dataset,
+                 dataset_info,
+                 overwrite,
+                 max_connections=4):
         self._config = config
         self.tier = dataset_info['tier']
         self.dataset = dataset
         self.dataset_info = dataset_info
         self.overwrite = overwrite
+        self.max_connections = max_connections
+        self._executor = None
+        self._futures = []
+        self._manifest = None
 
     @property
     def local_folder(self):
@@ -46,3 +173,55 @@ class BaseDownloader():
             Path to the RAWOBS folder
         """
         return self._config['rootpath']['RAWOBS'][0]
+
+    @property
+    def manifest(self):
+        """Manifest of the completely downloaded files.
+
+        Returns
+        -------
+        DownloadManifest
+            Manifest stored in the download folder
+        """
+        if self._manifest is None:
+            self._manifest = DownloadManifest(self.local_folder)
+        return self._manifest
+
+    @contextmanager
+    def concurrent(self):
+        """Download the files requested inside the block concurrently.
+
+        Use as `with downloader.concurrent():`. At most `max_connections`
+        files are downloaded at the same time. When leaving the block, all
+        downloads are finished and the first error, if any, is raised.
+        """
+        if self._executor is not None:
+            yield
+            return
+        try:
+            with ThreadPoolExecutor(
+                    max_workers=self.max_connections) as executor:
+                self._executor = executor
+                try:
+                    yield
+                finally:
+                    self._executor = None
+        finally:
+            self._close_connections()
+        futures, self._futures = self._futures, []
+        errors = [future.exception() for future in futures]
+        errors = [error for error in errors if error is not None]
+        for error in errors[1:]:
+            logger.error('Download failed: %s', error)
+        if errors:
+            raise errors[0]
+
+    def _close_connections(self):
+        """Close connections opened by the threads of `concurrent`."""
+
+    def _submit(self, function, *args):
+        """Run a download now or, inside `concurrent`, in the pool."""
+        if self._executor is None:
+            function(*args)
+        else:
+            self._futures.append(self._executor.submit(function, *args))
@@ -4,6 +4,8 @@ import ftplib
 import logging
 import os
 import re
+import threading
+import time
 
 from progressbar import (
     ETA,
@@ -22,6 +24,9 @@ logger = logging.getLogger(__name__)
 class FTPDownloader(BaseDownloader):
     """Downloader for FTP repositories.
 
+    Files in a folder are downloaded concurrently, each connection to the
+    server is used by a single thread. Interrupted downloads are resumed.
+
     Parameters
     ----------
     config : dict
@@ -34,15 +39,51 @@ class FTPDownloader(BaseDownloader):
         Dataset information from the datasets.yml file
     overwrite : bool
         Overwrite already downloaded files
+    max_connections : int, optional
+        Maximum number of connections to the server, by default 4
     """
-    def __init__(self, config, server, dataset, dataset_info, overwrite):
-        super().__init__(config, dataset, dataset_info, overwrite)
-        self._client = None
+    def __init__(self,
+                 config,
+                 server,
+                 dataset,
+                 dataset_info,
+                 overwrite,
+                 max_connections=4):
+        super().__init__(config, dataset, dataset_info, overwrite,
+                         max_connections)
+        self._connections = threading.local()
+        self._worker_clients = []
+        self._lock = threading.Lock()
+        self._cwd = None
         self.server = server
 
+    @property
+    def _client(self):
+        """Connection to the server used by the current thread."""
+        client = getattr(self._connections, 'client', None)
+        if client is None:
+            client = ftplib.FTP(self.server)
+            client.login()
+            if self._cwd is not None:
+                client.cwd(self._cwd)
+            self._connections.client = client
+            with self._lock:
+                self._worker_clients.append(client)
+        return client
+
+    def _close_connections(self):
+        """Close the connections opened by the download threads."""
+        with self._lock:
+            clients, self._worker_clients = self._worker_clients, []
+        for client in clients:
+            try:
+                client.quit()
+            except ftplib.all_errors:
+                client.close()
+
     def connect(self):
         """Connect to the FTP server."""
-        self._client = ftplib.FTP(self.server)
+        self._connections.client = ftplib.FTP(self.server)
         logger.info(self._client.getwelcome())
         self._client.login()
 
@@ -57,7 +98,8 @@ class FTPDownloader(BaseDownloader):
         logger.debug('Current working directory: %s', self._client.pwd())
         logger.debug('Setting working directory to %s', path)
         self._client.cwd(path)
-        logger.debug('New working directory: %s', self._client.pwd())
+        self._cwd = self._client.pwd()
+        logger.debug('New working directory: %s', self._cwd)
 
     def list_folders(self, server_path='.'):
         """List folder in the remote.
@@ -90,6 +132,8 @@ class FTPDownloader(BaseDownloader):
     def download_folder(self, server_path, sub_folder='', filter_files=None):
         """Download files from a given folder.
 
+        Up to `max_connections` files are downloaded at the same time.
+
         Parameters
         ----------
         server_path : str
@@ -109,12 +153,17 @@ class FTPDownloader(BaseDownloader):
                 filename for filename in filenames
                 if expression.match(os.path.basename(filename))
             ]
-        for filename in filenames:
-            self.download_file(filename, sub_folder)
+        with self.concurrent():
+            for filename in filenames:
+                self.download_file(filename, sub_folder)
 
     def download_file(self, server_path, sub_folder=''):
         """Download a file from the server.
 
+        Partially downloaded files are resumed and the size of the file is
+        checked after the transfer. Inside `concurrent`, the file is
+        downloaded in the background.
+
         Parameters
         ----------
         server_path : str
@@ -125,42 +174,66 @@ class FTPDownloader(BaseDownloader):
         os.makedirs(os.path.join(self.local_folder, sub_folder), exist_ok=True)
         local_path = os.path.join(self.local_folder, sub_folder,
                                   os.path.basename(server_path))
-        if not self.overwrite and os.path.isfile(local_path):
+        if not self.overwrite and self.manifest.is_complete(local_path):
             logger.info('File %s already downloaded. Skipping...', server_path)
             return
+        self._submit(self._download_file, server_path, local_path)
+
+    def _download_file(self, server_path, local_path):
+        """Download a file to a temporary file and move it into place."""
         logger.info('Downloading %s', server_path)
         logger.debug('Downloading to %s', local_path)
+        folder, filename = os.path.split(local_path)
+        part_path = os.path.join(folder, f'.{filename}.part')
+
+        client = self._client
+        client.sendcmd("TYPE i")
+        size = client.size(server_path)
+        offset = 0
+        if not self.overwrite and os.path.isfile(part_path):
+            offset = os.path.getsize(part_path)
+            if offset > size:
+                offset = 0
+            elif offset:
+                logger.info('Resuming %s at %s bytes', server_path, offset)
+
+        progress = None
+        if self.max_connections == 1:
+            widgets = [
+                DataSize(),
+                Bar(),
+                Percentage(), ' ',
+                FileTransferSpeed(), ' (',
+                ETA(), ')'
+            ]
+            progress = ProgressBar(max_value=size, widgets=widgets)
+            progress.start()
+            progress.update(offset)
 
-        self._client.sendcmd("TYPE i")
-        size = self._client.size(server_path)
-
-        widgets = [
-            DataSize(),
-            Bar(),
-            Percentage(), ' ',
-            FileTransferSpeed(), ' (',
-            ETA(), ')'
-        ]
-
-        progress = ProgressBar(max_value=size, widgets=widgets)
-        progress.start()
-
-        with open(local_path, 'wb') as file_handler:
+        start = time.perf_counter()
+        with open(part_path, 'ab' if offset else 'wb') as file_handler:
 
             def _file_write(data):
                 file_handler.write(data)
                 nonlocal progress
-                progress += len(data)
-
-            try:
-                self._client.retrbinary(f'RETR {server_path}', _file_write)
-            except Exception:
-                file_handler.close()
-                if os.path.exists(local_path):
-                    os.remove(local_path)
-                raise
-
-        progress.finish()
+                if progress is not None:
+                    progress += len(data)
+
+            client.retrbinary(f'RETR {server_path}',
+                              _file_write,
+                              rest=offset or None)
+
+        if progress is not None:
+            progress.finish()
+        received = os.path.getsize(part_path)
+        if received != size:
+            raise IOError(f'Downloaded {received} bytes of {server_path}, '
+                          f'expected {size} bytes')
+        os.replace(part_path, local_path)
+        self.manifest.add(local_path, server_path)
+        elapsed = time.perf_counter() - start
+        logger.info('Downloaded %s (%.1f MB, %.1f MB/s)', server_path,
+                    size / 2**20, (size - offset) / 2**20 / max(elapsed, 1e-6))
 
 
 class CCIDownloader(FTPDownloader):
@@ -176,10 +249,17 @@ class CCIDownloader(FTPDownloader):
         Dataset information from the datasets.yml file
     overwrite : bool
         Overwrite already downloaded files
+    max_connections : int, optional
+        Maximum number of connections to the server, by default 4
     """
-    def __init__(self, config, dataset, dataset_info, overwrite):
+    def __init__(self,
+                 config,
+                 dataset,
+                 dataset_info,
+                 overwrite,
+                 max_connections=4):
         super().__init__(config, 'anon-ftp.ceda.ac.uk', dataset, dataset_info,
-                         overwrite)
+                         overwrite, max_connections)
         self.ftp_name = self.dataset_name[7:]
 
     def set_cwd(self, path):
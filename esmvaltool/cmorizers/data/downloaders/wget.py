@@ -1,7 +1,9 @@
 """wget based downloader."""
 
+import hashlib
 import logging
 import os
+import shutil
 import subprocess
 
 from .downloader import BaseDownloader
@@ -10,10 +12,20 @@ logger = logging.getLogger(__name__)
 
 
 class WGetDownloader(BaseDownloader):
-    """Data downloader based on wget."""
+    """Data downloader based on wget.
+
+    Interrupted file and folder downloads are continued. Inside `concurrent`,
+    files and folders are downloaded in the background.
+    """
     def download_folder(self, server_path, wget_options):
         """Download folder.
 
+        The folder is downloaded to a hidden staging folder (one per remote
+        folder, so that concurrent downloads do not share wget's temporary
+        index files) and the files are moved to the download folder once
+        wget succeeds. Interrupted downloads are continued from the staging
+        folder and completely downloaded folders are skipped.
+
         Parameters
         ----------
         server_path: str
@@ -25,18 +37,45 @@ class WGetDownloader(BaseDownloader):
             raise ValueError(
                 'Overwrite does not work with downloading directories through '
                 'wget. Please, remove the unwanted data manually')
-        command = ['wget'] + wget_options + self.overwrite_options + [
-            f'--directory-prefix={self.local_folder}',
+        if self.manifest.is_folder_complete(server_path):
+            logger.info('Folder %s already downloaded. Skipping...',
+                        server_path)
+            return
+        name = hashlib.sha256(server_path.encode()).hexdigest()[:16]
+        staging_folder = os.path.join(self.local_folder, '.wget', name)
+        command = ['wget'] + wget_options + [
+            '--continue',
+            f'--directory-prefix={staging_folder}',
             '--recursive',
             '--no-directories',
             f'{server_path}',
         ]
+        self._submit(self._download_folder, command, staging_folder,
+                     server_path)
+
+    def _download_folder(self, command, staging_folder, server_path):
+        """Run wget and move the downloaded files into place."""
         logger.debug(command)
+        os.makedirs(staging_folder, exist_ok=True)
         subprocess.check_output(command)
+        for filename in sorted(os.listdir(staging_folder)):
+            local_path = os.path.join(self.local_folder, filename)
+            os.replace(os.path.join(staging_folder, filename), local_path)
+            self.manifest.add(local_path, server_path)
+        self.manifest.add_folder(server_path)
+        shutil.rmtree(staging_folder)
+        try:
+            os.rmdir(os.path.dirname(staging_folder))
+        except OSError:
+            pass
 
     def download_file(self, server_path, wget_options):
         """Download file.
 
+        The file is downloaded to a hidden ``.part`` file, which is moved into
+        place once wget succeeds, so interrupted downloads are continued on
+        the next run.
+
         Parameters
         ----------
         server_path: str
@@ -44,15 +83,30 @@ class WGetDownloader(BaseDownloader):
         wget_options: list(str)
             Extra options for wget
         """
-        command = ['wget'] + wget_options + self.overwrite_options + [
-            f'--directory-prefix={self.local_folder}',
-            '--no-directories',
+        filename = os.path.basename(server_path)
+        local_path = os.path.join(self.local_folder, filename)
+        if not self.overwrite and self.manifest.is_complete(local_path):
+            logger.info('File %s already downloaded. Skipping...', server_path)
+            return
+        part_path = os.path.join(self.local_folder, f'.{filename}.part')
+        command = ['wget'] + wget_options + [
+            f'--output-document={part_path}',
             server_path,
         ]
-        if self.overwrite:
-            command.append(f'-O {os.path.basename(server_path)}')
+        if not self.overwrite:
+            command.append('--continue')
+        self._submit(self._download_file, command, part_path, local_path,
+                     server_path)
+
+    def _download_file(self, command, part_path, local_path, server_path):
+        """Run wget and move the downloaded file into place."""
         logger.debug(command)
+        os.makedirs(self.local_folder, exist_ok=True)
+        if self.overwrite and os.path.isfile(part_path):
+            os.remove(part_path)
         subprocess.check_output(command)
+        os.replace(part_path, local_path)
+        self.manifest.add(local_path, server_path)
 
     def login(self, server_path, wget_options):
         """Login.
@@ -80,8 +134,14 @@ class WGetDownloader(BaseDownloader):
 
 class NASADownloader(WGetDownloader):
     """Downloader for the NASA repository."""
-    def __init__(self, config, dataset, dataset_info, overwrite):
-        super().__init__(config, dataset, dataset_info, overwrite)
+    def __init__(self,
+                 config,
+                 dataset,
+                 dataset_info,
+                 overwrite,
+                 max_connections=4):
+        super().__init__(config, dataset, dataset_info, overwrite,
+                         max_connections)
 
         self._wget_common_options = [
             "--load-cookies=~/.urs_cookies",
@@ -94,7 +94,6 @@ For further details on obtaining daily values from ERA-Interim,
 import logging
 import re
 from collections import defaultdict
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from copy import deepcopy
 from datetime import datetime, timedelta
 from os import cpu_count
@@ -108,6 +107,7 @@ from esmvalcore.preprocessor import daily_statistics, monthly_statistics
 from iris import NameConstraint
 
 from esmvaltool.cmorizers.data import utilities as utils
+from esmvaltool.cmorizers.data.scheduler import run_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -391,6 +391,8 @@ def _extract_variable(in_files, var, cfg, out_dir):
     logger.info("CMORizing variable '%s' from input files '%s'",
                 var['short_name'], ', '.join(in_files))
     attributes = deepcopy(cfg['attributes'])
+    attributes['comment'] = attributes['comment'].strip().format(
+        year=datetime.now().year)
     attributes['mip'] = var['mip']
     cmor_table = CMOR_TABLES[attributes['project_id']]
     definition = cmor_table.get_variable(var['mip'], var['short_name'])
@@ -471,43 +473,26 @@ def _get_in_files_by_year(in_dir, var):
     return in_files.values()
 
 
-def _run(jobs, n_workers):
-    """Run CMORization jobs using n_workers."""
-    if n_workers == 1:
-        for job in jobs:
-            _extract_variable(*job)
-    else:
-        with ProcessPoolExecutor(max_workers=n_workers) as executor:
-            futures = {}
-            for job in jobs:
-                future = executor.submit(_extract_variable, *job)
-                futures[future] = job[0]
+def get_jobs(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
+    """Get one CMORization job per variable and year."""
+    cfg.pop('cmor_table')
 
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except:  # noqa
-                    logger.error("Failed to CMORize %s",
-                                 ', '.join(futures[future]))
-                    raise
+    jobs = []
+    for short_name, var in cfg['variables'].items():
+        if 'short_name' not in var:
+            var['short_name'] = short_name
+        for in_files in _get_in_files_by_year(in_dir, var):
+            jobs.append((_extract_variable, (in_files, var, cfg, out_dir)))
+    return jobs
 
 
 def cmorization(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
     """Run CMORizer for ERA-Interim."""
-    cfg['attributes']['comment'] = cfg['attributes']['comment'].strip().format(
-        year=datetime.now().year)
-    cfg.pop('cmor_table')
-
     n_workers = cfg_user.get('max_parallel_tasks')
     if n_workers is None:
         n_workers = int(cpu_count() / 1.5)
-    logger.info("Using at most %s workers", n_workers)
-
-    jobs = []
-    for short_name, var in cfg['variables'].items():
-        if 'short_name' not in var:
-            var['short_name'] = short_name
-        for in_files in _get_in_files_by_year(in_dir, var):
-            jobs.append([in_files, var, cfg, out_dir])
 
-    _run(jobs, n_workers)
+    dataset = cfg['attributes']['dataset_id']
+    jobs = get_jobs(in_dir, out_dir, cfg, cfg_user, start_date, end_date)
+    if run_jobs({dataset: jobs}, n_workers):
+        raise RuntimeError(f"Failed to CMORize {dataset}")
@@ -16,6 +16,7 @@ Download and processing instructions
 
 from esmvaltool.cmorizers.data.formatters.datasets.era_interim import (
     cmorization,
+    get_jobs,
 )
 
-__all__ = ['cmorization']
+__all__ = ['cmorization', 'get_jobs']
@@ -284,8 +284,8 @@ def _extract_variable(in_files, var, cfg, out_dir):
     logger.info("Finished CMORizing %s", ', '.join(in_files))
 
 
-def cmorization(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
-    """Run CMORizer for MERRA2."""
+def get_jobs(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
+    """Get one CMORization job per year and variable."""
     cfg.pop('cmor_table')
     if start_date is None:
         start_date = 1980
@@ -295,6 +295,7 @@ def cmorization(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
         end_date = 2022
     else:
         end_date = end_date.year
+    jobs = []
     for year in range(start_date, end_date + 1):
         for short_name, var in cfg['variables'].items():
             if 'short_name' not in var:
@@ -305,4 +306,12 @@ def cmorization(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
             if not in_files:
                 logger.warning('Year %s data not found', year)
                 continue
-            _extract_variable(in_files, var, cfg, out_dir)
+            jobs.append((_extract_variable, (in_files, var, cfg, out_dir)))
+    return jobs
+
+
+def cmorization(in_dir, out_dir, cfg, cfg_user, start_date, end_date):
+    """Run CMORizer for MERRA2."""
+    for function, args in get_jobs(in_dir, out_dir, cfg, cfg_user,
+                                   start_date, end_date):
+        function(*args)
@@ -0,0 +1,294 @@
+"""Manifest of CMORized output files for incremental formatting.
+
+The manifest records for each formatting job the input files it read (size,
+modification time and checksum), the version of the formatter, the
+configuration passed to the job and the output files it wrote. On the next
+run, jobs for which none of these have changed and whose output files are
+still present are skipped.
+
+The input files of a job are the existing files among its arguments. Input
+directories, e.g. the raw data directory passed to formatters that run as a
+single job, only contribute all files they contain if a job does not receive
+any files directly. Checksums are computed at most once per file and run.
+
+The output files of a job are the files it writes with
+:func:`esmvaltool.cmorizers.data.utilities.save_variable`. Output that is
+written in another way, e.g. by NCL formatters, can be recorded for a job
+explicitly or installed without being tracked.
+"""
+import datetime
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+import yaml
+
+from esmvaltool import __version__
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'cmorization_manifest.yml'
+
+
+def file_checksum(path, chunk_size=2**20):
+    """Compute the SHA-256 checksum of a file.
+
+    Parameters
+    ----------
+    path: str
+        Path to the file.
+    chunk_size: int
+        Number of bytes that are read at once.
+
+    Returns
+    -------
+    str
+        Hexadecimal checksum.
+    """
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def _formatter_version(function):
+    """Get a version string for the code of a formatting job."""
+    source_file = inspect.getsourcefile(function)
+    if source_file is None:
+        return __version__
+    return f'{__version__}-{file_checksum(source_file)[:16]}'
+
+
+class Manifest():
+    """Manifest of the output files of a CMORized dataset.
+
+    Parameters
+    ----------
+    directory: str
+        Directory where the output files and the manifest are stored.
+    ignore: dict, optional
+        Job arguments that do not affect the output, e.g. the output
+        directory of the current run, keyed by the name that is used instead
+        of their value.
+    """
+
+    def __init__(self, directory, ignore=None):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_FILE
+        self.ignore = dict(ignore or {})
+        self.entries = {}
+        if self.path.exists():
+            with self.path.open(encoding='utf-8') as file:
+                self.entries = yaml.safe_load(file) or {}
+        self._versions = {}
+        self._checksums = {}
+        self._listings = {}
+
+    def _ignored(self, obj):
+        """Get the name of an ignored argument, or None."""
+        for name, value in self.ignore.items():
+            if obj is value:
+                return name
+            if (isinstance(obj, (str, Path)) and isinstance(value, (str, Path))
+                    and str(obj) == str(value)):
+                return name
+        return None
+
+    def _checksum(self, path, stat):
+        """Compute the checksum of a file once per size and mtime."""
+        key = (path, stat['size'], stat['mtime'])
+        if key not in self._checksums:
+            self._checksums[key] = file_checksum(path)
+        return self._checksums[key]
+
+    def _list_files(self, path):
+        """List all files in a directory once."""
+        if path not in self._listings:
+            self._listings[path] = [
+                os.path.join(root, f) for root, _, files in os.walk(path)
+                for f in files
+            ]
+        return self._listings[path]
+
+    def _canonical(self, obj, inputs, directories):
+        """Convert a job argument to a representation that can be hashed.
+
+        Existing files are added to `inputs` and existing directories to
+        `directories`.
+        """
+        name = self._ignored(obj)
+        if name is not None:
+            return f'<{name}>'
+        if isinstance(obj, dict):
+            return {
+                str(key): self._canonical(value, inputs, directories)
+                for key, value in obj.items()
+            }
+        if isinstance(obj, (list, tuple, set)):
+            return [
+                self._canonical(value, inputs, directories) for value in obj
+            ]
+        if isinstance(obj, (str, Path)):
+            path = str(obj)
+            if os.path.isfile(path):
+                inputs.append(path)
+            elif os.path.isdir(path):
+                directories.append(path)
+            return path
+        if isinstance(obj, (datetime.date, datetime.datetime)):
+            return obj.isoformat()
+        if obj is None or isinstance(obj, (bool, int, float)):
+            return obj
+        # Objects without a stable representation, e.g. CMOR tables
+        return f'<{type(obj).__module__}.{type(obj).__qualname__}>'
+
+    def fingerprint(self, job):
+        """Describe a formatting job.
+
+        Parameters
+        ----------
+        job: tuple
+            Function and arguments of the job.
+
+        Returns
+        -------
+        tuple
+            Key that identifies the job and a record of its input files and
+            formatter version.
+        """
+        function, args = job
+        inputs = []
+        directories = []
+        name = f'{function.__module__}.{function.__qualname__}'
+        canonical = [name, self._canonical(args, inputs, directories)]
+        if not inputs:
+            for directory in directories:
+                inputs.extend(self._list_files(directory))
+        key = hashlib.sha256(
+            json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+        if function not in self._versions:
+            self._versions[function] = _formatter_version(function)
+        record = {
+            'function': name,
+            'formatter_version': self._versions[function],
+            'inputs': {},
+        }
+        for path in sorted(set(inputs)):
+            stat = os.stat(path)
+            record['inputs'][path] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+            }
+        return key, record
+
+    def is_current(self, key, record):
+        """Check if the recorded output of a job is still up to date."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        if entry['formatter_version'] != record['formatter_version']:
+            return False
+        if set(entry['inputs']) != set(record['inputs']):
+            return False
+        for path, stat in record['inputs'].items():
+            old = entry['inputs'][path]
+            if old['size'] != stat['size']:
+                return False
+            if old['mtime'] != stat['mtime']:
+                if old['checksum'] != self._checksum(path, stat):
+                    return False
+                old['mtime'] = stat['mtime']
+        return all((self.directory / filename).exists()
+                   for filename in entry['outputs'])
+
+    def outdated(self, jobs):
+        """Select the jobs whose output needs to be (re)generated.
+
+        Parameters
+        ----------
+        jobs: list(tuple)
+            Function and arguments of each job.
+
+        Returns
+        -------
+        list(tuple)
+            The outdated jobs.
+        dict
+            Key and record of each outdated job, keyed by its index in the
+            returned list of jobs.
+        """
+        outdated = []
+        records = {}
+        for job in jobs:
+            key, record = self.fingerprint(job)
+            if self.is_current(key, record):
+                continue
+            records[len(outdated)] = (key, record)
+            outdated.append(job)
+        logger.info("Skipping %s of %s jobs with up to date output in %s",
+                    len(jobs) - len(outdated), len(jobs), self.directory)
+        return outdated, records
+
+    def record(self, key, record, outputs):
+        """Move the output of a finished job into place and record it.
+
+        Parameters
+        ----------
+        key: str
+            Key that identifies the job.
+        record: dict
+            Record of the job, as returned by :meth:`fingerprint`.
+        outputs: list(str)
+            Paths of the files written by the job.
+        """
+        if not outputs:
+            return
+        filenames = self.install(outputs)
+
+        # Output files are owned by a single job
+        for other_key, entry in list(self.entries.items()):
+            if set(entry['outputs']) & set(filenames):
+                self.entries.pop(other_key)
+
+        entry = dict(record, outputs=sorted(filenames))
+        entry['inputs'] = {
+            path: dict(stat, checksum=self._checksum(path, stat))
+            for path, stat in record['inputs'].items()
+        }
+        self.entries[key] = entry
+
+    def install(self, outputs):
+        """Move output files into place without recording them.
+
+        Parameters
+        ----------
+        outputs: list(str)
+            Paths of the output files.
+
+        Returns
+        -------
+        list(str)
+            Names of the installed files.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filenames = []
+        for output in outputs:
+            filename = os.path.basename(output)
+            target = self.directory / filename
+            if os.path.abspath(output) != str(target.absolute()):
+                shutil.move(output, target)
+            filenames.append(filename)
+        return filenames
+
+    def save(self):
+        """Write the manifest to disk."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as file:
+            yaml.safe_dump(self.entries, file)
+        tmp_path.replace(self.path)
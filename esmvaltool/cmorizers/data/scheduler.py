@@ -0,0 +1,144 @@
+"""Concurrent execution of download and formatting jobs.
+
+Jobs are grouped by dataset. All jobs of all datasets share a single pool
+of worker processes, so many small datasets and datasets with many jobs
+(e.g. one per year and variable) keep all workers busy.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from esmvaltool.cmorizers.data.utilities import record_saved_files
+
+logger = logging.getLogger(__name__)
+
+
+def get_n_workers(config):
+    """Get the maximum number of jobs that run at the same time.
+
+    Parameters
+    ----------
+    config: dict
+        User configuration, the number of workers is read from
+        ``max_parallel_tasks``. If this is not set, the number of CPUs is
+        used.
+
+    Returns
+    -------
+    int
+        Number of workers.
+    """
+    n_workers = config.get('max_parallel_tasks')
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    return max(1, n_workers)
+
+
+def _timed_call(function, args):
+    """Run a job and return its duration in seconds and its output files."""
+    start = time.perf_counter()
+    with record_saved_files() as saved_files:
+        function(*args)
+    return time.perf_counter() - start, saved_files
+
+
+class _Progress():
+    """Keep track of the finished jobs and the timing per dataset."""
+
+    def __init__(self, jobs):
+        self.start = time.perf_counter()
+        self.total = {dataset: len(tasks) for dataset, tasks in jobs.items()}
+        self.done = dict.fromkeys(jobs, 0)
+        self.busy = dict.fromkeys(jobs, 0.)
+        self.failed = []
+        for dataset, n_jobs in self.total.items():
+            if not n_jobs:
+                logger.warning("No jobs to run for dataset %s", dataset)
+
+    def update(self, dataset, duration=None):
+        """Report a finished job, a duration of None means it failed."""
+        self.done[dataset] += 1
+        if duration is None:
+            if dataset not in self.failed:
+                self.failed.append(dataset)
+        else:
+            self.busy[dataset] += duration
+            logger.info("%s: finished job %s/%s in %.1f s", dataset,
+                        self.done[dataset], self.total[dataset], duration)
+        if self.done[dataset] == self.total[dataset]:
+            status = 'failed' if dataset in self.failed else 'finished'
+            logger.info(
+                "%s: %s after %.1f s, %.1f s spent in %s jobs", dataset,
+                status,
+                time.perf_counter() - self.start, self.busy[dataset],
+                self.total[dataset])
+
+
+def run_jobs(jobs, n_workers, callback=None):
+    """Run the jobs of multiple datasets concurrently.
+
+    A failing job is logged and marks its dataset as failed, the jobs of
+    other datasets continue to run.
+
+    Parameters
+    ----------
+    jobs: dict
+        Jobs keyed by dataset name. Each job is a tuple of a picklable
+        function and a tuple with its arguments.
+    n_workers: int
+        Maximum number of jobs that run at the same time. If 1, all jobs are
+        run in the current process.
+    callback: callable, optional
+        Called in the current process as ``callback(dataset, index,
+        outputs)`` after each successful job, where ``index`` is the position
+        of the job in the list of jobs of its dataset and ``outputs`` the
+        list of files it saved with
+        :func:`esmvaltool.cmorizers.data.utilities.save_variable`.
+
+    Returns
+    -------
+    list(str)
+        Datasets for which at least one job failed.
+    """
+    progress = _Progress(jobs)
+    n_jobs = sum(progress.total.values())
+    logger.info("Running %s jobs for %s datasets using at most %s workers",
+                n_jobs, len(jobs), n_workers)
+
+    def _finish(dataset, index, result):
+        if result is None:
+            progress.update(dataset)
+            return
+        duration, outputs = result
+        if callback is not None:
+            callback(dataset, index, outputs)
+        progress.update(dataset, duration)
+
+    if n_workers == 1:
+        for dataset, tasks in jobs.items():
+            for index, (function, args) in enumerate(tasks):
+                try:
+                    result = _timed_call(function, args)
+                except Exception:
+                    logger.exception("Job failed for dataset %s", dataset)
+                    result = None
+                _finish(dataset, index, result)
+        return progress.failed
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {}
+        for dataset, tasks in jobs.items():
+            for index, (function, args) in enumerate(tasks):
+                future = executor.submit(_timed_call, function, args)
+                futures[future] = (dataset, index)
+
+        for future in as_completed(futures):
+            dataset, index = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                logger.exception("Job failed for dataset %s", dataset)
+                result = None
+            _finish(dataset, index, result)
+    return progress.failed
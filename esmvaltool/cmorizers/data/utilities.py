@@ -1,10 +1,15 @@
 """Utils module for Python cmorizers."""
 import datetime
 import gzip
+import json
 import logging
 import os
 import re
 import shutil
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
 
@@ -23,6 +28,13 @@ logger = logging.getLogger(__name__)
 
 REFERENCES_PATH = Path(esmvaltool_file).absolute().parent / 'references'
 
+# Lists of paths written by save_variable, see record_saved_files
+_SAVED_FILES = []
+
+# Records of unpacked gzip files, see _gunzip
+UNPACKED_FILE = '.unpacked_gzip.jsonl'
+_UNPACKED_LOCK = threading.Lock()
+
 
 def add_height2m(cube: Cube) -> None:
     """Add scalar coordinate 'height' with value of 2m to cube in-place.
@@ -367,6 +379,24 @@ def save_variable(cube, var, outdir, attrs, **kwargs):
     status = 'lazy' if cube.has_lazy_data() else 'realized'
     logger.info('Cube has %s data [lazy is preferred]', status)
     iris.save(cube, file_path, fill_value=1e20, **kwargs)
+    for saved_files in _SAVED_FILES:
+        saved_files.append(file_path)
+
+
+@contextmanager
+def record_saved_files():
+    """Record the paths of all files written by :func:`save_variable`.
+
+    Use as `with record_saved_files() as saved_files:`, the list
+    `saved_files` contains the paths of the files that were saved inside the
+    `with` block.
+    """
+    saved_files = []
+    _SAVED_FILES.append(saved_files)
+    try:
+        yield saved_files
+    finally:
+        _SAVED_FILES.remove(saved_files)
 
 
 def extract_doi_value(tags):
@@ -539,29 +569,45 @@ def set_units(cube, units):
     return cube
 
 
-def unpack_files_in_folder(folder):
+def unpack_files_in_folder(folder, n_workers=None):
     """Unpack all compressed and tarred files in a given folder.
 
     This function flattens the folder hierarchy, both outside
     and inside the given folder. It also unpack nested files
 
+    Independent archives are unpacked concurrently and their members are
+    streamed directly to the folder. Members that are already present in the
+    folder are not extracted again. For gzip files, this is based on a record
+    of the unpacked files that is kept in the folder.
+
     Parameters
     ----------
     folder : str
         Path to the folder to unpack
+    n_workers : int, optional
+        Maximum number of archives that are unpacked at the same time, by
+        default the number of CPUs.
     """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    n_read = 0
+    n_written = 0
+    unpacked = _read_unpacked(folder)
     decompress = True
     while decompress:
         decompress = False
         files = os.listdir(folder)
         files.sort()
+        archives = []
         for filename in files:
             full_path = os.path.join(folder, filename)
             if os.path.isdir(full_path):
                 logger.info('Moving files from folder %s', filename)
                 folder_files = os.listdir(full_path)
                 for file_path in folder_files:
-                    shutil.move(os.path.join(full_path, file_path), folder)
+                    shutil.move(os.path.join(full_path, file_path),
+                                os.path.join(folder, file_path))
                 os.rmdir(full_path)
                 decompress = True
                 continue
@@ -569,19 +615,136 @@ def unpack_files_in_folder(folder):
                 continue
             if not filename.endswith(('.gz', '.tgz', '.tar')):
                 continue
-            logger.info('Unpacking %s', filename)
-            shutil.unpack_archive(full_path, folder)
-            os.remove(full_path)
-            decompress = True
+            archives.append(full_path)
+        if not archives:
+            continue
+        decompress = True
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for size, written in executor.map(_unpack_archive, archives,
+                                              [folder] * len(archives),
+                                              [unpacked] * len(archives)):
+                n_read += size
+                n_written += written
+    elapsed = time.perf_counter() - start
+    if n_read:
+        logger.info(
+            'Unpacked %.1f MB to %.1f MB in %.1f s (%.1f MB/s) in %s',
+            n_read / 2**20, n_written / 2**20, elapsed,
+            n_written / 2**20 / max(elapsed, 1e-6), folder)
+
+
+def _unpack_archive(full_path, folder, unpacked):
+    """Unpack a single archive and remove it.
+
+    Returns the size of the archive and the number of bytes written.
+    """
+    size = os.path.getsize(full_path)
+    if full_path.endswith(('.tar', '.tar.gz', '.tgz')):
+        written = _untar(full_path, folder)
+    else:
+        written = _gunzip(full_path, folder, unpacked)
+    os.remove(full_path)
+    return size, written
+
 
+def _stream_to_file(f_in, target):
+    """Write a file object to a temporary file and move it into place."""
+    folder, filename = os.path.split(target)
+    tmp_target = os.path.join(folder, f'.{filename}.part')
+    with open(tmp_target, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out, length=2**22)
+    os.replace(tmp_target, target)
 
-def _gunzip(file_name, work_dir):
+
+def _read_unpacked(work_dir):
+    """Read the records of the gzip files unpacked in a folder."""
+    unpacked = {}
+    path = os.path.join(work_dir, UNPACKED_FILE)
+    if os.path.isfile(path):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                record = json.loads(line)
+                unpacked[record['target']] = record
+    return unpacked
+
+
+def _untar(file_name, work_dir):
+    """Stream the members of a tar archive to a folder.
+
+    Files are written to a temporary file first and files that are already
+    present with the same size are not extracted again.
+    """
+    logger.info('Unpacking %s', file_name)
+    written = 0
+    real_work_dir = os.path.realpath(work_dir)
+    with tarfile.open(file_name, 'r|*') as tar:
+        for member in tar:
+            if not member.isfile():
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extract(member, work_dir, filter='data')
+                else:
+                    tar.extract(member, work_dir)
+                continue
+            target = os.path.realpath(os.path.join(work_dir, member.name))
+            if os.path.commonpath([target, real_work_dir]) != real_work_dir:
+                raise tarfile.TarError(
+                    f'Member {member.name} of {file_name} would be extracted '
+                    f'outside of {work_dir}')
+            if (os.path.isfile(target)
+                    and os.path.getsize(target) == member.size):
+                logger.debug('Skipping %s, already present', member.name)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _stream_to_file(tar.extractfile(member), target)
+            os.utime(target, (member.mtime, member.mtime))
+            written += member.size
+    return written
+
+
+def _gunzip(file_name, work_dir, unpacked=None):
+    """Stream the content of a gzip file to a folder.
+
+    The file is not unpacked again if it was unpacked from a gzip file with
+    the same size and trailer before and has not changed since. The trailer
+    of a gzip file with several members only describes the last member, so
+    the size of the existing file alone cannot be used for this.
+    """
+    if unpacked is None:
+        unpacked = _read_unpacked(work_dir)
     filename = os.path.split(file_name)[-1]
     filename = re.sub(r"\.gz$", "", filename, flags=re.IGNORECASE)
-
+    target = os.path.join(work_dir, filename)
+
+    with open(file_name, 'rb') as f_in:
+        f_in.seek(-8, os.SEEK_END)
+        trailer = f_in.read(8).hex()
+    archive_size = os.path.getsize(file_name)
+    record = unpacked.get(filename)
+    if (record is not None and record['archive_size'] == archive_size
+            and record['trailer'] == trailer and os.path.isfile(target)):
+        stat = os.stat(target)
+        if stat.st_size == record['size'] and stat.st_mtime == record['mtime']:
+            logger.info('Skipping %s, %s already present', file_name,
+                        filename)
+            return 0
+
+    logger.info('Unpacking %s', file_name)
     with gzip.open(file_name, 'rb') as f_in:
-        with open(os.path.join(work_dir, filename), 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
+        _stream_to_file(f_in, target)
+    stat = os.stat(target)
+    record = {
+        'target': filename,
+        'archive_size': archive_size,
+        'trailer': trailer,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+    }
+    with _UNPACKED_LOCK:
+        unpacked[filename] = record
+        with open(os.path.join(work_dir, UNPACKED_FILE), 'a',
+                  encoding='utf-8') as file:
+            file.write(json.dumps(record) + '\n')
+    return stat.st_size
 
 
 try:
@@ -5,6 +5,7 @@ import logging
 import os
 
 import iris
+import iris.coord_categorisation
 import iris.plot as iplt
 import matplotlib.cm as mpl_cm
 import matplotlib.lines as mlines
@@ -74,11 +74,11 @@ def run_hofm_data(cfg):
         model_filenames = get_clim_model_filenames(cfg, hofm_var)
         model_filenames = OrderedDict(
             sorted(model_filenames.items(), key=lambda t: t[0]))
-        # loop over regions and models
-        for mmodel, region in itertools.product(model_filenames,
-                                                cfg['hofm_regions']):
-            # actual extraction of the data for specific model and region
-            hofm_data(cfg, model_filenames, mmodel, hofm_var, region)
+        # loop over models, all regions are extracted at once
+        for mmodel in model_filenames:
+            # actual extraction of the data for specific model
+            hofm_data(cfg, model_filenames, mmodel, hofm_var,
+                      cfg['hofm_regions'])
 
 
 def hofm_plot_params(cfg, hofm_var, var_number, observations):
@@ -85,20 +85,73 @@ def load_meta(datapath, fxpath=None):
     return metadata
 
 
-def hofm_extract_region(metadata, cmor_var, indexes, level, time=0):
-    """Calculates mean over the region."""
-    # fix for climatology
-    if metadata['datafile'].variables[cmor_var].ndim < 4:
-        level_pp = metadata['datafile'].variables[cmor_var][level, :, :]
-    else:
-        level_pp = metadata['datafile'].variables[cmor_var][time, level, :, :]
-    if not isinstance(level_pp, np.ma.MaskedArray):
-        level_pp = np.ma.masked_equal(level_pp, 0)
-    data_mask = level_pp[indexes[0], indexes[1]].mask
-    area_masked = np.ma.masked_where(
-        data_mask, metadata['areacello'][indexes[0], indexes[1]])
-    result = (area_masked *
-              level_pp[indexes[0], indexes[1]]).sum() / area_masked.sum()
+def hofm_region_weights(metadata, regions):
+    """Precompute indexes and area weights of the regions.
+
+    Parameters
+    ----------
+    metadata: dict
+        output of the `load_meta` function
+    regions: list
+        names of the regions predefined in `hofm_regions` function.
+
+    Returns
+    -------
+    window: tuple of slices
+        smallest rectangle (j, i) of the grid that contains all regions
+    region_weights: dict
+        region names as keys and tuples with the indexes of the region
+        (relative to `window`) and the corresponding `areacello` values
+        as values.
+    """
+    indexes = {
+        region: hofm_regions(region, metadata['lon2d'], metadata['lat2d'])
+        for region in regions
+    }
+    all_indexes = [
+        np.hstack([index[dim] for index in indexes.values()])
+        for dim in range(2)
+    ]
+    window = tuple(
+        slice(dim_indexes.min(), dim_indexes.max() + 1) if dim_indexes.size
+        else slice(0, 0) for dim_indexes in all_indexes)
+    region_weights = {}
+    for region, (indexesi, indexesj) in indexes.items():
+        region_weights[region] = (
+            (indexesi - window[0].start, indexesj - window[1].start),
+            metadata['areacello'][indexesi, indexesj],
+        )
+    return window, region_weights
+
+
+def hofm_extract_regions(data, region_weights):
+    """Calculate means over the regions for a block of data.
+
+    Parameters
+    ----------
+    data: numpy masked array
+        data with dimensions (time, level, j, i)
+    region_weights: dict
+        output of the `hofm_region_weights` function
+
+    Returns
+    -------
+    dict
+        region names as keys and area weighted means with dimensions
+        (level, time) as values.
+    """
+    if not isinstance(data, np.ma.MaskedArray):
+        data = np.ma.masked_equal(data, 0)
+    result = {}
+    for region, (indexes, area) in region_weights.items():
+        region_data = data[..., indexes[0], indexes[1]]
+        weights = np.where(
+            np.ma.getmaskarray(region_data) | np.ma.getmaskarray(area), 0.0,
+            np.ma.filled(area, 0.0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = ((weights * np.ma.filled(region_data, 0.0)).sum(axis=-1) /
+                     weights.sum(axis=-1))
+        result[region] = means.T
     return result
 
 
@@ -133,10 +186,13 @@ def hofm_save_data(cfg, data_info, oce_hofm):
                               provenance_record)
 
 
-def hofm_data(cfg, model_filenames, mmodel, cmor_var, region):
+def hofm_data(cfg, model_filenames, mmodel, cmor_var, regions):
     """Extract data for Hovmoeller diagrams from monthly values.
 
-    Saves the data to files in `diagworkdir`.
+    Saves the data to files in `diagworkdir`. The data are read in
+    blocks of `hofm_block_size` time steps containing all levels down to
+    `hofm_depth`, and the means of all regions are computed from the same
+    block.
 
     Parameters
     ----------
@@ -150,16 +206,19 @@ def hofm_data(cfg, model_filenames, mmodel, cmor_var, region):
         dictionary with model names as keys and paths to fx files as values.
     max_level: float
         maximum depth level the Hovmoeller diagrams should go to.
-    region: str
-        name of the region predefined in `hofm_regions` function.
+    regions: list
+        names of the regions predefined in `hofm_regions` function.
     diagworkdir: str
         path to work directory.
+    block_size: int
+        number of time steps that are read at once.
 
     Returns
     -------
     None
     """
-    logger.info("Extract  %s data for %s, region %s", cmor_var, mmodel, region)
+    logger.info("Extract  %s data for %s, regions %s", cmor_var, mmodel,
+                regions)
     areacello_fx = get_fx_filenames(cfg, 'areacello')
     metadata = load_meta(datapath=model_filenames[mmodel],
                          fxpath=areacello_fx[mmodel])
@@ -167,27 +226,41 @@ def hofm_data(cfg, model_filenames, mmodel, cmor_var, region):
     lev_limit = metadata['lev'][
         metadata['lev'] <= cfg['hofm_depth']].shape[0] + 1
 
-    indexes = hofm_regions(region, metadata['lon2d'], metadata['lat2d'])
+    window, region_weights = hofm_region_weights(metadata, regions)
 
     series_lenght = get_series_lenght(metadata['datafile'], cmor_var)
-
-    oce_hofm = np.zeros((metadata['lev'][0:lev_limit].shape[0], series_lenght))
-    for mon in range(series_lenght):
-        for ind, _ in enumerate(metadata['lev'][0:lev_limit]):
-            oce_hofm[ind, mon] = hofm_extract_region(metadata, cmor_var,
-                                                     indexes, ind, mon)
-    data_info = {}
-    data_info['basedir'] = cfg['work_dir']
-    data_info['variable'] = cmor_var
-    data_info['mmodel'] = mmodel
-    data_info['region'] = region
-    data_info['time'] = metadata['time']
-    data_info['levels'] = metadata['lev']
-    data_info['lev_limit'] = lev_limit
-    data_info['ori_file'] = model_filenames[mmodel]
-    data_info['areacello'] = areacello_fx[mmodel]
-
-    hofm_save_data(cfg, data_info, oce_hofm)
+    block_size = cfg.get('hofm_block_size', 12)
+
+    oce_hofm = {
+        region: np.zeros((metadata['lev'][0:lev_limit].shape[0],
+                          series_lenght))
+        for region in regions
+    }
+    variable = metadata['datafile'].variables[cmor_var]
+    for start in range(0, series_lenght, block_size):
+        stop = min(start + block_size, series_lenght)
+        # fix for climatology
+        if variable.ndim < 4:
+            block = variable[0:lev_limit, window[0], window[1]][np.newaxis]
+        else:
+            block = variable[start:stop, 0:lev_limit, window[0], window[1]]
+        for region, means in hofm_extract_regions(block,
+                                                  region_weights).items():
+            oce_hofm[region][:, start:stop] = means
+
+    for region in regions:
+        data_info = {}
+        data_info['basedir'] = cfg['work_dir']
+        data_info['variable'] = cmor_var
+        data_info['mmodel'] = mmodel
+        data_info['region'] = region
+        data_info['time'] = metadata['time']
+        data_info['levels'] = metadata['lev']
+        data_info['lev_limit'] = lev_limit
+        data_info['ori_file'] = model_filenames[mmodel]
+        data_info['areacello'] = areacello_fx[mmodel]
+
+        hofm_save_data(cfg, data_info, oce_hofm[region])
 
     metadata['datafile'].close()
 
@@ -39,6 +39,7 @@ from functools import partial
 
 import cf_units
 import iris
+import iris.coord_categorisation
 import iris.plot as iplt
 import matplotlib.pyplot as plt
 import numpy as np
@@ -30,6 +30,7 @@ from copy import deepcopy
 import numpy as np
 import matplotlib.pyplot as plt
 import iris
+import iris.coord_categorisation
 from iris.analysis import Aggregator
 
 from esmvaltool.diag_scripts.shared import (group_metadata, run_diagnostic,
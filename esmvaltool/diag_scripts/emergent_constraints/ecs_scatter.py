@@ -45,6 +45,9 @@ from pprint import pformat
 
 import dask.array as da
 import iris
+import iris.analysis.cartography
+import iris.coord_categorisation
+import iris.quickplot
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
@@ -2,6 +2,7 @@
 import os
 
 import iris
+import iris.coord_categorisation
 import matplotlib.pyplot as plt
 
 from esmvaltool.diag_scripts.shared import (
@@ -3,6 +3,7 @@ import logging
 from pathlib import Path
 
 import iris
+import iris.quickplot
 import matplotlib.pyplot as plt
 
 from esmvaltool.diag_scripts.shared import run_diagnostic, save_figure
@@ -28,6 +28,7 @@ of Arctic-midlatitude teleconnections.
 import logging
 from pathlib import Path
 import iris
+import iris.quickplot
 import numpy as np
 import seaborn as sns
 from matplotlib import pyplot as plt
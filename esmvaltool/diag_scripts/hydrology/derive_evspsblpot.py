@@ -8,6 +8,7 @@ American Meteorological Society, 17, 1373-1382, DOI: 10.1175/JHM-D-15-0006.1,
 """
 import numpy as np
 import iris
+import iris.analysis.maths
 
 
 def tetens_derivative(tas):
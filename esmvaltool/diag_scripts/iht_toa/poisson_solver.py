@@ -10,31 +10,42 @@ If the solver fails to converge, the tolerance can be increased.
 
 Convergence is achieved faster by using a preconditioner on the output field.
 
+Alternatively, the Poisson equation can be solved with a sparse matrix
+representation of the spherical Laplacian, which is assembled and factorised
+only once per grid. The ``'direct'`` solver uses a sparse LU decomposition and
+the ``'iterative'`` solver uses BiCGSTAB with an incomplete LU preconditioner.
+Both solve a stack of source terms (e.g., all time steps of a dataset) at once.
+As the Laplacian is singular, the energy flux potential is only defined up to
+a constant; the sparse solvers return potentials with zero mean.
+
 The heat transport is calculated as the gradient of the energy flux potential,
 the output of the Poisson solver.
 """
 
+import functools
+
 import numpy as np
+import scipy.sparse
 from numba import jit
+from scipy.sparse.linalg import LinearOperator, bicgstab, spilu, splu
+
+SOLVERS = ('stencil', 'iterative', 'direct')
 
 
 def swap_bounds(array):
     """Extend the array by one in all directions.
 
     As the array is periodic it allows for easier computations at
-    boundaries.
+    boundaries. The last two dimensions of ``array`` are latitude and
+    longitude, leading dimensions (e.g., time) are treated independently.
     """
-    shape0, shape1 = np.array(array.shape) - 2
-    wrap_point = int(shape1 / 2 + 1)
-    for i in range(1, shape1 + 1):
-        array[0, i] = array[1, wrap_point]
-        array[shape0 + 1, i] = array[shape0, wrap_point]
-        wrap_point += 1
-        if wrap_point > shape1:
-            wrap_point = 1
-
-    array[:, 0] = array[:, shape1]
-    array[:, shape1 + 1] = array[:, 1]
+    shape0, shape1 = np.array(array.shape[-2:]) - 2
+    wrap_points = 1 + (np.arange(shape1) + int(shape1 / 2)) % shape1
+    array[..., 0, 1:shape1 + 1] = array[..., 1, wrap_points]
+    array[..., shape0 + 1, 1:shape1 + 1] = array[..., shape0, wrap_points]
+
+    array[..., :, 0] = array[..., :, shape1]
+    array[..., :, shape1 + 1] = array[..., :, 1]
 
     return array
 
@@ -83,22 +94,170 @@ def precon_b(m_e, m_n, cx_matrix):
                                m_n[j, i] * cx_matrix[j + 1, i])
 
 
+@jit(nopython=True)
+def sip_factors(a_matrix, alf, m_matrix):
+    """Calculate the factors of the ILU/SIP preconditioner in place."""
+    shape0, shape1 = np.array(m_matrix.shape[1:]) - 1
+    for j in range(1, shape0 + 1):
+        for i in range(1, shape1 + 1):
+            m_matrix[2, j, i] = (a_matrix[2, j - 1, i - 1] /
+                                 (1.0 + alf * m_matrix[0, j - 1, i]))
+
+            m_matrix[1, j, i] = (a_matrix[1, j - 1, i - 1] /
+                                 (1.0 + alf * m_matrix[3, j, i - 1]))
+
+            m_matrix[4, j, i] = (a_matrix[4, j - 1, i - 1] -
+                                 m_matrix[2, j, i] *
+                                 (m_matrix[3, j - 1, i] -
+                                  alf * m_matrix[0, j - 1, i]) -
+                                 m_matrix[1, j, i] *
+                                 (m_matrix[0, j, i - 1] -
+                                  alf * m_matrix[3, j, i - 1]))
+
+            m_matrix[4, j, i] = 1.0 / m_matrix[4, j, i]
+
+            m_matrix[0, j, i] = ((a_matrix[0, j - 1, i - 1] -
+                                  alf * m_matrix[2, j, i] *
+                                  m_matrix[0, j - 1, i]) *
+                                 m_matrix[4, j, i])
+
+            m_matrix[3, j, i] = ((a_matrix[3, j - 1, i - 1] -
+                                  alf * m_matrix[1, j, i] *
+                                  m_matrix[3, j, i - 1]) *
+                                 m_matrix[4, j, i])
+
+
+@functools.lru_cache(maxsize=None)
+def stencil_coefficients(shape):
+    """Calculate metric and five-point stencil of the spherical Laplacian.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape ``(n_lat, n_lon)`` of the source term.
+
+    Returns
+    -------
+    hpi : numpy.ndarray
+        Cosine of latitude at the cell centres (shape ``(n_lat,)``).
+    a_matrix : numpy.ndarray
+        Contributions from the four neighbouring cells (e, w, s, n) and the
+        cell itself (p) (Eq. 8), shape ``(5, n_lat, n_lon)``.
+
+    The results are cached per grid and therefore read-only.
+    """
+    deltay = np.pi / shape[0]
+    yyy = -0.5 * np.pi + deltay * np.arange(shape[0] + 1)
+    hpi = np.cos(yyy[:-1] + 0.5 * deltay)
+    hvj = np.cos(yyy)
+    hvj[[0, -1]] = 0.0
+
+    # Spherical Laplacian variables
+    aaa = 1.0 / ((2.0 * np.pi / shape[1])**2.)
+    bbb = 1.0 / ((np.pi / shape[0])**2.)
+
+    # A_w is the contribution from i-1, A_e is from i+1,
+    # A_s is j-1, A_n is j+1, and A_p is the diagonal
+    txa = aaa / hpi**2.0
+    tyb = bbb / hpi
+    a_matrix = np.zeros((5, *shape))
+    a_matrix[0] = txa[:, np.newaxis]
+    a_matrix[1] = txa[:, np.newaxis]
+    a_matrix[2] = (tyb * hvj[:-1])[:, np.newaxis]
+    a_matrix[3] = (tyb * hvj[1:])[:, np.newaxis]
+    a_matrix[4] = -a_matrix[0:4].sum(axis=0)
+    hpi.setflags(write=False)
+    a_matrix.setflags(write=False)
+    return (hpi, a_matrix)
+
+
+@functools.lru_cache(maxsize=None)
+def sparse_laplacian(shape):
+    """Assemble the spherical Laplacian as symmetric sparse matrix.
+
+    The rows of the five-point stencil are multiplied by the cosine of
+    latitude, which makes the matrix symmetric. Grid cells are numbered
+    in C order.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape ``(n_lat, n_lon)`` of the source term.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Matrix of shape ``(n_lat * n_lon, n_lat * n_lon)``.
+    """
+    (hpi, a_matrix) = stencil_coefficients(shape)
+    a_matrix = a_matrix * hpi[:, np.newaxis]
+    index = np.arange(shape[0] * shape[1]).reshape(shape)
+    rows = [index.ravel(), index[:-1].ravel()]
+    cols = [np.roll(index, -1, axis=1).ravel(), index[1:].ravel()]
+    values = [a_matrix[0].ravel(), a_matrix[3, :-1].ravel()]
+    upper = scipy.sparse.coo_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(index.size, index.size))
+    return (upper + upper.T + scipy.sparse.diags(a_matrix[4].ravel())).tocsr()
+
+
+@functools.lru_cache(maxsize=None)
+def sparse_factorisation(shape, solver):
+    """Factorise the spherical Laplacian for the sparse solvers.
+
+    The constant null space of the Laplacian is removed by fixing the
+    potential in the last grid cell, which makes the (negated) matrix
+    positive definite. Results are cached, so the factorisation is only
+    calculated once per grid.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape ``(n_lat, n_lon)`` of the source term.
+    solver : str
+        ``'direct'`` (sparse LU decomposition) or ``'iterative'``
+        (incomplete LU decomposition used as preconditioner).
+
+    Returns
+    -------
+    matrix : scipy.sparse.csc_matrix
+        Reduced (negated) matrix.
+    factors : scipy.sparse.linalg.SuperLU
+        (Incomplete) LU decomposition of ``matrix``.
+    """
+    matrix = -sparse_laplacian(shape)[:-1, :-1].tocsc()
+    if solver == 'direct':
+        return (matrix, splu(matrix))
+    return (matrix, spilu(matrix, drop_tol=1e-5, fill_factor=20))
+
+
 class SphericalPoisson:
     """Poisson solver over the sphere.
 
     Solve Poisson equation for a given source term (forcing) and
     calculate meridional heat transport (MHT).
+
+    The source term can either be a single field (latitude, longitude) or
+    a stack of fields (e.g., time, latitude, longitude). Stacks are solved
+    as a batch by the sparse solvers.
     """
 
-    def __init__(self, logger, source, tolerance=2.0e-4):
+    def __init__(self, logger, source, tolerance=2.0e-4, solver='stencil'):
         """Initialise solver with source field, metrics and matrices."""
+        if solver not in SOLVERS:
+            raise ValueError(
+                f"Expected one of {SOLVERS} for Poisson solver, got "
+                f"'{solver}'")
         self.logger = logger
         self.source = source
+        self.grid_shape = tuple(np.shape(source)[-2:])
         self.tolerance = tolerance
+        self.solver = solver
         self.energy_flux_potential = None
         self.meridional_heat_transport = None
         logger.info("Initialising Poisson solver.")
-        self.set_matrices()
+        if solver == 'stencil':
+            self.set_matrices()
 
     def set_matrices(self):
         """Calculate A and M matrices.
@@ -107,74 +266,13 @@ class SphericalPoisson:
         A_matrix are the values are the contributions from each of the
         four neighbouring cells: e,w,s,n,p.
         """
-        # Calculate metrics hpi and hvj
-        src_shape = np.array(self.source.shape)
-        hpi = np.zeros(src_shape[0])
-        hvj = np.zeros(src_shape[0] + 1)
-        deltay = np.pi / src_shape[0]
-        yyy = -0.5 * np.pi + 0.5 * deltay
-        hvj[0] = 0.0
-        for j in range(0, src_shape[0]):
-            hpi[j] = np.cos(yyy)
-            hvj[j + 1] = np.cos(yyy + 0.5 * deltay)
-            yyy += deltay
-        hvj[-1] = 0.0
-
-        # Storing the full matrix
-        a_matrix = np.zeros((5, *src_shape))
-
-        # ILU factors
-        m_matrix = np.zeros((5, *(src_shape + 1)))
-
-        # Spherical Laplacian variables
-        aaa = 1.0 / ((2.0 * np.pi / src_shape[1])**2.)
-        bbb = 1.0 / ((np.pi / src_shape[0])**2.)
-
-        # First calculate the Poisson equations 5-point stencil
-        # A_w is the contribution from i-1, A_e is from i+1,
-        # A_s is j-1, A_n is j+1, and A_p is the diagonal
-        for j in range(0, src_shape[0]):
-            txa = aaa / hpi[j]**2.0
-            tyb = bbb / hpi[j]
-
-            for i in range(0, src_shape[1]):
-                a_matrix[0, j, i] = txa
-                a_matrix[1, j, i] = txa
-                a_matrix[2, j, i] = tyb * hvj[j]
-                a_matrix[3, j, i] = tyb * hvj[j + 1]
-                a_matrix[4, j, i] = -a_matrix[0:4, j, i].sum()
+        src_shape = np.array(self.grid_shape)
+        (_, a_matrix) = stencil_coefficients(self.grid_shape)
 
         # ILU/SIP preconditioner factors: alf = 0.0 is ILU
-        alf = 0.9
+        m_matrix = np.zeros((5, *(src_shape + 1)))
         m_matrix[4] += 1.0
-
-        for j in range(1, src_shape[0] + 1):
-            for i in range(1, src_shape[1] + 1):
-                m_matrix[2, j, i] = (a_matrix[2, j - 1, i - 1] /
-                                     (1.0 + alf * m_matrix[0, j - 1, i]))
-
-                m_matrix[1, j, i] = (a_matrix[1, j - 1, i - 1] /
-                                     (1.0 + alf * m_matrix[3, j, i - 1]))
-
-                m_matrix[4, j, i] = (a_matrix[4, j - 1, i - 1] -
-                                     m_matrix[2, j, i] *
-                                     (m_matrix[3, j - 1, i] -
-                                     alf * m_matrix[0, j - 1, i]) -
-                                     m_matrix[1, j, i] *
-                                     (m_matrix[0, j, i - 1] -
-                                     alf * m_matrix[3, j, i - 1]))
-
-                m_matrix[4, j, i] = 1.0 / m_matrix[4, j, i]
-
-                m_matrix[0, j, i] = ((a_matrix[0, j - 1, i - 1] -
-                                     alf * m_matrix[2, j, i] *
-                                     m_matrix[0, j - 1, i]) *
-                                     m_matrix[4, j, i])
-
-                m_matrix[3, j, i] = ((a_matrix[3, j - 1, i - 1] -
-                                     alf * m_matrix[1, j, i] *
-                                     m_matrix[3, j, i - 1]) *
-                                     m_matrix[4, j, i])
+        sip_factors(a_matrix, 0.9, m_matrix)
 
         self.a_matrix = a_matrix
         self.m_matrix = m_matrix
@@ -182,6 +280,60 @@ class SphericalPoisson:
     def solve(self, max_iterations=1000):
         """Solve equation for the source term.
 
+        A stack of source terms is solved field by field by the stencil
+        solver and as a single batch by the sparse solvers.
+        """
+        source = np.asarray(self.source, dtype=np.float64)
+        fields = source.reshape(-1, *self.grid_shape)
+        if self.solver == 'stencil':
+            efp = np.stack([
+                self._solve_stencil(field, max_iterations) for field in fields
+            ])
+        else:
+            efp = self._solve_sparse(fields, max_iterations)
+        self.energy_flux_potential = efp.reshape(*source.shape[:-2],
+                                                 *efp.shape[1:])
+
+    def _solve_sparse(self, fields, max_iterations):
+        """Solve equation for a stack of source terms with sparse matrices.
+
+        The equation is multiplied by the cosine of latitude to obtain a
+        symmetric system. Removing the weighted mean of the source terms
+        makes them consistent with the singular Laplacian.
+        """
+        (matrix, factors) = sparse_factorisation(self.grid_shape, self.solver)
+        (hpi, _) = stencil_coefficients(self.grid_shape)
+        rhs = fields * hpi[:, np.newaxis]
+        rhs -= (hpi[:, np.newaxis] * rhs.sum(axis=(1, 2))[:, None, None] /
+                (hpi.sum() * self.grid_shape[1]))
+        rhs = -rhs.reshape(len(fields), -1)[:, :-1]
+
+        if self.solver == 'direct':
+            solution = factors.solve(np.asfortranarray(rhs.T)).T
+        else:
+            preconditioner = LinearOperator(matrix.shape, factors.solve)
+            solution = np.empty_like(rhs)
+            for (idx, rhs_field) in enumerate(rhs):
+                (solution[idx], info) = bicgstab(matrix,
+                                                 rhs_field,
+                                                 rtol=self.tolerance,
+                                                 maxiter=max_iterations,
+                                                 M=preconditioner)
+                if info != 0:
+                    raise RuntimeError('Poisson solver has not converged.')
+        self.logger.info("Poisson solver (%s) has solved %i source term(s).",
+                         self.solver, len(fields))
+
+        efp = np.zeros((len(fields), *(np.array(self.grid_shape) + 2)))
+        interior = np.zeros((len(fields), np.prod(self.grid_shape)))
+        interior[:, :-1] = solution
+        interior -= interior.mean(axis=1, keepdims=True)
+        efp[:, 1:-1, 1:-1] = interior.reshape(-1, *self.grid_shape)
+        return swap_bounds(efp)
+
+    def _solve_stencil(self, source, max_iterations):
+        """Solve equation for a single source term with the stencil solver.
+
         Bi-conjugate gradient stabilized numerical solver: van der
         Vorst, H. A., 1992: Bi-cgstab: A fast and smoothly converging
         variant of bi-cg for the solution of nonsymmetric linear
@@ -190,9 +342,9 @@ class SphericalPoisson:
         This solver implements the preconditioned Bi-CGSTAB algorithm,
         described in page 638 of that paper.
         """
-        bbb = np.zeros(np.array(self.source.shape) + 2)
-        xxx = np.zeros(np.array(self.source.shape) + 2)
-        bbb[1:-1, 1:-1] = self.source
+        bbb = np.zeros(np.array(self.grid_shape) + 2)
+        xxx = np.zeros(np.array(self.grid_shape) + 2)
+        bbb[1:-1, 1:-1] = source
         bbb = swap_bounds(bbb)
 
         sc_err = dot_prod(bbb, bbb)
@@ -206,8 +358,8 @@ class SphericalPoisson:
         }
         stv['crrr'] = stv['rrr'].copy()
 
-        ppp = np.zeros(np.array(self.source.shape) + 2)
-        vvv = np.zeros(np.array(self.source.shape) + 2)
+        ppp = np.zeros(np.array(self.grid_shape) + 2)
+        vvv = np.zeros(np.array(self.grid_shape) + 2)
 
         iteration = 0
         while iteration < max_iterations:
@@ -250,7 +402,7 @@ class SphericalPoisson:
             if iteration == max_iterations:
                 raise RuntimeError('Poisson solver has not converged.')
 
-        self.energy_flux_potential = xxx
+        return xxx
 
     def calc_meridional_heat_transport(self):
         """Meridional heat transport of energy flux potential.
@@ -259,14 +411,13 @@ class SphericalPoisson:
         the energy flux potential. Equation (11) in Pearce and Bodas-
         Salcedo (2023).
         """
-        deltax = 2.0 * np.pi / self.source.shape[1]
-        deltay = np.pi / self.source.shape[0]
+        deltax = 2.0 * np.pi / self.grid_shape[1]
+        deltay = np.pi / self.grid_shape[0]
         yvalues = np.arange(-0.5 * np.pi + 0.5 * deltay, 0.5 * np.pi, deltay)
-        grad_phi = np.gradient(self.energy_flux_potential, deltay, axis=0)
-        grad_phi = grad_phi[1:-1, 1:-1]
-        self.meridional_heat_transport = np.sum((grad_phi.T *
-                                                 np.cos(yvalues) *
-                                                 deltax).T, axis=1)
+        grad_phi = np.gradient(self.energy_flux_potential, deltay, axis=-2)
+        grad_phi = grad_phi[..., 1:-1, 1:-1]
+        self.meridional_heat_transport = np.sum(
+            grad_phi * (np.cos(yvalues) * deltax)[:, np.newaxis], axis=-1)
 
     def calc_ax(self, x_matrix):
         """Matrix calculation of the Laplacian equation, LHS of Eq.
@@ -274,7 +425,7 @@ class SphericalPoisson:
         (9) in Pearce and Bodas-Salcedo (2023).
         """
         # Laplacian equation
-        src_shape = np.array(self.source.shape)
+        src_shape = np.array(self.grid_shape)
         ax_matrix = np.zeros(src_shape + 2)
         x_matrix = swap_bounds(x_matrix)
         shape0, shape1 = src_shape
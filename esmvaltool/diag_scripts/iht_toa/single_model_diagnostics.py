@@ -185,11 +185,13 @@ def weight_zm(cube, latitude=None):
     return cube.data * cube_areas.data
 
 
-def call_poisson(flux_cube, latitude='latitude', longitude='longitude'):
+def call_poisson(flux_cube, latitude='latitude', longitude='longitude',
+                 solver='stencil'):
     """Call the Poisson solver with the data in ``flux_cube`` as source term.
 
        Return the energy flux potential and implied meridional heat transport
-       as cubes.
+       as cubes. If ``flux_cube`` has a time dimension, all time steps are
+       solved together.
 
     Parameters
     ----------
@@ -199,6 +201,11 @@ def call_poisson(flux_cube, latitude='latitude', longitude='longitude'):
         Name of latitude coordinate in ``cube``.
     longitude : string
         Name of longitude coordinate in ``cube``.
+    solver : string
+        Poisson solver, one of ``'stencil'``, ``'iterative'`` or
+        ``'direct'``. The energy flux potentials of the sparse solvers
+        (``'iterative'`` and ``'direct'``) have zero mean and can differ from
+        the one of ``'stencil'`` by a constant.
 
     Returns
     -------
@@ -219,24 +226,28 @@ def call_poisson(flux_cube, latitude='latitude', longitude='longitude'):
     data_mean = flux_cube.collapsed(["longitude", "latitude"],
                                     iris.analysis.MEAN,
                                     weights=grid_areas).data
-    data = flux_cube.data - data_mean
+    data = flux_cube.data - np.reshape(data_mean, (-1, 1, 1))
+    data = data.reshape(flux_cube.shape)
 
     logger.info("Calling spherical_poisson")
     sphpo = SphericalPoisson(logger,
                              source=data * (earth_radius**2.0),
-                             tolerance=2.0e-4)
+                             tolerance=2.0e-4,
+                             solver=solver)
     sphpo.solve()
     sphpo.calc_meridional_heat_transport()
     logger.info("Ending spherical_poisson")
 
     # Energy flux potential
-    efp_cube = iris.cube.Cube(sphpo.energy_flux_potential[1:-1, 1:-1],
+    efp_cube = iris.cube.Cube(sphpo.energy_flux_potential[..., 1:-1, 1:-1],
                               long_name=f"energy_flux_potential"
                                         f"_of_{flux_cube.var_name}",
                               var_name=f"{flux_cube.var_name}_efp",
                               units='J s-1',
-                              dim_coords_and_dims=[(flux_cube.coords()[0], 0),
-                                                   (flux_cube.coords()[1], 1)])
+                              dim_coords_and_dims=[
+                                  (coord, flux_cube.coord_dims(coord))
+                                  for coord in flux_cube.dim_coords
+                              ])
 
     # MHT data cube
     collapsed_longitude = iris.coords.AuxCoord(180.0,
@@ -244,9 +255,14 @@ def call_poisson(flux_cube, latitude='latitude', longitude='longitude'):
                                                long_name='longitude',
                                                standard_name='longitude',
                                                units='degrees')
-    dim_coords_and_dims = [(flux_cube.coord('latitude'), 0)]
-    aux_coords_and_dims = [(flux_cube.coord('time'), None),
-                           (collapsed_longitude, None)]
+    time_dims = flux_cube.coord_dims('time')
+    dim_coords_and_dims = [(flux_cube.coord('latitude'), flux_cube.ndim - 2)]
+    if time_dims:
+        dim_coords_and_dims.append((flux_cube.coord('time'), time_dims))
+        aux_coords_and_dims = [(collapsed_longitude, None)]
+    else:
+        aux_coords_and_dims = [(flux_cube.coord('time'), None),
+                               (collapsed_longitude, None)]
     mht_cube = iris.cube.Cube(sphpo.meridional_heat_transport,
                               long_name=f"meridional_heat_transport_of"
                                         f"_{flux_cube.var_name}",
@@ -322,15 +338,19 @@ class ImpliedHeatTransport:
        MHT: meridional heat transport
     """
 
-    def __init__(self, flx_files):
+    def __init__(self, flx_files, solver='stencil'):
         """Calculate all the diagnostics for all fluxes in ``flx_files``.
 
         Parameters
         ----------
         flx_files : list
             List of files with input data.
+        solver : string
+            Poisson solver, one of ``'stencil'``, ``'iterative'`` or
+            ``'direct'``.
         """
         self.flx_files = flx_files
+        self.solver = solver
 
         # Create cube lists for the different datasets
         self.flx_clim = iris.cube.CubeList()
@@ -366,21 +386,18 @@ class ImpliedHeatTransport:
 
         Loop over input data and calculate EFP and MHT of the
         climatologies of radiative fluxes and the 12-month
-        rolling means of radiative fluxes.
+        rolling means of radiative fluxes. All time steps of a rolling
+        mean are solved together.
         """
         # Loop over climatologies
         for flx in self.flx_clim:
-            efp, mht = call_poisson(flx)
+            efp, mht = call_poisson(flx, solver=self.solver)
             self.efp_clim.append(efp)
             self.mht_clim.append(mht)
         # Loop over rolling means
         for flx_rm in self.flx_rolling_mean:
-            mht_series = iris.cube.CubeList()
-            for flx in flx_rm.slices_over('time'):
-                efp, mht = call_poisson(flx)
-                mht_series.append(mht)
-            # Append MHT rolling mean after merging time series.
-            self.mht_rolling_mean.append(mht_series.merge_cube())
+            efp, mht = call_poisson(flx_rm, solver=self.solver)
+            self.mht_rolling_mean.append(mht)
 
     def derived_fluxes(self):
         """Calculate derived radiative fluxes.
@@ -956,6 +973,7 @@ def main(config):
     config : dict
         The ESMValTool configuration.
     """
+    solver = config.get('solver', 'stencil')
     input_data = deepcopy(list(config['input_data'].values()))
     input_data = group_metadata(input_data, 'dataset', sort='variable_group')
 
@@ -981,7 +999,8 @@ def main(config):
         iht[model_name] = {}
         for dataset_name, files in datasets.items():
             logger.info("Dataset %s", dataset_name)
-            iht[model_name][dataset_name] = ImpliedHeatTransport(files)
+            iht[model_name][dataset_name] = ImpliedHeatTransport(
+                files, solver=solver)
 
     # Produce plots
     plot_single_model_diagnostics(iht, config)
@@ -1,6 +1,6 @@
 """Resample the target model for the selected time periods."""
 import logging
-from itertools import product
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import matplotlib.pyplot as plt
@@ -98,29 +98,139 @@ def get_segment_season_means(cfg):
     return segments_season_means, provenance
 
 
-def _find_single_top1000(segment_means, target):
+def _combination_members(ids, n_members, n_segments):
+    """Convert combination ids to ensemble member indices per segment.
+
+    The ids enumerate the combinations in the same order as
+    ``itertools.product(range(n_members), repeat=n_segments)``.
+    """
+    members = np.unravel_index(ids, (n_members, ) * n_segments)
+    return np.stack(members, axis=-1)
+
+
+def _combination_distances(segment_means, members, target):
+    """Compute the distance to the target for a block of combinations."""
+    n_segments = segment_means.shape[0]
+    means = segment_means[np.arange(n_segments), members].mean(axis=1)
+    dtype = np.promote_types(means.dtype, np.asarray(target).dtype)
+    return np.abs(means.astype(dtype) - target)
+
+
+def _update_top(top, candidates, n_combinations):
+    """Merge new candidates into the running selection of best ids.
+
+    Ties in distance are broken by the combination id, so the selection is
+    identical to a full sort of all combinations.
+    """
+    ids = np.concatenate([top[0], candidates[0]])
+    distances = np.concatenate([top[1], candidates[1]])
+    if len(distances) > n_combinations:
+        kth = np.partition(distances, n_combinations - 1)[n_combinations - 1]
+        if not np.isnan(kth):
+            keep = ~(distances > kth)
+            ids, distances = ids[keep], distances[keep]
+    order = np.lexsort((ids, distances))[:n_combinations]
+    return ids[order], distances[order]
+
+
+def _search_chunked(segment_means, target, n_combinations, chunk_size):
+    """Evaluate all combinations in blocks of ``chunk_size``."""
+    n_segments, n_members = segment_means.shape
+    n_total = n_members**n_segments
+    top = (np.empty(0, dtype=np.int64), np.empty(0))
+    for start in range(0, n_total, chunk_size):
+        ids = np.arange(start, min(start + chunk_size, n_total),
+                        dtype=np.int64)
+        members = _combination_members(ids, n_members, n_segments)
+        distances = _combination_distances(segment_means, members, target)
+        top = _update_top(top, (ids, distances), n_combinations)
+    return top
+
+
+def _search_branch_and_bound(segment_means, target, n_combinations,
+                             chunk_size):
+    """Evaluate only combinations that can still enter the selection.
+
+    The leading segments form a prefix for which a lower bound of the
+    distance to the target is derived from the smallest and largest segment
+    means that the remaining segments can contribute. Prefixes are visited
+    in order of increasing bound and all prefixes whose bound exceeds the
+    distance of the worst combination selected so far are skipped.
+    """
+    n_segments, n_members = segment_means.shape
+    n_suffix = n_segments
+    while n_suffix > 0 and n_members**n_suffix > chunk_size:
+        n_suffix -= 1
+    n_suffix = max(n_suffix, 1)
+    n_prefix = n_segments - n_suffix
+    if n_prefix == 0:
+        return _search_chunked(segment_means, target, n_combinations,
+                               chunk_size)
+    suffix_size = n_members**n_suffix
+
+    # Lower bound of the distance for each prefix
+    prefix_ids = np.arange(n_members**n_prefix, dtype=np.int64)
+    prefix_members = _combination_members(prefix_ids, n_members, n_prefix)
+    prefix_sums = segment_means[np.arange(n_prefix),
+                                prefix_members].sum(axis=1)
+    suffix_means = segment_means[n_prefix:]
+    residual = target * n_segments - prefix_sums
+    bounds = np.maximum.reduce([
+        residual - suffix_means.max(axis=1).sum(),
+        suffix_means.min(axis=1).sum() - residual,
+        np.zeros_like(residual),
+    ]) / n_segments
+    # Allow for rounding differences between the bound and the exact mean
+    tolerance = 1e-6 * (np.abs(segment_means).max() + abs(target))
+
+    top = (np.empty(0, dtype=np.int64), np.empty(0))
+    suffix_ids = np.arange(suffix_size, dtype=np.int64)
+    batch_size = max(1, chunk_size // suffix_size)
+    order = np.argsort(bounds, kind='stable')
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        if len(top[0]) == n_combinations:
+            batch = batch[bounds[batch] <= top[1][-1] + tolerance]
+            if not batch.size:
+                break
+        ids = (prefix_ids[batch, np.newaxis] * suffix_size +
+               suffix_ids).ravel()
+        members = _combination_members(ids, n_members, n_segments)
+        distances = _combination_distances(segment_means, members, target)
+        top = _update_top(top, (ids, distances), n_combinations)
+    return top
+
+
+def _find_single_top1000(segment_means,
+                         target,
+                         n_combinations=1000,
+                         chunk_size=2**20,
+                         branch_and_bound=False):
     """Select n_combinations that are closest to the target.
 
-    First, get all possible combinations, then select n_combinations.
-    Store the result under 'filename'
+    The possible combinations are enumerated in blocks of at most
+    ``chunk_size`` combinations, so memory use does not depend on the size
+    of the ensemble. Optionally, blocks that cannot contain any of the
+    n_combinations best combinations are skipped.
     """
-    n_segments = len(segment_means.segment)
+    segment_indices = range(len(segment_means.segment))
     n_members = len(segment_means.ensemble_member)
-    segment_indices = range(n_segments)
-    segment_means = segment_means.values  # much faster indexing
+    segment_means = segment_means.transpose('segment',
+                                            'ensemble_member').values
 
-    all_possible_combinations = product(range(n_members), repeat=n_segments)
-    results = []
-
-    for combination in all_possible_combinations:
-        results.append(
-            list(combination) +
-            [abs(segment_means[segment_indices, combination].mean() - target)])
+    if branch_and_bound:
+        ids, distances = _search_branch_and_bound(segment_means, target,
+                                                  n_combinations, chunk_size)
+    else:
+        ids, distances = _search_chunked(segment_means, target,
+                                         n_combinations, chunk_size)
 
     # Create a pandas dataframe with the combinations and distance to target
-    dataframe = pd.DataFrame(results,
-                             columns=list(segment_indices) + ['distance'])
-    top1000 = dataframe.sort_values('distance').head(1000)
+    members = _combination_members(ids, n_members, len(segment_indices))
+    top1000 = pd.DataFrame(members,
+                           columns=list(segment_indices),
+                           index=ids)
+    top1000['distance'] = distances
     return top1000
 
 
@@ -149,7 +259,12 @@ def get_all_top1000s(cfg, segment_season_means):
             LOGGER.info("Found intermediate file %s", filename)
         else:
             segments = segment_season_means[name].pr.sel(season='DJF')
-            top1000 = _find_single_top1000(segments, target)
+            top1000 = _find_single_top1000(
+                segments,
+                target,
+                chunk_size=cfg.get('chunk_size', 2**20),
+                branch_and_bound=cfg.get('branch_and_bound', False),
+            )
             top1000.to_csv(filename, index=False)
             LOGGER.info("Intermediate results stored as %s.", filename)
         top1000s[name] = pd.read_csv(filename)
@@ -253,15 +368,66 @@ def _penalties(overlap):
         funclist=[0, 1, 5, 100])
 
 
-def _best_subset(combinations, n_sample=8):
+def _subset_penalties(subsets, n_members):
+    """Compute the penalties for a batch of subsets at once.
+
+    subsets: numpy 3d array with shape (n_subsets, n_sample, n_segments)
+    n_members: the number of ensemble members.
+
+    The reuse of each ensemble member per segment is counted with a single
+    bincount over all subsets and segments.
+    """
+    n_subsets, _, n_segments = subsets.shape
+    offsets = (np.arange(n_subsets)[:, np.newaxis, np.newaxis] * n_segments +
+               np.arange(n_segments)) * n_members
+    counts = np.bincount((subsets + offsets).ravel(),
+                         minlength=n_subsets * n_segments * n_members)
+    return _penalties(counts).reshape(n_subsets, -1).sum(axis=1)
+
+
+def _refine_subset(combinations, indices, n_members):
+    """Improve a subset by replacing one combination at a time.
+
+    In each step, all subsets that differ from the current one in a single
+    combination are evaluated at once and the one with the lowest penalty is
+    kept, until no replacement lowers the penalty any further.
+    """
+    penalty = _subset_penalties(combinations[indices][np.newaxis],
+                                n_members)[0]
+    while penalty > 0:
+        n_sample = len(indices)
+        candidates = np.tile(indices, (n_sample, len(combinations), 1))
+        candidates[np.arange(n_sample), :, np.arange(n_sample)] = np.arange(
+            len(combinations))
+        candidates = candidates.reshape(-1, n_sample)
+        penalties = _subset_penalties(combinations[candidates], n_members)
+        best = np.argmin(penalties)
+        if penalties[best] >= penalty:
+            break
+        penalty = penalties[best]
+        indices = candidates[best]
+    return indices
+
+
+def _best_subset(combinations,
+                 n_sample=8,
+                 seed=None,
+                 n_draws=10000,
+                 batch_size=1000,
+                 refine=False):
     """Find n samples with minimal reuse of ensemble members per segment.
 
     combinations: a pandas series with the remaining candidates
     n: the final number of samples drawn from the remaining set.
+    seed: seed for the random number generator, for reproducible results.
+    n_draws: the number of random subsets that are evaluated.
+    batch_size: the number of random subsets that are evaluated at once.
+    refine: improve the best random subset with a local search.
     """
     # Convert series of 1d arrays to 2d array (much faster!)
     combinations = np.array(
         [list(combination) for combination in combinations])
+    n_members = combinations.max() + 1
 
     # Store the indices in a nice dataframe
     n_segments = combinations.shape[1]
@@ -271,22 +437,42 @@ def _best_subset(combinations, n_sample=8):
         index=[f'Combination {x}' for x in range(n_sample)])
 
     # Random number generator
-    rng = np.random.default_rng()
+    rng = np.random.default_rng(seed)
 
     lowest_penalty = 500  # just a random high value
-    for _ in range(10000):
-        subset = rng.choice(combinations, size=n_sample)
-        penalty = 0
-        for segment in subset.T:
-            _, counts = np.unique(segment, return_counts=True)
-            penalty += _penalties(counts).sum()
-        if penalty < lowest_penalty:
-            lowest_penalty = penalty
-            best_subset.loc[:, :] = subset
+    best_indices = None
+    for start in range(0, n_draws, batch_size):
+        indices = rng.integers(len(combinations),
+                               size=(min(batch_size, n_draws - start),
+                                     n_sample))
+        penalties = _subset_penalties(combinations[indices], n_members)
+        best = np.argmin(penalties)
+        if penalties[best] < lowest_penalty:
+            lowest_penalty = penalties[best]
+            best_indices = indices[best]
+
+    if best_indices is not None:
+        if refine:
+            best_indices = _refine_subset(combinations, best_indices,
+                                          n_members)
+        best_subset.loc[:, :] = combinations[best_indices]
 
     return best_subset
 
 
+def _best_subsets(combinations, cfg, seed_sequence):
+    """Find the final subsets for the control and future periods."""
+    seeds = seed_sequence.spawn(2)
+    kwargs = {
+        'n_sample': cfg['n_samples'],
+        'n_draws': cfg.get('n_draws', 10000),
+        'refine': cfg.get('refine_subsets', False),
+    }
+    control = _best_subset(combinations['control'], seed=seeds[0], **kwargs)
+    future = _best_subset(combinations['future'], seed=seeds[1], **kwargs)
+    return pd.concat([control, future], axis=1, keys=['control', 'future'])
+
+
 def select_final_subset(cfg, subsets, prov=None):
     """Select sample with minimal reuse of ensemble segments.
 
@@ -294,18 +480,42 @@ def select_final_subset(cfg, subsets, prov=None):
     same ensemble member for the same period. From 10.000 randomly
     selected sets of 8 samples, count and penalize re-used segments (1
     for 3*reuse, 5 for 4*reuse). Choose the set with the lowest penalty.
+    Optionally, improve this set by replacing one sample at a time.
+
+    The scenarios are processed in parallel using at most ``n_jobs``
+    processes. If a ``seed`` is given, the selection is reproducible.
     """
     n_samples = cfg['n_samples']
-    all_scenarios = {}
-    for scenario, dataframes in subsets.items():
-        # Make a table with the final indices
+    n_jobs = cfg.get('n_jobs', 1)
+    seeds = np.random.SeedSequence(cfg.get('seed')).spawn(len(subsets))
+    combinations = {
+        scenario: {
+            period: dataframe.combination
+            for period, dataframe in dataframes.items()
+        }
+        for scenario, dataframes in subsets.items()
+    }
+    settings = {
+        key: cfg[key]
+        for key in ('n_samples', 'n_draws', 'refine_subsets') if key in cfg
+    }
+    for scenario in subsets:
         LOGGER.info("Selecting %s final samples for scenario %s", n_samples,
                     scenario)
-        control = _best_subset(dataframes['control'].combination, n_samples)
-        future = _best_subset(dataframes['future'].combination, n_samples)
-        table = pd.concat([control, future],
-                          axis=1,
-                          keys=['control', 'future'])
+    if n_jobs == 1:
+        tables = [
+            _best_subsets(combinations[scenario], settings, seed)
+            for scenario, seed in zip(subsets, seeds)
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            tables = list(
+                executor.map(_best_subsets,
+                             [combinations[scenario] for scenario in subsets],
+                             [settings] * len(subsets), seeds))
+
+    all_scenarios = {}
+    for scenario, table in zip(subsets, tables):
         all_scenarios[scenario] = table
 
         # Store the output
@@ -28,6 +28,7 @@ import os
 from cartopy import crs  # This line causes a segmentation fault in prospector
 import cartopy.feature as cfeature
 import iris
+import iris.quickplot
 import matplotlib.pyplot as plt
 import numpy as np
 # specific imports for this diagnostic
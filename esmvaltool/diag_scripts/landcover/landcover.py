@@ -40,6 +40,7 @@ import os
 import numpy as np
 
 import iris
+import iris.analysis.cartography
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 import esmvaltool.diag_scripts.shared as diag
@@ -0,0 +1,183 @@
+"""Batched local explanations given by LIME.
+
+Note
+----
+This module provides a vectorized version of
+:meth:`lime.lime_tabular.LimeTabularExplainer.explain_instance` for regression
+models. Instead of explaining a single instance at a time, the perturbation
+samples of many instances are generated together, the model is evaluated with
+a single ``predict`` call per batch and the local weighted ridge regressions
+are solved with batched linear algebra. This is considerably faster for large
+prediction inputs (e.g., global grids with many grid cells).
+
+The local explanations are equivalent to the ones given by
+:meth:`lime.lime_tabular.LimeTabularExplainer.explain_instance` with
+``discretize_continuous=False`` and ``sample_around_instance=True`` (feature
+selection ``'highest_weights'``, default ridge regressor).
+
+"""
+
+import logging
+import os
+
+import numpy as np
+from joblib import Parallel, delayed
+
+logger = logging.getLogger(os.path.basename(__file__))
+
+
+def _weighted_ridge(x_data, y_data, weights, alpha):
+    """Fit weighted ridge regressions with intercept for a batch of inputs.
+
+    Parameters
+    ----------
+    x_data : numpy.ndarray
+        Input data with shape ``(n_instances, n_samples, n_features)``.
+    y_data : numpy.ndarray
+        Target data with shape ``(n_instances, n_samples)``.
+    weights : numpy.ndarray
+        Sample weights with shape ``(n_instances, n_samples)``.
+    alpha : float
+        Regularization strength.
+
+    Returns
+    -------
+    numpy.ndarray
+        Coefficients with shape ``(n_instances, n_features)``.
+
+    """
+    weights_sum = weights.sum(axis=1)
+    x_mean = np.einsum('bn,bnf->bf', weights, x_data) / weights_sum[:, None]
+    y_mean = np.einsum('bn,bn->b', weights, y_data) / weights_sum
+    x_centered = x_data - x_mean[:, None, :]
+    y_centered = y_data - y_mean[:, None]
+    x_weighted = x_centered * weights[:, :, None]
+    gram = np.einsum('bnf,bng->bfg', x_weighted, x_centered)
+    gram += alpha * np.eye(x_data.shape[2])
+    rhs = np.einsum('bnf,bn->bf', x_weighted, y_centered)
+    return np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+
+
+class LimeBatchExplainer():
+    """Explain many predictions of a regression model at once.
+
+    Parameters
+    ----------
+    explainer : lime.lime_tabular.LimeTabularExplainer
+        Fitted explainer (with ``discretize_continuous=False`` and
+        ``sample_around_instance=True``) that provides the training data
+        statistics, the kernel and the random state.
+    num_samples : int, optional (default: 5000)
+        Size of the neighborhood used to fit the local linear model of each
+        instance.
+    num_features : int, optional (default: 10)
+        Maximum number of features present in each explanation.
+
+    """
+
+    def __init__(self, explainer, num_samples=5000, num_features=10):
+        """Initialize class members."""
+        self.explainer = explainer
+        self.num_samples = num_samples
+        self.num_features = num_features
+
+    def _sample(self, x_batch, random_state):
+        """Generate the perturbed neighborhood of all instances of a batch."""
+        explainer = self.explainer
+        (n_instances, n_features) = x_batch.shape
+        data = random_state.normal(
+            0.0, 1.0, (n_instances, self.num_samples, n_features))
+        data = data * explainer.scaler.scale_ + x_batch[:, None, :]
+        data[:, 0] = x_batch
+        inverse = data.copy()
+        for column in explainer.categorical_features:
+            values = np.asarray(explainer.feature_values[column])
+            idx = random_state.choice(
+                len(values), size=(n_instances, self.num_samples),
+                p=explainer.feature_frequencies[column])
+            inverse_column = values[idx]
+            binary_column = (inverse_column == x_batch[:, [column]])
+            binary_column[:, 0] = True
+            inverse_column[:, 0] = x_batch[:, column]
+            data[:, :, column] = binary_column
+            inverse[:, :, column] = inverse_column
+        return (data, inverse)
+
+    def _explain_batch(self, x_batch, predict_fn, seed):
+        """Get local linear coefficients for a batch of instances."""
+        explainer = self.explainer
+        random_state = np.random.RandomState(seed)
+        (n_instances, n_features) = x_batch.shape
+        (data, inverse) = self._sample(x_batch, random_state)
+
+        # Evaluate model once for the whole batch
+        y_pred = np.asarray(predict_fn(inverse.reshape(-1, n_features)))
+        y_pred = y_pred.reshape(n_instances, self.num_samples)
+
+        # Sample weights given by distances in scaled space
+        scaled_data = ((data - explainer.scaler.mean_) /
+                       explainer.scaler.scale_)
+        distances = np.linalg.norm(scaled_data - scaled_data[:, :1], axis=2)
+        weights = explainer.base.kernel_fn(distances)
+
+        # Feature selection ('highest_weights')
+        if n_features > self.num_features:
+            coefs = _weighted_ridge(scaled_data, y_pred, weights, 0.01)
+            weighted_data = np.abs(coefs * scaled_data[:, 0])
+            used_features = np.argsort(-weighted_data, axis=1, kind='stable')
+            used_features = used_features[:, :self.num_features]
+            scaled_data = np.take_along_axis(scaled_data,
+                                             used_features[:, None, :],
+                                             axis=2)
+        else:
+            used_features = np.broadcast_to(np.arange(n_features),
+                                            (n_instances, n_features))
+
+        # Local linear models
+        coefs = np.zeros((n_instances, n_features))
+        np.put_along_axis(coefs, used_features,
+                          _weighted_ridge(scaled_data, y_pred, weights, 1.0),
+                          axis=1)
+        return coefs
+
+    def explain(self, x_data, predict_fn, batch_size=100, n_jobs=1):
+        """Get the local linear coefficients for many instances.
+
+        Parameters
+        ----------
+        x_data : numpy.ndarray
+            Instances that are explained (2D array).
+        predict_fn : callable
+            Prediction function of the model (for 2D input).
+        batch_size : int, optional (default: 100)
+            Number of instances explained together. The memory usage scales
+            with ``batch_size * num_samples * n_features``.
+        n_jobs : int, optional (default: 1)
+            Maximum number of batches that are processed at the same time
+            (using threads). Use ``-1`` to use all processors.
+
+        Returns
+        -------
+        numpy.ndarray
+            Coefficients of the local linear models with respect to the
+            scaled features with shape ``(n_instances, n_features)``.
+            Coefficients of features not selected for an instance are 0.
+
+        """
+        x_data = np.asarray(x_data, dtype=np.float64)
+        batches = [
+            x_data[idx:idx + batch_size]
+            for idx in range(0, x_data.shape[0], batch_size)
+        ]
+        seeds = self.explainer.random_state.randint(np.iinfo(np.int32).max,
+                                                    size=len(batches))
+        logger.debug("Explaining %i instances in %i batches", x_data.shape[0],
+                     len(batches))
+        parallel = Parallel(n_jobs=n_jobs, prefer='threads')
+        coefs = parallel(
+            [delayed(self._explain_batch)(batch, predict_fn, seed)
+             for (batch, seed) in zip(batches, seeds)]
+        )
+        if not coefs:
+            return np.zeros((0, x_data.shape[1]))
+        return np.concatenate(coefs)
@@ -29,7 +29,10 @@ efecv_kwargs: dict, optional
 grid_search_cv_kwargs: dict, optional
     Keyword arguments for the grid search cross-validation, see
     `<https://scikit-learn.org/stable/modules/generated/
-    sklearn.model_selection.GridSearchCV.html>`_.
+    sklearn.model_selection.GridSearchCV.html>`_. Use ``successive_halving:
+    true`` to perform a successive halving search instead of an exhaustive
+    search, see
+    :meth:`esmvaltool.diag_scripts.mlr.models.MLRModel.grid_search_cv`.
 grid_search_cv_param_grid: dict or list of dict, optional
     If specified, perform exhaustive parameter search using cross-validation
     instead of simply calling
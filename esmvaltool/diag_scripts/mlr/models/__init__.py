@@ -211,6 +211,14 @@ categorical_features: list of str
     contrast to numerical features).
 coords_as_features: list of str
     If given, specify a list of coordinates which should be used as features.
+cv_cache_dir: str
+    If given, cache the fitted results of :meth:`grid_search_cv`,
+    :meth:`rfecv` and :meth:`efecv` in this directory (relative paths are
+    interpreted relative to ``work_dir``). Results are identified by the
+    training data, the parameters of the pipeline and the search and the
+    cross-validation splits; repeated calls with identical input load the
+    cached result instead of refitting all folds. Use a directory outside of
+    the recipe's ``work_dir`` to reuse results across recipe runs.
 dtype: str (default: 'float64')
     Internal data type which is used for all calculations, see
     `<https://docs.scipy.org/doc/numpy/user/basics.types.html>`_ for a list of
@@ -232,6 +240,11 @@ imputation_strategy: str (default: 'remove')
     Strategy for the imputation of missing values in the features. Must be one
     of ``'remove'``, ``'mean'``, ``'median'``, ``'most_frequent'`` or
     ``'constant'``.
+lime_batch_size: int (default: 100)
+    Number of prediction points that are explained together when calculating
+    local feature importance or propagating prediction input errors with LIME.
+    Larger values need fewer calls of the model's ``predict()`` function but
+    more memory (roughly ``lime_batch_size * 5000 * n_features`` values).
 log_level: str (default: 'info')
     Verbosity for the logger. Must be one of ``'debug'``, ``'info'``,
     ``'warning'`` or ``'error'``.
@@ -293,6 +306,7 @@ work_dir: str (default: ~/work)
 
 """
 
+import hashlib
 import importlib
 import logging
 import os
@@ -302,12 +316,12 @@ from inspect import getfullargspec
 from pprint import pformat
 
 import iris
+import joblib
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from cf_units import Unit
-from joblib import Parallel, delayed
 from lime.lime_tabular import LimeTabularExplainer
 from matplotlib.ticker import ScalarFormatter
 from scipy.stats import shapiro
@@ -315,12 +329,15 @@ from sklearn import metrics
 from sklearn.compose import ColumnTransformer
 from sklearn.decomposition import PCA
 from sklearn.exceptions import NotFittedError
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.impute import SimpleImputer
 from sklearn.inspection import PartialDependenceDisplay
 from sklearn.model_selection import (
     GridSearchCV,
+    HalvingGridSearchCV,
     LeaveOneGroupOut,
     LeaveOneOut,
+    check_cv,
     train_test_split,
 )
 from sklearn.preprocessing import StandardScaler
@@ -334,6 +351,7 @@ from esmvaltool.diag_scripts.mlr.custom_sklearn import (
     get_rfecv_transformer,
     perform_efecv,
 )
+from esmvaltool.diag_scripts.mlr.lime_batch import LimeBatchExplainer
 from esmvaltool.diag_scripts.shared import (
     ProvenanceLogger,
     group_metadata,
@@ -622,9 +640,13 @@ class MLRModel():
             kwargs.update(self._get_logo_cv_kwargs())
 
         # Exhaustive feature selection
-        (self._clf, transformer) = perform_efecv(
-            self._clf, self.data['train'].x, self.get_y_array('train'),
-            **kwargs)
+        clf = self._clf
+        (self._clf, transformer) = self._call_cached(
+            'efecv',
+            lambda: perform_efecv(clf, self.data['train'].x,
+                                  self.get_y_array('train'), **kwargs),
+            lambda: self._get_cv_cache_key(clf, **kwargs),
+        )
         self._clf.steps.insert(0, ('feature_selection', transformer))
 
         # Log results
@@ -857,7 +879,8 @@ class MLRModel():
         data_frame = self.get_data_frame(data_type, impute_nans=impute_nans)
         return data_frame.y.squeeze().values
 
-    def grid_search_cv(self, param_grid, **kwargs):
+    def grid_search_cv(self, param_grid, successive_halving=False,
+                       **kwargs):
         """Perform exhaustive parameter search using cross-validation.
 
         Parameters
@@ -866,9 +889,18 @@ class MLRModel():
             Parameter names (keys) and ranges (values) for the search. Have to
             be given for each step of the pipeline separated by two
             underscores, i.e. ``s__p`` is the parameter ``p`` for step ``s``.
+        successive_halving : bool, optional (default: False)
+            Use successive halving
+            (:class:`sklearn.model_selection.HalvingGridSearchCV`) instead of
+            an exhaustive search: all candidates are evaluated on a small
+            subset of the training data and only the best candidates are
+            evaluated on more data in the following iterations. The
+            candidates of each iteration are evaluated in parallel (see
+            option ``n_jobs``).
         **kwargs : keyword arguments, optional
             Additional options for
-            :class:`sklearn.model_selection.GridSearchCV`.
+            :class:`sklearn.model_selection.GridSearchCV` or
+            :class:`sklearn.model_selection.HalvingGridSearchCV`.
 
         Raises
         ------
@@ -877,18 +909,30 @@ class MLRModel():
             or ``best_params_``.
 
         """
+        if successive_halving:
+            search_type = 'successive halving'
+            cv_estimator = HalvingGridSearchCV
+            kwargs.setdefault('random_state', self.random_state)
+        else:
+            search_type = 'exhaustive'
+            cv_estimator = GridSearchCV
         logger.info(
-            "Performing exhaustive grid search cross-validation with final "
-            "regressor %s and parameter grid %s on %i training points",
+            "Performing %s grid search cross-validation with final regressor "
+            "%s and parameter grid %s on %i training points", search_type,
             self._CLF_TYPE, param_grid, len(self.data['train'].index))
 
         # Get keyword arguments
-        (cv_kwargs, fit_kwargs) = self._get_cv_estimator_kwargs(GridSearchCV,
+        (cv_kwargs, fit_kwargs) = self._get_cv_estimator_kwargs(cv_estimator,
                                                                 **kwargs)
 
         # Create and fit GridSearchCV instance
-        clf = GridSearchCV(self._clf, param_grid, **cv_kwargs)
-        clf.fit(self.data['train'].x, self.data['train'].y, **fit_kwargs)
+        clf = cv_estimator(self._clf, param_grid, **cv_kwargs)
+        clf = self._call_cached(
+            'grid_search_cv',
+            lambda: clf.fit(self.data['train'].x, self.data['train'].y,
+                            **fit_kwargs),
+            lambda: self._get_cv_cache_key(clf, clf.cv, **fit_kwargs),
+        )
 
         # Try to find best estimator
         if hasattr(clf, 'best_estimator_'):
@@ -1744,8 +1788,12 @@ class MLRModel():
 
         # Create and fit AdvancedRFECV instance
         rfecv = AdvancedRFECV(self._clf, **cv_kwargs)
-        rfecv.fit(self.data['train'].x, self.get_y_array('train'),
-                  **fit_kwargs)
+        rfecv = self._call_cached(
+            'rfecv',
+            lambda: rfecv.fit(self.data['train'].x,
+                              self.get_y_array('train'), **fit_kwargs),
+            lambda: self._get_cv_cache_key(rfecv, rfecv.cv, **fit_kwargs),
+        )
 
         # Add feature selection step to pipeline
         self._clf = rfecv.estimator_
@@ -1830,6 +1878,30 @@ class MLRModel():
         if new_params:
             logger.info("Updated pipeline with parameters %s", new_params)
 
+    def _call_cached(self, description, function, get_key):
+        """Call ``function`` or load its result from the CV cache.
+
+        ``get_key`` is only called (and the training data only hashed) if
+        the option ``cv_cache_dir`` is given.
+
+        """
+        cache_dir = self._cfg.get('cv_cache_dir')
+        if cache_dir is None:
+            return function()
+        cache_dir = os.path.join(self._cfg['work_dir'], cache_dir)
+        path = os.path.join(cache_dir, f'{description}_{get_key()}.joblib')
+        if os.path.isfile(path):
+            logger.info("Loading cached result of %s() from %s", description,
+                        path)
+            return joblib.load(path)
+        result = function()
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(result, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info("Cached result of %s() in %s", description, path)
+        return result
+
     def _calculate_sample_weights(self, cube, var_type, group_attr=None):
         """Calculate sample weights if desired."""
         if not self._cfg['weighted_samples']:
@@ -1838,15 +1910,11 @@ class MLRModel():
             return None
         weights = mlr.get_all_weights(cube, **self._cfg['weighted_samples'])
         weights = weights.astype(self._cfg['dtype'], casting='same_kind')
-        weights = pd.DataFrame(
-            {'sample_weight': weights.ravel()},
-            index=self._get_multiindex(cube, group_attr=group_attr),
-            dtype=self._cfg['dtype'],
-        )
+        weights = np.ravel(weights)
         msg = '' if group_attr is None else f" of '{group_attr}'"
         logger.debug(
             "Successfully calculated %i sample weights for training data%s "
-            "using %s", len(weights.index), msg, self._cfg['weighted_samples'])
+            "using %s", weights.size, msg, self._cfg['weighted_samples'])
         return weights
 
     def _check_clf(self):
@@ -2098,41 +2166,52 @@ class MLRModel():
             raise ValueError(
                 f"Excepted one of '{allowed_types}' for 'var_type', got "
                 f"'{var_type}'")
-        x_data_for_groups = []
-        x_cube = None
-        if self._cfg['weighted_samples'] and var_type == 'feature':
-            sample_weights_for_groups = []
-        else:
-            sample_weights_for_groups = None
-
-        # Iterate over datasets
         datasets = select_metadata(datasets, var_type=var_type)
         if var_type == 'feature':
             groups = self.group_attributes
         else:
             groups = [None]
+
+        # Get reference cubes first to determine the number of points
+        datasets_for_groups = []
+        ref_cubes = []
         for group_attr in groups:
             group_datasets = select_metadata(datasets,
                                              group_attribute=group_attr)
-            if group_attr is not None:
-                logger.info("Loading '%s' data of '%s'", var_type, group_attr)
             msg = '' if group_attr is None else f" for '{group_attr}'"
             if not group_datasets:
                 raise ValueError(f"No '{var_type}' data{msg} found")
-            (group_data, x_cube,
-             weights) = self._get_x_data_for_group(group_datasets, var_type,
-                                                   group_attr)
-            x_data_for_groups.append(group_data)
-
-            # Append weights if desired
-            if sample_weights_for_groups is not None:
-                sample_weights_for_groups.append(weights)
+            datasets_for_groups.append(group_datasets)
+            ref_cubes.append(
+                self._get_reference_cube(group_datasets, var_type, msg))
+        sizes = [int(np.prod(cube.shape, dtype=int)) for cube in ref_cubes]
+        index = self._get_multiindex(groups, sizes)
+
+        # Fill a single preallocated array (each feature is contiguous)
+        x_array = np.empty((len(self.features), len(index)),
+                           dtype=self._cfg['dtype'])
+        if self._cfg['weighted_samples'] and var_type == 'feature':
+            sample_weights = np.empty(len(index), dtype=self._cfg['dtype'])
+        else:
+            sample_weights = None
+        start = 0
+        for (group_attr, group_datasets, ref_cube,
+             size) in zip(groups, datasets_for_groups, ref_cubes, sizes):
+            if group_attr is not None:
+                logger.info("Loading '%s' data of '%s'", var_type, group_attr)
+            stop = start + size
+            self._get_x_data_for_group(group_datasets, var_type, ref_cube,
+                                       x_array[:, start:stop], group_attr)
+            if sample_weights is not None:
+                sample_weights[start:stop] = self._calculate_sample_weights(
+                    ref_cube, var_type, group_attr=group_attr)
+            start = stop
+        x_cube = ref_cubes[-1]
 
         # Adapt sample_weights if necessary
-        if sample_weights_for_groups is not None:
-            sample_weights = pd.concat(sample_weights_for_groups)
-            sample_weights.index = pd.MultiIndex.from_tuples(
-                sample_weights.index, names=self._get_multiindex_names())
+        if sample_weights is not None:
+            sample_weights = pd.DataFrame({'sample_weight': sample_weights},
+                                          index=index)
             logger.info(
                 "Successfully calculated sample weights for training data "
                 "using %s", self._cfg['weighted_samples'])
@@ -2145,13 +2224,12 @@ class MLRModel():
                     "cubes",
                     sample_weights.min().values[0],
                     sample_weights.max().values[0])
-        else:
-            sample_weights = None
 
-        # Convert index back to MultiIndex
-        x_data = pd.concat(x_data_for_groups)
-        x_data.index = pd.MultiIndex.from_tuples(
-            x_data.index, names=self._get_multiindex_names())
+        # Wrap array without copying it
+        x_data = pd.DataFrame(x_array.T,
+                              index=index,
+                              columns=self.features,
+                              copy=False)
 
         return (x_data, x_cube, sample_weights)
 
@@ -2163,6 +2241,7 @@ class MLRModel():
                 f"Excepted one of '{allowed_types}' for 'var_type', got "
                 f"'{var_type}'")
         y_data_for_groups = []
+        sizes = []
 
         # Iterate over datasets
         datasets = select_metadata(datasets, var_type=var_type)
@@ -2183,18 +2262,15 @@ class MLRModel():
             cube = self._load_cube(dataset)
             text = f"{var_type} '{self.label}'{msg}"
             self._check_cube_dimensions(cube, None, text)
-            cube_data = pd.DataFrame(
-                self._get_cube_data(cube),
-                columns=[self.label],
-                index=self._get_multiindex(cube, group_attr=group_attr),
-                dtype=self._cfg['dtype'],
-            )
+            cube_data = self._get_cube_data(cube)
             y_data_for_groups.append(cube_data)
+            sizes.append(cube_data.size)
 
-        # Convert index back to MultiIndex
-        y_data = pd.concat(y_data_for_groups)
-        y_data.index = pd.MultiIndex.from_tuples(
-            y_data.index, names=self._get_multiindex_names())
+        # Create data frame with MultiIndex
+        y_array = np.concatenate(y_data_for_groups).astype(self._cfg['dtype'],
+                                                           copy=False)
+        y_data = pd.DataFrame({self.label: y_array},
+                              index=self._get_multiindex(groups, sizes))
 
         return y_data
 
@@ -2215,6 +2291,45 @@ class MLRModel():
         logger.debug("Added broadcasted %s", msg)
         return new_cube
 
+    def _get_cv_cache_key(self, estimator, cv=None, groups=None, **kwargs):
+        """Get key that identifies the result of a CV estimator.
+
+        The key is given by the training data, all parameters of the
+        estimator which affect the results (including the types of all
+        estimators of the pipeline), the cross-validation splits and further
+        keyword arguments. The splits are hashed one at a time so that the
+        memory usage does not grow with the number of splits.
+
+        """
+        ignored = ('memory', 'n_jobs', 'pre_dispatch', 'verbose', 'verbosity',
+                   'silent')
+        x_train = self.data['train'].x
+        y_train = self.get_y_array('train')
+        cv = check_cv(cv, y_train, classifier=False)
+        params = {}
+        for (key, val) in estimator.get_params(deep=True).items():
+            if key.split('__')[-1] in ignored:
+                continue
+            if key.split('__')[-1] in ('steps', 'transformers'):
+                continue
+            if hasattr(val, 'get_params'):
+                val = f'{type(val).__module__}.{type(val).__qualname__}'
+            params[key] = val
+        kwargs = {
+            key: val for (key, val) in kwargs.items() if key not in ignored
+        }
+        splits = hashlib.sha256()
+        for (train_idx, test_idx) in cv.split(x_train, y_train, groups):
+            splits.update(joblib.hash((train_idx, test_idx)).encode())
+        return joblib.hash({
+            'estimator': type(estimator).__name__,
+            'params': params,
+            'x_train': x_train,
+            'y_train': y_train,
+            'splits': splits.hexdigest(),
+            'kwargs': kwargs,
+        })
+
     def _get_clf_parameters(self, deep=True):
         """Get parameters of pipeline."""
         return self._clf.get_params(deep=deep)
@@ -2391,51 +2506,35 @@ class MLRModel():
                                        columns=['units'])
         return label
 
+    def _get_lime_coefficients(self, x_pred):
+        """Get coefficients of local linear models given by LIME."""
+        explainer = LimeBatchExplainer(self._lime_explainer)
+
+        # Ignore warnings about missing feature names here because they are
+        # not used
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                'ignore',
+                message=('X does not have valid feature names, but '
+                         'SimpleImputer was fitted with feature names'),
+                category=UserWarning,
+                module='sklearn',
+            )
+            return explainer.explain(x_pred.values,
+                                     self._clf.predict,
+                                     batch_size=self._cfg['lime_batch_size'],
+                                     n_jobs=self._cfg['n_jobs'])
+
     def _get_lime_feature_importance(self, x_pred):
         """Get most important feature given by LIME."""
         logger.info(
             "Calculating local feature importance using LIME (this may take "
             "a while...)")
         x_pred = self._impute_nans(x_pred)
-
-        # Most important feature for single input
-        def _most_important_feature(x_single_pred, explainer, predict_fn):
-            """Get most important feature for single input.
-
-            Note
-            ----
-            Ignore warnings about missing feature names here because they are
-            not used.
-
-            """
-            with warnings.catch_warnings():
-                warnings.filterwarnings(
-                    'ignore',
-                    message=('X does not have valid feature names, but '
-                             'SimpleImputer was fitted with feature names'),
-                    category=UserWarning,
-                    module='sklearn',
-                )
-                explanation = explainer.explain_instance(x_single_pred,
-                                                         predict_fn)
-            local_exp = explanation.local_exp[1]
-            sorted_exp = sorted(local_exp, key=lambda elem: elem[0])
-            norm = sum(abs(elem[1]) for elem in sorted_exp)
-            return [abs(elem[1]) / norm for elem in sorted_exp]
-
-        # Apply on whole input (using multiple processes)
-        parallel = Parallel(n_jobs=self._cfg['n_jobs'])
-        lime_feature_importance = parallel(
-            [
-                delayed(_most_important_feature)(
-                    x,
-                    explainer=self._lime_explainer,
-                    predict_fn=self._clf.predict,
-                ) for x in x_pred.values
-            ]
-        )
-        lime_feature_importance = np.array(lime_feature_importance,
-                                           dtype=self._cfg['dtype'])
+        coefs = np.abs(self._get_lime_coefficients(x_pred))
+        lime_feature_importance = coefs / coefs.sum(axis=1, keepdims=True)
+        lime_feature_importance = lime_feature_importance.astype(
+            self._cfg['dtype'])
         lime_feature_importance = np.moveaxis(lime_feature_importance, -1, 0)
         lime_feature_importance = dict(zip(self.features,
                                            lime_feature_importance))
@@ -2474,11 +2573,18 @@ class MLRModel():
 
         return mask
 
-    def _get_multiindex(self, ref_cube, group_attr=None):
-        """Get :class:`pandas.MultiIndex` for data."""
-        group_attr = self._group_attr_to_pandas_index_str(group_attr)
-        index = pd.MultiIndex.from_product(
-            [[group_attr], np.arange(ref_cube.data.size)],
+    def _get_multiindex(self, group_attrs, sizes):
+        """Get :class:`pandas.MultiIndex` for data of consecutive groups."""
+        group_attrs = [
+            self._group_attr_to_pandas_index_str(group_attr)
+            for group_attr in group_attrs
+        ]
+        sizes = np.array(sizes, dtype=int)
+        offsets = np.repeat(np.cumsum(sizes) - sizes, sizes)
+        index = pd.MultiIndex(
+            levels=[group_attrs, np.arange(sizes.max(initial=0))],
+            codes=[np.repeat(np.arange(len(sizes)), sizes),
+                   np.arange(sizes.sum()) - offsets],
             names=self._get_multiindex_names(),
         )
         return index
@@ -2631,21 +2737,17 @@ class MLRModel():
                              param, str(function), parameters[param])
         return parameters
 
-    def _get_x_data_for_group(self, datasets, var_type, group_attr=None):
-        """Get x data for a group of datasets."""
+    def _get_x_data_for_group(self, datasets, var_type, ref_cube, out,
+                              group_attr=None):
+        """Fill x data for a group of datasets into ``out``.
+
+        ``out`` needs to be an array with shape ``(n_features, n_points)``.
+
+        """
         msg = '' if group_attr is None else f" for '{group_attr}'"
-        ref_cube = self._get_reference_cube(datasets, var_type, msg)
-        group_data = pd.DataFrame(
-            columns=self.features,
-            index=self._get_multiindex(ref_cube, group_attr=group_attr),
-            dtype=self._cfg['dtype'],
-        )
-        sample_weights = self._calculate_sample_weights(ref_cube,
-                                                        var_type,
-                                                        group_attr=group_attr)
 
         # Iterate over all features
-        for tag in self.features:
+        for (idx, tag) in enumerate(self.features):
             if self.features_types[tag] != 'coordinate':
                 dataset = self._check_dataset(datasets, var_type, tag, msg)
 
@@ -2686,15 +2788,10 @@ class MLRModel():
                                                      msg)
 
             # Save data
-            new_data = np.array(new_data)
-            if new_data.size != ref_cube.data.size:
-                new_data = np.broadcast_to(new_data, (ref_cube.data.size,))
-            group_data[tag] = new_data
+            out[idx] = new_data
 
-        # Return data and reference cube
-        logger.debug("Found %i raw '%s' input data points%s",
-                     len(group_data.index), var_type, msg)
-        return (group_data, ref_cube, sample_weights)
+        logger.debug("Found %i raw '%s' input data points%s", out.shape[1],
+                     var_type, msg)
 
     def _group_by_attributes(self, datasets):
         """Group datasets by specified attributes."""
@@ -3130,47 +3227,12 @@ class MLRModel():
                 "'feature_selection' step is present (usually because of "
                 "calling rfecv())")
         x_pred = self._impute_nans(x_pred)
-
-        # Propagated error for single input
-        def _propagated_error(x_single_pred, x_single_err, explainer,
-                              predict_fn, features, categorical_features):
-            """Get propagated prediction input error for single input.
-
-            Note
-            ----
-            Ignore warnings about missing feature names here because they are
-            not used.
-
-            """
-            with warnings.catch_warnings():
-                warnings.filterwarnings(
-                    'ignore',
-                    message=('X does not have valid feature names, but '
-                             'SimpleImputer was fitted with feature names'),
-                    category=UserWarning,
-                    module='sklearn',
-                )
-                exp = explainer.explain_instance(x_single_pred, predict_fn)
-            x_single_err = np.nan_to_num(x_single_err)
-            x_err_scaled = x_single_err / explainer.scaler.scale_
-            squared_error = 0.0
-            for (idx, coef) in exp.local_exp[1]:
-                if features[idx] in categorical_features:
-                    continue
-                squared_error += (x_err_scaled[idx] * coef)**2
-            return squared_error
-
-        # Apply on whole input (using multiple processes)
-        parallel = Parallel(n_jobs=self._cfg['n_jobs'])
-        errors = parallel(
-            [delayed(_propagated_error)(
-                x, x_e, explainer=self._lime_explainer,
-                predict_fn=self._clf.predict,
-                features=self.features,
-                categorical_features=self.categorical_features,
-            ) for (x, x_e) in zip(x_pred.values, x_err.values)]
-        )
-        return np.array(errors, dtype=self._cfg['dtype'])
+        coefs = self._get_lime_coefficients(x_pred)
+        x_err_scaled = (np.nan_to_num(x_err.values) /
+                        self._lime_explainer.scaler.scale_)
+        numerical = ~np.isin(self.features, self.categorical_features)
+        squared_errors = (x_err_scaled[:, numerical] * coefs[:, numerical])**2
+        return np.sum(squared_errors, axis=1).astype(self._cfg['dtype'])
 
     def _remove_missing_features(self, x_data, y_data, sample_weights):
         """Remove missing values in the features data (if desired)."""
@@ -3276,6 +3338,7 @@ class MLRModel():
         self._cfg.setdefault('fit_kwargs', {})
         self._cfg.setdefault('group_datasets_by_attributes', [])
         self._cfg.setdefault('imputation_strategy', 'remove')
+        self._cfg.setdefault('lime_batch_size', 100)
         self._cfg.setdefault('log_level', 'info')
         self._cfg.setdefault('mlr_model_name', f'{self._CLF_TYPE} model')
         self._cfg.setdefault('n_jobs', 1)
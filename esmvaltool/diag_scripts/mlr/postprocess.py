@@ -71,6 +71,11 @@ cov_estimate_dim_map: list of int, optional
     dimensions of ``prediction_input`` used for estimating covariance. Only
     relevant if both dataset types are given. See notes above for more
     information.
+cov_estimate_block_size: int, optional (default: 256)
+    Number of rows of the (never fully stored) covariance matrices that are
+    evaluated at once when estimating the real error using a
+    ``prediction_input`` dataset with identical shape as the errors. Larger
+    values are faster but need more memory.
 ignore: list of dict, optional
     Ignore specific datasets by specifying multiple :obj:`dict` s of metadata.
 landsea_fraction_weighted: str, optional
@@ -209,8 +214,25 @@ def _collapse_regular_cube(cfg, cube, power=1):
     return cube
 
 
-def _corrcoef(array, rowvar=True, weights=None):
-    """Fast version of :func:`numpy.ma.corrcoef`."""
+def _blocked_row_norms(left, right, block_size):
+    """Get norms of the rows of ``left @ right`` computed in blocks of rows."""
+    norms = np.empty(left.shape[0])
+    for idx in range(0, left.shape[0], block_size):
+        block = left[idx:idx + block_size] @ right
+        norms[idx:idx + block_size] = np.sqrt(np.sum(block**2, axis=1))
+    return norms
+
+
+def _normalized_anomalies(array, rowvar=True, weights=None):
+    """Get normalized (weighted) anomalies of the variables of an array.
+
+    The matrix of Pearson correlation coefficients of the variables is given
+    by the product of the returned array with its transpose. This allows to
+    evaluate quadratic forms of this matrix without calculating the matrix
+    itself. Variables with invalid (masked or zero) norms are set to 0, i.e.,
+    their correlation coefficients are ignored.
+
+    """
     if not rowvar:
         array = array.T
         if weights is not None:
@@ -221,10 +243,9 @@ def _corrcoef(array, rowvar=True, weights=None):
     else:
         sqrt_weights = np.ma.sqrt(weights)
     demean = (array - mean) * sqrt_weights
-    res = np.ma.dot(demean, demean.T)
     row_norms = np.ma.sqrt(np.ma.sum(demean**2, axis=1))
-    res /= np.ma.outer(row_norms, row_norms)
-    return res
+    anomalies = demean / row_norms.reshape(-1, 1)
+    return np.ma.filled(anomalies, 0.0)
 
 
 def _estim_cov_differing_shape(cfg, squared_error_cube, cov_est_cube, weights):
@@ -257,20 +278,17 @@ def _estim_cov_differing_shape(cfg, squared_error_cube, cov_est_cube, weights):
             f"and 'prediction_output_error' datasets, got {cov_est.shape} and "
             f"{error.shape}")
 
-    # Estimate covariance
-    error = error.ravel()
+    # Estimate covariance: the weighted sum over the covariance matrix
+    # (Pearson coefficients times errors) is the squared norm of the weighted
+    # errors projected onto the normalized anomalies
+    error = error.ravel() * np.ma.getdata(weights).ravel()
     cov_est = cov_est.reshape(-1, *error.shape)
-    pearson_coeffs = _corrcoef(cov_est, rowvar=False)
-    covariance = pearson_coeffs * np.ma.outer(error, error)
-
-    # Collapse covariance
-    weights = weights.ravel()
-    weights = np.outer(weights, weights)
-    error = np.ma.sqrt(np.ma.sum(covariance * weights))
-    return error
+    anomalies = _normalized_anomalies(cov_est, rowvar=False)
+    return np.sqrt(np.sum((anomalies.T @ error)**2))
 
 
-def _estim_cov_identical_shape(squared_error_cube, cov_est_cube, weights):
+def _estim_cov_identical_shape(cfg, squared_error_cube, cov_est_cube,
+                               weights):
     """Collapse estimated covariance.
 
     Estimate error by approximating covariance from dataset with identical
@@ -289,26 +307,25 @@ def _estim_cov_identical_shape(squared_error_cube, cov_est_cube, weights):
         error = error.reshape(error.shape[0], -1)
         cov_est = cov_est.reshape(cov_est.shape[0], -1)
         weights = weights.reshape(weights.shape[0], -1)
-
-    # Pearson coefficients (= normalized covariance) over both dimensions
-    pearson_dim0 = _corrcoef(cov_est, weights=weights)
-    pearson_dim1 = _corrcoef(cov_est, rowvar=False, weights=weights)
-
-    # Covariances
-    cov_dim0 = (np.einsum('...i,...j->...ij', error, error) *
-                np.einsum('...i,...j->...ij', weights, weights) * pearson_dim1)
-    cov_dim1 = (np.einsum('i...,j...->...ij', error, error) *
-                np.einsum('i...,j...->...ij', weights, weights) * pearson_dim0)
-
-    # Errors over dimensions
-    error_dim0 = np.ma.sqrt(np.ma.sum(cov_dim0, axis=(1, 2)))
-    error_dim1 = np.ma.sqrt(np.ma.sum(cov_dim1, axis=(1, 2)))
+    weighted_error = error * np.ma.getdata(weights)
+
+    # Normalized anomalies (Pearson coefficients = normalized covariance)
+    # over both dimensions
+    anomalies_dim0 = _normalized_anomalies(cov_est, weights=weights)
+    anomalies_dim1 = _normalized_anomalies(cov_est, rowvar=False,
+                                           weights=weights)
+
+    # Errors over dimensions (covariance matrices are evaluated block by
+    # block and never stored completely)
+    block_size = cfg.get('cov_estimate_block_size', 256)
+    error_dim0 = _blocked_row_norms(weighted_error, anomalies_dim1,
+                                    block_size)
+    error_dim1 = _blocked_row_norms(weighted_error.T, anomalies_dim0,
+                                    block_size)
 
     # Collapse further (all weights are already included in first step)
-    cov_order_0 = pearson_dim0 * np.ma.outer(error_dim0, error_dim0)
-    cov_order_1 = pearson_dim1 * np.ma.outer(error_dim1, error_dim1)
-    error_order_0 = np.ma.sqrt(np.ma.sum(cov_order_0))
-    error_order_1 = np.ma.sqrt(np.ma.sum(cov_order_1))
+    error_order_0 = np.sqrt(np.sum((anomalies_dim0.T @ error_dim0)**2))
+    error_order_1 = np.sqrt(np.sum((anomalies_dim1.T @ error_dim1)**2))
     logger.debug(
         "Found real errors %e and %e after collapsing with different "
         "orderings, using maximum", error_order_0, error_order_1)
@@ -347,8 +364,8 @@ def _estimate_real_error(cfg, squared_error_cube, cov_est_dataset, basepath):
 
     # Estimate error
     if cov_est_cube.shape == squared_error_cube.shape:
-        error = _estim_cov_identical_shape(squared_error_cube, cov_est_cube,
-                                           weights)
+        error = _estim_cov_identical_shape(cfg, squared_error_cube,
+                                           cov_est_cube, weights)
     else:
         error = _estim_cov_differing_shape(cfg, squared_error_cube,
                                            cov_est_cube, weights)
@@ -6,6 +6,12 @@ This diagnostic can be used to compute and show Empirical Orthogonal Functions
 (EOFs) and Principal Components (PCs) of arbitrary input. It creates a map plot
 of the first EOF and the associated PC time series.
 
+By default, the EOFs are calculated with :class:`eofs.iris.Eof`, which
+requires the full input data in memory and computes a complete singular value
+decomposition (SVD). For large input data (e.g., long daily records), the
+option ``eof_method`` can be used to only compute the leading EOF on the
+(chunked) lazy data, see below.
+
 Configuration options in recipe
 -------------------------------
 cartopy_data_dir: str, optional (default: None)
@@ -15,6 +21,20 @@ config_file: str, optional
     Path to the monitor configuration file. Defaults to ``monitor_config.yml``
     in the same folder as the diagnostic script. More information on the
     monitor configuration file can be found :ref:`here <monitor_config_file>`.
+eof_block_size: int, optional (default: 1000)
+    Number of time steps that are processed at once if ``eof_method:
+    incremental`` is used.
+eof_method: str, optional (default: 'full')
+    Method used to calculate the EOFs. Must be one of ``full`` (complete SVD
+    of the realized data using :class:`eofs.iris.Eof`), ``randomized``
+    (randomized SVD of the lazy data that only computes the leading modes,
+    see :func:`dask.array.linalg.svd_compressed`) or ``incremental``
+    (:class:`sklearn.decomposition.IncrementalPCA` on blocks of
+    ``eof_block_size`` time steps followed by one subspace iteration). The
+    results of ``randomized`` and ``incremental`` agree with the ones of
+    ``full`` within numerical tolerance, but only up to the sign of the EOFs
+    and PCs: for these methods, the sign is chosen such that the element with
+    the largest absolute value of each EOF is positive.
 plot_filename: str, optional
     Filename pattern for the plots.
     Defaults to ``{plot_type}_{real_name}_{dataset}_{mip}_{exp}_{ensemble}``.
@@ -42,12 +62,22 @@ rasterize_maps: bool, optional (default: True)
 
 """
 import logging
-from copy import deepcopy
+from copy import copy, deepcopy
 
+import dask.array as da
 import iris
 import matplotlib.pyplot as plt
+import numpy as np
 from eofs.iris import Eof
+from eofs.tools.iris import (
+    classified_aux_coords,
+    get_time_coord,
+    weights_array,
+)
+from iris.coords import DimCoord
+from iris.cube import Cube
 from mapgenerator.plotting.plotmap import PlotMap
+from sklearn.decomposition import IncrementalPCA
 
 import esmvaltool.diag_scripts.shared
 import esmvaltool.diag_scripts.shared.names as n
@@ -56,6 +86,184 @@ from esmvaltool.diag_scripts.shared import group_metadata
 
 logger = logging.getLogger(__name__)
 
+# Additional modes used to improve the accuracy of the leading modes
+EOF_OVERSAMPLES = 10
+
+
+class LeadingEofs():
+    """Leading EOFs and PCs of a cube computed on lazy data.
+
+    This class provides the same interface as :class:`eofs.iris.Eof`, but only
+    computes the leading ``neofs`` modes. The input data is never realized at
+    once.
+
+    Parameters
+    ----------
+    cube: iris.cube.Cube
+        Input data. Time must be the first dimension.
+    neofs: int, optional (default: 1)
+        Number of leading modes that are calculated.
+    method: str, optional (default: 'randomized')
+        Must be ``'randomized'`` (randomized SVD of the lazy data) or
+        ``'incremental'`` (incremental PCA on blocks of ``block_size`` time
+        steps).
+    weights: str, optional (default: 'coslat')
+        Weighting scheme (see :func:`eofs.tools.iris.weights_array`). Use
+        ``None`` for no weighting.
+    block_size: int, optional (default: 1000)
+        Number of time steps processed at once for ``method='incremental'``.
+    ddof: int, optional (default: 1)
+        Delta degrees of freedom used to calculate the eigenvalues.
+
+    """
+
+    def __init__(self, cube, neofs=1, method='randomized', weights='coslat',
+                 block_size=1000, ddof=1):
+        """Initialize class members and compute leading modes."""
+        (time, time_dim) = get_time_coord(cube)
+        if time_dim != 0:
+            raise ValueError(
+                "time must be the first dimension, consider using the "
+                "transpose() method")
+        self._time = copy(time)
+        self._coords = [copy(coord) for coord in cube.dim_coords]
+        self._coords.remove(self._time)
+        (self._time_aux_coords, self._space_aux_coords, _) = (
+            classified_aux_coords(cube))
+        self._dtype = np.promote_types(cube.dtype, np.float32)
+        self._ddof = ddof
+        n_time = cube.shape[0]
+
+        # Weighted data with shape (time, space)
+        data = da.ma.filled(cube.lazy_data().astype(np.float64), np.nan)
+        data = data.reshape((n_time, -1))
+        if weights is not None:
+            data = data * weights_array(cube[:1], scheme=weights).ravel()
+
+        # Points with missing values at any time are ignored
+        mean = data.mean(axis=0).compute()
+        self._valid = np.isfinite(mean)
+        if not self._valid.any():
+            raise ValueError("all input data is missing")
+        anomalies = data[:, self._valid] - mean[self._valid]
+
+        if method == 'randomized':
+            (self._u, self._s, eofs) = self._randomized_svd(anomalies, neofs)
+        elif method == 'incremental':
+            (self._u, self._s, eofs) = self._incremental_svd(
+                anomalies, neofs, block_size)
+        else:
+            raise ValueError(
+                f"Expected one of 'randomized', 'incremental' for EOF "
+                f"method, got '{method}'")
+
+        # Deterministic signs (largest absolute value of each EOF positive)
+        max_idx = np.argmax(np.abs(eofs), axis=1)
+        signs = np.sign(eofs[np.arange(eofs.shape[0]), max_idx])
+        self._u *= signs
+        self._flat_eofs = np.full((eofs.shape[0], self._valid.size), np.nan)
+        self._flat_eofs[:, self._valid] = eofs * signs[:, np.newaxis]
+        self._eigenvalues = self._s**2 / (n_time - ddof)
+        self._space_shape = cube.shape[1:]
+        self.neofs = eofs.shape[0]
+
+    @staticmethod
+    def _randomized_svd(anomalies, neofs):
+        """Randomized SVD that only computes the leading modes."""
+        (u_mat, sing, v_mat) = da.linalg.svd_compressed(
+            anomalies, neofs, n_power_iter=4, n_oversamples=EOF_OVERSAMPLES,
+            seed=0, coerce_signs=False)
+        return da.compute(u_mat, sing, v_mat)
+
+    @staticmethod
+    def _incremental_svd(anomalies, neofs, block_size):
+        """Incremental SVD using blocks of time steps.
+
+        The subspace spanned by the leading modes is estimated with an
+        incremental PCA and refined with one subspace iteration. The data is
+        read three times, but only one block of time steps at a time.
+
+        """
+        (n_time, n_space) = anomalies.shape
+        n_components = min(neofs + EOF_OVERSAMPLES, n_time, n_space)
+        if block_size < n_components:
+            raise ValueError(
+                f"EOF block size needs to be at least {n_components:d}, got "
+                f"{block_size:d}")
+        starts = list(range(0, n_time, block_size))
+        if len(starts) > 1 and n_time - starts[-1] < n_components:
+            starts.pop()
+        blocks = [slice(start, stop) for (start, stop) in
+                  zip(starts, starts[1:] + [n_time])]
+
+        # First pass: incremental PCA
+        ipca = IncrementalPCA(n_components=n_components)
+        for block in blocks:
+            ipca.partial_fit(anomalies[block].compute())
+        subspace = ipca.components_.T
+
+        # Second pass: subspace iteration
+        product = np.zeros_like(subspace)
+        for block in blocks:
+            data = anomalies[block].compute()
+            product += data.T @ (data @ subspace)
+        (subspace, _) = np.linalg.qr(product)
+
+        # Third pass: project data on subspace and get leading modes
+        projection = np.concatenate(
+            [anomalies[block].compute() @ subspace for block in blocks])
+        (u_mat, sing, v_mat) = np.linalg.svd(projection, full_matrices=False)
+        eofs = (subspace @ v_mat.T).T
+        return (u_mat[:, :neofs], sing[:neofs], eofs[:neofs])
+
+    def eofs(self, eofscaling=0, neofs=None):
+        """Get EOFs (see :meth:`eofs.iris.Eof.eofs`)."""
+        slicer = slice(0, neofs)
+        flat_eofs = self._flat_eofs[slicer]
+        if eofscaling == 1:
+            flat_eofs = flat_eofs / np.sqrt(self._eigenvalues[slicer])[:, None]
+        elif eofscaling == 2:
+            flat_eofs = flat_eofs * np.sqrt(self._eigenvalues[slicer])[:, None]
+        elif eofscaling != 0:
+            raise ValueError(f"invalid eof scaling option: {eofscaling}")
+        eofs = np.ma.masked_invalid(
+            flat_eofs.reshape((-1, *self._space_shape)).astype(self._dtype))
+        eofdim = DimCoord(list(range(eofs.shape[0])),
+                          var_name='eof',
+                          long_name='eof_number')
+        coords = [eofdim] + [copy(coord) for coord in self._coords]
+        eofs = Cube(
+            eofs,
+            dim_coords_and_dims=list(zip(coords, list(range(eofs.ndim)))),
+            var_name='eofs',
+            long_name='empirical_orthogonal_functions')
+        for (coord, dims) in self._space_aux_coords:
+            eofs.add_aux_coord(copy(coord), dims)
+        return eofs
+
+    def pcs(self, pcscaling=0, npcs=None):
+        """Get PCs (see :meth:`eofs.iris.Eof.pcs`)."""
+        slicer = slice(0, npcs)
+        pcs = self._u[:, slicer] * self._s[slicer]
+        if pcscaling == 1:
+            pcs = pcs / np.sqrt(self._eigenvalues[slicer])
+        elif pcscaling == 2:
+            pcs = pcs * np.sqrt(self._eigenvalues[slicer])
+        elif pcscaling != 0:
+            raise ValueError(f"invalid PC scaling option: {pcscaling}")
+        pcdim = DimCoord(list(range(pcs.shape[1])),
+                         var_name='pc',
+                         long_name='pc_number')
+        coords = [copy(self._time), pcdim]
+        pcs = Cube(
+            pcs.astype(self._dtype),
+            dim_coords_and_dims=list(zip(coords, list(range(pcs.ndim)))),
+            var_name='pcs',
+            long_name='principal_components')
+        for (coord, dims) in self._time_aux_coords:
+            pcs.add_aux_coord(copy(coord), dims)
+        return pcs
+
 
 class Eofs(MonitorBase):
     """Diagnostic to compute EOFs and plot them.
@@ -71,8 +279,19 @@ class Eofs(MonitorBase):
 
         # Get default settings
         self.cfg = deepcopy(self.cfg)
+        self.cfg.setdefault('eof_block_size', 1000)
+        self.cfg.setdefault('eof_method', 'full')
         self.cfg.setdefault('rasterize_maps', True)
 
+    def _get_solver(self, cube):
+        """Get EOF solver for a cube."""
+        if self.cfg['eof_method'] == 'full':
+            return Eof(cube, weights='coslat')
+        return LeadingEofs(cube,
+                           neofs=1,
+                           method=self.cfg['eof_method'],
+                           block_size=self.cfg['eof_block_size'])
+
     def compute(self):
         """Compute the diagnostic."""
         for module in ['matplotlib', 'fiona']:
@@ -90,7 +309,7 @@ class Eofs(MonitorBase):
                 # Load variable
                 cube = iris.load_cube(var_info['filename'])
                 # Initialise solver
-                solver = Eof(cube, weights='coslat')
+                solver = self._get_solver(cube)
                 # Get variable options as defined in monitor_config.yml
                 variable_options = self._get_variable_options(
                     var_info['variable_group'], '')
@@ -28,11 +28,24 @@ Currently supported plot types (use the option ``plots`` to specify them):
       coordinates of length > 1. Supported coordinates: `time`, `shape_id`
       (optional) and `region` (optional).
 
+The monthly, seasonal and full climatologies needed by the different plot
+types are computed once per variable and shared between all plots. If the
+input data is a time series (i.e., has a `time` coordinate), the monthly
+climatology is calculated in a single pass over the data and the seasonal and
+full climatologies are derived from it.
+
 Configuration options in recipe
 -------------------------------
 cartopy_data_dir: str, optional (default: None)
     Path to cartopy data dir. Defaults to None. See
     https://scitools.org.uk/cartopy/docs/latest/.
+climatology_cache_dir: str, optional (default: None)
+    If given, store the climatologies in this directory (relative paths are
+    interpreted relative to ``work_dir``) and reuse them in subsequent runs.
+    Climatologies are identified by a hash of the contents of the input file,
+    the variable group, the variable's short name and the climatological
+    period. Use a directory outside of the recipe's ``work_dir`` to reuse
+    climatologies across recipe runs.
 config_file: str, optional
     Path to the monitor configuration file. Defaults to ``monitor_config.yml``
     in the same folder as the diagnostic script. More information on the
@@ -107,11 +120,14 @@ None
 """
 
 import calendar
+import hashlib
 import logging
+import os
 from copy import deepcopy
 
 import iris
 import iris.coord_categorisation
+import joblib
 import matplotlib.pyplot as plt
 import numpy as np
 from esmvalcore.preprocessor import climate_statistics
@@ -126,6 +142,21 @@ from esmvaltool.diag_scripts.shared import group_metadata
 
 logger = logging.getLogger(__name__)
 
+SEASONS = {
+    12: 'DJF',
+    1: 'DJF',
+    2: 'DJF',
+    3: 'MAM',
+    4: 'MAM',
+    5: 'MAM',
+    6: 'JJA',
+    7: 'JJA',
+    8: 'JJA',
+    9: 'SON',
+    10: 'SON',
+    11: 'SON'
+}
+
 
 class Monitor(MonitorBase):
     """Diagnostic to plot preprocessor output."""
@@ -134,6 +165,8 @@ class Monitor(MonitorBase):
         super().__init__(config)
         self.plots = config.get('plots', {})
         self.has_errors = False
+        self._climatologies = {}
+        self._file_hashes = {}
 
         # Get default settings
         self.cfg = deepcopy(self.cfg)
@@ -164,15 +197,179 @@ class Monitor(MonitorBase):
                 cube.var_name = self._real_name(var_name)
                 cube.attributes['plot_name'] = var_info.get('plot_name', '')
 
+                self.compute_climatologies(cube, var_info)
                 self.timeseries(cube, var_info)
                 self.plot_annual_cycle(cube, var_info)
                 self.plot_monthly_climatology(cube, var_info)
                 self.plot_seasonal_climatology(cube, var_info)
                 self.plot_climatology(cube, var_info)
+                self._climatologies.clear()
         if self.has_errors:
             raise Exception(
                 'Errors detected. Please check log for more details')
 
+    def _get_climatology_periods(self):
+        """Get climatological periods needed by the given plot types."""
+        periods = []
+        if 'annual_cycle' in self.plots or 'monclim' in self.plots:
+            periods.append('month')
+        if 'seasonclim' in self.plots:
+            periods.append('season')
+        if 'clim' in self.plots:
+            periods.append('full')
+        return periods
+
+    def _load_or_aggregate(self, cube, var_info, period, aggregate):
+        """Aggregate cube or load aggregated cube from the cache dir."""
+        key = (var_info['filename'], var_info['variable_group'], period)
+        if key in self._climatologies:
+            return self._climatologies[key]
+        cache_dir = self.cfg.get('climatology_cache_dir')
+        if cache_dir is None:
+            self._climatologies[key] = aggregate()
+            return self._climatologies[key]
+        cache_dir = os.path.join(self.cfg['work_dir'], cache_dir)
+        file_hash = joblib.hash({
+            'content': self._get_file_hash(var_info['filename']),
+            'variable_group': var_info['variable_group'],
+            'short_name': var_info.get('short_name'),
+            'period': period,
+        })
+        path = os.path.join(cache_dir, f'{period}_climatology_{file_hash}.nc')
+        if os.path.isfile(path):
+            logger.info("Loading cached %s climatology from %s", period, path)
+            climatology = iris.load_cube(path)
+            climatology.var_name = cube.var_name
+            climatology.attributes['plot_name'] = cube.attributes.get(
+                'plot_name', '')
+        else:
+            climatology = aggregate()
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp.nc'
+            iris.save(climatology, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info("Cached %s climatology in %s", period, path)
+        self._climatologies[key] = climatology
+        return climatology
+
+    def _get_file_hash(self, filename):
+        """Get hash of the contents of a file (only calculated once)."""
+        if filename not in self._file_hashes:
+            file_hash = hashlib.sha256()
+            with open(filename, 'rb') as file:
+                for block in iter(lambda: file.read(2**20), b''):
+                    file_hash.update(block)
+            self._file_hashes[filename] = file_hash.hexdigest()
+        return self._file_hashes[filename]
+
+    def _monthly_climatology(self, cube, var_info):
+        """Get monthly climatology (``None`` if not available)."""
+        if cube.coords('month_number'):
+            return cube
+        if not cube.coords('time', dim_coords=True):
+            return None
+
+        def aggregate():
+            climatology = climate_statistics(cube, period='month')
+            climatology.data  # pylint: disable=pointless-statement
+            return climatology
+
+        return self._load_or_aggregate(cube, var_info, 'month', aggregate)
+
+    def compute_climatologies(self, cube, var_info, periods=None):
+        """Compute the climatologies of a cube.
+
+        The monthly climatology is calculated in a single pass over the input
+        data, the seasonal and full climatologies are derived from it. The
+        results are shared by all plot methods (see
+        :meth:`get_climatology`).
+
+        Parameters
+        ----------
+        cube: iris.cube.Cube
+            Input data.
+        var_info: dict
+            Variable's metadata from ESMValTool
+        periods: list of str, optional
+            Climatological periods (``'month'``, ``'season'`` or ``'full'``).
+            By default, use the periods needed by the given plot types.
+
+        Returns
+        -------
+        dict
+            Climatologies for the different periods.
+
+        """
+        if periods is None:
+            periods = self._get_climatology_periods()
+        climatologies = {}
+        for period in periods:
+            climatologies[period] = self._get_climatology(
+                cube, var_info, period)
+        return climatologies
+
+    def _get_climatology(self, cube, var_info, period):
+        """Get climatology of a cube (not copied)."""
+        monthly = self._monthly_climatology(cube, var_info)
+        if period == 'month':
+            return cube if monthly is None else monthly
+
+        if period == 'season':
+            if monthly is None:
+                return cube
+
+            def aggregate():
+                climatology = monthly.copy()
+                points = [
+                    SEASONS[point]
+                    for point in climatology.coord('month_number').points
+                ]
+                climatology.add_aux_coord(
+                    AuxCoord(points, var_name='season'),
+                    climatology.coord_dims('month_number'))
+                return climatology.aggregated_by('season', iris.analysis.MEAN)
+
+        elif period == 'full':
+            if monthly is not None:
+                def aggregate():
+                    return monthly.collapsed('month_number',
+                                             iris.analysis.MEAN)
+            elif cube.coords('season'):
+                def aggregate():
+                    return cube.collapsed('season', iris.analysis.MEAN)
+            else:
+                return cube
+
+        else:
+            raise ValueError(
+                f"Expected one of 'month', 'season', 'full' for "
+                f"climatological period, got '{period}'")
+
+        return self._load_or_aggregate(cube, var_info, period, aggregate)
+
+    def get_climatology(self, cube, var_info, period):
+        """Get climatology of a cube.
+
+        Climatologies are only computed once per input file and variable
+        group and optionally stored in ``climatology_cache_dir``.
+
+        Parameters
+        ----------
+        cube: iris.cube.Cube
+            Input data.
+        var_info: dict
+            Variable's metadata from ESMValTool
+        period: str
+            Climatological period (``'month'``, ``'season'`` or ``'full'``).
+
+        Returns
+        -------
+        iris.cube.Cube
+            Copy of the climatology (can be safely modified).
+
+        """
+        return self._get_climatology(cube, var_info, period).copy()
+
     @staticmethod
     def _add_month_name(cube):
         if cube.coords('month_number'):
@@ -245,12 +442,13 @@ class Monitor(MonitorBase):
 
         Warning
         -------
-        The monthly climatology is done inside the function so the users can
-        plot both the timeseries and the annual cycle in one go
+        The monthly climatology is done inside the function (see
+        :meth:`get_climatology`) so the users can plot both the timeseries and
+        the annual cycle in one go
         """
         if 'annual_cycle' not in self.plots:
             return
-        cube = climate_statistics(cube, period='month')
+        cube = self.get_climatology(cube, var_info, 'month')
         self._add_month_name(cube)
 
         plotter = PlotSeries()
@@ -290,6 +488,7 @@ class Monitor(MonitorBase):
         ----------
         cube: iris.cube.Cube
             Data to plot. Must be 3D with latitude, longitude and month_number
+            or time
         var_info: dict
             Variable's metadata from ESMValTool
         """
@@ -302,6 +501,7 @@ class Monitor(MonitorBase):
         plot_size = self.plots['monclim'].get('plot_size', (5, 4))
         columns = self.plots['monclim'].get('columns', 3)
         rows = self.plots['monclim'].get('rows', 4)
+        cube = self.get_climatology(cube, var_info, 'month')
         if months:
             cube = cube.extract(
                 iris.Constraint(month_number=lambda cell: cell in months))
@@ -356,8 +556,6 @@ class Monitor(MonitorBase):
                 region=map_name,
                 caption=caption,
             )
-        cube.remove_coord('month')
-        cube.remove_coord('month_name')
 
     def _plot_monthly_cube(self, plot_map, months, columns, rows, map_options,
                            variable_options, cube_slice):
@@ -393,40 +591,21 @@ class Monitor(MonitorBase):
         Parameters
         ----------
         cube: iris.cube.Cube
-            Data to plot. Must be 3D with latitude, longitude and month_number
-            or season
+            Data to plot. Must be 3D with latitude, longitude and month_number,
+            season or time
         var_info: dict
             Variable's metadata from ESMValTool
 
         Warning
         -------
-        The seasonal climatology can be done inside the function so the users
-        can plot monthly, seasonal and yearly climatologies in one go
+        The seasonal climatology can be done inside the function (see
+        :meth:`get_climatology`) so the users can plot monthly, seasonal and
+        yearly climatologies in one go
         """
         if 'seasonclim' not in self.plots:
             return
 
-        season = {
-            12: 'DJF',
-            1: 'DJF',
-            2: 'DJF',
-            3: 'MAM',
-            4: 'MAM',
-            5: 'MAM',
-            6: 'JJA',
-            7: 'JJA',
-            8: 'JJA',
-            9: 'SON',
-            10: 'SON',
-            11: 'SON'
-        }
-        if cube.coords('month_number'):
-            points = [
-                season[point] for point in cube.coord('month_number').points
-            ]
-            cube.add_aux_coord(iris.coords.AuxCoord(points, var_name='season'),
-                               cube.coord_dims('month_number'))
-            cube = cube.aggregated_by('season', iris.analysis.MEAN)
+        cube = self.get_climatology(cube, var_info, 'season')
 
         plot_map = PlotMap()
         maps = self.plots['seasonclim'].get('maps', ['global'])
@@ -490,7 +669,6 @@ class Monitor(MonitorBase):
                 region=map_name,
                 caption=caption,
             )
-        cube.remove_coord('season')
 
     def plot_climatology(self, cube, var_info):
         """Plot the climatology as a multipanel plot.
@@ -501,23 +679,21 @@ class Monitor(MonitorBase):
         Parameters
         ----------
         cube: iris.cube.Cube
-            Data to plot. Must be 3D with latitude, longitude and month_number
-            or season or 2D with latitude and longitude
+            Data to plot. Must be 3D with latitude, longitude and month_number,
+            season or time or 2D with latitude and longitude
         var_info: dict
             Variable's metadata from ESMValTool
 
         Warning
         -------
         The climatology can be done inside the function from the monthly and
-        seasonal climatologies so the users can plot several of them in one go
+        seasonal climatologies (see :meth:`get_climatology`) so the users can
+        plot several of them in one go
         """
         if 'clim' not in self.plots:
             return
 
-        if cube.coords('month_number'):
-            cube = cube.collapsed('month_number', iris.analysis.MEAN)
-        elif cube.coords('season'):
-            cube = cube.collapsed('season', iris.analysis.MEAN)
+        cube = self.get_climatology(cube, var_info, 'full')
         maps = self.plots['clim'].get('maps', ['global'])
         plot_map = PlotMap(loglevel='INFO')
         plot_map.outdir = self.get_plot_folder(var_info)
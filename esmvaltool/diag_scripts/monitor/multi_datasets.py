@@ -84,6 +84,18 @@ figure_kwargs: dict, optional
 group_variables_by: str, optional (default: 'short_name')
     Facet which is used to create variable groups. For each variable group, an
     individual plot is created.
+lazy_loading: bool, optional
+    Only load the input data when it is needed for a plot. By default, this is
+    ``true`` if ``n_jobs`` is not 1 and ``false`` otherwise (in which case all
+    input files are loaded when the diagnostic is initialized).
+n_jobs: int, optional (default: 1)
+    Maximum number of processes used to create the plots. Independent plots
+    (for the different variable groups and plot types, and for the plot types
+    ``map``, ``zonal_mean_profile``, ``hovmoeller_z_vs_time`` and
+    ``hovmoeller_time_vs_lat_or_lon`` also for the different datasets) are
+    created in parallel. Use ``null`` to use all available processors.
+    Provenance records are merged after all plots have been created, the
+    output is identical to a serial run.
 plots: dict, optional
     Plot types plotted by this diagnostic (see list above). Dictionary keys
     must be ``timeseries``, ``annual_cycle``, ``map``, ``zonal_mean_profile``,
@@ -603,12 +615,15 @@ time_on: str, optional (default: y-axis)
 """
 import logging
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 from pathlib import Path
 from pprint import pformat
 
 import cartopy.crs as ccrs
+import dask
 import iris
+import iris.plot
 import matplotlib as mpl
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
@@ -640,6 +655,17 @@ from esmvaltool.diag_scripts.shared import (
 
 logger = logging.getLogger(Path(__file__).stem)
 
+# Plot types for which a separate plot is created for each dataset
+PER_DATASET_PLOT_TYPES = [
+    'map',
+    'zonal_mean_profile',
+    'hovmoeller_z_vs_time',
+    'hovmoeller_time_vs_lat_or_lon',
+]
+
+# Diagnostic used by the worker processes (see _init_worker)
+_DIAGNOSTIC = None
+
 
 class MultiDatasets(MonitorBase):
     """Diagnostic to plot multi-dataset plots."""
@@ -653,6 +679,8 @@ class MultiDatasets(MonitorBase):
         self.cfg.setdefault('facet_used_for_labels', 'dataset')
         self.cfg.setdefault('figure_kwargs', {'constrained_layout': True})
         self.cfg.setdefault('group_variables_by', 'short_name')
+        self.cfg.setdefault('n_jobs', 1)
+        self.cfg.setdefault('lazy_loading', self.cfg['n_jobs'] != 1)
         self.cfg.setdefault('savefig_kwargs', {
             'bbox_inches': 'tight',
             'dpi': 300,
@@ -664,6 +692,9 @@ class MultiDatasets(MonitorBase):
         logger.info("Using facet '%s' to create labels",
                     self.cfg['facet_used_for_labels'])
 
+        # Provenance records collected by worker processes
+        self._provenance_records = None
+
         # Load input data
         self.input_data = self._load_and_preprocess_data()
         self.grouped_input_data = group_metadata(
@@ -903,12 +934,12 @@ class MultiDatasets(MonitorBase):
             return
 
         # Extract cube(s)
-        cube = dataset['cube']
+        cube = self._get_cube(dataset)
         if ref_dataset is None:
             ref_cube = None
             label = self._get_label(dataset)
         else:
-            ref_cube = ref_dataset['cube']
+            ref_cube = self._get_cube(ref_dataset)
             label = (f'{self._get_label(dataset)} vs. '
                      f'{self._get_label(ref_dataset)}')
 
@@ -1111,43 +1142,70 @@ class MultiDatasets(MonitorBase):
         """Load and preprocess data."""
         input_data = list(self.cfg['input_data'].values())
 
-        for dataset in input_data:
-            filename = dataset['filename']
-            logger.info("Loading %s", filename)
-            cubes = iris.load(filename)
-            if len(cubes) == 1:
-                cube = cubes[0]
-            else:
-                var_name = dataset['short_name']
-                try:
-                    cube = cubes.extract_cube(iris.NameConstraint(
-                        var_name=var_name
-                    ))
-                except ConstraintMismatchError as exc:
-                    var_names = [c.var_name for c in cubes]
-                    raise ValueError(
-                        f"Cannot load data: multiple variables ({var_names}) "
-                        f"are available in file {filename}, but not the "
-                        f"requested '{var_name}'"
-                    ) from exc
-
-            # Fix time coordinate if present
-            if cube.coords('time', dim_coords=True):
-                ih.unify_time_coord(cube)
-
-            # Fix Z-coordinate if present
-            if cube.coords('air_pressure', dim_coords=True):
-                z_coord = cube.coord('air_pressure', dim_coords=True)
-                z_coord.attributes['positive'] = 'down'
-                z_coord.convert_units('hPa')
-            elif cube.coords('altitude', dim_coords=True):
-                z_coord = cube.coord('altitude')
-                z_coord.attributes['positive'] = 'up'
-
-            dataset['cube'] = cube
+        # Cubes are loaded on demand by _get_cube if loading is deferred
+        if not self.cfg['lazy_loading']:
+            for dataset in input_data:
+                dataset['cube'] = self._load_cube(dataset)
 
         return input_data
 
+    @staticmethod
+    def _load_cube(dataset):
+        """Load and preprocess cube of a single dataset."""
+        filename = dataset['filename']
+        logger.info("Loading %s", filename)
+        cubes = iris.load(filename)
+        if len(cubes) == 1:
+            cube = cubes[0]
+        else:
+            var_name = dataset['short_name']
+            try:
+                cube = cubes.extract_cube(iris.NameConstraint(
+                    var_name=var_name
+                ))
+            except ConstraintMismatchError as exc:
+                var_names = [c.var_name for c in cubes]
+                raise ValueError(
+                    f"Cannot load data: multiple variables ({var_names}) "
+                    f"are available in file {filename}, but not the "
+                    f"requested '{var_name}'"
+                ) from exc
+
+        # Fix time coordinate if present
+        if cube.coords('time', dim_coords=True):
+            ih.unify_time_coord(cube)
+
+        # Fix Z-coordinate if present
+        if cube.coords('air_pressure', dim_coords=True):
+            z_coord = cube.coord('air_pressure', dim_coords=True)
+            z_coord.attributes['positive'] = 'down'
+            z_coord.convert_units('hPa')
+        elif cube.coords('altitude', dim_coords=True):
+            z_coord = cube.coord('altitude')
+            z_coord.attributes['positive'] = 'up'
+
+        return cube
+
+    def _get_cube(self, dataset):
+        """Get cube of a dataset (load it if necessary)."""
+        if 'cube' not in dataset:
+            dataset['cube'] = self._load_cube(dataset)
+        return dataset['cube']
+
+    def _log_provenance(self, paths, provenance_record):
+        """Log provenance record of output files.
+
+        When running in a worker process, the records are collected and
+        logged by the main process afterwards.
+        """
+        if self._provenance_records is not None:
+            self._provenance_records.extend(
+                (path, provenance_record) for path in paths)
+            return
+        with ProvenanceLogger(self.cfg) as provenance_logger:
+            for path in paths:
+                provenance_logger.log(path, provenance_record)
+
     def _plot_map_with_ref(self, plot_func, dataset, ref_dataset):
         """Plot map plot for single dataset with a reference dataset."""
         plot_type = 'map'
@@ -1155,8 +1213,8 @@ class MultiDatasets(MonitorBase):
                     self._get_label(ref_dataset), self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
-        ref_cube = ref_dataset['cube']
+        cube = self._get_cube(dataset)
+        ref_cube = self._get_cube(ref_dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
         dim_coords_ref = self._check_cube_dimensions(ref_cube, plot_type)
 
@@ -1259,7 +1317,7 @@ class MultiDatasets(MonitorBase):
                     self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
+        cube = self._get_cube(dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
 
         # Create plot with desired settings
@@ -1309,8 +1367,8 @@ class MultiDatasets(MonitorBase):
                     self._get_label(ref_dataset), self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
-        ref_cube = ref_dataset['cube']
+        cube = self._get_cube(dataset)
+        ref_cube = self._get_cube(ref_dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
         dim_coords_ref = self._check_cube_dimensions(ref_cube, plot_type)
 
@@ -1416,7 +1474,7 @@ class MultiDatasets(MonitorBase):
                     self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
+        cube = self._get_cube(dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
 
         # Create plot with desired settings
@@ -1473,7 +1531,7 @@ class MultiDatasets(MonitorBase):
             " for '%s'", self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
+        cube = self._get_cube(dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
 
         # Create plot with desired settings
@@ -1536,8 +1594,8 @@ class MultiDatasets(MonitorBase):
             self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
-        ref_cube = ref_dataset['cube']
+        cube = self._get_cube(dataset)
+        ref_cube = self._get_cube(ref_dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
         dim_coords_ref = self._check_cube_dimensions(ref_cube, plot_type)
 
@@ -1652,8 +1710,8 @@ class MultiDatasets(MonitorBase):
                     self._get_label(ref_dataset), self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
-        ref_cube = ref_dataset['cube']
+        cube = self._get_cube(dataset)
+        ref_cube = self._get_cube(ref_dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
         self._check_cube_dimensions(ref_cube, plot_type)
         if 'latitude' in dim_coords_dat:
@@ -1768,7 +1826,7 @@ class MultiDatasets(MonitorBase):
                     " for '%s'", self._get_label(dataset))
 
         # Make sure that the data has the correct dimensions
-        cube = dataset['cube']
+        cube = self._get_cube(dataset)
         dim_coords_dat = self._check_cube_dimensions(cube, plot_type)
         if 'latitude' in dim_coords_dat:
             non_time_label = 'latitude [°N]'
@@ -1930,7 +1988,7 @@ class MultiDatasets(MonitorBase):
         cubes = {}
         for dataset in datasets:
             ancestors.append(dataset['filename'])
-            cube = dataset['cube']
+            cube = self._get_cube(dataset)
             cubes[self._get_label(dataset)] = cube
             self._check_cube_dimensions(cube, plot_type)
 
@@ -1998,9 +2056,7 @@ class MultiDatasets(MonitorBase):
             'plot_types': ['line'],
             'long_names': [var_attrs['long_name']],
         }
-        with ProvenanceLogger(self.cfg) as provenance_logger:
-            provenance_logger.log(plot_path, provenance_record)
-            provenance_logger.log(netcdf_path, provenance_record)
+        self._log_provenance([plot_path, netcdf_path], provenance_record)
 
     def create_annual_cycle_plot(self, datasets):
         """Create annual cycle plot."""
@@ -2020,7 +2076,7 @@ class MultiDatasets(MonitorBase):
         cubes = {}
         for dataset in datasets:
             ancestors.append(dataset['filename'])
-            cube = dataset['cube']
+            cube = self._get_cube(dataset)
             cubes[self._get_label(dataset)] = cube
             self._check_cube_dimensions(cube, plot_type)
 
@@ -2073,9 +2129,7 @@ class MultiDatasets(MonitorBase):
             'plot_types': ['seas'],
             'long_names': [var_attrs['long_name']],
         }
-        with ProvenanceLogger(self.cfg) as provenance_logger:
-            provenance_logger.log(plot_path, provenance_record)
-            provenance_logger.log(netcdf_path, provenance_record)
+        self._log_provenance([plot_path, netcdf_path], provenance_record)
 
     def create_map_plot(self, datasets):
         """Create map plot."""
@@ -2145,10 +2199,8 @@ class MultiDatasets(MonitorBase):
                 'plot_types': ['map'],
                 'long_names': [dataset['long_name']],
             }
-            with ProvenanceLogger(self.cfg) as provenance_logger:
-                provenance_logger.log(plot_path, provenance_record)
-                for netcdf_path in netcdf_paths:
-                    provenance_logger.log(netcdf_path, provenance_record)
+            self._log_provenance([plot_path, *netcdf_paths],
+                                 provenance_record)
 
     def create_zonal_mean_profile_plot(self, datasets):
         """Create zonal mean profile plot."""
@@ -2220,10 +2272,8 @@ class MultiDatasets(MonitorBase):
                 'plot_types': ['vert'],
                 'long_names': [dataset['long_name']],
             }
-            with ProvenanceLogger(self.cfg) as provenance_logger:
-                provenance_logger.log(plot_path, provenance_record)
-                for netcdf_path in netcdf_paths:
-                    provenance_logger.log(netcdf_path, provenance_record)
+            self._log_provenance([plot_path, *netcdf_paths],
+                                 provenance_record)
 
     def create_1d_profile_plot(self, datasets):
         """Create 1D profile plot."""
@@ -2245,7 +2295,7 @@ class MultiDatasets(MonitorBase):
         cubes = {}
         for dataset in datasets:
             ancestors.append(dataset['filename'])
-            cube = dataset['cube']
+            cube = self._get_cube(dataset)
             cubes[self._get_label(dataset)] = cube
             self._check_cube_dimensions(cube, plot_type)
 
@@ -2326,9 +2376,7 @@ class MultiDatasets(MonitorBase):
             'plot_types': ['line'],
             'long_names': [var_attrs['long_name']],
         }
-        with ProvenanceLogger(self.cfg) as provenance_logger:
-            provenance_logger.log(plot_path, provenance_record)
-            provenance_logger.log(netcdf_path, provenance_record)
+        self._log_provenance([plot_path, netcdf_path], provenance_record)
 
     def create_variable_vs_lat_plot(self, datasets):
         """Create Variable as a function of latitude."""
@@ -2346,7 +2394,7 @@ class MultiDatasets(MonitorBase):
         cubes = {}
         for dataset in datasets:
             ancestors.append(dataset['filename'])
-            cube = dataset['cube']
+            cube = self._get_cube(dataset)
             cubes[self._get_label(dataset)] = cube
             self._check_cube_dimensions(cube, plot_type)
 
@@ -2398,9 +2446,7 @@ class MultiDatasets(MonitorBase):
             'plot_types': ['line'],
             'long_names': [var_attrs['long_name']],
         }
-        with ProvenanceLogger(self.cfg) as provenance_logger:
-            provenance_logger.log(plot_path, provenance_record)
-            provenance_logger.log(netcdf_path, provenance_record)
+        self._log_provenance([plot_path, netcdf_path], provenance_record)
 
     def create_hovmoeller_z_vs_time_plot(self, datasets):
         """Create Hovmoeller Z vs. time plot."""
@@ -2470,10 +2516,8 @@ class MultiDatasets(MonitorBase):
                 'plot_types': ['vert'],
                 'long_names': [dataset['long_name']],
             }
-            with ProvenanceLogger(self.cfg) as provenance_logger:
-                provenance_logger.log(plot_path, provenance_record)
-                for netcdf_path in netcdf_paths:
-                    provenance_logger.log(netcdf_path, provenance_record)
+            self._log_provenance([plot_path, *netcdf_paths],
+                                 provenance_record)
 
     def create_hovmoeller_time_vs_lat_or_lon_plot(self, datasets):
         """Create the Hovmoeller plot with time vs latitude or longitude."""
@@ -2540,23 +2584,83 @@ class MultiDatasets(MonitorBase):
                 'plot_types': ['zonal'],
                 'long_names': [dataset['long_name']],
             }
-            with ProvenanceLogger(self.cfg) as provenance_logger:
-                provenance_logger.log(plot_path, provenance_record)
-                for netcdf_path in netcdf_paths:
-                    provenance_logger.log(netcdf_path, provenance_record)
+            self._log_provenance([plot_path, *netcdf_paths],
+                                 provenance_record)
+
+    def _get_plot_tasks(self):
+        """Get independent plot tasks in the order of a serial run."""
+        tasks = []
+        for datasets in self.grouped_input_data.values():
+            for plot_type in self.supported_plot_types:
+                if plot_type not in self.plots:
+                    continue
+                method_name = f'create_{plot_type}_plot'
+                if plot_type not in PER_DATASET_PLOT_TYPES or not datasets:
+                    tasks.append((method_name, datasets))
+                    continue
+                ref_dataset = self._get_reference_dataset(datasets)
+                for dataset in datasets:
+                    if dataset is ref_dataset:
+                        continue
+                    if ref_dataset is None:
+                        tasks.append((method_name, [dataset]))
+                    else:
+                        tasks.append((method_name, [dataset, ref_dataset]))
+        return tasks
 
     def compute(self):
         """Plot preprocessed data."""
-        for (var_key, datasets) in self.grouped_input_data.items():
-            logger.info("Processing variable %s", var_key)
-            self.create_timeseries_plot(datasets)
-            self.create_annual_cycle_plot(datasets)
-            self.create_map_plot(datasets)
-            self.create_zonal_mean_profile_plot(datasets)
-            self.create_1d_profile_plot(datasets)
-            self.create_variable_vs_lat_plot(datasets)
-            self.create_hovmoeller_z_vs_time_plot(datasets)
-            self.create_hovmoeller_time_vs_lat_or_lon_plot(datasets)
+        if self.cfg['n_jobs'] == 1:
+            for (var_key, datasets) in self.grouped_input_data.items():
+                logger.info("Processing variable %s", var_key)
+                self.create_timeseries_plot(datasets)
+                self.create_annual_cycle_plot(datasets)
+                self.create_map_plot(datasets)
+                self.create_zonal_mean_profile_plot(datasets)
+                self.create_1d_profile_plot(datasets)
+                self.create_variable_vs_lat_plot(datasets)
+                self.create_hovmoeller_z_vs_time_plot(datasets)
+                self.create_hovmoeller_time_vs_lat_or_lon_plot(datasets)
+            return
+
+        tasks = self._get_plot_tasks()
+        logger.info("Creating %i plot(s) using %s processes", len(tasks),
+                    self.cfg['n_jobs'])
+        with ProcessPoolExecutor(max_workers=self.cfg['n_jobs'],
+                                 initializer=_init_worker,
+                                 initargs=(self, )) as executor:
+            records = list(executor.map(_run_plot_task, *zip(*tasks)))
+
+        # Merge provenance records in the order of a serial run
+        with ProvenanceLogger(self.cfg) as provenance_logger:
+            for task_records in records:
+                for (path, provenance_record) in task_records:
+                    provenance_logger.log(path, provenance_record)
+
+
+def _init_worker(diagnostic):
+    """Initialize worker process.
+
+    The thread pool of dask's default scheduler does not survive forking the
+    main process, so data is computed in the worker's main thread instead.
+    """
+    global _DIAGNOSTIC  # pylint: disable=global-statement
+    _DIAGNOSTIC = diagnostic
+    dask.config.set(scheduler='synchronous')
+    sns.set_theme(**diagnostic.cfg['seaborn_settings'])
+    warnings.filterwarnings(
+        'ignore',
+        message="Using DEFAULT_SPHERICAL_EARTH_RADIUS",
+        category=UserWarning,
+        module='iris',
+    )
+
+
+def _run_plot_task(method_name, datasets):
+    """Create plot(s) in worker process and return provenance records."""
+    _DIAGNOSTIC._provenance_records = []
+    getattr(_DIAGNOSTIC, method_name)(datasets)
+    return _DIAGNOSTIC._provenance_records
 
 
 def main():
@@ -5,6 +5,7 @@ import os
 from pprint import pformat
 
 import iris
+import iris.quickplot
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 
@@ -5,6 +5,7 @@ import os
 from pprint import pformat
 
 import iris
+import iris.quickplot
 import matplotlib.pyplot as plt
 
 from esmvaltool.diag_scripts.mpqb.mpqb_utils import get_mpqb_cfg
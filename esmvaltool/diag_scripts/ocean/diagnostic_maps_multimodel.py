@@ -30,6 +30,7 @@ from pprint import pformat
 
 import cartopy.crs as ccrs
 import iris
+import iris.plot
 from matplotlib import gridspec
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
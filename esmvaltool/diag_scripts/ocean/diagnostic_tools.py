@@ -15,6 +15,7 @@ import os
 import sys
 from pathlib import Path
 import iris
+import iris.coord_categorisation
 
 import numpy as np
 import cftime
@@ -1,9 +1,11 @@
 """Sea ice drift diagnostic."""
 import csv
+import hashlib
 import logging
 import math
 import os
 import warnings
+from collections import OrderedDict
 
 import iris
 import iris.analysis
@@ -17,7 +19,7 @@ from iris.util import broadcast_to_shape
 from matplotlib import pyplot as plt
 from pyproj import Transformer
 from scipy import stats
-from shapely.geometry import Point, Polygon
+from shapely.geometry import Polygon
 
 import esmvaltool.diag_scripts.shared
 import esmvaltool.diag_scripts.shared.names as n
@@ -27,6 +29,11 @@ logger = logging.getLogger(os.path.basename(__file__))
 
 MONTHS_PER_YEAR = 12
 
+# Masks of the 'Inside polygon' coordinate by polygon and grid (only the
+# most recently used ones are kept)
+_INSIDE_POLYGON_CACHE = OrderedDict()
+_INSIDE_POLYGON_CACHE_SIZE = 16
+
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 
@@ -538,15 +545,15 @@ class InsidePolygonFactory(AuxCoordFactory):
         self.units = '1.0'
         self.attributes = {}
 
-        polygon.append(polygon[0])
         self.transformer = Transformer.from_crs("WGS84",
                                                 "North_Pole_Stereographic",
                                                 always_xy=True)
 
-        transformed = []
-        for lon_val, lat_val in polygon:
-            transformed.append(self.transformer.transform(lon_val, lat_val))
-        self.polygon = Polygon(transformed)
+        polygon = np.array(list(polygon) + [polygon[0]], dtype=np.float64)
+        self.polygon = Polygon(
+            np.column_stack(
+                self.transformer.transform(polygon[:, 0], polygon[:, 1])))
+        shapely.prepare(self.polygon)
 
     @property
     def dependencies(self):
@@ -554,21 +561,40 @@ class InsidePolygonFactory(AuxCoordFactory):
         return {'lat': self.lat, 'lon': self.lon}
 
     def _derive(self, lat, lon):
-        def in_polygon(lat, lon):
-            """Check if point is inside polygon."""
-            if lon > 180:
-                lon -= 360
-            point = self.transformer.transform(lon, lat)
-            try:
-                contained = self.polygon.contains(Point(point[0], point[1]))
-            except shapely.errors.TopologicalError:
-                return np.nan
-            if contained:
-                return 1.
-            return np.nan
-
-        vectorized = np.vectorize(in_polygon)
-        return vectorized(lat, lon)
+        """Get 1 for points inside the polygon and NaN otherwise.
+
+        The result is cached for the most recently used polygons and grids,
+        so cubes on the same grid share it.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        grid_hash = hashlib.sha1()
+        grid_hash.update(lat.tobytes())
+        grid_hash.update(lon.tobytes())
+        key = (shapely.to_wkb(self.polygon), lat.shape,
+               grid_hash.hexdigest())
+        if key in _INSIDE_POLYGON_CACHE:
+            _INSIDE_POLYGON_CACHE.move_to_end(key)
+        else:
+            _INSIDE_POLYGON_CACHE[key] = self._in_polygon(lat, lon)
+            while len(_INSIDE_POLYGON_CACHE) > _INSIDE_POLYGON_CACHE_SIZE:
+                _INSIDE_POLYGON_CACHE.popitem(last=False)
+        return _INSIDE_POLYGON_CACHE[key].copy()
+
+    def _calculate_array(self, lat, lon):
+        """Get 1 for points inside the polygon and NaN otherwise."""
+        return self._derive(lat, lon)
+
+    def _in_polygon(self, lat, lon):
+        """Check which points are inside the polygon."""
+        lon = np.where(lon > 180, lon - 360, lon)
+        x_points, y_points = self.transformer.transform(lon, lat)
+        try:
+            contained = shapely.contains_xy(self.polygon, x_points, y_points)
+        except (shapely.errors.TopologicalError,
+                shapely.errors.GEOSException):
+            return np.full(lat.shape, np.nan)
+        return np.where(contained, 1., np.nan)
 
     def make_coord(self, coord_dims_func):
         """Returns a new :class:`iris.coords.AuxCoord`
@@ -1,15 +1,16 @@
 """Diagnostic to select grid points within a shapefile."""
 import logging
 import os
-from copy import deepcopy
 
 import fiona
 import iris
+import joblib
 import numpy as np
+import scipy.sparse
+import shapely
 import xlsxwriter
 from netCDF4 import Dataset, num2date
-from shapely.geometry import MultiPoint, shape
-from shapely.ops import nearest_points
+from shapely.geometry import shape
 
 from esmvaltool.diag_scripts.shared import (
     ProvenanceLogger,
@@ -133,97 +134,137 @@ def shapeselect(cfg, cube):
     shppath = cfg['shapefile']
     if not os.path.isabs(shppath):
         shppath = os.path.join(cfg['auxiliary_data_dir'], shppath)
+    lon, lat = get_grid_points(cube)
+    weights, reprcells = get_weights(cfg, lon, lat, shppath)
+    ncts = apply_weights(cube.data, weights)
+    nclon = lon[reprcells]  # Takes representative point
+    nclat = lat[reprcells]
+    return ncts, nclon, nclat
+
+
+def get_grid_points(cube):
+    """Get the longitudes and latitudes of all horizontal grid points.
+
+    Works with 1-d (rectilinear) and 2-d (curvilinear) coordinates. The
+    points are returned in the order of the flattened horizontal dimensions
+    of the data.
+    """
+    lon = cube.coord('longitude').points
+    lat = cube.coord('latitude').points
+    if lon.ndim == 1 and lat.ndim == 1:
+        lon, lat = np.meshgrid(lon, lat)
+    elif lon.ndim != 2 or lon.shape != lat.shape:
+        raise ValueError(
+            f"Longitude and latitude coordinates with shapes {lon.shape} and "
+            f"{lat.shape} are not supported")
+    return lon.ravel(), lat.ravel()
+
+
+def get_weights(cfg, lon, lat, shppath):
+    """Get the weights of all grid points for all polygons of a shapefile.
+
+    The weights are cached in ``weights_cache_dir`` (relative paths are
+    relative to ``work_dir``). Cached weights are identified by the grid
+    points, the content of the shapefile and the weighting method.
+    """
     wgtmet = cfg['weighting_method']
-    if ((cube.coord('latitude').ndim == 1
-         and cube.coord('longitude').ndim == 1)):
-        coordpoints = [(x, y) for x in cube.coord('longitude').points
-                       for y in cube.coord('latitude').points]
-        for i, crd in enumerate(coordpoints):
-            if crd[0] > 180:
-                coordpoints[i] = (coordpoints[i][0] - 360., coordpoints[i][1])
-    else:
-        raise ValueError("Support for 2-d coords not implemented!")
-    multipoint = MultiPoint(coordpoints)
-    points = list(multipoint.geoms)
+    with open(shppath, 'rb') as shpfile:
+        key = joblib.hash({
+            'lon': lon,
+            'lat': lat,
+            'shapefile': shpfile.read(),
+            'weighting_method': wgtmet,
+        })
+    cache_dir = os.path.join(cfg['work_dir'],
+                             cfg.get('weights_cache_dir', 'weights_cache'))
+    path = os.path.join(cache_dir, f'shapeselect_weights_{key}.npz')
+    if os.path.isfile(path):
+        logger.info("Loading cached weights from %s", path)
+        with np.load(path) as cached:
+            weights = scipy.sparse.csr_matrix(
+                (cached['data'], cached['indices'], cached['indptr']),
+                shape=tuple(cached['shape']))
+            return weights, cached['reprcells']
     with fiona.open(shppath) as shp:
-        gpx = []
-        gpy = []
-        cnt = -1
-        ncts = np.zeros((cube.coord('time').shape[0], len(shp)))
-        nclon = np.zeros((len(shp)))  # Takes representative point
-        nclat = np.zeros((len(shp)))
-        for ishp, multipol in enumerate(shp):
-            cnt += 1
-            multi = shape(multipol['geometry'])
-            if wgtmet == 'mean_inside':
-                gpx, gpy = mean_inside(gpx, gpy, points, multi, cube)
-                if not gpx:
-                    gpx, gpy = representative(gpx, gpy, multipoint, multi,
-                                              cube)
-            elif wgtmet == 'representative':
-                gpx, gpy = representative(gpx, gpy, multipoint, multi, cube)
-            if len(gpx) == 1:
-                ncts[:, ishp] = np.reshape(cube.data[:, gpy, gpx],
-                                           (cube.data.shape[0], ))
-            else:
-                ncts[:, ishp] = np.mean(cube.data[:, gpy, gpx], axis=1)
-            gxx, gyy = representative([], [], multipoint, multi, cube)
-            nclon[ishp] = cube.coord('longitude').points[gxx]
-            nclat[ishp] = cube.coord('latitude').points[gyy]
-    return ncts, nclon, nclat
+        geometries = [shape(multipol['geometry']) for multipol in shp]
+    weights, reprcells = polygon_weights(lon, lat, geometries, wgtmet)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, data=weights.data, indices=weights.indices,
+             indptr=weights.indptr, shape=weights.shape, reprcells=reprcells)
+    os.replace(tmp_path, path)
+    logger.info("Cached weights in %s", path)
+    return weights, reprcells
 
 
-def mean_inside(gpx, gpy, points, multi, cube):
-    """Find points inside shape."""
-    for point in points:
-        if point.within(multi):
-            if point.x < 0:
-                addx = 360.
-            else:
-                addx = 0.
-            xxx, yyy = best_match(
-                cube.coord('longitude').points,
-                cube.coord('latitude').points, point.x + addx, point.y)
-            gpx.append(xxx)
-            gpy.append(yyy)
-    return gpx, gpy
-
-
-def representative(gpx, gpy, multipoint, multi, cube):
-    """Find representative point in shape."""
-    reprpoint = multi.representative_point()
-    nearest = nearest_points(reprpoint, multipoint)
-    npx = nearest[1].coords[0][0]
-    npy = nearest[1].coords[0][1]
-    if npx < 0:
-        addx = 360.
-    else:
-        addx = 0.
-    xxx, yyy = best_match(
-        cube.coord('longitude').points,
-        cube.coord('latitude').points, npx + addx, npy)
-    gpx.append(xxx)
-    gpy.append(yyy)
-    return gpx, gpy
-
-
-def best_match(iin, jin, pex, pey):
-    """Identify the grid points in 2-d with minimum distance."""
-    if iin.shape != 2 or jin.shape != 2:
-        gpx = deepcopy(iin)
-        gpy = deepcopy(jin)
-        gpxx = np.zeros((len(gpx), len(gpy)))
-        gpyy = np.zeros((len(gpx), len(gpy)))
-        for gpi in range(0, len(gpy)):
-            gpxx[:, gpi] = gpx
-        for gpj in range(0, len(gpx)):
-            gpyy[gpj, :] = gpy
+def polygon_weights(lon, lat, geometries, wgtmet):
+    """Calculate the weights of the grid points for the given polygons.
+
+    Parameters
+    ----------
+    lon : numpy.ndarray
+        Longitudes of the grid points (1-d).
+    lat : numpy.ndarray
+        Latitudes of the grid points (1-d).
+    geometries : list of shapely.geometry.base.BaseGeometry
+        Polygons.
+    wgtmet : str
+        Weighting method, ``'mean_inside'`` (mean of all grid points inside
+        the polygon, the representative point is used if there are none) or
+        ``'representative'`` (grid point closest to a representative point of
+        the polygon).
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Weights with shape ``(n_polygons, n_grid_points)``, the weights of
+        each polygon sum up to 1.
+    numpy.ndarray
+        Index of the grid point closest to a representative point of each
+        polygon.
+
+    """
+    if wgtmet not in ('mean_inside', 'representative'):
+        raise ValueError(f"Unknown weighting_method '{wgtmet}', expected "
+                         f"'mean_inside' or 'representative'")
+    geometries = np.asarray(geometries, dtype=object)
+    n_polygons = len(geometries)
+    points = shapely.points(np.where(lon > 180., lon - 360., lon), lat)
+    tree = shapely.STRtree(points)
+
+    nearest = tree.query_nearest(shapely.point_on_surface(geometries),
+                                 all_matches=False)
+    reprcells = np.zeros(n_polygons, dtype=np.intp)
+    reprcells[nearest[0]] = nearest[1]
+
+    if wgtmet == 'mean_inside':
+        (rows, cells) = tree.query(geometries, predicate='contains')
+        empty = np.setdiff1d(np.arange(n_polygons), rows)
+        rows = np.concatenate([rows, empty])
+        cells = np.concatenate([cells, reprcells[empty]])
     else:
-        gpxx = deepcopy(iin)
-        gpyy = deepcopy(jin)
-    distance = ((gpxx - pex)**2 + (gpyy - pey)**2)**0.5
-    ind = np.unravel_index(np.argmin(distance, axis=None), distance.shape)
-    return ind[0], ind[1]
+        rows = np.arange(n_polygons)
+        cells = reprcells
+    counts = np.bincount(rows, minlength=n_polygons)
+    weights = scipy.sparse.csr_matrix((1.0 / counts[rows], (rows, cells)),
+                                      shape=(n_polygons, len(points)))
+    return weights, reprcells
+
+
+def apply_weights(data, weights):
+    """Average data with dimensions (time, ...) over all polygons.
+
+    Masked grid points are ignored, polygons without valid data are set to
+    NaN.
+    """
+    data = data.reshape(data.shape[0], -1)
+    mask = np.ma.getmaskarray(data)
+    ncts = weights @ np.ma.filled(data, 0.0).T
+    if mask.any():
+        valid = weights @ (~mask).T.astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ncts = ncts / valid
+    return np.asarray(ncts).T
 
 
 def write_netcdf(path, var, plon, plat, cube, cfg):
@@ -1,7 +1,18 @@
-"""Code that is shared between multiple diagnostic scripts."""
-from . import io, iris_helpers, names, plot
+"""Code that is shared between multiple diagnostic scripts.
+
+Submodules and functions that depend on heavy packages (e.g., :mod:`iris`,
+:mod:`matplotlib` or :mod:`cartopy`) are only imported on first access to keep
+the startup time of diagnostic scripts low.
+"""
+import importlib
+
+from . import names
 from ._base import (
+    InputData,
+    Metadata,
+    MetadataList,
     ProvenanceLogger,
+    _configure_iris,
     extract_variables,
     get_cfg,
     get_diagnostic_filename,
@@ -16,7 +27,15 @@ from ._base import (
     variables_available,
 )
 from ._diag import Datasets, Variable, Variables
-from ._validation import apply_supermeans, get_control_exper_obs
+
+# Lazily imported objects and the modules they are defined in
+_LAZY_ATTRIBUTES = {
+    'io': None,
+    'iris_helpers': None,
+    'plot': None,
+    'apply_supermeans': '._validation',
+    'get_control_exper_obs': '._validation',
+}
 
 __all__ = [
     # Main entry point for diagnostics
@@ -29,6 +48,9 @@ __all__ = [
     # Log provenance
     'ProvenanceLogger',
     # Select and sort input metadata
+    'InputData',
+    'Metadata',
+    'MetadataList',
     'select_metadata',
     'sorted_metadata',
     'group_metadata',
@@ -50,3 +72,24 @@ __all__ = [
     'get_control_exper_obs',
     'apply_supermeans',
 ]
+
+
+def __getattr__(name):
+    """Import heavy submodules and functions on first access."""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(
+            f"module '{__name__}' has no attribute '{name}'")
+    module_name = _LAZY_ATTRIBUTES[name]
+    if module_name is None:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+        globals()[name] = value
+    # Importing a submodule may import iris for the first time
+    _configure_iris()
+    return value
+
+
+def __dir__():
+    """List all public attributes, including lazily imported ones."""
+    return sorted(set(globals()) | set(__all__))
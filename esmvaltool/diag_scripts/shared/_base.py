@@ -1,6 +1,8 @@
 """Convenience functions for running a diagnostic script."""
 import argparse
 import contextlib
+import fcntl
+import functools
 import glob
 import logging
 import os
@@ -9,14 +11,26 @@ import sys
 import time
 from pathlib import Path
 
-import distributed
-import iris
-import matplotlib.pyplot as plt
 import yaml
 
 logger = logging.getLogger(__name__)
 
-iris.FUTURE.save_split_attrs = True
+# Process-wide index of the records in each provenance file
+_PROVENANCE_INDEX = {}
+
+# Attributes used by the indexes of MetadataList objects and counter that is
+# increased whenever one of these attributes of a Metadata object is modified
+_INDEXED_ATTRIBUTES = set()
+_METADATA_VERSION = 0
+
+# Key for metadata that does not contain an attribute
+_MISSING = object()
+
+
+def _configure_iris():
+    """Set iris options if iris has already been imported."""
+    if 'iris' in sys.modules:
+        sys.modules['iris'].FUTURE.save_split_attrs = True
 
 
 def get_plot_filename(basename, cfg):
@@ -86,6 +100,8 @@ def save_figure(basename, provenance, cfg, figure=None, close=True, **kwargs):
     ProvenanceLogger: For an example provenance record that can be used
         with this function.
     """
+    import matplotlib.pyplot as plt
+
     if cfg.get('output_file_type') is None:
         extensions = ('png', 'pdf')
     elif isinstance(cfg['output_file_type'], str):
@@ -131,6 +147,9 @@ def save_data(basename, provenance, cfg, cube, **kwargs):
         raise ValueError(
             "Please use the `basename` argument to specify the output file")
 
+    import iris
+    _configure_iris()
+
     filename = get_diagnostic_filename(basename, cfg)
     logger.info("Saving analysis results to %s", filename)
     iris.save(cube, target=filename, **kwargs)
@@ -177,12 +196,17 @@ class ProvenanceLogger:
         """Create a provenance logger."""
         self._log_file = os.path.join(cfg['run_dir'],
                                       'diagnostic_provenance.yml')
-
-        if not os.path.exists(self._log_file):
-            self.table = {}
+        self._new_records = {}
+        if os.path.isdir(cfg['run_dir']):
+            with _provenance_lock(cfg['run_dir']):
+                self._index = _update_provenance_index(self._log_file)
         else:
-            with open(self._log_file, 'r') as file:
-                self.table = yaml.safe_load(file)
+            self._index = _update_provenance_index(self._log_file)
+
+    @property
+    def table(self):
+        """dict: All provenance records (including unsaved ones)."""
+        return {**self._index['table'], **self._new_records}
 
     def log(self, filename, record):
         """Record provenance.
@@ -211,19 +235,50 @@ class ProvenanceLogger:
         """  # noqa
         if isinstance(filename, Path):
             filename = str(filename)
-        if filename in self.table:
+        if (filename in self._index['table']
+                or filename in self._new_records):
             raise KeyError(
                 "Provenance record for {} already exists.".format(filename))
 
-        self.table[filename] = record
+        self._new_records[filename] = record
 
     def _save(self):
-        """Save the provenance log to file."""
+        """Append the new provenance records to the provenance log.
+
+        Records are appended to the file instead of rewriting it (like the
+        NCL function ``log_provenance`` does), which is safe for multiple
+        processes writing to the same file.
+        """
         dirname = os.path.dirname(self._log_file)
         if not os.path.exists(dirname):
             os.makedirs(dirname)
-        with open(self._log_file, 'w') as file:
-            yaml.safe_dump(self.table, file)
+        with _provenance_lock(dirname):
+            self._index = _update_provenance_index(self._log_file)
+            index = self._index
+            for filename in self._new_records:
+                if filename in index['table']:
+                    raise KeyError(
+                        "Provenance record for {} already exists.".format(
+                            filename))
+            if not self._new_records and index['inode'] is not None:
+                return
+            text = ''.join(
+                yaml.safe_dump({filename: record})
+                for (filename, record) in self._new_records.items())
+            if index['table']:
+                with open(self._log_file, 'a') as file:
+                    file.write(text)
+            else:
+                # Replace empty provenance log (i.e., '{}')
+                tmp_file = f'{self._log_file}.{os.getpid()}.tmp'
+                with open(tmp_file, 'w') as file:
+                    file.write(text or yaml.safe_dump({}))
+                os.replace(tmp_file, self._log_file)
+            index['table'].update(self._new_records)
+            stat = os.stat(self._log_file)
+            index['size'] = stat.st_size
+            index['inode'] = stat.st_ino
+            self._new_records = {}
 
     def __enter__(self):
         """Enter context."""
@@ -234,6 +289,266 @@ class ProvenanceLogger:
         self._save()
 
 
+@contextlib.contextmanager
+def _provenance_lock(dirname):
+    """Lock the directory containing the provenance log."""
+    lock = os.open(dirname, os.O_RDONLY)
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        os.close(lock)
+
+
+def _update_provenance_index(log_file):
+    """Update the process-wide index of a provenance file.
+
+    Only records that have been appended to the file since the last update
+    are read. The file is read completely if it has been replaced or
+    truncated.
+    """
+    index = _PROVENANCE_INDEX.setdefault(log_file, {
+        'table': {},
+        'size': 0,
+        'inode': None,
+    })
+    try:
+        stat = os.stat(log_file)
+    except FileNotFoundError:
+        index.update(table={}, size=0, inode=None)
+        return index
+    if stat.st_ino != index['inode'] or stat.st_size < index['size']:
+        index.update(table={}, size=0)
+    if stat.st_size > index['size']:
+        with open(log_file, 'rb') as file:
+            file.seek(index['size'])
+            index['table'].update(yaml.safe_load(file) or {})
+            index['size'] = file.tell()
+    index['inode'] = stat.st_ino
+    return index
+
+
+def _metadata_modified(keys):
+    """Invalidate indexes if indexed attributes of metadata are modified."""
+    global _METADATA_VERSION  # pylint: disable=global-statement
+    if not _INDEXED_ATTRIBUTES.isdisjoint(keys):
+        _METADATA_VERSION += 1
+
+
+class Metadata(dict):
+    """Dictionary describing preprocessed data.
+
+    Behaves exactly like a :obj:`dict`, but tells :class:`MetadataList`
+    objects to rebuild their indexes when indexed attributes are modified.
+    The values of ``cfg['input_data']`` are :class:`Metadata` objects.
+    """
+
+    def __setitem__(self, key, value):
+        """Set item."""
+        _metadata_modified((key, ))
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        """Delete item."""
+        _metadata_modified((key, ))
+        super().__delitem__(key)
+
+    def __ior__(self, other):
+        """Update dictionary in-place."""
+        self.update(other)
+        return self
+
+    def clear(self):
+        """Remove all items."""
+        _metadata_modified(self)
+        super().clear()
+
+    def pop(self, key, *args):
+        """Remove item and return its value."""
+        _metadata_modified((key, ))
+        return super().pop(key, *args)
+
+    def popitem(self):
+        """Remove and return last item."""
+        _metadata_modified(self)
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        """Insert key with a value of default if key is not present."""
+        if key not in self:
+            _metadata_modified((key, ))
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        """Update dictionary."""
+        other = dict(*args, **kwargs)
+        _metadata_modified(other)
+        super().update(other)
+
+
+def _invalidate_indexes(method):
+    """Wrap list method so that it discards the indexes of the list."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.__dict__.pop('_indexes', None)
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class MetadataList(list):
+    """List of metadata describing preprocessed data.
+
+    Behaves exactly like a :obj:`list` of :obj:`dict`. In addition,
+    :func:`select_metadata` and :func:`group_metadata` use hash indexes of the
+    list, which are built on the first query of an attribute (e.g.,
+    ``dataset``, ``short_name``, ``variable_group``, ``exp`` or
+    ``ensemble``). Repeated selections then only take time proportional to
+    the number of selected elements.
+
+    Indexes are only used if all elements are :class:`Metadata` objects (e.g.,
+    the values of ``cfg['input_data']`` or the results of
+    :func:`select_metadata` and :func:`group_metadata` applied to them). They
+    are rebuilt if the list or an indexed attribute of an element is modified.
+    """
+
+    append = _invalidate_indexes(list.append)
+    extend = _invalidate_indexes(list.extend)
+    insert = _invalidate_indexes(list.insert)
+    pop = _invalidate_indexes(list.pop)
+    remove = _invalidate_indexes(list.remove)
+    clear = _invalidate_indexes(list.clear)
+    sort = _invalidate_indexes(list.sort)
+    reverse = _invalidate_indexes(list.reverse)
+    __setitem__ = _invalidate_indexes(list.__setitem__)
+    __delitem__ = _invalidate_indexes(list.__delitem__)
+    __iadd__ = _invalidate_indexes(list.__iadd__)
+    __imul__ = _invalidate_indexes(list.__imul__)
+
+    def __getstate__(self):
+        """Do not copy or pickle indexes."""
+        return {}
+
+    def _get_index(self, attribute):
+        """Get index ``{value: [positions]}`` of an attribute.
+
+        Returns ``None`` if the list cannot be indexed.
+        """
+        indexes = self.__dict__.get('_indexes')
+        if indexes is None or indexes['version'] != _METADATA_VERSION:
+            indexes = {
+                'version': _METADATA_VERSION,
+                'indexable': all(isinstance(m, Metadata) for m in self),
+            }
+            self.__dict__['_indexes'] = indexes
+        if not indexes['indexable']:
+            return None
+        if attribute not in indexes:
+            _INDEXED_ATTRIBUTES.add(attribute)
+            index = {}
+            try:
+                for (position, attributes) in enumerate(self):
+                    index.setdefault(attributes.get(attribute, _MISSING),
+                                     []).append(position)
+            except TypeError:
+                # Unhashable values
+                index = None
+            indexes[attribute] = index
+        return indexes[attribute]
+
+    def _select(self, **attributes):
+        """Select metadata using the indexes (see :func:`select_metadata`)."""
+        positions = None
+        for (attribute, value) in attributes.items():
+            index = self._get_index(attribute)
+            if index is None:
+                continue
+            if isinstance(value, str) and value == '*':
+                candidates = sorted(
+                    pos for (key, attribute_positions) in index.items()
+                    if key is not _MISSING for pos in attribute_positions)
+            else:
+                try:
+                    candidates = index.get(value, [])
+                except TypeError:
+                    continue
+            if positions is None or len(candidates) < len(positions):
+                positions = candidates
+        if positions is None:
+            positions = range(len(self))
+        return MetadataList(
+            self[pos] for pos in positions
+            if _matches_attributes(self[pos], attributes))
+
+    def _group(self, attribute):
+        """Group metadata using the indexes (see :func:`group_metadata`).
+
+        Returns ``None`` if the list cannot be indexed.
+        """
+        index = self._get_index(attribute)
+        if index is None:
+            return None
+        groups = {}
+        for (key, positions) in index.items():
+            if key is _MISSING:
+                key = None
+            if key in groups:
+                positions = sorted(groups[key] + positions)
+            groups[key] = positions
+        return {
+            key: MetadataList(self[pos] for pos in positions)
+            for (key, positions) in groups.items()
+        }
+
+
+class InputData(dict):
+    """Dictionary containing the metadata of all input files.
+
+    Behaves exactly like a :obj:`dict`, but :meth:`values` returns a
+    :class:`MetadataList` (which must not be modified) that is reused until
+    the dictionary is modified. This allows :func:`select_metadata` and
+    :func:`group_metadata` to reuse the indexes of this list across calls.
+    """
+
+    __setitem__ = _invalidate_indexes(dict.__setitem__)
+    __delitem__ = _invalidate_indexes(dict.__delitem__)
+    __ior__ = _invalidate_indexes(dict.__ior__)
+    clear = _invalidate_indexes(dict.clear)
+    pop = _invalidate_indexes(dict.pop)
+    popitem = _invalidate_indexes(dict.popitem)
+    setdefault = _invalidate_indexes(dict.setdefault)
+    update = _invalidate_indexes(dict.update)
+
+    def __getstate__(self):
+        """Do not copy or pickle cached values."""
+        return {}
+
+    def values(self):
+        """Get metadata of all input files."""
+        if '_indexes' not in self.__dict__:
+            self.__dict__['_indexes'] = MetadataList(super().values())
+        return self.__dict__['_indexes']
+
+
+# Represent metadata containers like their base types in YAML files
+for _dumper in (yaml.representer.SafeRepresenter,
+                yaml.representer.Representer, yaml.SafeDumper, yaml.Dumper):
+    for _cls in (InputData, Metadata):
+        _dumper.add_representer(
+            _cls, yaml.representer.SafeRepresenter.represent_dict)
+    _dumper.add_representer(
+        MetadataList, yaml.representer.SafeRepresenter.represent_list)
+
+
+def _matches_attributes(attribs, attributes):
+    """Check if metadata matches the given attributes."""
+    return all(a in attribs and (
+        attribs[a] == attributes[a] or attributes[a] == '*')
+        for a in attributes)
+
+
 def select_metadata(metadata, **attributes):
     """Select specific metadata describing preprocessed data.
 
@@ -249,15 +564,12 @@ def select_metadata(metadata, **attributes):
     Returns
     -------
     :obj:`list` of :obj:`dict`
-        A list of matching metadata.
+        A list of matching metadata (a :class:`MetadataList`).
     """
-    selection = []
-    for attribs in metadata:
-        if all(a in attribs and (
-                attribs[a] == attributes[a] or attributes[a] == '*')
-               for a in attributes):
-            selection.append(attribs)
-    return selection
+    if isinstance(metadata, MetadataList):
+        return metadata._select(**attributes)
+    return MetadataList(attribs for attribs in metadata
+                        if _matches_attributes(attribs, attributes))
 
 
 def group_metadata(metadata, attribute, sort=None):
@@ -275,14 +587,19 @@ def group_metadata(metadata, attribute, sort=None):
     Returns
     -------
     :obj:`dict` of :obj:`list` of :obj:`dict`
-        A dictionary containing the requested groups.
+        A dictionary containing the requested groups (as
+        :class:`MetadataList`).
     """
-    groups = {}
-    for attributes in metadata:
-        key = attributes.get(attribute)
-        if key not in groups:
-            groups[key] = []
-        groups[key].append(attributes)
+    groups = None
+    if isinstance(metadata, MetadataList):
+        groups = metadata._group(attribute)
+    if groups is None:
+        groups = {}
+        for attributes in metadata:
+            key = attributes.get(attribute)
+            if key not in groups:
+                groups[key] = MetadataList()
+            groups[key].append(attributes)
 
     if sort:
         groups = sorted_group_metadata(groups, sort)
@@ -314,7 +631,7 @@ def sorted_metadata(metadata, sort):
         """Define a key to sort the list of attributes by."""
         return tuple(str(attributes.get(k, '')).lower() for k in sort)
 
-    return sorted(metadata, key=normalized_variable_key)
+    return MetadataList(sorted(metadata, key=normalized_variable_key))
 
 
 def sorted_group_metadata(metadata_groups, sort):
@@ -439,11 +756,13 @@ def _get_input_data_files(cfg):
         elif os.path.basename(filename) == 'metadata.yml':
             metadata_files.append(filename)
 
-    input_files = {}
+    input_files = InputData()
     for filename in metadata_files:
         with open(filename) as file:
             metadata = yaml.safe_load(file)
-            input_files.update(metadata)
+            input_files.update(
+                (path, Metadata(attributes))
+                for (path, attributes) in metadata.items())
 
     return input_files
 
@@ -568,7 +887,11 @@ def run_diagnostic():
         logger.info("Removing %s from previous run.", provenance_file)
         os.remove(provenance_file)
 
+    # Heavy modules are only imported when they are actually needed to keep
+    # the startup time of diagnostic scripts low
+    _configure_iris()
     if not args.no_distributed and 'scheduler_address' in cfg:
+        import distributed
         try:
             client = distributed.Client(cfg['scheduler_address'])
         except OSError as exc:
@@ -18,6 +18,7 @@ import warnings
 from esmvaltool import ESMValToolDeprecationWarning
 
 from . import names as n
+from ._base import _MISSING, Metadata, MetadataList
 
 logger = logging.getLogger(__name__)
 
@@ -407,6 +408,7 @@ class Datasets:
         self._iter_counter = 0
         self._paths = []
         self._data = {}
+        self._metadata = None
         success = True
         if isinstance(cfg, dict):
             input_data = cfg.get(n.INPUT_DATA)
@@ -466,11 +468,43 @@ class Datasets:
             `True` if valid path, `False` if not.
 
         """
-        if path in self._paths:
+        if path in self._data:
             return True
         logger.warning("%s is not a valid dataset path", path)
         return False
 
+    def _select_paths(self, dataset_info):
+        """Get all paths matching a given `dataset_info` (unsorted).
+
+        Uses hash indexes of the dataset information (see
+        :class:`esmvaltool.diag_scripts.shared.MetadataList`).
+
+        """
+        if self._metadata is None:
+            self._metadata = (list(self._datasets),
+                              MetadataList(self._datasets.values()))
+        (all_paths, metadata) = self._metadata
+        positions = None
+        for (info, value) in dataset_info.items():
+            index = metadata._get_index(info)
+            if index is None:
+                continue
+            try:
+                candidates = index.get(value, [])
+            except TypeError:
+                continue
+            if value is None:
+                candidates = sorted(candidates + index.get(_MISSING, []))
+            if positions is None or len(candidates) < len(positions):
+                positions = candidates
+        if positions is None:
+            positions = range(len(all_paths))
+        return [
+            all_paths[pos] for pos in positions if all(
+                metadata[pos].get(info) == dataset_info[info]
+                for info in dataset_info)
+        ]
+
     def _extract_paths(self, dataset_info, fail_when_ambiguous=False):
         """Get all paths matching a given `dataset_info`.
 
@@ -493,10 +527,7 @@ class Datasets:
             `fail_when_ambiguous` is set to `True`.
 
         """
-        paths = list(self._datasets)
-        for info in dataset_info:
-            paths = [path for path in paths if
-                     self._datasets[path].get(info) == dataset_info[info]]
+        paths = self._select_paths(dataset_info)
         if not paths:
             logger.warning("%s does not match any dataset", dataset_info)
             return paths
@@ -527,7 +558,8 @@ class Datasets:
             self._paths.remove(path)
         self._paths.append(path)
         self._data[path] = data
-        self._datasets[path] = dataset_info
+        self._datasets[path] = Metadata(dataset_info)
+        self._metadata = None
 
     def add_to_data(self, data, path=None, **dataset_info):
         """Add element to a dataset's data.
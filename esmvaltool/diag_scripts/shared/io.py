@@ -5,6 +5,8 @@ import os
 from pprint import pformat
 
 import iris
+import iris.coords
+import iris.cube
 import numpy as np
 
 from .iris_helpers import unify_1d_cubes
@@ -3,6 +3,9 @@ import logging
 from pprint import pformat
 
 import iris
+import iris.analysis
+import iris.coords
+import iris.util
 import numpy as np
 from cf_units import Unit
 from iris.exceptions import CoordinateNotFoundError
@@ -11,6 +14,8 @@ from ._base import group_metadata
 
 logger = logging.getLogger(__name__)
 
+iris.FUTURE.save_split_attrs = True
+
 
 def _transform_coord_to_ref(cubes, ref_coord):
     """Transform coordinates of cubes to reference."""
@@ -8,7 +8,6 @@ The module contains the following functions:
               NetCDF files and providing a flux diagram and a table outputs,
               the latter separately for the two hemispheres;
     - averages: a script computing time, global and zonal averages;
-    - averages_comp: a script computing global mean of the output fields;
     - bsslzr: it contains the coefficients for the conversion from regular
               lonlat grid to Gaussian grid;
     - diagram: it is the interface between the main program and a
@@ -18,6 +17,8 @@ The module contains the following functions:
     - globall_cg: it computes the global and hemispheric means at each
                   timestep;
     - init: initializes the table and ingests input fields;
+    - lat_diff: computes meridional differences for the derivatives;
+    - lec_year: computes the Fourier coefficients and the LEC for one year;
     - makek: computes the KE reservoirs;
     - makea: computes the APE reservoirs;
     - mka2k: computes the APE->KE conversion terms;
@@ -38,6 +39,8 @@ The module contains the following functions:
              the reservoirs;
     - table_conv: prints the global and hemispheric mean values of the
                   conversion terms;
+    - time_means: computes the time means of the reservoirs and conversion
+                  terms, processing chunks of time steps at once;
     - varatts: prints the attributes of a variable in a Nc file;
     - weights: computes the weights for vertical integrations and meridional
                averages;
@@ -53,6 +56,7 @@ References.
 import math
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from cdo import Cdo
@@ -72,7 +76,46 @@ NW_2 = 9
 NW_3 = 21
 
 
-def lorenz(outpath, model, year, filenc, plotfile, logfile):
+def lec_year(model, wdir, ldir, energy3_file, tas_file, chunk_size, dtype,
+             y_ro):
+    """Compute the Fourier coefficients and the LEC for a single year.
+
+    The intermediate files are specific to the year, so that several years
+    can be processed in parallel.
+
+    Arguments:
+    ----------
+    model: the model name;
+    wdir: the working directory where the outputs are stored;
+    ldir: the directory where tables and flux diagrams are stored;
+    energy3_file: the file containing the merged t, u, v, w fields;
+    tas_file: the file containing the near-surface temperature;
+    chunk_size: number of time steps that are processed at once;
+    dtype: data type used to accumulate the time means;
+    y_ro: the year that is considered;
+    """
+    cdo = Cdo()
+    enfile_yr = wdir + '/inputen_{}.nc'.format(y_ro)
+    tasfile_yr = wdir + '/tas_yr_{}.nc'.format(y_ro)
+    tadiag_file = wdir + '/ta_filled_{}.nc'.format(y_ro)
+    ncfile = wdir + '/fourier_coeff_{}.nc'.format(y_ro)
+    cdo.selyear(y_ro, input=energy3_file, options='-b F32', output=enfile_yr)
+    cdo.selyear(y_ro, input=tas_file, options='-b F32', output=tasfile_yr)
+    fourier_coefficients.fourier_coeff(tadiag_file, ncfile, enfile_yr,
+                                       tasfile_yr)
+    diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, y_ro))
+    logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, y_ro))
+    lec = lorenz(wdir, model, y_ro, ncfile, diagfile, logfile, chunk_size,
+                 dtype)
+    os.remove(enfile_yr)
+    os.remove(tasfile_yr)
+    os.remove(tadiag_file)
+    os.remove(ncfile)
+    return lec
+
+
+def lorenz(outpath, model, year, filenc, plotfile, logfile, chunk_size=None,
+           dtype=np.float64):
     """Manage input and output fields and calling functions.
 
     Receive fields t,u,v,w as input fields in Fourier
@@ -85,14 +128,14 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
         year: year that is considered;
         filenc: name of the file containing the input fields;
         plotfile: name of the file that will contain the flux diagram;
-        logfile: name of the file containing the table as a .txt file.
+        logfile: name of the file containing the table as a .txt file;
+        chunk_size: number of time steps that are processed at once (all
+          time steps if None);
+        dtype: data type used to accumulate the time means.
     """
     ta_c, ua_c, va_c, wap_c, dims, lev, lat = init(logfile, filenc)
-    nlev = int(dims[0])
-    ntime = int(dims[1])
-    nlat = int(dims[2])
     ntp = int(dims[3])
-    d_s, y_l, g_w = weights(lev, nlev, lat)
+    d_s, y_l, g_w = weights(lev, int(dims[0]), lat)
     # Compute time mean
     ta_tmn = np.nanmean(ta_c, axis=1)
     ta_ztmn, ta_gmn = averages(ta_tmn, g_w)
@@ -101,56 +144,25 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
     wap_tmn = np.nanmean(wap_c, axis=1)
     _, wap_gmn = averages(wap_tmn, g_w)
     # Compute stability parameter
-    gam_ztmn = np.zeros([nlev, nlat])
-    for l_l in range(nlat):
-        gam_ztmn[:, l_l] = stabil(ta_ztmn[:, l_l], lev, nlev)
-    gam_tmn = stabil(ta_gmn, lev, nlev)
-    e_k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ape = np.zeros([nlev, ntime, nlat, ntp - 1])
-    a2k = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ae2az = np.zeros([nlev, ntime, nlat, ntp - 1])
-    ke2kz = np.zeros([nlev, ntime, nlat, ntp - 1])
-    at2as = np.zeros([nlev, ntime, nlat, ntp - 1])
-    kt2ks = np.zeros([nlev, ntime, nlat, ntp - 1])
-    for t_t in range(ntime):
-        ta_tan = ta_c[:, t_t, :, :] - ta_tmn
-        ua_tan = ua_c[:, t_t, :, :] - ua_tmn
-        va_tan = va_c[:, t_t, :, :] - va_tmn
-        wap_tan = wap_c[:, t_t, :, :] - wap_tmn
-        # Compute zonal means
-        _, ta_tgan = averages(ta_tan, g_w)
-        _, wap_tgan = averages(wap_tan, g_w)
-        # Compute kinetic energy
-        e_k[:, t_t, :, :] = makek(ua_tan, va_tan)
-        # Compute available potential energy
-        ape[:, t_t, :, :] = makea(ta_tan, ta_tgan, gam_tmn)
-        # Compute conversion between kin.en. and pot.en.
-        a2k[:, t_t, :, :] = mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, lev)
-        # Compute conversion between zonal and eddy APE
-        ae2az[:, t_t, :, :] = mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn,
-                                     lev, y_l, gam_tmn, nlat, nlev)
-        # Compute conversion between zonal and eddy KE
-        ke2kz[:, t_t, :, :] = mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn,
-                                     lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy APE
-        at2as[:, t_t, :, :] = mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn,
-                                     gam_ztmn, lev, y_l, nlat, ntp, nlev)
-        # Compute conversion between stationary and transient eddy KE
-        kt2ks[:, t_t, :, :] = mkktks(ua_tan, va_tan, ua_tmn, va_tmn, y_l, nlat,
-                                     ntp, nlev)
-    ek_tgmn = averages_comp(e_k, g_w, d_s, dims)
+    gam_ztmn = stabil(ta_ztmn, lev)
+    gam_tmn = stabil(ta_gmn, lev)
+    # Compute time means of transient eddy terms
+    tmean = time_means([ta_c, ua_c, va_c, wap_c],
+                       [ta_tmn, ua_tmn, va_tmn, wap_tmn], lev, y_l, g_w,
+                       [gam_tmn, gam_ztmn], chunk_size, dtype)
+    ek_tgmn = globall_cg(tmean['ek'], g_w, d_s, dims)
     table(ek_tgmn, ntp, 'TOT. KIN. EN.    ', logfile, flag=0)
-    ape_tgmn = averages_comp(ape, g_w, d_s, dims)
+    ape_tgmn = globall_cg(tmean['ape'], g_w, d_s, dims)
     table(ape_tgmn, ntp, 'TOT. POT. EN.     ', logfile, flag=0)
-    a2k_tgmn = averages_comp(a2k, g_w, d_s, dims)
+    a2k_tgmn = globall_cg(tmean['a2k'], g_w, d_s, dims)
     table(a2k_tgmn, ntp, 'KE -> APE (trans) ', logfile, flag=1)
-    ae2az_tgmn = averages_comp(ae2az, g_w, d_s, dims)
+    ae2az_tgmn = globall_cg(tmean['ae2az'], g_w, d_s, dims)
     table(ae2az_tgmn, ntp, 'AZ <-> AE (trans) ', logfile, flag=1)
-    ke2kz_tgmn = averages_comp(ke2kz, g_w, d_s, dims)
+    ke2kz_tgmn = globall_cg(tmean['ke2kz'], g_w, d_s, dims)
     table(ke2kz_tgmn, ntp, 'KZ <-> KE (trans) ', logfile, flag=1)
-    at2as_tgmn = averages_comp(at2as, g_w, d_s, dims)
+    at2as_tgmn = globall_cg(tmean['at2as'], g_w, d_s, dims)
     table(at2as_tgmn, ntp, 'ASE  <->  ATE   ', logfile, flag=1)
-    kt2ks_tgmn = averages_comp(kt2ks, g_w, d_s, dims)
+    kt2ks_tgmn = globall_cg(tmean['kt2ks'], g_w, d_s, dims)
     table(kt2ks_tgmn, ntp, 'KSE  <->  KTE   ', logfile, flag=1)
     ek_st = makek(ua_tmn, va_tmn)
     ek_stgmn = globall_cg(ek_st, g_w, d_s, dims)
@@ -162,11 +174,10 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
     a2k_stgmn = globall_cg(a2k_st, g_w, d_s, dims)
     table(a2k_stgmn, ntp, 'KE -> APE (stat)', logfile, flag=1)
     ae2az_st = mkaeaz(va_tmn, wap_tmn, ta_tmn, ta_tmn, ta_gmn, lev, y_l,
-                      gam_tmn, nlat, nlev)
+                      gam_tmn)
     ae2az_stgmn = globall_cg(ae2az_st, g_w, d_s, dims)
     table(ae2az_stgmn, ntp, 'AZ <-> AE (stat)', logfile, flag=1)
-    ke2kz_st = mkkekz(ua_tmn, va_tmn, wap_tmn, ua_tmn, va_tmn, lev, y_l, nlat,
-                      ntp, nlev)
+    ke2kz_st = mkkekz(ua_tmn, va_tmn, wap_tmn, ua_tmn, va_tmn, lev, y_l)
     ke2kz_stgmn = globall_cg(ke2kz_st, g_w, d_s, dims)
     # table(ke2kz_stgmn, ntp, 'KZ <-> KE (stat)', logfile, flag=1)
     list_diag = [
@@ -174,16 +185,9 @@ def lorenz(outpath, model, year, filenc, plotfile, logfile):
         a2k_tgmn, a2k_stgmn, at2as_tgmn, kt2ks_tgmn, ke2kz_tgmn, ke2kz_stgmn
     ]
     lec_strength = diagram(plotfile, list_diag, dims)
-    nc_f = outpath + '/ek_tmap_{}_{}.nc'.format(model, year)
-    output(e_k, d_s, filenc, 'ek', nc_f)
-    nc_f = outpath + '/ape_tmap_{}_{}.nc'.format(model, year)
-    output(ape, d_s, filenc, 'ape', nc_f)
-    nc_f = outpath + '/a2k_tmap_{}_{}.nc'.format(model, year)
-    output(a2k, d_s, filenc, 'a2k', nc_f)
-    nc_f = outpath + '/ae2az_tmap_{}_{}.nc'.format(model, year)
-    output(ae2az, d_s, filenc, 'ae2az', nc_f)
-    nc_f = outpath + '/ke2kz_tmap_{}_{}.nc'.format(model, year)
-    output(ke2kz, d_s, filenc, 'ke2kz', nc_f)
+    for name in ['ek', 'ape', 'a2k', 'ae2az', 'ke2kz']:
+        nc_f = outpath + '/{}_tmap_{}_{}.nc'.format(name, model, year)
+        output(tmean[name], d_s, filenc, name, nc_f)
     return lec_strength
 
 
@@ -192,29 +196,15 @@ def averages(x_c, g_w):
 
     Arguments:
     ----------
-    x_c: the input field as (lev, lat, wave);
+    x_c: the input field as (lev, lat, wave), optionally with a leading time
+         dimension;
     g_w: the Gaussian weights for meridional averaging;
     """
-    xc_ztmn = np.squeeze(np.real(x_c[:, :, 0]))
-    xc_gmn = np.nansum(xc_ztmn * g_w[np.newaxis, :], axis=1) / np.nansum(g_w)
+    xc_ztmn = np.real(x_c[..., 0])
+    xc_gmn = np.nansum(xc_ztmn * g_w, axis=-1) / np.nansum(g_w)
     return xc_ztmn, xc_gmn
 
 
-def averages_comp(fld, g_w, d_s, dims):
-    """Compute the global mean averages of reservoirs and conversion terms.
-
-    Arguments:
-    ----------
-    fld: the component of the LEC (time, lev, lat, wave);
-    g_w: the Gaussian weights for meridional averaging;
-    d_s: the Delta sigma of the sigma levels;
-    dims: a list containing the dimensions length0;
-    """
-    fld_tmn = np.nanmean(fld, axis=1)
-    fld_tgmn = globall_cg(fld_tmn, g_w, d_s, dims)
-    return fld_tgmn
-
-
 def bsslzr(kdim):
     """Obtain parameters for the Gaussian coefficients.
 
@@ -379,25 +369,19 @@ def globall_cg(d3v, g_w, d_s, dims):
     d_s: the vertical levels;
     dims: a list containing the sizes of the dimensions;
     """
-    nlev = int(dims[0])
     nlat = int(dims[2])
     ntp = int(dims[3])
     gmn = np.zeros([3, ntp - 1])
-    aux1 = np.zeros([nlev, int(nlat / 2), ntp - 1])
-    aux2 = np.zeros([nlev, int(nlat / 2), ntp - 1])
-    aux1v = np.zeros([nlev, ntp - 1])
-    aux2v = np.zeros([nlev, ntp - 1])
     nhem = int(nlat / 2)
     fac = 1 / G * PS / 1e5
-    for l_l in range(nlev):
-        for i_h in range(nhem):
-            aux1[l_l, i_h, :] = fac * np.real(d3v[l_l, i_h, :]) * g_w[i_h]
-            aux2[l_l, i_h, :] = (fac * np.real(d3v[l_l, i_h + nhem - 1, :]) *
-                                 g_w[i_h + nhem - 1])
-        aux1v[l_l, :] = (np.nansum(aux1[l_l, :, :], axis=0) /
-                         np.nansum(g_w[0:nhem]) * d_s[l_l])
-        aux2v[l_l, :] = (np.nansum(aux2[l_l, :, :], axis=0) /
-                         np.nansum(g_w[0:nhem]) * d_s[l_l])
+    d3v = np.real(d3v)
+    aux1 = fac * d3v[:, 0:nhem, :] * g_w[0:nhem, np.newaxis]
+    aux2 = (fac * d3v[:, nhem - 1:2 * nhem - 1, :] *
+            g_w[nhem - 1:2 * nhem - 1, np.newaxis])
+    aux1v = (np.nansum(aux1, axis=1) / np.nansum(g_w[0:nhem]) *
+             d_s[:, np.newaxis])
+    aux2v = (np.nansum(aux2, axis=1) / np.nansum(g_w[0:nhem]) *
+             d_s[:, np.newaxis])
     gmn[1, :] = (np.nansum(aux1v, axis=0) / np.nansum(d_s))
     gmn[2, :] = (np.nansum(aux2v, axis=0) / np.nansum(d_s))
     gmn[0, :] = 0.5 * (gmn[1, :] + gmn[2, :])
@@ -481,6 +465,28 @@ def init(logfile, filep):
     return ta_c, ua_c, va_c, wap_c, dims, lev, lat
 
 
+def lat_diff(fld, lat):
+    """Compute meridional differences for finite difference derivatives.
+
+    Centred differences are used, with one-sided differences at the first
+    and last latitude.
+
+    Arguments:
+    ----------
+    fld: a field with latitude as second dimension;
+    lat: the latitudes;
+
+    Returns the differences of the field and the corresponding latitude
+    differences.
+    """
+    d_f = np.concatenate([fld[:, 1:2] - fld[:, 0:1], fld[:, 2:] - fld[:, :-2],
+                          fld[:, -1:] - fld[:, -2:-1]],
+                         axis=1)
+    d_y = np.concatenate(
+        [lat[1:2] - lat[0:1], lat[2:] - lat[:-2], lat[-1:] - lat[-2:-1]])
+    return d_f, d_y
+
+
 def makek(u_t, v_t):
     """Compute the kinetic energy reservoirs from u and v.
 
@@ -492,8 +498,8 @@ def makek(u_t, v_t):
     ck1 = u_t * np.conj(u_t)
     ck2 = v_t * np.conj(v_t)
     e_k = np.real(ck1 + ck2)
-    e_k[:, :, 0] = 0.5 * np.real(u_t[:, :, 0] * u_t[:, :, 0] +
-                                 v_t[:, :, 0] * v_t[:, :, 0])
+    e_k[..., 0] = 0.5 * np.real(u_t[..., 0] * u_t[..., 0] +
+                                v_t[..., 0] * v_t[..., 0])
     return e_k
 
 
@@ -507,9 +513,9 @@ def makea(t_t, t_g, gam):
     gam: a vertical profile of the stability parameter;
     """
     ape = gam[:, np.newaxis, np.newaxis] * np.real(t_t * np.conj(t_t))
-    ape[:, :, 0] = (gam[:, np.newaxis] * 0.5 * np.real(
-        (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-        (t_t[:, :, 0] - t_g[:, np.newaxis])))
+    ape[..., 0] = (gam[:, np.newaxis] * 0.5 * np.real(
+        (t_t[..., 0] - t_g[..., np.newaxis]) *
+        (t_t[..., 0] - t_g[..., np.newaxis])))
     return ape
 
 
@@ -526,13 +532,13 @@ def mka2k(wap, t_t, w_g, t_g, p_l):
     """
     a2k = -np.real(R / p_l[:, np.newaxis, np.newaxis] *
                    (t_t * np.conj(wap) + np.conj(t_t) * wap))
-    a2k[:, :, 0] = -np.real(R / p_l[:, np.newaxis] *
-                            (t_t[:, :, 0] - t_g[:, np.newaxis]) *
-                            (wap[:, :, 0] - w_g[:, np.newaxis]))
+    a2k[..., 0] = -np.real(R / p_l[:, np.newaxis] *
+                           (t_t[..., 0] - t_g[..., np.newaxis]) *
+                           (wap[..., 0] - w_g[..., np.newaxis]))
     return a2k
 
 
-def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
+def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam):
     """Compute the zonal mean - eddy APE conversions from t and v.
 
     Arguments:
@@ -544,56 +550,22 @@ def mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
     p_l: the pressure levels;
     lat: the latudinal dimension;
     gam: a vertical profile of the stability parameter;
-    nlat: the number of latitudes;
-    nlev: the number of levels;
     """
-    dtdp = np.zeros([nlev, nlat])
-    dtdy = np.zeros([nlev, nlat])
-    ttt = np.real(ttt)
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            t_1 = ttt[l_l, :, 0] - ttg[l_l]
-            t_2 = ttt[l_l + 1, :, 0] - ttg[l_l + 1]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-        elif l_l == nlev - 1:
-            t_1 = ttt[l_l - 1, :, 0] - ttg[l_l - 1]
-            t_2 = ttt[l_l, :, 0] - ttg[l_l]
-            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-        else:
-            t_1 = ttt[l_l, :, 0] - ttg[l_l]
-            t_2 = ttt[l_l + 1, :, 0] - ttg[l_l + 1]
-            dtdp1 = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
-            t_2 = t_1
-            t_1 = ttt[l_l - 1, :, 0] - ttg[l_l - 1]
-            dtdp2 = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
-            dtdp[l_l, :] = ((dtdp1 * (p_l[l_l] - p_l[l_l - 1]) + dtdp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-        dtdp[l_l, :] = dtdp[l_l, :] - (R / (CP * p_l[l_l]) *
-                                       (ttt[l_l, :, 0] - ttg[l_l]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            t_1 = ttt[:, i_l, 0]
-            t_2 = ttt[:, i_l + 1, 0]
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            t_1 = ttt[:, i_l - 1, 0]
-            t_2 = ttt[:, i_l, 0]
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l] - lat[i_l - 1])
-        else:
-            t_1 = ttt[:, i_l - 1, 0]
-            t_2 = ttt[:, i_l + 1, 0]
-            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l - 1])
-    dtdy = dtdy / AA
+    ttt = np.real(ttt[:, :, 0])
+    tta = ttt - ttg[:, np.newaxis]
+    dtdp = (np.gradient(tta, p_l, axis=0) - R /
+            (CP * p_l[:, np.newaxis]) * tta)
+    d_t, d_y = lat_diff(ttt, lat)
+    dtdy = d_t / d_y / AA
     c_1 = np.real(v_t * np.conj(t_t) + t_t * np.conj(v_t))
     c_2 = np.real(wap * np.conj(t_t) + t_t * np.conj(wap))
     ae2az = (gam[:, np.newaxis, np.newaxis] *
              (dtdy[:, :, np.newaxis] * c_1 + dtdp[:, :, np.newaxis] * c_2))
-    ae2az[:, :, 0] = 0.
+    ae2az[..., 0] = 0.
     return ae2az
 
 
-def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
+def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat):
     """Compute the zonal mean - eddy KE conversions from u and v.
 
     Arguments:
@@ -605,89 +577,33 @@ def mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
     vtt: a climatological mean 3D meridional velocity field;
     p_l: the pressure levels;
     lat: the latitude dimension;
-    nlat: the number of latitudes;
-    ntp: the number of wavenumbers;
-    nlev: the number of vertical levels;
     """
-    dudp = np.zeros([nlev, nlat])
-    dvdp = np.zeros([nlev, nlat])
-    dudy = np.zeros([nlev, nlat])
-    dvdy = np.zeros([nlev, nlat])
-    for l_l in np.arange(nlev):
-        if l_l == 0:
-            dudp[l_l, :] = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                            (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            dudp[l_l, :] = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-            dvdp[l_l, :] = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                            (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            dudp1 = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dvdp1 = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
-                     (p_l[l_l + 1] - p_l[l_l]))
-            dudp2 = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dvdp2 = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
-                     (p_l[l_l] - p_l[l_l - 1]))
-            dudp[l_l, :] = ((dudp1 * (p_l[l_l] - p_l[l_l - 1]) + dudp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-            dvdp[l_l, :] = ((dvdp1 * (p_l[l_l] - p_l[l_l - 1]) + dvdp2 *
-                             (p_l[l_l + 1] - p_l[l_l])) /
-                            (p_l[l_l + 1] - p_l[l_l - 1]))
-    for i_l in np.arange(nlat):
-        if i_l == 0:
-            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l, 0])) /
-                            (lat[i_l + 1] - lat[i_l]))
-        elif i_l == nlat - 1:
-            dudy[:, i_l] = ((np.real(utt[:, i_l, 0] - utt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-            dvdy[:, i_l] = ((np.real(vtt[:, i_l, 0] - vtt[:, i_l - 1, 0])) /
-                            (lat[i_l] - lat[i_l - 1]))
-        else:
-            dudy[:,
-                 i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l - 1, 0])) /
-                         (lat[i_l + 1] - lat[i_l - 1]))
-            dvdy[:,
-                 i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l - 1, 0])) /
-                         (lat[i_l + 1] - lat[i_l - 1]))
-    dudy = dudy / AA
-    dvdy = dvdy / AA
-    c_1 = np.zeros([nlev, nlat, ntp - 1])
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_4 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    c_6 = np.zeros([nlev, nlat, ntp - 1])
+    utt = np.real(utt[:, :, 0])
+    vtt = np.real(vtt[:, :, 0])
+    dudp = np.gradient(utt, p_l, axis=0)
+    dvdp = np.gradient(vtt, p_l, axis=0)
+    d_u, d_y = lat_diff(utt, lat)
+    d_v, _ = lat_diff(vtt, lat)
+    dudy = d_u / d_y / AA
+    dvdy = d_v / d_y / AA
+    tan_lat = np.tan(lat) / AA
     u_u = np.real(u_t * np.conj(u_t) + u_t * np.conj(u_t))
     u_v = np.real(u_t * np.conj(v_t) + v_t * np.conj(u_t))
     v_v = np.real(v_t * np.conj(v_t) + v_t * np.conj(v_t))
     u_w = np.real(u_t * np.conj(wap) + wap * np.conj(u_t))
     v_w = np.real(v_t * np.conj(wap) + wap * np.conj(v_t))
-    for i_l in np.arange(nlat):
-        c_1[:, i_l, :] = dudy[:, i_l][:, np.newaxis] * u_v[:, i_l, :]
-        c_2[:, i_l, :] = dvdy[:, i_l][:, np.newaxis] * v_v[:, i_l, :]
-        c_5[:, i_l, :] = (np.tan(lat[i_l]) / AA *
-                          np.real(utt[:, i_l, 0])[:, np.newaxis] *
-                          (u_v[:, i_l, :]))
-        c_6[:, i_l, :] = -(np.tan(lat[i_l]) / AA *
-                           np.real(vtt[:, i_l, 0])[:, np.newaxis] *
-                           (u_u[:, i_l, :]))
-    for l_l in np.arange(nlev):
-        c_3[l_l, :, :] = dudp[l_l, :][:, np.newaxis] * u_w[l_l, :, :]
-        c_4[l_l, :, :] = dvdp[l_l, :][:, np.newaxis] * v_w[l_l, :, :]
+    c_1 = dudy[:, :, np.newaxis] * u_v
+    c_2 = dvdy[:, :, np.newaxis] * v_v
+    c_3 = dudp[:, :, np.newaxis] * u_w
+    c_4 = dvdp[:, :, np.newaxis] * v_w
+    c_5 = (tan_lat * utt)[:, :, np.newaxis] * u_v
+    c_6 = -(tan_lat * vtt)[:, :, np.newaxis] * u_u
     ke2kz = (c_1 + c_2 + c_3 + c_4 + c_5 + c_6)
-    ke2kz[:, :, 0] = 0.
+    ke2kz[..., 0] = 0.
     return ke2kz
 
 
-def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
+def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat):
     """Compute the stat.-trans. eddy APE conversions from u, v, wap and t.
 
     Arguments:
@@ -700,80 +616,39 @@ def mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
     g_w: the gaussian weights;
     p_l: the pressure levels;
     lat: the latitude dimension;
-    nlat: the number of latitudes;
-    ntp: the number of wavenumbers;
-    nlev: the number of vertical levels;
     """
-    t_r = np.fft.ifft(t_t, axis=2)
-    u_r = np.fft.ifft(u_t, axis=2)
-    v_r = np.fft.ifft(v_t, axis=2)
-    w_r = np.fft.ifft(wap, axis=2)
+    t_r = np.fft.ifft(t_t, axis=-1)
+    u_r = np.fft.ifft(u_t, axis=-1)
+    v_r = np.fft.ifft(v_t, axis=-1)
+    w_r = np.fft.ifft(wap, axis=-1)
     tur = t_r * u_r
     tvr = t_r * v_r
     twr = t_r * w_r
-    t_u = np.fft.fft(tur, axis=2)
-    t_v = np.fft.fft(tvr, axis=2)
-    t_w = np.fft.fft(twr, axis=2)
+    t_u = np.fft.fft(tur, axis=-1)
+    t_v = np.fft.fft(tvr, axis=-1)
+    t_w = np.fft.fft(twr, axis=-1)
     c_1 = (t_u * np.conj(ttt[:, :, np.newaxis]) -
            ttt[:, :, np.newaxis] * np.conj(t_u))
     c_6 = (t_w * np.conj(ttt[:, :, np.newaxis]) -
            ttt[:, :, np.newaxis] * np.conj(t_w))
-    c_2 = np.zeros([nlev, nlat, ntp - 1])
-    c_3 = np.zeros([nlev, nlat, ntp - 1])
-    c_5 = np.zeros([nlev, nlat, ntp - 1])
-    for i_l in range(nlat):
-        if i_l == 0:
-            c_2[:, i_l, :] = np.real(
-                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l])) *
-                np.conj(ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-            c_3[:, i_l, :] = np.real(
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l])) *
-                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
-        elif i_l == nlat - 1:
-            c_2[:, i_l, :] = np.real(
-                t_v[:, i_l, :] / (AA * (lat[i_l] - lat[i_l - 1])) *
-                np.conj(ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = np.real(
-                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l] - lat[i_l - 1])) *
-                (ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-        else:
-            c_2[:, i_l, :] = np.real(t_v[:, i_l, :] /
-                                     (AA * (lat[i_l + 1] - lat[i_l - 1])) *
-                                     np.conj(ttt[:, i_l + 1, np.newaxis] -
-                                             ttt[:, i_l - 1, np.newaxis]))
-            c_3[:, i_l, :] = np.real(
-                np.conj(t_v[:, i_l, :]) / (AA *
-                                           (lat[i_l + 1] - lat[i_l - 1])) *
-                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
-    for l_l in range(nlev):
-        if l_l == 0:
-            c_5[l_l, :, :] = (
-                (ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                (p_l[l_l + 1] - p_l[l_l]))
-        elif l_l == nlev - 1:
-            c_5[l_l, :, :] = (
-                (ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                (p_l[l_l] - p_l[l_l - 1]))
-        else:
-            c51 = ((ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
-                   (p_l[l_l + 1] - p_l[l_l]))
-            c52 = ((ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
-                   (p_l[l_l] - p_l[l_l - 1]))
-            c_5[l_l, :, :] = ((c51 * (p_l[l_l] - p_l[l_l - 1]) + c52 *
-                               (p_l[l_l + 1] - p_l[l_l])) /
-                              (p_l[l_l + 1] - p_l[l_l - 1]))
-    k_k = np.arange(0, ntp - 1)
+    d_t, d_y = lat_diff(ttt, lat)
+    d_t = d_t[:, :, np.newaxis]
+    d_y = AA * d_y[:, np.newaxis]
+    c_2 = np.real(t_v / d_y * np.conj(d_t))
+    c_3 = np.real(np.conj(t_v) / d_y * d_t)
+    c_5 = np.gradient(ttt, p_l, axis=0)[:, :, np.newaxis]
+    k_k = np.arange(0, t_t.shape[-1])
     at2as = (((k_k - 1)[np.newaxis, np.newaxis, :] * np.imag(c_1) /
-              (AA * np.cos(lat[np.newaxis, :, np.newaxis])) +
+              (AA * np.cos(lat[:, np.newaxis])) +
               np.real(t_w * np.conj(c_5) + np.conj(t_w) * c_5) +
               np.real(c_2 + c_3) + R /
               (CP * p_l[:, np.newaxis, np.newaxis]) * np.real(c_6)) *
              g_w[:, :, np.newaxis])
-    at2as[:, :, 0] = 0.
+    at2as[..., 0] = 0.
     return at2as
 
 
-def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
+def mkktks(u_t, v_t, utt, vtt, lat):
     """Compute the stat.-trans. eddy KE conversions from u, v and t.
 
     Arguments:
@@ -783,50 +658,34 @@ def mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
     utt: a climatological mean 3D zonal velocity field;
     vtt: a climatological mean 3D meridional velocity field;
     lat: the latitude dimension;
-    nlat: the number of latitudes;
-    ntp: the number of wavenumbers;
-    nlev: the number of vertical levels;
     """
-    dut = np.zeros([nlev, nlat, ntp - 1])
-    dvt = np.zeros([nlev, nlat, ntp - 1])
-    dlat = np.zeros([nlat])
     utt = np.real(utt)
     vtt = np.real(vtt)
-    u_r = np.fft.irfft(u_t, axis=2)
-    v_r = np.fft.irfft(v_t, axis=2)
+    u_r = np.fft.irfft(u_t, axis=-1)
+    v_r = np.fft.irfft(v_t, axis=-1)
     uur = u_r * u_r
     uvr = u_r * v_r
     vvr = v_r * v_r
-    u_u = np.fft.rfft(uur, axis=2)
-    v_v = np.fft.rfft(vvr, axis=2)
-    u_v = np.fft.rfft(uvr, axis=2)
+    u_u = np.fft.rfft(uur, axis=-1)
+    v_v = np.fft.rfft(vvr, axis=-1)
+    u_v = np.fft.rfft(uvr, axis=-1)
     c_1 = u_u * np.conj(u_t) - u_t * np.conj(u_u)
     # c_3 = u_v * np.conj(u_t) + u_t * np.conj(u_v)
     c_5 = u_u * np.conj(v_t) + v_t * np.conj(u_u)
     c_6 = u_v * np.conj(v_t) - v_t * np.conj(u_v)
-    for i_l in range(nlat):
-        if i_l == 0:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l])
-        elif i_l == nlat - 1:
-            dut[:, i_l, :] = (utt[:, i_l, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l] - lat[i_l - 1])
-        else:
-            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l - 1, :])
-            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l - 1, :])
-            dlat[i_l] = (lat[i_l + 1] - lat[i_l - 1])
-    c21 = np.conj(u_u) * dut / dlat[np.newaxis, :, np.newaxis]
-    c22 = u_u * np.conj(dut) / dlat[np.newaxis, :, np.newaxis]
-    c41 = np.conj(v_v) * dvt / dlat[np.newaxis, :, np.newaxis]
-    c42 = v_v * np.conj(dvt) / dlat[np.newaxis, :, np.newaxis]
-    k_k = np.arange(0, ntp - 1)
+    dut, dlat = lat_diff(utt, lat)
+    dvt, _ = lat_diff(vtt, lat)
+    dlat = dlat[:, np.newaxis]
+    c21 = np.conj(u_u) * dut / dlat
+    c22 = u_u * np.conj(dut) / dlat
+    c41 = np.conj(v_v) * dvt / dlat
+    c42 = v_v * np.conj(dvt) / dlat
+    k_k = np.arange(0, u_t.shape[-1])
     kt2ks = (np.real(c21 + c22 + c41 + c42) / AA +
-             np.tan(lat)[np.newaxis, :, np.newaxis] * np.real(c_1 - c_5) / AA +
+             np.tan(lat)[:, np.newaxis] * np.real(c_1 - c_5) / AA +
              np.imag(c_1 + c_6) * (k_k - 1)[np.newaxis, np.newaxis, :] /
-             (AA * np.cos(lat)[np.newaxis, :, np.newaxis]))
-    kt2ks[:, :, 0] = 0
+             (AA * np.cos(lat)[:, np.newaxis]))
+    kt2ks[..., 0] = 0
     return kt2ks
 
 
@@ -841,8 +700,7 @@ def output(fld, d_s, filenc, name, nc_f):
     name: the variable name;
     nc_f: the name of the output file (with path)
     """
-    fld_tmn = np.nanmean(fld, axis=1)
-    fld_aux = fld_tmn * d_s[:, np.newaxis, np.newaxis]
+    fld_aux = fld * d_s[:, np.newaxis, np.newaxis]
     fld_vmn = np.nansum(fld_aux, axis=0) / np.nansum(d_s)
     removeif(nc_f)
     pr_output(fld_vmn, name, filenc, nc_f)
@@ -886,7 +744,8 @@ def pr_output(varo, varname, filep, nc_f):
         w_nc_fid.variables[varname][:] = varo
 
 
-def preproc_lec(model, wdir, pdir, input_data):
+def preproc_lec(model, wdir, pdir, input_data, chunk_size=None,
+                dtype=np.float64, n_jobs=1):
     """Preprocess fields for LEC computations and send it to lorenz program.
 
     This function computes the interpolation of ta, ua, va, wap daily fields to
@@ -903,9 +762,12 @@ def preproc_lec(model, wdir, pdir, input_data):
       to store tables of conversion/reservoir terms and the flux diagram for
       year;
     filelist: a list of file names containing the input fields;
+    chunk_size: number of time steps that are processed at once (all time
+      steps if None);
+    dtype: data type used to accumulate the time means;
+    n_jobs: maximum number of years that are processed in parallel.
     """
     cdo = Cdo()
-    fourc = fourier_coefficients
     ta_file = e.select_metadata(input_data, short_name='ta',
                                 dataset=model)[0]['filename']
     tas_file = e.select_metadata(input_data, short_name='tas',
@@ -957,8 +819,7 @@ def preproc_lec(model, wdir, pdir, input_data):
     yrs = cdo.showyear(input=energy3_file)
     yrs = str(yrs)
     yrs2 = yrs.split()
-    y_i = 0
-    lect = np.zeros(len(yrs2))
+    years = []
     for y_r in yrs2:
         y_rl = [y_n for y_n in y_r]
         y_ro = ''
@@ -967,24 +828,16 @@ def preproc_lec(model, wdir, pdir, input_data):
             if e_l.isdigit() is True:
                 y_ro += e_l
         # print(filter(str.isdigit, str(y_r)))
-        enfile_yr = wdir + '/inputen.nc'
-        tasfile_yr = wdir + '/tas_yr.nc'
-        tadiag_file = wdir + '/ta_filled.nc'
-        ncfile = wdir + '/fourier_coeff.nc'
-        cdo.selyear(y_ro,
-                    input=energy3_file,
-                    options='-b F32',
-                    output=enfile_yr)
-        cdo.selyear(y_ro, input=tas_file, options='-b F32', output=tasfile_yr)
-        fourc.fourier_coeff(tadiag_file, ncfile, enfile_yr, tasfile_yr)
-        diagfile = (ldir + '/{}_{}_lec_diagram.png'.format(model, y_ro))
-        logfile = (ldir + '/{}_{}_lec_table.txt'.format(model, y_ro))
-        lect[y_i] = lorenz(wdir, model, y_ro, ncfile, diagfile, logfile)
-        y_i = y_i + 1
-        os.remove(enfile_yr)
-        os.remove(tasfile_yr)
-        os.remove(tadiag_file)
-        os.remove(ncfile)
+        years.append(y_ro)
+    args = [model, wdir, ldir, energy3_file, tas_file, chunk_size, dtype]
+    if n_jobs == 1:
+        lect = [lec_year(*args, y_ro) for y_ro in years]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            lect = list(
+                executor.map(lec_year, *[[arg] * len(years) for arg in args],
+                             years))
+    lect = np.array(lect)
     os.remove(maskorog)
     os.remove(ua_file_mask)
     os.remove(va_file_mask)
@@ -1000,30 +853,20 @@ def removeif(filename):
         pass
 
 
-def stabil(ta_gmn, p_l, nlev):
+def stabil(ta_gmn, p_l):
     """Compute the stability parameter from temp. and pressure levels.
 
     Arguments:
     ----------
-    ta_gmn: a temperature vertical profile;
+    ta_gmn: a temperature vertical profile (optionally with latitude as
+            second dimension);
     p_l: the vertical levels;
-    nlev: the number of vertical levels;
     """
     cpdr = CP / R
     t_g = ta_gmn
-    g_s = np.zeros(nlev)
-    for i_l in range(nlev):
-        if i_l == 0:
-            dtdp = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-        elif i_l == nlev - 1:
-            dtdp = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-        else:
-            dtdp1 = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
-            dtdp2 = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
-            dtdp = ((dtdp1 * (p_l[i_l] - p_l[i_l - 1]) + dtdp2 *
-                     (p_l[i_l + 1] - p_l[i_l])) /
-                    (p_l[i_l + 1] - p_l[i_l - 1]))
-        g_s[i_l] = CP / (t_g[i_l] - p_l[i_l] * dtdp * cpdr)
+    dtdp = np.gradient(t_g, p_l, axis=0)
+    p_l = np.reshape(p_l, (-1, ) + (1, ) * (np.ndim(t_g) - 1))
+    g_s = CP / (t_g - p_l * dtdp * cpdr)
     return g_s
 
 
@@ -1050,6 +893,72 @@ def table(varin, ntp, name, logfile, flag):
     write_to_tab(logfile, name, vared_tog, varzon)
 
 
+def time_means(fields, tmns, lev, lat, g_w, gams, chunk_size=None,
+               dtype=np.float64):
+    """Compute time means of the transient reservoirs and conversion terms.
+
+    The time steps are processed in chunks, so that the memory needed does
+    not depend on the length of the time series. The time means are
+    accumulated incrementally.
+
+    Arguments:
+    ----------
+    fields: a list with the t, u, v, w fields (lev, time, lat, wave);
+    tmns: a list with the time means of t, u, v, w (lev, lat, wave);
+    lev: the pressure levels;
+    lat: the latitudes in radians;
+    g_w: the Gaussian weights for meridional averaging;
+    gams: a list with the stability parameter as vertical profile and as
+          zonal mean (lev, lat);
+    chunk_size: number of time steps that are processed at once (all time
+                steps if None);
+    dtype: data type used to accumulate the time means.
+
+    Returns a dictionary with the time means (lev, lat, wave) of the
+    reservoirs and conversion terms.
+    """
+    ta_tmn, ua_tmn, va_tmn, wap_tmn = tmns
+    ta_ztmn, ta_gmn = averages(ta_tmn, g_w)
+    gam_tmn, gam_ztmn = gams
+    ntime = fields[0].shape[1]
+    chunk_size = chunk_size or ntime
+    sums = {}
+    counts = {}
+    for t_0 in range(0, ntime, chunk_size):
+        ta_tan, ua_tan, va_tan, wap_tan = [
+            np.moveaxis(fld[:, t_0:t_0 + chunk_size], 1, 0) - tmn
+            for (fld, tmn) in zip(fields, tmns)
+        ]
+        # Compute zonal means
+        _, ta_tgan = averages(ta_tan, g_w)
+        _, wap_tgan = averages(wap_tan, g_w)
+        terms = {
+            # Kinetic energy
+            'ek': makek(ua_tan, va_tan),
+            # Available potential energy
+            'ape': makea(ta_tan, ta_tgan, gam_tmn),
+            # Conversion between kin.en. and pot.en.
+            'a2k': mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan, lev),
+            # Conversion between zonal and eddy APE
+            'ae2az': mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn, ta_gmn, lev, lat,
+                            gam_tmn),
+            # Conversion between zonal and eddy KE
+            'ke2kz': mkkekz(ua_tan, va_tan, wap_tan, ua_tmn, va_tmn, lev,
+                            lat),
+            # Conversion between stationary and transient eddy APE
+            'at2as': mkatas(ua_tan, va_tan, wap_tan, ta_tan, ta_ztmn,
+                            gam_ztmn, lev, lat),
+            # Conversion between stationary and transient eddy KE
+            'kt2ks': mkktks(ua_tan, va_tan, ua_tmn, va_tmn, lat),
+        }
+        for (name, term) in terms.items():
+            sums[name] = (sums.get(name, 0.0) +
+                          np.nansum(term, axis=0, dtype=dtype))
+            counts[name] = (counts.get(name, 0) +
+                            np.count_nonzero(~np.isnan(term), axis=0))
+    return {name: sums[name] / counts[name] for name in sums}
+
+
 def varatts(w_nc_var, varname, tres, vres):
     """Add attributes to the variables, depending on name and time res.
 
@@ -127,6 +127,13 @@ USAGE
               latent energy budget,
        - lec: if set to true, the program will compute the Lorenz Energy Cycle
               (LEC) averaged on each year;
+       - lec_chunk_size: number of time steps processed at once in the LEC
+              computations (default: 30). Smaller values reduce the memory
+              usage, 0 processes all time steps of a year at once;
+       - lec_float32: if set to true, the time means of the LEC components
+              are accumulated in single precision (default: false);
+       - n_jobs: maximum number of years for which the LEC is computed in
+              parallel (default: 1);
        - entr: if set to true, the program will compute the material entropy
                production (MEP);
        - met: if set to 1, the program will compute the MEP with the indirect
@@ -313,6 +320,7 @@ def main(cfg):
     lec = str(cfg['lec'])
     entr = str(cfg['entr'])
     met = str(cfg['met'])
+    lec_float32 = str(cfg.get('lec_float32', False))
     flags = [wat, lec, entr, met]
     # Initialize multi-model arrays
     modnum = len(model_names)
@@ -425,7 +433,11 @@ def main(cfg):
             logger.info('Computation of the Lorenz Energy '
                         'Cycle (year by year)\n')
             _, _ = mkthe.init_mkthe_lec(model, wdir, input_data)
-            lect = lorenz.preproc_lec(model, wdir, pdir, input_data)
+            lect = lorenz.preproc_lec(
+                model, wdir, pdir, input_data,
+                chunk_size=cfg.get('lec_chunk_size', 30),
+                dtype=np.float32 if lec_float32 == 'True' else np.float64,
+                n_jobs=cfg.get('n_jobs', 1))
             plotsmod.lec_plot(model, pdir, lect)
             lec_all[i_m, 0] = np.nanmean(lect)
             lec_all[i_m, 1] = np.nanstd(lect)
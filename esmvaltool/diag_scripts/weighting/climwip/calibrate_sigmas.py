@@ -6,7 +6,6 @@ from typing import Union
 import matplotlib.pyplot as plt
 import numpy as np
 import xarray as xr
-from scipy.optimize import brute
 
 from esmvaltool.diag_scripts.shared import (
     get_diagnostic_filename,
@@ -14,11 +13,10 @@ from esmvaltool.diag_scripts.shared import (
 )
 from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
     area_weighted_mean,
-    calculate_model_distances,
-    calculate_weights,
+    batched_weighted_quantile,
+    calculate_all_model_distances,
     combine_ensemble_members,
     compute_overall_mean,
-    weighted_quantile,
 )
 from esmvaltool.diag_scripts.weighting.climwip.io_functions import (
     read_metadata,
@@ -31,14 +29,60 @@ logger = logging.getLogger(os.path.basename(__file__))
 SIGMA_RANGE = (.1, 2)  # allow this to be set by the recipe later
 PERCENTILES = [.1, .9]  # allow this to be set by the recipe later
 
-confidence_test_values = {'baseline': {}}
+SIGMA_STEPS = 100  # number of sigma values in SIGMA_RANGE
+MAX_BATCH_SIZE = 2**24  # maximum size of the (sigma, model, model) arrays
 
 
-def calculate_percentiles(target: 'xr.DataArray',
-                          weights_matrix: 'xr.DataArray',
-                          percentiles: list,
-                          weighted: bool = True) -> ('xr.DataArray', float):
-    """Calculate (equally) weighted percentiles based on each perfect model.
+def calculate_weights_matrices(performance: 'np.array',
+                               independence: Union['np.array', None],
+                               performance_sigmas: 'np.array',
+                               independence_sigma: Union[float, None]
+                               ) -> 'np.array':
+    """Calculate the weights based on each perfect model for many sigmas.
+
+    Batched version of calculate_weights_data for all perfect models and
+    performance sigmas at once.
+
+    Parameters
+    ----------
+    performance : array_like, shape (N, N)
+        Generalised distance for each model (last dimension) for each perfect
+        model (first dimension). Nan values lead to the model being excluded
+        (this is always the case for the perfect model itself).
+    independence : array_like, shape (N, N) or None
+        Matrix containing model-model distances for independence.
+    performance_sigmas : array_like, shape (S,)
+        Performance weighting shape parameters.
+    independence_sigma : float or None
+        Independence weighting shape parameter.
+
+    Returns
+    -------
+    weights_matrices : array_like, shape (S, N, N)
+        Weights for each performance sigma, perfect model and model.
+    """
+    not_nan = np.isfinite(performance)
+    denominator = 1
+    if independence is not None:
+        # the denominator does not depend on the performance sigma
+        exp = np.exp(-((independence / independence_sigma)**2))
+        finite = np.isfinite(exp)
+        denominator = not_nan.astype(float) @ np.where(finite, exp, 0.).T
+        not_finite = not_nan.astype(float) @ (~finite).astype(float).T
+        denominator[not_finite > 0] = np.nan
+
+    sigmas = np.asarray(performance_sigmas, dtype=float)
+    numerator = np.exp(-((performance / sigmas[:, np.newaxis, np.newaxis])**2))
+    weights = numerator / denominator
+    weights /= weights.sum(axis=-1, where=not_nan, keepdims=True)
+    return weights
+
+
+def calculate_percentiles(target: 'np.array',
+                          target_perfect: 'np.array',
+                          weights_matrix: 'np.array',
+                          percentiles: list) -> ('np.array', 'np.array'):
+    """Calculate weighted percentiles based on each perfect model.
 
     Parameters
     ----------
@@ -48,12 +92,14 @@ def calculate_percentiles(target: 'xr.DataArray',
         potentially additional models) are excluded from the target, the
         rest is weighted. The perfect model is then used to evaluate the
         weighted distribution (see also weights_matrix).
-    weights_matrix : array_like, shape (N, N)
-        For each perfect model in the perfect_model_ensemble dimension
-        the weights_matrix contains the respective model weights in the
-        model_ensemble dimension based on this perfect model.
-
-        Special feature: nan values in the model_ensemble dimension will lead
+    target_perfect : array_like, shape (N,)
+        Target values of the perfect models.
+    weights_matrix : array_like, shape (..., N, N)
+        For each perfect model in the second to last dimension the
+        weights_matrix contains the respective model weights in the last
+        dimension based on this perfect model.
+
+        Special feature: nan values in the model dimension will lead
         to the model being excluded from the weights calculation. This
         is always the case for the perfect model itself (diagonal of the
         matrix) but might also be the case for other models. This is
@@ -62,69 +108,44 @@ def calculate_percentiles(target: 'xr.DataArray',
     percentiles : array_like, shape (2,)
         Lower and upper percentile to use in the confidence test. Has to
         satisfy 0 <= percentiles <=1 and percentiles[0] < percentiles[1]
-    weighted : bool, optional
-        If weighted is set to False (default: True) all values in the weights
-        matrix will be set to 1, except for nan values which will be preserved.
-        This can be used to calculate the unweighted baseline for each perfect
-        model, consistent with the weighted case.
 
     Returns
     -------
-    percentile_spread : array_like, shape (N,)
+    percentile_spread : array_like, shape (..., N)
         Full range spanned by the two percentiles for each perfect model.
-    inside_ratio: float
+    inside_ratio: array_like, shape (...)
         Ratio of perfect models inside their respective percentile_spread.
     """
-    percentiles = xr.DataArray(percentiles, dims='percentile')
-
-    # need to rename for the inside_count comparison
-    target_perfect = target.rename(
-        {'model_ensemble': 'perfect_model_ensemble'})
-
-    if not weighted:  # replace with equal weight but keep nans
-        weights_matrix = 0 * weights_matrix + 1
-
-    percentiles_data = xr.apply_ufunc(
-        weighted_quantile,
-        target,
-        percentiles,
-        weights_matrix,
-        input_core_dims=[['model_ensemble'], ['percentile'],
-                         ['model_ensemble']],
-        output_core_dims=[['percentile']],
-        vectorize=True,
-    )
+    percentiles_data = batched_weighted_quantile(target, percentiles,
+                                                 weights_matrix)
 
-    inside_count = np.logical_and(
-        target_perfect >= percentiles_data.isel(percentile=0),
-        target_perfect <= percentiles_data.isel(percentile=1)).values
-    inside_ratio = inside_count.sum() / len(inside_count)
+    inside_count = np.logical_and(target_perfect >= percentiles_data[..., 0],
+                                  target_perfect <= percentiles_data[..., 1])
+    inside_ratio = inside_count.sum(axis=-1) / inside_count.shape[-1]
 
-    percentiles_spread = (percentiles_data.isel(percentile=1) -
-                          percentiles_data.isel(percentile=0))
+    percentiles_spread = percentiles_data[..., 1] - percentiles_data[..., 0]
 
     return percentiles_spread, inside_ratio
 
 
-def compute_cost_function(target: 'xr.DataArray',
-                          weights_matrix: 'xr.DataArray',
-                          performance_sigma: float) -> float:
+def compute_cost_function(inside_ratio: 'np.array',
+                          performance_sigmas: 'np.array') -> 'np.array':
     """Optimize the performance sigma for confidence.
 
     Parameters
     ----------
-    target : array_like, shape (N,)
-        See calculate_percentiles for more information.
-    weights_matrix : array_like, shape (N, N)
-        See calculate_percentiles for more information.
-    performance_sigma : float
-        The performance sigma value used to calculate the weights.
+    inside_ratio : array_like, shape (S,)
+        Ratio of perfect models inside their respective percentile_spread
+        for each performance sigma value.
+    performance_sigmas : array_like, shape (S,)
+        The performance sigma values used to calculate the weights.
 
     Returns
     -------
-    cost_function_value : float
-        Value of the cost function based on the given performance sigma value.
-        The cost function is a discontinuous function distinguishing two cases:
+    cost_function_values : array_like, shape (S,)
+        Values of the cost function based on the given performance sigma
+        values. The cost function is a discontinuous function distinguishing
+        two cases:
               99 + abs(difference)  if overconfident
         f = {
               sigma                 else
@@ -153,39 +174,23 @@ def compute_cost_function(target: 'xr.DataArray',
     percentiles = PERCENTILES
     inside_ratio_reference = percentiles[1] - percentiles[0]
 
-    # calculate the equally weighted case once as baseline
-    if len(confidence_test_values['baseline']) == 0:
-        percentiles_spread, inside_ratio = calculate_percentiles(
-            target, weights_matrix, percentiles, weighted=False)
-        confidence_test_values['baseline']['percentile_spread'] = (
-            percentiles_spread)
-        confidence_test_values['baseline']['inside_ratio'] = inside_ratio
-
-    percentiles_spread, inside_ratio = calculate_percentiles(
-        target, weights_matrix, percentiles)
-    confidence_test_values[performance_sigma] = {
-        'percentile_spread': percentiles_spread,
-        'inside_ratio': inside_ratio
-    }
-
     difference = inside_ratio - inside_ratio_reference
 
-    if difference < 0:  # overconfident
-        return 99 - difference
-    return performance_sigma
+    # overconfident if difference < 0
+    return np.where(difference < 0, 99 - difference, performance_sigmas)
 
 
-def evaluate_target(performance_sigma: list,
+def evaluate_target(performance_sigmas: 'np.array',
                     overall_performance: 'xr.DataArray',
                     target: 'xr.DataArray',
-                    overall_independence: 'xr.DataArray',
-                    independence_sigma: float) -> float:
-    """Evaluate the weighting in the target period.
+                    overall_independence: Union['xr.DataArray', None],
+                    independence_sigma: Union[float, None]) -> 'xr.Dataset':
+    """Evaluate the weighting in the target period for many sigma values.
 
     Parameters
     ----------
-    performance_sigma : list of one float
-        Performance weighting shape parameter, determines how strong the
+    performance_sigmas : array_like, shape (S,)
+        Performance weighting shape parameters, determine how strong the
         weighting for performance is (smaller values correspond to stronger
         weighting)
     overall_performance : array_like, shape (N, N)
@@ -194,41 +199,129 @@ def evaluate_target(performance_sigma: list,
         dimension.
     target : array_like, shape (N,)
         See calculate_percentiles for more information.
-    overall_independence : array_like, shape (N, N)
+    overall_independence : array_like, shape (N, N) or None
         Matrix containing model-model distances for independence.
-    independence_sigma : float
+    independence_sigma : float or None
         Independence weighting shape parameter.
 
     Returns
     -------
-    cost_function_value : float
-        See compute_cost_function for more information.
+    confidence : xr.Dataset
+        Contains the cost function values (see compute_cost_function), the
+        ratio of perfect models inside their percentile spread and the
+        percentile spread for each sigma and perfect model. The unweighted
+        baseline is given as variables with the prefix 'baseline_'.
     """
-    performance_sigma = performance_sigma[0]
+    performance_sigmas = np.asarray(performance_sigmas, dtype=float)
+    overall_performance = overall_performance.transpose(
+        'perfect_model_ensemble', 'model_ensemble')
+    models = overall_performance['model_ensemble'].values
+    perfect_models = overall_performance['perfect_model_ensemble'].values
+    target_values = target.sel(model_ensemble=models).values
+    target_perfect = target.sel(model_ensemble=perfect_models).values
 
     # exclude perfect model in each row by setting it to nan
-    idx_diag = np.diag_indices(overall_performance['model_ensemble'].size)
-    overall_performance.values[idx_diag] = np.nan
+    performance = overall_performance.values.astype(float)
+    np.fill_diagonal(performance, np.nan)
+
+    independence = None
+    if overall_independence is not None:
+        independence = overall_independence.transpose(
+            'model_ensemble', 'model_ensemble_reference').sel(
+                model_ensemble=models, model_ensemble_reference=models).values
+
+    # calculate the equally weighted case as baseline (keep nans)
+    weights_matrices = calculate_weights_matrices(performance, independence,
+                                                  performance_sigmas[:1],
+                                                  independence_sigma)
+    baseline_spread, baseline_ratio = calculate_percentiles(
+        target_values, target_perfect, 0 * weights_matrices[0] + 1,
+        PERCENTILES)
+
+    n_batches = -(-performance_sigmas.size * performance.size //
+                  MAX_BATCH_SIZE)
+    percentiles_spread = []
+    inside_ratio = []
+    for sigmas in np.array_split(performance_sigmas, max(n_batches, 1)):
+        weights_matrices = calculate_weights_matrices(performance,
+                                                      independence, sigmas,
+                                                      independence_sigma)
+        spread, ratio = calculate_percentiles(target_values, target_perfect,
+                                              weights_matrices, PERCENTILES)
+        percentiles_spread.append(spread)
+        inside_ratio.append(ratio)
+    percentiles_spread = np.concatenate(percentiles_spread)
+    inside_ratio = np.concatenate(inside_ratio)
+
+    return xr.Dataset(
+        data_vars={
+            'cost_function': ('sigma',
+                              compute_cost_function(inside_ratio,
+                                                    performance_sigmas)),
+            'inside_ratio': ('sigma', inside_ratio),
+            'percentile_spread': (('sigma', 'perfect_model_ensemble'),
+                                  percentiles_spread),
+            'baseline_inside_ratio': ((), baseline_ratio),
+            'baseline_percentile_spread': ('perfect_model_ensemble',
+                                           baseline_spread),
+        },
+        coords={
+            'sigma': performance_sigmas,
+            'perfect_model_ensemble': perfect_models,
+        })
 
-    weights_matrix = calculate_weights(overall_performance,
-                                       overall_independence, performance_sigma,
-                                       independence_sigma)
 
-    cost_function_value = compute_cost_function(target, weights_matrix,
-                                                performance_sigma)
-    return cost_function_value
+def find_best_sigma(evaluate: callable,
+                    refinement_steps: int = 0) -> (float, 'xr.Dataset'):
+    """Find the performance sigma with the smallest cost function.
 
+    Parameters
+    ----------
+    evaluate : callable
+        Function returning the output of evaluate_target for an array of
+        performance sigmas.
+    refinement_steps : int, optional
+        If given, the cost function is also evaluated on a grid with this
+        number of steps between the neighbors of the best sigma value found
+        on the grid of SIGMA_STEPS values in SIGMA_RANGE.
 
-def visualize_save_calibration(performance_sigma, cfg, success):
+    Returns
+    -------
+    performance_sigma : float
+        Sigma value with the smallest cost function (the smallest one in case
+        of ties).
+    confidence : xr.Dataset
+        Output of evaluate_target for all evaluated sigma values.
+    """
+    sigmas = np.linspace(*SIGMA_RANGE, SIGMA_STEPS)
+    confidence = evaluate(sigmas)
+    if refinement_steps:
+        idx_best = int(confidence['cost_function'].argmin())
+        refined = np.linspace(sigmas[max(idx_best - 1, 0)],
+                              sigmas[min(idx_best + 1, sigmas.size - 1)],
+                              refinement_steps)
+        refined = refined[~np.isin(refined, sigmas)]
+        confidence = xr.concat([confidence, evaluate(refined)],
+                               dim='sigma',
+                               data_vars='minimal',
+                               coords='minimal',
+                               compat='override').sortby('sigma')
+    idx_best = int(confidence['cost_function'].argmin())
+    return float(confidence['sigma'][idx_best]), confidence
+
+
+def visualize_save_calibration(performance_sigma, results, cfg, success):
     """Visualize a summary of the calibration."""
     percentiles = PERCENTILES
     inside_ratio_reference = percentiles[1] - percentiles[0]
 
-    baseline = confidence_test_values.pop('baseline')
-    sigmas = sorted(confidence_test_values)
-    inside_ratios = [
-        confidence_test_values[sigma]['inside_ratio'] for sigma in sigmas
-    ]
+    sigmas = results['sigma'].values
+    inside_ratios = results['inside_ratio'].values
+    percentile_spread = results['percentile_spread']
+    baseline = {
+        'inside_ratio': float(results['baseline_inside_ratio']),
+        'percentile_spread': results['baseline_percentile_spread'],
+    }
     confidence = xr.Dataset(
         data_vars={
             'inside_ratio_reference': ((), inside_ratio_reference, {
@@ -277,10 +370,7 @@ def visualize_save_calibration(performance_sigma, cfg, success):
         axes.set_title('Performance sigma calibration (FAILED)')
 
     # optional: sharpness
-    sharpness = xr.concat([
-        confidence_test_values[sigma]['percentile_spread'].expand_dims(
-            {'sigma': [sigma]}) for sigma in sigmas], dim='sigma')
-    sharpness /= baseline['percentile_spread']
+    sharpness = percentile_spread / baseline['percentile_spread']
     axes.plot(sigmas,
               sharpness.mean('perfect_model_ensemble'),
               color='lightgray',
@@ -321,22 +411,32 @@ def calibrate_performance_sigma(performance_contributions: list,
     settings = cfg['calibrate_performance_sigma']
     models, _ = read_metadata(cfg)
 
-    performances_matrix = {}
+    models_data = {}
     for variable_group in performance_contributions:
 
         logger.info('Reading model data for %s', variable_group)
         if variable_group.endswith("_ANOM"):
-            model_data, model_data_files = read_model_data_ancestor(
-                cfg, variable_group)
+            model_data, _ = read_model_data_ancestor(cfg,
+                                                     variable_group,
+                                                     lazy=True)
         else:
             datasets_model = models[variable_group]
-            model_data, _ = read_model_data(datasets_model)
-
-        logger.info('Calculating performance for %s', variable_group)
-        performance_matrix = calculate_model_distances(
-            model_data, 'perfect_model_ensemble')
+            model_data, _ = read_model_data(datasets_model, lazy=True)
+        models_data[variable_group] = model_data
+
+    logger.info('Calculating performance for %s',
+                ', '.join(performance_contributions))
+    performances_matrix = dict(
+        zip(
+            models_data,
+            calculate_all_model_distances(
+                list(models_data.values()),
+                'perfect_model_ensemble',
+                pairwise_complete=cfg.get('pairwise_complete_distances',
+                                          False),
+                n_jobs=cfg.get('n_jobs', 1))))
+    for performance_matrix in performances_matrix.values():
         logger.debug(performance_matrix.values)
-        performances_matrix[variable_group] = performance_matrix
 
     performance_matrix = xr.Dataset(performances_matrix)
     overall_performance = compute_overall_mean(performance_matrix,
@@ -360,18 +460,16 @@ def calibrate_performance_sigma(performance_contributions: list,
             overall_performance, ['model_ensemble', 'perfect_model_ensemble'])
         target_data, _ = combine_ensemble_members(target_data)
 
-    performance_sigma, fval, _, _ = brute(
-        evaluate_target,
-        ranges=(SIGMA_RANGE, ),
-        Ns=100,
-        finish=None,
-        args=(overall_performance, target_data, overall_independence,
-              independence_sigma),
-        full_output=True,
+    performance_sigma, confidence = find_best_sigma(
+        lambda sigmas: evaluate_target(sigmas, overall_performance,
+                                       target_data, overall_independence,
+                                       independence_sigma),
+        settings.get('refinement_steps', 0),
     )
 
-    success = fval < 99
-    visualize_save_calibration(performance_sigma, cfg, success=success)
+    success = float(confidence['cost_function'].min()) < 99
+    visualize_save_calibration(performance_sigma, confidence, cfg,
+                               success=success)
 
     if success:
         logmsg = f'Found optimal performance sigma value: {performance_sigma}'
@@ -2,14 +2,16 @@
 import logging
 import os
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
 
 import numpy as np
 import xarray as xr
-from scipy.spatial.distance import pdist, squareform
 
 logger = logging.getLogger(os.path.basename(__file__))
 
+DISTANCE_CHUNK_SIZE = 2**24  # maximum number of values per chunk
+
 
 def area_weighted_mean(data_array: 'xr.DataArray') -> 'xr.DataArray':
     """Calculate area mean weighted by the latitude.
@@ -23,8 +25,62 @@ def area_weighted_mean(data_array: 'xr.DataArray') -> 'xr.DataArray':
     return means
 
 
+def squared_distance_sums(values: 'np.ndarray',
+                          weights: 'np.ndarray',
+                          pairwise_complete: bool = False) -> tuple:
+    """Calculate the weighted squared distances for a chunk of grid cells.
+
+    Uses the Gram matrix formulation |a|^2 + |b|^2 - 2 a.b on values
+    centered for each grid cell, so that the sums of all chunks give the
+    squared distances between the members.
+
+    Parameters
+    ----------
+    values : array_like, shape (N, M)
+        Values of the N members in M grid cells.
+    weights : array_like, shape (M,)
+        Weights of the grid cells.
+    pairwise_complete : bool, optional
+        If False (default), only grid cells which are finite in all members
+        are used. Otherwise, all grid cells which are finite in both members
+        of a pair are used.
+
+    Returns
+    -------
+    squared_distances : array_like, shape (N, N)
+        Sums of the weighted squared differences.
+    overlap : array_like, shape (N, N)
+        Number of grid cells used for each pair.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    not_nan = np.isfinite(values)
+    if not pairwise_complete:
+        common = np.all(not_nan, axis=0)
+        values = values[:, common]
+        weights = weights[common]
+        values = values - values.mean(axis=0)
+        weighted = values * weights
+        norms = np.einsum('ij,ij->i', weighted, values)
+        squared_distances = (norms[:, np.newaxis] + norms[np.newaxis, :] -
+                             2 * weighted @ values.T)
+        overlap = np.full(squared_distances.shape, values.shape[1])
+        return squared_distances, overlap
+
+    mask = not_nan.astype(np.float64)
+    count = mask.sum(axis=0)
+    mean = np.where(not_nan, values, 0.).sum(axis=0) / np.maximum(count, 1)
+    values = np.where(not_nan, values - mean, 0.)
+    weighted = values * weights
+    squares = weighted * values
+    squared_distances = (squares @ mask.T + mask @ squares.T -
+                         2 * weighted @ values.T)
+    return squared_distances, mask @ mask.T
+
+
 def distance_matrix(values: 'np.ndarray',
-                    weights: 'np.ndarray' = None) -> 'np.ndarray':
+                    weights: 'np.ndarray' = None,
+                    pairwise_complete: bool = False) -> 'np.ndarray':
     """Calculate the pairwise distance between model members.
 
     Takes a dataset with ensemble member/lon/lat. Flattens lon/lat
@@ -33,30 +89,49 @@ def distance_matrix(values: 'np.ndarray',
 
     If weights are passed, they should have the same shape as values.
 
+    Grid cells with non-finite values in any member are ignored, unless
+    `pairwise_complete` is set, then only the grid cells with non-finite
+    values in one of the two members of each pair are ignored.
+
     Returns 2D NxN array, where N == number of ensemble members.
     """
     n_members = values.shape[0]
 
     values = values.reshape(n_members, -1)
 
-    # pdist does not work with NaN
-    not_nan = np.where(np.all(np.isfinite(values), axis=0))[0]
-    values = values[:, not_nan]
-
-    if weights is not None:
-        # Reshape weights to match values array
-        weights = weights.reshape(n_members, -1)
-        weights = weights[:, not_nan]
-        weights = weights[0]  # Weights are equal along first dim
-
-    d_matrix = squareform(pdist(values, metric='euclidean', w=weights))
-
-    return d_matrix
+    if weights is None:
+        weights = np.ones(values.shape[1])
+    else:
+        # Weights are equal along first dim
+        weights = weights.reshape(n_members, -1)[0]
+
+    chunk_size = max(DISTANCE_CHUNK_SIZE // max(n_members, 1), 1)
+    squared_distances = 0
+    overlap = 0
+    for idx in range(0, values.shape[1], chunk_size):
+        chunk_distances, chunk_overlap = squared_distance_sums(
+            values[:, idx:idx + chunk_size], weights[idx:idx + chunk_size],
+            pairwise_complete)
+        squared_distances += chunk_distances
+        overlap += chunk_overlap
+    return _finalize_distances(squared_distances, overlap, n_members)
+
+
+def _finalize_distances(squared_distances, overlap, n_members):
+    """Get distances from sums of squared differences."""
+    distances = np.sqrt(
+        np.clip(squared_distances + np.zeros((n_members, n_members)), 0,
+                None))
+    np.fill_diagonal(distances, 0.)
+    distances[np.asarray(overlap) == 0] = np.nan
+    return distances
 
 
 def calculate_model_distances(
         data_array: 'xr.DataArray',
-        dimension: str = 'model_ensemble_reference') -> 'xr.DataArray':
+        dimension: str = 'model_ensemble_reference',
+        pairwise_complete: bool = False,
+        n_jobs: int = 1) -> 'xr.DataArray':
     """Calculate pair-wise distances between all values in data_array.
 
     Distances are calculated as the area weighted euclidean distance
@@ -72,31 +147,99 @@ def calculate_model_distances(
         Name of the newly created reference dimension (default:
         'model_ensemble_reference'. Must not be equal to the existing
         model dimension ('model_ensemble')!
+    pairwise_complete : bool
+        Only ignore grid cells which are missing in one of the two members
+        of each pair (default: ignore grid cells missing in any member).
+    n_jobs : int
+        Number of threads used to process the chunks of the data.
 
     Returns
     -------
     distances : array_like, shape (N, N)
         Symmetric matrix of pairwise model distances.
     """
-    assert dimension != 'model_ensemble', f'{dimension} != "model_ensemble"'
-    weights = np.cos(np.radians(data_array.lat))
-    weights, _ = xr.broadcast(weights, data_array)
-
-    diff = xr.apply_ufunc(
-        distance_matrix,
-        data_array,
-        weights,
-        input_core_dims=[['model_ensemble', 'lat', 'lon'],
-                         ['model_ensemble', 'lat', 'lon']],
-        output_core_dims=[[dimension, 'model_ensemble']],
-    )
+    return calculate_all_model_distances([data_array], dimension,
+                                         pairwise_complete, n_jobs)[0]
 
-    diff.name = f'd{data_array.name}'
-    diff.attrs['variable_group'] = data_array.name
-    diff.attrs["units"] = data_array.units
-    diff[dimension] = diff.model_ensemble.values
 
-    return diff
+def calculate_all_model_distances(
+        data_arrays: list,
+        dimension: str = 'model_ensemble_reference',
+        pairwise_complete: bool = False,
+        n_jobs: int = 1) -> list:
+    """Calculate the model distances for several variable groups at once.
+
+    The fields are processed in chunks of latitudes (of at most
+    DISTANCE_CHUNK_SIZE values) and the weighted squared differences of all
+    chunks of all variable groups are accumulated in a single pass over the
+    data. Lazy (dask) input is only loaded chunk by chunk.
+
+    Parameters
+    ----------
+    data_arrays : list of array_like, shape (N,...)
+        Arrays of (2 dimensional) model fields.
+    dimension : string
+        See calculate_model_distances.
+    pairwise_complete : bool
+        See calculate_model_distances.
+    n_jobs : int
+        See calculate_model_distances.
+
+    Returns
+    -------
+    list of array_like, shape (N, N)
+        Matrices of pairwise model distances for each input array.
+    """
+    assert dimension != 'model_ensemble', f'{dimension} != "model_ensemble"'
+
+    tasks = []
+    for (group, data_array) in enumerate(data_arrays):
+        data_array = data_array.transpose('model_ensemble', 'lat', 'lon')
+        n_values = data_array.sizes['model_ensemble'] * data_array.sizes['lon']
+        n_lat = max(DISTANCE_CHUNK_SIZE // max(n_values, 1), 1)
+        for idx in range(0, data_array.sizes['lat'], n_lat):
+            tasks.append((group, data_array.isel(lat=slice(idx, idx + n_lat))))
+
+    def process(task):
+        group, chunk = task
+        weights = np.cos(np.radians(chunk.lat.values))
+        weights = np.broadcast_to(weights[:, np.newaxis],
+                                  chunk.shape[1:]).ravel()
+        values = chunk.values.reshape(chunk.shape[0], -1)
+        return (group, *squared_distance_sums(values, weights,
+                                              pairwise_complete))
+
+    squared_distances = [0] * len(data_arrays)
+    overlap = [0] * len(data_arrays)
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for group, chunk_distances, chunk_overlap in executor.map(
+                process, tasks):
+            squared_distances[group] += chunk_distances
+            overlap[group] += chunk_overlap
+
+    results = []
+    for (group, data_array) in enumerate(data_arrays):
+        n_members = data_array.sizes['model_ensemble']
+        diff = xr.DataArray(
+            _finalize_distances(squared_distances[group], overlap[group],
+                                n_members),
+            dims=(dimension, 'model_ensemble'),
+            coords={
+                dimension: data_array.model_ensemble.values,
+                'model_ensemble': data_array.model_ensemble.values,
+            },
+        )
+        diff = diff.assign_coords({
+            name: coord
+            for (name, coord) in data_array.coords.items() if coord.ndim == 0
+        })
+
+        diff.name = f'd{data_array.name}'
+        diff.attrs['variable_group'] = data_array.name
+        diff.attrs["units"] = data_array.units
+        results.append(diff)
+
+    return results
 
 
 def compute_overall_mean(dataset: 'xr.Dataset',
@@ -299,3 +442,73 @@ def weighted_quantile(values: list,
     weighted_quantiles = (weighted_quantiles - min_val) / max_val
 
     return np.interp(quantiles, weighted_quantiles, values)
+
+
+def batched_weighted_quantile(values: 'np.array',
+                              quantiles: list,
+                              weights: 'np.array') -> 'np.array':
+    """Calculate weighted quantiles for many sets of weights at once.
+
+    Vectorized version of :func:`weighted_quantile` which evaluates the same
+    values with each set of weights along the leading dimensions of
+    `weights`.
+
+    Parameters
+    ----------
+    values: array_like, shape (N,)
+        Input values.
+    quantiles: array_like, shape (Q,)
+        List of quantiles between 0.0 and 1.0.
+    weights: array_like, shape (..., N)
+        Weights of the values. Values with a non-finite value or weight are
+        excluded.
+
+    Returns
+    -------
+    np.array, shape (..., Q)
+        Numpy array with computed quantiles (nan if all values are
+        excluded).
+    """
+    values = np.asarray(values, dtype=float)
+    quantiles = np.asarray(quantiles, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    if not np.all((quantiles >= 0) & (quantiles <= 1)):
+        raise ValueError('Quantiles should be between 0.0 and 1.0')
+
+    # sort by value and move excluded values to the end of each set
+    idx = np.argsort(values)
+    values = np.broadcast_to(values[idx], weights.shape)
+    weights = weights[..., idx]
+    not_nan = np.isfinite(values) & np.isfinite(weights)
+    idx = np.argsort(~not_nan, axis=-1, kind='stable')
+    values = np.take_along_axis(values, idx, axis=-1)
+    weights = np.take_along_axis(weights, idx, axis=-1)
+    n_valid = not_nan.sum(axis=-1, keepdims=True)
+    is_valid = np.arange(values.shape[-1]) < n_valid
+    weights = np.where(is_valid, weights, 0.)
+
+    weighted_quantiles = np.cumsum(weights, axis=-1) - 0.5 * weights
+
+    # Cast weighted quantiles to 0-1 To be consistent with np.quantile
+    last = np.maximum(n_valid - 1, 0)
+    min_val = weighted_quantiles[..., :1]
+    max_val = np.take_along_axis(weighted_quantiles, last, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_quantiles = (weighted_quantiles - min_val) / max_val
+    weighted_quantiles = np.where(is_valid, weighted_quantiles, np.inf)
+
+    # linear interpolation as in np.interp for each set of weights
+    lower = (weighted_quantiles[..., np.newaxis, :] <=
+             quantiles[:, np.newaxis]).sum(axis=-1) - 1
+    upper = np.minimum(lower + 1, last)
+    lower = np.clip(lower, 0, last)
+    x_lower = np.take_along_axis(weighted_quantiles, lower, axis=-1)
+    x_upper = np.take_along_axis(weighted_quantiles, upper, axis=-1)
+    y_lower = np.take_along_axis(values, lower, axis=-1)
+    y_upper = np.take_along_axis(values, upper, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (y_upper - y_lower) / (x_upper - x_lower)
+    result = np.where(upper > lower, y_lower + slope * (quantiles - x_lower),
+                      y_lower)
+    return np.where(n_valid > 0, result, np.nan)
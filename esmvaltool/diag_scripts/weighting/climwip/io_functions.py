@@ -95,13 +95,15 @@ def make_standard_calendar(xrds: 'xr.Dataset'):
 
 def read_input_data(metadata: list,
                     dim: str = 'data_ensemble',
-                    identifier_fmt: str = '{dataset}') -> tuple:
+                    identifier_fmt: str = '{dataset}',
+                    lazy: bool = False) -> tuple:
     """Load data from metadata.
 
     Read the input data from the list of given data sets. `metadata` is
     a list of metadata containing the filenames to load. Only returns
     the given `variable`. The datasets are stacked along the `dim`
-    dimension. Returns an xarray.DataArray.
+    dimension. Returns an xarray.DataArray. If `lazy` is set, the data
+    are not loaded into memory but returned as dask arrays.
     """
     data_arrays = []
     identifiers = []
@@ -111,7 +113,7 @@ def read_input_data(metadata: list,
         short_name = info['short_name']
         variable_group = info['variable_group']
 
-        xrds = xr.open_dataset(filename)
+        xrds = xr.open_dataset(filename, chunks={} if lazy else None)
         make_standard_calendar(xrds)
         xrda = xrds[short_name]
         xrda = xrda.rename(variable_group)
@@ -135,19 +137,22 @@ def read_input_data(metadata: list,
     return diagnostic, input_files
 
 
-def read_model_data(datasets: list) -> tuple:
+def read_model_data(datasets: list, lazy: bool = False) -> tuple:
     """Load model data from list of metadata."""
     return read_input_data(datasets,
                            dim='model_ensemble',
-                           identifier_fmt='{dataset}_{ensemble}_{exp}')
+                           identifier_fmt='{dataset}_{ensemble}_{exp}',
+                           lazy=lazy)
 
 
-def read_model_data_ancestor(cfg, variable_group) -> tuple:
+def read_model_data_ancestor(cfg, variable_group, lazy=False) -> tuple:
     """Load model data from ancestor folder."""
     filepath = io.get_ancestor_file(cfg, 'MODELS_' + variable_group + '.nc')
     ancestor_ds = xr.open_dataset(filepath)
 
-    anc_da = ancestor_ds[variable_group].load()
+    anc_da = ancestor_ds[variable_group]
+    if not lazy:
+        anc_da = anc_da.load()
     anc_da = anc_da.rename(variable_group)
 
     return anc_da, filepath
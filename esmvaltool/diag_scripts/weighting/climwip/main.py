@@ -20,7 +20,7 @@ from esmvaltool.diag_scripts.weighting.climwip.calibrate_sigmas import (
     calibrate_performance_sigma, )
 from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
     area_weighted_mean,
-    calculate_model_distances,
+    calculate_all_model_distances,
     calculate_weights,
     combine_ensemble_members,
     compute_overall_mean,
@@ -231,18 +231,30 @@ def main(cfg):
     performances = {}
     independences = {}
 
+    models_data = {}
+    models_data_files = {}
     for variable_group in independence_contributions:
 
         logger.info('Reading model data for %s', variable_group)
         if variable_group.endswith("_ANOM"):
             model_data, model_data_files = read_model_data_ancestor(
-                cfg, variable_group)
+                cfg, variable_group, lazy=True)
         else:
             datasets_model = models[variable_group]
-            model_data, model_data_files = read_model_data(datasets_model)
+            model_data, model_data_files = read_model_data(datasets_model,
+                                                           lazy=True)
+        models_data[variable_group] = model_data
+        models_data_files[variable_group] = model_data_files
 
-        logger.info('Calculating independence for %s', variable_group)
-        independence = calculate_model_distances(model_data)
+    if independence_contributions:
+        logger.info('Calculating independence for %s',
+                    ', '.join(independence_contributions))
+    all_independences = calculate_all_model_distances(
+        list(models_data.values()),
+        pairwise_complete=cfg.get('pairwise_complete_distances', False),
+        n_jobs=cfg.get('n_jobs', 1))
+    for variable_group, independence in zip(models_data, all_independences):
+        model_data_files = models_data_files[variable_group]
         visualize_and_save_independence(independence, cfg, model_data_files)
         logger.debug(independence.values)
         independences[variable_group] = independence
@@ -31,6 +31,9 @@ Key features:
   datasets that don't have data in the interval; if you want all possible years
   hence no filtering on years just use "*" for start and end years;
 - `config-user: rootpath: CMIPX` may be a list, rootpath lists are supported;
+- the data directories are walked only once and cached in an index (in
+  `~/.esmvaltool/cache/recipe_filler` by default, see `--index-dir`); later
+  runs only re-list directories that have been modified since;
 
 Caveats:
 
@@ -41,13 +44,18 @@ Have fun!
 """
 import argparse
 import datetime
+import fnmatch
+import gzip
+import hashlib
 import itertools
+import json
 import logging
 import logging.config
 import os
 import shutil
 import time
-from glob import glob
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from glob import glob, has_magic
 from pathlib import Path
 
 import esmvalcore
@@ -461,6 +469,253 @@ def filter_years(files, start_year, end_year, overlap=False):
     return valid_files
 
 
+class DirectoryIndex:
+    """Index of all directories and files below a root directory.
+
+    The directory tree is walked once (in parallel, listing each directory
+    in a separate task) and the listing of each directory is stored
+    together with its modification time. When an index is loaded from its
+    cache file, only directories that have been modified since are listed
+    again, all other directories only need a single ``stat`` call.
+
+    Parameters
+    ----------
+    root: str
+        Root directory.
+    cache_file: str, optional
+        Compressed JSON file used to store the index between runs.
+    n_jobs: int, optional
+        Number of threads used to walk the directory tree.
+    """
+
+    VERSION = 1
+
+    def __init__(self, root, cache_file=None, n_jobs=8):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.cache_file = cache_file
+        self.n_jobs = n_jobs
+        # relative directory -> [mtime_ns, subdirectories, files]
+        self.entries = {}
+        self._recent_ns = 0
+
+    def load(self):
+        """Load the cached index (if available) and update it."""
+        cached = {}
+        if self.cache_file is not None and os.path.exists(self.cache_file):
+            try:
+                with gzip.open(self.cache_file, 'rt') as file:
+                    content = json.load(file)
+            except (OSError, ValueError) as exc:
+                logger.warning("Ignoring invalid index %s: %s",
+                               self.cache_file, exc)
+            else:
+                if (content.get('version') == self.VERSION
+                        and content.get('root') == self.root):
+                    cached = content['entries']
+        start = time.time()
+        self.update(cached)
+        logger.info(
+            "Indexed %s directories below %s in %.1f s (%s cached)",
+            len(self.entries), self.root,
+            time.time() - start, len(cached))
+        self.save()
+        return self
+
+    def save(self):
+        """Save the index to its cache file."""
+        if self.cache_file is None:
+            return
+        content = {
+            'version': self.VERSION,
+            'root': self.root,
+            'entries': self.entries,
+        }
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with gzip.open(tmp_file, 'wt') as file:
+                json.dump(content, file, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError as exc:
+            logger.warning("Unable to write index %s: %s", self.cache_file,
+                           exc)
+
+    def update(self, cached=None):
+        """Walk the directory tree, reusing unmodified cached listings."""
+        cached = cached or {}
+        # Listings of directories modified very recently are not trusted
+        # in later runs since they may change within the same timestamp
+        self._recent_ns = time.time_ns() - 2 * 10**9
+        entries = {}
+        # Every directory is a separate task so the work is spread over all
+        # threads at every level of the tree, independent of its layout
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            pending = {executor.submit(self._visit, '', cached, ())}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result is None:
+                        continue
+                    (reldir, entry, parents) = result
+                    entries[reldir] = entry
+                    for subdir in entry[1]:
+                        pending.add(
+                            executor.submit(self._visit,
+                                            os.path.join(reldir, subdir),
+                                            cached, parents))
+        self.entries = entries
+
+    def _visit(self, reldir, cached, parents):
+        """Get the listing of `reldir` and the inodes of its parents."""
+        path = os.path.join(self.root, reldir)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        inode = (stat.st_dev, stat.st_ino)
+        if inode in parents:
+            # Symbolic link loop
+            return None
+        entry = cached.get(reldir)
+        if entry is None or entry[0] != stat.st_mtime_ns:
+            entry = self._list(path, stat.st_mtime_ns)
+        return (reldir, entry, parents + (inode, ))
+
+    def _list(self, path, mtime_ns):
+        """List a directory."""
+        dirs = []
+        files = []
+        try:
+            with os.scandir(path) as iterator:
+                for dir_entry in iterator:
+                    try:
+                        is_dir = dir_entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    (dirs if is_dir else files).append(dir_entry.name)
+        except OSError as exc:
+            logger.debug("Unable to list %s: %s", path, exc)
+        if mtime_ns >= self._recent_ns:
+            mtime_ns = -1
+        return [mtime_ns, sorted(dirs), sorted(files)]
+
+    def relpath(self, path):
+        """Get path relative to the root or None if it is outside."""
+        path = os.path.abspath(os.path.expanduser(path))
+        if path == self.root:
+            return ''
+        if path.startswith(self.root.rstrip(os.sep) + os.sep):
+            return os.path.relpath(path, self.root)
+        return None
+
+    def isdir(self, path):
+        """Check if `path` is an indexed directory."""
+        return self.relpath(path) in self.entries
+
+    def listdir(self, path):
+        """List the contents of a directory like :func:`os.listdir`."""
+        entry = self.entries.get(self.relpath(path))
+        if entry is None:
+            raise FileNotFoundError(f"No such directory: '{path}'")
+        return entry[1] + entry[2]
+
+    def glob(self, pattern):
+        """Find paths matching `pattern` like :func:`glob.glob`."""
+        relpattern = self.relpath(pattern)
+        if relpattern is None:
+            raise ValueError(f"{pattern} is not below {self.root}")
+        if relpattern == '':
+            return [self.root]
+        parts = relpattern.split(os.sep)
+        matches = ['']
+        for (idx, part) in enumerate(parts):
+            last = idx == len(parts) - 1
+            magic = has_magic(part)
+            new_matches = []
+            for reldir in matches:
+                if reldir not in self.entries:
+                    continue
+                (_, dirs, files) = self.entries[reldir]
+                names = dirs + files if last else dirs
+                if magic:
+                    if not part.startswith('.'):
+                        names = [n for n in names if not n.startswith('.')]
+                    names = fnmatch.filter(names, part)
+                elif part in names:
+                    names = [part]
+                else:
+                    continue
+                prefix = reldir + os.sep if reldir else ''
+                new_matches.extend(prefix + n for n in names)
+            matches = new_matches
+        return [os.path.join(self.root, m) for m in matches]
+
+
+_DIRECTORY_INDEXES = []
+
+
+def build_indexes(rootpaths, index_dir, n_jobs=8):
+    """Build (or update) the directory indexes used to find data.
+
+    Parameters
+    ----------
+    rootpaths: list
+        Root directories of the data.
+    index_dir: str
+        Directory where the indexes are stored; if None, the indexes are
+        not stored.
+    n_jobs: int
+        Number of threads used to walk each root directory.
+    """
+    _DIRECTORY_INDEXES.clear()
+    for rootpath in rootpaths:
+        root = os.path.abspath(os.path.expanduser(rootpath))
+        if not os.path.isdir(root) or any(
+                index.root == root for index in _DIRECTORY_INDEXES):
+            continue
+        cache_file = None
+        if index_dir is not None:
+            name = hashlib.sha256(root.encode()).hexdigest()[:16]
+            cache_file = os.path.join(index_dir, f"{name}.json.gz")
+        _DIRECTORY_INDEXES.append(
+            DirectoryIndex(root, cache_file, n_jobs).load())
+    # Look up paths in the innermost root directory first
+    _DIRECTORY_INDEXES.sort(key=lambda index: len(index.root), reverse=True)
+
+
+def _get_index(path):
+    """Get the directory index that contains `path`."""
+    for index in _DIRECTORY_INDEXES:
+        if index.relpath(path) is not None:
+            return index
+    return None
+
+
+def _glob(pattern):
+    """Find paths matching a pattern, using the indexes if possible."""
+    index = _get_index(pattern)
+    if index is None:
+        return glob(pattern)
+    return index.glob(pattern)
+
+
+def _listdir(path):
+    """List a directory, using the indexes if possible."""
+    index = _get_index(path)
+    if index is None:
+        return os.listdir(path)
+    return index.listdir(path)
+
+
+def _isdir(path):
+    """Check if a directory exists, using the indexes if possible."""
+    index = _get_index(path)
+    if index is None:
+        return os.path.isdir(path)
+    return index.isdir(path)
+
+
 def _resolve_latestversion(dirname_template):
     """Resolve the 'latestversion' tag."""
     for version_separator in ['{latestversion}', '{version}']:
@@ -472,13 +727,13 @@ def _resolve_latestversion(dirname_template):
     # Find latest version
     part1, part2 = dirname_template.split(version_separator)
     part2 = part2.lstrip(os.sep)
-    part1_contents = glob(part1)
+    part1_contents = _glob(part1)
     if part1_contents:
-        versions = os.listdir(part1_contents[0])
+        versions = _listdir(part1_contents[0])
         versions.sort(reverse=True)
         for version in ['latest'] + versions:
             dirname = os.path.join(part1, version, part2)
-            if glob(dirname):
+            if _glob(dirname):
                 return dirname
 
     return dirname_template
@@ -490,9 +745,9 @@ def list_all_files(file_dict, cmip_era):
 
     Function that returns all files that are determined by a
     file_dict dictionary; file_dict is keyed on usual parameters
-    like `dataset`, `project`, `mip` etc; glob.glob is used
-    to find files; speedup is achieved by replacing wildcards
-    with values from CMOR tables.
+    like `dataset`, `project`, `mip` etc; the directory indexes (see
+    :func:`build_indexes`) or glob.glob are used to find files; speedup is
+    achieved by replacing wildcards with values from CMOR tables.
 
     Parameters
     ----------
@@ -545,7 +800,7 @@ def list_all_files(file_dict, cmip_era):
                 logger.info("Expanding path to %s", new_path)
 
             # Globs all the wildcards into a list of files.
-            files = glob(new_path)
+            files = _glob(new_path)
             all_files.extend(files)
     if not all_files:
         logger.warning("Could not find any file for data specifications.")
@@ -736,19 +991,19 @@ def _find_all_datasets(recipe_dict, cmip_eras):
                     var = recipe_dict["short_name"]
                     institutes_path = os.path.join(site_pth, exp, mip, var)
 
-                if not os.path.isdir(institutes_path):
+                if not _isdir(institutes_path):
                     logger.warning("Path to data %s "
                                    "does not exist; will look everywhere.",
                                    institutes_path)
                     datasets = ["*"]
                     return datasets
 
-                institutes = os.listdir(institutes_path)
+                institutes = _listdir(institutes_path)
                 if drs in ["BADC", "DKRZ", "CP4CDS"]:
                     for institute in institutes:
                         datasets.extend(
-                            os.listdir(os.path.join(institutes_path,
-                                                    institute)))
+                            _listdir(os.path.join(institutes_path,
+                                                  institute)))
                 else:
                     datasets.extend(institutes)
 
@@ -799,6 +1054,19 @@ def get_args():
                         default=os.path.join(os.getcwd(),
                                              'recipe_autofilled.yml'),
                         help='Output recipe, default recipe_autofilled.yml')
+    parser.add_argument('--index-dir',
+                        default=os.path.join(os.environ["HOME"], '.esmvaltool',
+                                             'cache', 'recipe_filler'),
+                        help='Directory to store the data directory indexes')
+    parser.add_argument('--no-index',
+                        action='store_true',
+                        help='Do not store the data directory indexes')
+    parser.add_argument('-j',
+                        '--jobs',
+                        type=int,
+                        default=8,
+                        help='Number of threads used to index data, '
+                        'default 8')
 
     args = parser.parse_args()
     return args
@@ -855,6 +1123,17 @@ def run():
     # check config user file
     _check_config_file(config_user)
 
+    # index data directories
+    rootpaths = []
+    for cmip_era in cmip_eras:
+        for rootpath in _get_site_rootpath(cmip_era)[1]:
+            if isinstance(rootpath, list):
+                rootpaths.extend(rootpath)
+            else:
+                rootpaths.append(rootpath)
+    index_dir = None if args.no_index else args.index_dir
+    build_indexes(rootpaths, index_dir, n_jobs=args.jobs)
+
     # parse recipe
     with open(input_recipe, 'r') as yamlfile:
         yamlrecipe = yaml.safe_load(yamlfile)
@@ -3,11 +3,14 @@ from __future__ import annotations
 
 import argparse
 import difflib
-import filecmp
 import fnmatch
+import hashlib
+import json
+import math
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from textwrap import indent
 from typing import Iterator, Optional
@@ -66,6 +69,21 @@ RECIPE_DIR_PATTERN: str = (
 )
 """Regex pattern for recipe output directories."""
 
+REFERENCE_INDEX_FILE: str = '.compare_index.json'
+"""Sidecar file in reference runs caching content and perceptual hashes."""
+
+HASH_BLOCK_SIZE: int = 2**20
+"""Number of bytes read at once when computing content hashes."""
+
+NC_BLOCK_SIZE: int = 2**26
+"""Approximate number of bytes of NetCDF variables compared at once."""
+
+PHASH_SIZE: int = 16
+"""Perceptual hash size used to compare PNG files."""
+
+PHASH_MAX_DISTANCE: int = 2
+"""Maximum perceptual hash hamming distance of PNG files that are the same."""
+
 
 def as_txt(msg: list[str]) -> str:
     """Convert lines of text to indented text."""
@@ -176,9 +194,15 @@ def adapt_attributes(attributes: dict, ignore_attributes: tuple[str, ...],
     return new_attrs
 
 
-def load_nc(filename: Path) -> xr.Dataset:
-    """Load a NetCDF file."""
-    dataset = xr.open_dataset(filename, chunks={}, decode_times=False)
+def load_nc(filename: Path, use_dask: bool = True) -> xr.Dataset:
+    """Load a NetCDF file.
+
+    If `use_dask` is False, the data is not loaded until it is accessed and
+    only the accessed part of a variable is read from disk.
+    """
+    dataset = xr.open_dataset(filename,
+                              chunks={} if use_dask else None,
+                              decode_times=False)
     recipe_name = get_recipe_name_from_file(filename)
 
     # Remove ignored variables
@@ -229,31 +253,107 @@ debug_html = debug_txt
 debug_grid = debug_txt
 
 
-def compare_nc(reference_file: Path, current_file: Path) -> bool:
-    """Compare two NetCDF files."""
-    ref = load_nc(reference_file)
-    cur = load_nc(current_file)
+def arrays_equal(ref: np.ndarray, cur: np.ndarray) -> bool:
+    """Check if two arrays are equal, treating NaNs as equal."""
+    if np.issubdtype(ref.dtype, np.inexact) and np.issubdtype(
+            cur.dtype, np.inexact):
+        return np.array_equal(ref, cur, equal_nan=True)
+    return np.array_equal(ref, cur)
 
-    return cur.identical(ref)
 
+def variables_identical(ref: xr.Variable, cur: xr.Variable) -> bool:
+    """Check if two variables are identical, reading them block by block.
+
+    Blocks are taken along the first dimension and contain approximately
+    :const:`NC_BLOCK_SIZE` bytes of data.
+    """
+    if ref.dims != cur.dims or ref.shape != cur.shape:
+        return False
+    if diff_attrs(ref.attrs, cur.attrs):
+        return False
+    if not ref.shape:
+        return arrays_equal(ref.values, cur.values)
+    row_size = max(ref.dtype.itemsize, cur.dtype.itemsize) * math.prod(
+        ref.shape[1:])
+    block_size = max(1, NC_BLOCK_SIZE // max(1, row_size))
+    for start in range(0, ref.shape[0], block_size):
+        block = slice(start, start + block_size)
+        if not arrays_equal(ref[block].values, cur[block].values):
+            return False
+    return True
 
-def compare_png(reference_file: Path, current_file: Path) -> bool:
-    """Compare two PNG files."""
-    # Based on:
-    # https://scitools-iris.readthedocs.io/en/latest/developers_guide/contributing_graphics_tests.html
 
-    # Perceptual hash size.
-    hash_size = 16
-    # Maximum perceptual hash hamming distance.
-    max_distance = 2
+def compare_nc(reference_file: Path, current_file: Path) -> bool:
+    """Compare two NetCDF files.
 
-    with Image.open(reference_file) as img:
-        ref = imagehash.phash(img, hash_size=hash_size)
-    with Image.open(current_file) as img:
-        cur = imagehash.phash(img, hash_size=hash_size)
+    Equivalent to :meth:`xarray.Dataset.identical`, but the data is compared
+    block by block (see :func:`variables_identical`) so that the memory
+    usage does not depend on the file size.
+    """
+    with load_nc(reference_file, use_dask=False) as ref, \
+            load_nc(current_file, use_dask=False) as cur:
+        if diff_attrs(ref.attrs, cur.attrs):
+            return False
+        if set(ref.variables) != set(cur.variables):
+            return False
+        if set(ref.coords) != set(cur.coords):
+            return False
+        return all(
+            variables_identical(ref.variables[var], cur.variables[var])
+            for var in ref.variables)
+
+
+def file_digest(filename: Path) -> str:
+    """Compute a hash of the content of a file without loading it at once."""
+    digest = hashlib.blake2b()
+    with filename.open('rb') as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_file_info(filename: Path, cached: Optional[dict] = None) -> dict:
+    """Get information on a file that is used for comparisons.
+
+    The returned dictionary contains the size and modification time of the
+    file. Hashes stored in `cached` are kept if the file has not changed
+    since they were computed, they are added when needed by
+    :func:`files_equal`.
+    """
+    stat = filename.stat()
+    info = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if cached is not None and all(cached.get(k) == v
+                                  for (k, v) in info.items()):
+        return dict(cached)
+    return info
+
+
+def get_phash(filename: Path, info: Optional[dict] = None):
+    """Get the perceptual hash of a PNG file, cached in `info` if given."""
+    if info is not None and 'phash' in info:
+        return imagehash.hex_to_hash(info['phash'])
+    with Image.open(filename) as img:
+        phash = imagehash.phash(img, hash_size=PHASH_SIZE)
+    if info is not None:
+        info['phash'] = str(phash)
+    return phash
+
+
+def compare_png(reference_file: Path,
+                current_file: Path,
+                reference_info: Optional[dict] = None) -> bool:
+    """Compare two PNG files.
+
+    The perceptual hash of the reference file is taken from (and stored in)
+    `reference_info` if given.
+    """
+    # Based on:
+    # https://scitools-iris.readthedocs.io/en/latest/developers_guide/contributing_graphics_tests.html
+    ref = get_phash(reference_file, reference_info)
+    cur = get_phash(current_file)
 
     distance = ref - cur
-    return distance < max_distance
+    return distance < PHASH_MAX_DISTANCE
 
 
 def debug(reference_file: Path, current_file: Path) -> str:
@@ -268,36 +368,125 @@ def debug(reference_file: Path, current_file: Path) -> str:
     return indent(msg, "  ")
 
 
-def files_equal(reference_file: Path, current_file: Path) -> bool:
-    """Compare two files."""
+def files_equal(reference_file: Path,
+                current_file: Path,
+                reference_info: Optional[dict] = None) -> bool:
+    """Compare two files.
+
+    Files with the same size and content hash are equal. Otherwise, files
+    with a dedicated comparison function (e.g., :func:`compare_nc`) are
+    compared with it. `reference_info` is a dictionary returned by
+    :func:`get_file_info` for the reference file, it is used to look up and
+    store hashes of the reference file.
+    """
+    if reference_info is None:
+        reference_info = get_file_info(reference_file)
+    if reference_info['size'] == current_file.stat().st_size:
+        if 'digest' not in reference_info:
+            reference_info['digest'] = file_digest(reference_file)
+        if reference_info['digest'] == file_digest(current_file):
+            return True
+
     suffix = reference_file.suffix[1:].lower()
     fn_name = f"compare_{suffix}"
-    if fn_name in globals():
+    if suffix == 'png':
+        same = compare_png(reference_file, current_file, reference_info)
+    elif fn_name in globals():
         compare_fn = globals()[fn_name]
         same = compare_fn(reference_file, current_file)
     else:
-        same = filecmp.cmp(reference_file, current_file, shallow=False)
+        same = False
     return same
 
 
-def compare_files(reference_dir: Path, current_dir: Path, files: list[Path],
-                  verbose: bool) -> list[str]:
-    """Compare files from the reference dir to the current dir."""
-    different = []
+def compare_file(reference_file: Path, current_file: Path,
+                 reference_info: dict,
+                 verbose: bool) -> tuple[Optional[str], dict]:
+    """Compare a single file, returning debug info if it is different.
+
+    Returns a tuple with None (if the files are equal) or a description of
+    the difference (possibly empty) and the updated `reference_info`.
+    """
+    if files_equal(reference_file, current_file, reference_info):
+        return (None, reference_info)
+    msg = ""
+    if verbose:
+        msg = debug(reference_file, current_file)
+    return (msg, reference_info)
+
+
+def load_reference_index(reference_dir: Path) -> dict:
+    """Load the cached hashes of the files of a reference run."""
+    index_file = reference_dir / REFERENCE_INDEX_FILE
+    if not index_file.exists():
+        return {}
+    try:
+        with index_file.open('r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as exc:
+        print(f"Ignoring invalid reference index {index_file}: {exc}")
+        return {}
+
+
+def save_reference_index(reference_dir: Path, index: dict) -> None:
+    """Save the cached hashes of the files of a reference run."""
+    index_file = reference_dir / REFERENCE_INDEX_FILE
+    tmp_file = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_file.open('w', encoding='utf-8') as file:
+            json.dump(index, file, indent=1, sort_keys=True)
+        os.replace(tmp_file, index_file)
+    except OSError as exc:
+        print(f"Unable to write reference index {index_file}: {exc}")
+        tmp_file.unlink(missing_ok=True)
+
+
+def compare_files(reference_dir: Path,
+                  current_dir: Path,
+                  files: list[Path],
+                  verbose: bool,
+                  n_jobs: Optional[int] = 1) -> list[str]:
+    """Compare files from the reference dir to the current dir.
+
+    The files are compared in parallel using `n_jobs` processes (all
+    processors if None). Hashes of the reference files are cached in the
+    file :const:`REFERENCE_INDEX_FILE` in `reference_dir`.
+    """
+    index = load_reference_index(reference_dir)
+    args = []
     for file in files:
         ref_file = reference_dir / file
-        cur_file = current_dir / file
-        if not files_equal(ref_file, cur_file):
+        args.append((
+            ref_file,
+            current_dir / file,
+            get_file_info(ref_file, index.get(str(file))),
+            verbose,
+        ))
+
+    if n_jobs == 1 or len(args) < 2:
+        results = [compare_file(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(compare_file, *zip(*args)))
+
+    different = []
+    new_index = {}
+    for (file, (info, reference_info)) in zip(files, results):
+        new_index[str(file)] = reference_info
+        if info is not None:
             msg = str(file)
-            if verbose:
-                if info := debug(ref_file, cur_file):
-                    msg += ":\n" + info
+            if info:
+                msg += ":\n" + info
             different.append(msg)
+    if new_index != index:
+        save_reference_index(reference_dir, {**index, **new_index})
     return different
 
 
-def compare(reference_dir: Optional[Path], current_dir: Path,
-            verbose: bool) -> bool:
+def compare(reference_dir: Optional[Path],
+            current_dir: Path,
+            verbose: bool,
+            n_jobs: Optional[int] = 1) -> bool:
     """Compare a recipe run to a reference run.
 
     Returns True if the runs were identical, False otherwise.
@@ -327,6 +516,7 @@ def compare(reference_dir: Optional[Path], current_dir: Path,
             current_dir,
             sorted(reference_files & current_files),
             verbose,
+            n_jobs,
     ):
         result.append("Differing files:")
         result.extend(indent(f"- {f}", "  ") for f in differing_files)
@@ -457,6 +647,14 @@ def main() -> int:
         action="store_true",
         help="Display more information on differences.",
     )
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=None,
+        help=("Number of processes used to compare files (default: number "
+              "of processors)."),
+    )
 
     args = parser.parse_args()
 
@@ -467,7 +665,10 @@ def main() -> int:
     success = []
     for current_dir, reference_dir in find_recipes(args.reference,
                                                    args.current):
-        same = compare(reference_dir, current_dir, verbose=args.verbose)
+        same = compare(reference_dir,
+                       current_dir,
+                       verbose=args.verbose,
+                       n_jobs=args.jobs)
         recipe = f"recipe_{get_recipe_name_from_dir(current_dir)}.yml"
         if same:
             success.append(f"{recipe}:\t{current_dir}")
@@ -66,7 +66,7 @@ REQUIREMENTS = {
         'ruamel.yaml',
         'scikit-image',
         'scikit-learn>=1.4.0',  # github.com/ESMValGroup/ESMValTool/issues/3504
-        'scipy',
+        'scipy>=1.12',  # rtol argument of scipy.sparse.linalg solvers
         'scitools-iris>=3.6.1',
         'seaborn',
         'seawater',
@@ -0,0 +1,51 @@
+"""
+Benchmark the import time of modules used by diagnostic scripts.
+
+Runs ``python -X importtime`` in a fresh interpreter several times and reports
+the best total import time of the given module together with the slowest
+imported modules (cumulative time). Usage:
+
+    python tests/benchmark_import_time.py [MODULE] [N_REPEATS]
+"""
+import subprocess
+import sys
+
+
+def _import_times(module):
+    """Get cumulative import times (in microseconds) of all modules."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        (_, cumulative, name) = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    """Run benchmark."""
+    module = 'esmvaltool.diag_scripts.shared'
+    if len(sys.argv) > 1:
+        module = sys.argv[1]
+    n_repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    best = None
+    for _ in range(n_repeats):
+        times = _import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    print(f"Import time of {module}: {best[module] / 1e3:.1f} ms "
+          f"(best of {n_repeats}, {len(best)} modules)")
+    print("Slowest imports (cumulative, ms):")
+    slowest = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    for (name, time) in slowest[1:16]:
+        print(f"{time / 1e3:10.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
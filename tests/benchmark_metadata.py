@@ -0,0 +1,78 @@
+"""
+Benchmark selection and grouping of diagnostic input metadata.
+
+Compares the linear scans over plain lists of dictionaries with the indexed
+queries on :class:`esmvaltool.diag_scripts.shared.MetadataList` for synthetic
+metadata of many datasets, using the nested-loop access pattern found in many
+diagnostics. Usage:
+
+    python tests/benchmark_metadata.py [N_DATASETS]
+"""
+import sys
+import time
+
+from esmvaltool.diag_scripts.shared import (
+    Metadata,
+    MetadataList,
+    group_metadata,
+    select_metadata,
+)
+
+
+def _get_metadata(n_datasets):
+    """Create synthetic metadata."""
+    metadata = []
+    for idx in range(n_datasets):
+        metadata.append(Metadata({
+            'dataset': f'dataset{idx % 500}',
+            'short_name': ['tas', 'pr', 'psl', 'ta', 'ua'][idx % 5],
+            'variable_group': f'group{idx % 10}',
+            'exp': ['historical', 'ssp585'][(idx // 5) % 2],
+            'ensemble': f'r{(idx // 10) % 10}i1p1f1',
+            'filename': f'/work/preproc/file{idx}.nc',
+        }))
+    return metadata
+
+
+def _nested_queries(metadata):
+    """Typical access pattern of a diagnostic."""
+    n_selected = 0
+    grouped = group_metadata(metadata, 'dataset')
+    for dataset in list(grouped)[:50]:
+        for short_name in ('tas', 'pr', 'psl', 'ta', 'ua'):
+            for exp in ('historical', 'ssp585'):
+                n_selected += len(select_metadata(
+                    metadata, dataset=dataset, short_name=short_name,
+                    exp=exp))
+    return n_selected
+
+
+def _time(function, *args):
+    """Time a function call."""
+    start = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - start, result)
+
+
+def main():
+    """Run benchmark."""
+    n_datasets = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    metadata = _get_metadata(n_datasets)
+    print(f"Metadata of {n_datasets} datasets")
+
+    (linear_time, linear_result) = _time(_nested_queries, list(metadata))
+    print(f"Linear scans:    {linear_time:8.3f} s")
+
+    indexed = MetadataList(metadata)
+    (first_time, indexed_result) = _time(_nested_queries, indexed)
+    print(f"Indexed (cold):  {first_time:8.3f} s")
+    (second_time, _) = _time(_nested_queries, indexed)
+    print(f"Indexed (warm):  {second_time:8.3f} s")
+
+    if linear_result != indexed_result:
+        raise ValueError(
+            f"Results differ: {linear_result} vs. {indexed_result}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,17 @@
 """Tests for _data_finder.py."""
 import contextlib
+import glob
 import os
 import shutil
 import sys
 import tempfile
+import threading
 
 import pytest
 import yaml
 
-from esmvaltool.utils.recipe_filler import run
+from esmvaltool.utils import recipe_filler
+from esmvaltool.utils.recipe_filler import DirectoryIndex, run
 
 
 # Load test configuration
@@ -90,6 +93,12 @@ def write_recipe(dirname, recipe_dict):
     return str(recipe_file)
 
 
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """Use temporary home directory to store the indexes."""
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+
+
 @pytest.fixture
 def root():
     """Root function for tests."""
@@ -209,3 +218,123 @@ def test_no_short_name(tmp_path, root):
         diag = autofilled_recipe["diagnostics"]["test_diagnostic"]
         var = diag["variables"]["test_var"]
         assert "additional_datasets" not in var
+
+
+INDEX_FILES = [
+    'MOHC/HadGEM2-ES/historical/mon/atmos/Amon/r1i1p1/v20110329/ta/'
+    'ta_Amon_HadGEM2-ES_historical_r1i1p1_193412-195911.nc',
+    'MOHC/HadGEM2-ES/historical/mon/atmos/Amon/r1i1p1/v20110329/ta/'
+    'ta_Amon_HadGEM2-ES_historical_r1i1p1_195912-198411.nc',
+    'MOHC/HadGEM2-ES/rcp85/mon/atmos/Amon/r1i1p1/v20110329/ta/'
+    'ta_Amon_HadGEM2-ES_rcp85_r1i1p1_200601-210012.nc',
+    'MPI-M/MPI-ESM-LR/historical/mon/atmos/Amon/r1i1p1/v20120315/ta/'
+    'ta_Amon_MPI-ESM-LR_historical_r1i1p1_185001-200512.nc',
+    'MPI-M/MPI-ESM-LR/historical/mon/atmos/Amon/r1i1p1/.hidden/ta/'
+    'ta_Amon_MPI-ESM-LR_historical_r1i1p1_185001-200512.nc',
+]
+
+INDEX_SYMLINKS = [
+    {
+        'link_name': 'MOHC/HadGEM2-ES/historical/mon/atmos/Amon/r1i1p1/latest',
+        'target': 'v20110329',
+    },
+    {
+        'link_name': 'MOHC/HadGEM2-ES/loop',
+        'target': '.',
+    },
+]
+
+
+@pytest.mark.parametrize('pattern', [
+    '',
+    '*',
+    'MOHC',
+    'MOHC/*/*',
+    '*/*/historical/mon/atmos/Amon/r1i1p1/*/ta/*.nc',
+    '*/*/historical/mon/atmos/Amon/r1i1p1/latest/ta/*.nc',
+    '*/*/*/mon/atmos/Amon/r1i1p1/v2011*/ta/ta_Amon_*_r1i1p1*.nc',
+    'MPI-M/MPI-ESM-LR/historical/mon/atmos/Amon/r1i1p1/.*',
+    'MPI-M/MPI-ESM-LR/historical/mon/atmos/Amon/r1i1p1/.hidden/ta/*',
+    'MOHC/HadGEM2-ES/loop',
+    'does/not/exist/*.nc',
+])
+def test_directory_index_glob(tmp_path, pattern):
+    """Test that the directory index finds the same files as glob."""
+    root = str(tmp_path / 'data')
+    create_tree(root, INDEX_FILES, INDEX_SYMLINKS)
+    index = DirectoryIndex(root)
+    index.update()
+    pattern = os.path.join(root, pattern)
+    assert sorted(index.glob(pattern)) == sorted(
+        p.rstrip(os.sep) for p in glob.glob(pattern))
+
+
+def test_directory_index_update(tmp_path, monkeypatch):
+    """Test that the cached index is updated incrementally."""
+    root = tmp_path / 'data'
+    create_tree(str(root), INDEX_FILES)
+    for (dirpath, _, _) in os.walk(root):
+        os.utime(dirpath, (0, 0))
+    cache_file = str(tmp_path / 'index' / 'index.json.gz')
+    index = DirectoryIndex(str(root), cache_file).load()
+    assert os.path.exists(cache_file)
+    assert len(index.glob(str(root / '*/*/*/*/*/*/*/*/*/*.nc'))) == 4
+
+    # Only modified directories are listed again
+    listed = []
+    list_dir = DirectoryIndex._list
+
+    def _list(self, path, mtime_ns):
+        listed.append(path)
+        return list_dir(self, path, mtime_ns)
+
+    monkeypatch.setattr(DirectoryIndex, '_list', _list)
+    new_dir = root / 'MOHC' / 'HadGEM2-ES' / 'rcp85'
+    create_file(str(new_dir / 'new.nc'))
+    index = DirectoryIndex(str(root), cache_file).load()
+    assert listed == [str(new_dir)]
+    assert index.glob(str(new_dir / '*.nc')) == [str(new_dir / 'new.nc')]
+    assert index.listdir(str(new_dir)) == ['mon', 'new.nc']
+
+
+def test_directory_index_parallel(tmp_path, monkeypatch):
+    """Test that the directories below a single directory are listed in
+    parallel."""
+    root = tmp_path / 'data'
+    for institute in ('MOHC', 'MPI-M'):
+        create_file(str(root / 'CMIP6' / institute / 'model' / 'file.nc'))
+    barrier = threading.Barrier(2, timeout=10)
+    list_dir = DirectoryIndex._list
+
+    def _list(self, path, mtime_ns):
+        if os.path.basename(path) in ('MOHC', 'MPI-M'):
+            barrier.wait()
+        return list_dir(self, path, mtime_ns)
+
+    monkeypatch.setattr(DirectoryIndex, '_list', _list)
+    index = DirectoryIndex(str(root), n_jobs=2)
+    index.update()
+    assert len(index.glob(str(root / '*/*/*/*.nc'))) == 2
+
+
+def test_run_uses_index(tmp_path, root, monkeypatch):
+    """Test that the data is found using the index."""
+    cfg = CONFIG['has_additional_datasets'][0]
+    create_tree(root, cfg.get('available_files'),
+                cfg.get('available_symlinks'))
+    user_config_file, recipe, output_recipe = setup_files(tmp_path, root, cfg)
+
+    def fail(*_):
+        raise AssertionError("File system should not be accessed")
+
+    with arguments('recipe_filler', recipe, '-c', user_config_file, '-o',
+                   output_recipe, '--index-dir', str(tmp_path / 'index')):
+        monkeypatch.setattr(recipe_filler, 'glob', fail)
+        run()
+
+    assert len(os.listdir(tmp_path / 'index')) == 1
+    with open(output_recipe, 'r') as file:
+        autofilled_recipe = yaml.safe_load(file)
+    var = autofilled_recipe["diagnostics"]["test_diagnostic"]["variables"][
+        "test_var"]
+    assert len(var["additional_datasets"]) == 1
@@ -31,6 +31,20 @@ def test_formatters_have_required_interface():
                   f'{spec.args}')
             print(f"Expected {arg_names}.")
             error = True
+        # Formatters that reuse the cmorization function of another
+        # formatter also need to provide its jobs
+        source = importlib.import_module(member.cmorization.__module__)
+        if hasattr(source, 'get_jobs') and not hasattr(member, 'get_jobs'):
+            print(f'Missing get_jobs in '
+                  f'{os.path.join(formatters_folder, formatter)}')
+            error = True
+        if hasattr(member, 'get_jobs'):
+            jobs_spec = inspect.getfullargspec(member.get_jobs)
+            if jobs_spec.args != spec.args:
+                print(f'Bad get_jobs args in '
+                      f'{os.path.join(formatters_folder, formatter)}: '
+                      f'{jobs_spec.args}')
+                error = True
     assert not error
 
 
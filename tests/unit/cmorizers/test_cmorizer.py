@@ -0,0 +1,82 @@
+"""Tests for the module :mod:`esmvaltool.cmorizers.data.cmorizer`."""
+import pytest
+
+from esmvaltool.cmorizers.data.cmorizer import Formatter
+from esmvaltool.cmorizers.data.manifest import MANIFEST_FILE
+
+
+class _Config(dict):
+    """Session configuration."""
+
+    def __init__(self, tmp_path):
+        super().__init__(
+            rootpath={
+                'RAWOBS': [str(tmp_path / 'RAWOBS')],
+                'OBS': [str(tmp_path / 'OBS')],
+                'default': [str(tmp_path / 'default')],
+            },
+            max_parallel_tasks=1,
+        )
+        self.session_dir = str(tmp_path / 'session')
+        self.run_dir = str(tmp_path / 'session' / 'run')
+
+
+def _write_untracked(out_dir, name):
+    """Pretend to run a formatter that does not use save_variable."""
+    with open(f'{out_dir}/{name}', 'w', encoding='utf-8') as file:
+        file.write('cmorized data')
+
+
+@pytest.fixture
+def formatter(tmp_path):
+    """Formatter for a single dataset."""
+    (tmp_path / 'RAWOBS' / 'Tier3' / 'DATASET').mkdir(parents=True)
+    formatter = Formatter({})
+    formatter.datasets = ['DATASET']
+    formatter.config = _Config(tmp_path)
+    return formatter
+
+
+def test_format_incremental_untracked(mocker, tmp_path, formatter):
+    """Test that output of jobs without reported files is installed."""
+    out_dir = str(tmp_path / 'session' / 'Tier3' / 'DATASET')
+    job = (_write_untracked, (out_dir, 'OBS_DATASET_tas.nc'))
+    get_jobs = mocker.patch.object(Formatter,
+                                   '_get_format_jobs',
+                                   return_value=[job])
+    (tmp_path / 'session' / 'Tier3' / 'DATASET').mkdir(parents=True)
+    formatter.format(None, None, install=False, incremental=True)
+
+    target_dir = tmp_path / 'OBS' / 'Tier3' / 'DATASET'
+    assert sorted(p.name for p in target_dir.iterdir()) == [
+        'OBS_DATASET_tas.nc', MANIFEST_FILE
+    ]
+    assert get_jobs.call_count == 1
+
+    # The job is up to date now
+    run_jobs = mocker.patch('esmvaltool.cmorizers.data.cmorizer.run_jobs',
+                            return_value=[])
+    formatter.format(None, None, install=False, incremental=True)
+    assert run_jobs.call_args.args[0] == {'DATASET': []}
+
+
+def test_format_incremental_untracked_multiple_jobs(mocker, tmp_path,
+                                                    formatter):
+    """Test that output of several untracked jobs is not recorded."""
+    out_dir = str(tmp_path / 'session' / 'Tier3' / 'DATASET')
+    jobs = [
+        (_write_untracked, (out_dir, 'OBS_DATASET_tas.nc')),
+        (_write_untracked, (out_dir, 'OBS_DATASET_pr.nc')),
+    ]
+    mocker.patch.object(Formatter, '_get_format_jobs', return_value=jobs)
+    (tmp_path / 'session' / 'Tier3' / 'DATASET').mkdir(parents=True)
+    formatter.format(None, None, install=False, incremental=True)
+
+    target_dir = tmp_path / 'OBS' / 'Tier3' / 'DATASET'
+    assert sorted(p.name for p in target_dir.iterdir()) == [
+        'OBS_DATASET_pr.nc', 'OBS_DATASET_tas.nc', MANIFEST_FILE
+    ]
+    run_jobs = mocker.patch('esmvaltool.cmorizers.data.cmorizer.run_jobs',
+                            return_value=[])
+    formatter.format(None, None, install=False, incremental=True)
+    assert run_jobs.call_args.args[0] == {'DATASET': jobs}
@@ -0,0 +1,268 @@
+"""Tests for the concurrent and resumable data downloaders."""
+import os
+import subprocess
+import threading
+from datetime import datetime
+
+import pytest
+
+from esmvaltool.cmorizers.data.downloaders import ftp
+from esmvaltool.cmorizers.data.downloaders.datasets import patmos_x
+from esmvaltool.cmorizers.data.downloaders.downloader import DownloadManifest
+from esmvaltool.cmorizers.data.downloaders.wget import WGetDownloader
+
+FILES = {f'data/file{i}.nc': bytes(range(i, 256)) * 10 for i in range(6)}
+
+
+class FakeFTP:
+    """In-process stand-in for :class:`ftplib.FTP`."""
+
+    files = FILES
+    connections = []
+    truncate = False
+
+    def __init__(self, server):
+        self.server = server
+        self.cwd_path = '/'
+        self.thread = threading.get_ident()
+        self.offsets = []
+        self.closed = False
+        self.connections.append(self)
+
+    def quit(self):
+        self.closed = True
+
+    def getwelcome(self):
+        return 'welcome'
+
+    def login(self):
+        pass
+
+    def cwd(self, path):
+        self.cwd_path = path
+
+    def pwd(self):
+        return self.cwd_path
+
+    def sendcmd(self, command):
+        pass
+
+    def nlst(self, path='.'):
+        return [name for name in self.files if name.startswith(path)]
+
+    def size(self, path):
+        return len(self.files[path])
+
+    def retrbinary(self, command, callback, rest=None):
+        assert threading.get_ident() == self.thread
+        data = self.files[command.split(' ', 1)[1]]
+        self.offsets.append(rest or 0)
+        if self.truncate:
+            data = data[:-10]
+        for start in range(rest or 0, len(data), 100):
+            callback(data[start:start + 100])
+
+
+@pytest.fixture
+def downloader(monkeypatch, tmp_path):
+    monkeypatch.setattr(ftp.ftplib, 'FTP', FakeFTP)
+    monkeypatch.setattr(FakeFTP, 'connections', [])
+    config = {'rootpath': {'RAWOBS': [str(tmp_path)]}}
+    downloader = ftp.FTPDownloader(config, 'ftp.server', 'DATASET',
+                                   {'tier': 3}, False, max_connections=3)
+    downloader.connect()
+    downloader.set_cwd('/pub')
+    return downloader
+
+
+def test_download_folder_concurrent(downloader):
+    """Test that a folder is downloaded over several connections."""
+    downloader.download_folder('data', filter_files=r'file[0-4]\.nc')
+    for i in range(5):
+        path = f'{downloader.local_folder}/file{i}.nc'
+        with open(path, 'rb') as file:
+            assert file.read() == FILES[f'data/file{i}.nc']
+        assert downloader.manifest.is_complete(path)
+    workers = [conn for conn in FakeFTP.connections if conn.offsets]
+    assert 1 < len(workers) <= 3
+    assert all(conn.cwd_path == '/pub' for conn in workers)
+    assert all(conn.closed for conn in workers)
+    assert not FakeFTP.connections[0].closed
+
+
+def test_download_file_resume(downloader):
+    """Test that a partial download is resumed."""
+    data = FILES['data/file1.nc']
+    part = f'{downloader.local_folder}/.file1.nc.part'
+    downloader.download_file('data/file2.nc')
+    with open(part, 'wb') as file:
+        file.write(data[:1000])
+    downloader.download_file('data/file1.nc')
+    with open(f'{downloader.local_folder}/file1.nc', 'rb') as file:
+        assert file.read() == data
+    assert FakeFTP.connections[0].offsets == [0, 1000]
+
+
+def test_download_file_incomplete(downloader, monkeypatch):
+    """Test that a truncated download is kept for resuming."""
+    monkeypatch.setattr(FakeFTP, 'truncate', True)
+    with pytest.raises(IOError, match='expected'):
+        downloader.download_file('data/file3.nc')
+    folder = downloader.local_folder
+    assert not downloader.manifest.is_complete(f'{folder}/file3.nc')
+    with open(f'{folder}/.file3.nc.part', 'rb') as file:
+        assert file.read() == FILES['data/file3.nc'][:-10]
+
+
+def test_download_file_skip(downloader):
+    """Test that completely downloaded files are skipped."""
+    downloader.download_file('data/file0.nc')
+    downloader.download_file('data/file0.nc')
+    assert FakeFTP.connections[0].offsets == [0]
+
+    path = f'{downloader.local_folder}/file0.nc'
+    with open(path, 'ab') as file:
+        file.write(b'extra')
+    manifest = DownloadManifest(downloader.local_folder)
+    assert not manifest.is_complete(path)
+
+
+def test_download_errors_raised(downloader, monkeypatch):
+    """Test that errors in background downloads are raised."""
+    monkeypatch.setattr(FakeFTP, 'truncate', True)
+    with pytest.raises(IOError):
+        downloader.download_folder('data')
+
+
+@pytest.fixture
+def wget_downloader(tmp_path):
+    config = {'rootpath': {'RAWOBS': [str(tmp_path)]}}
+    return WGetDownloader(config, 'DATASET', {'tier': 2}, False)
+
+
+def _fake_wget(fail_urls=(), index=False):
+    """Fake wget that writes the requested URLs to the output paths."""
+
+    def _wget(command):
+        url = command[-2] if command[-1] == '--continue' else command[-1]
+        options = dict(
+            option[2:].split('=', 1) for option in command
+            if option.startswith('--') and '=' in option)
+        if 'output-document' in options:
+            path = options['output-document']
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write(url)
+        else:
+            folder = options['directory-prefix']
+            assert os.path.isdir(folder)
+            name = url.rstrip('/').rsplit('/', 1)[-1]
+            if index:
+                with open(os.path.join(folder, 'index.html'), 'w',
+                          encoding='utf-8') as file:
+                    file.write(url)
+            for i in range(2):
+                with open(os.path.join(folder, f'{name}{i}'), 'a',
+                          encoding='utf-8') as file:
+                    file.write(url)
+        if url in fail_urls:
+            raise subprocess.CalledProcessError(4, command)
+
+    return _wget
+
+
+def test_wget_download_file(mocker, wget_downloader):
+    """Test that wget downloads are continued and recorded."""
+    downloader = wget_downloader
+    folder = downloader.local_folder
+    check_output = mocker.patch(
+        'esmvaltool.cmorizers.data.downloaders.wget.subprocess.check_output',
+        side_effect=_fake_wget())
+    with downloader.concurrent():
+        downloader.download_file('https://server/file.nc', ['--quiet'])
+    check_output.assert_called_once_with([
+        'wget',
+        '--quiet',
+        f'--output-document={folder}/.file.nc.part',
+        'https://server/file.nc',
+        '--continue',
+    ])
+    assert downloader.manifest.is_complete(f'{folder}/file.nc')
+    assert not os.path.exists(f'{folder}/.file.nc.part')
+    downloader.download_file('https://server/file.nc', ['--quiet'])
+    check_output.assert_called_once()
+
+
+def test_wget_download_file_interrupted(mocker, wget_downloader):
+    """Test that failed wget downloads are not moved into place."""
+    downloader = wget_downloader
+    folder = downloader.local_folder
+    url = 'https://server/file.nc'
+    check_output = mocker.patch(
+        'esmvaltool.cmorizers.data.downloaders.wget.subprocess.check_output',
+        side_effect=_fake_wget(fail_urls=[url]))
+    with pytest.raises(subprocess.CalledProcessError):
+        downloader.download_file(url, [])
+    assert not os.path.exists(f'{folder}/file.nc')
+    assert not downloader.manifest.is_complete(f'{folder}/file.nc')
+
+    check_output.side_effect = _fake_wget()
+    downloader.download_file(url, [])
+    assert check_output.call_count == 2
+    assert check_output.call_args[0][0][-1] == '--continue'
+    with open(f'{folder}/file.nc', encoding='utf-8') as file:
+        assert file.read() == url + url
+
+
+def test_wget_download_folder(mocker, wget_downloader):
+    """Test concurrent and resumable wget folder downloads."""
+    downloader = wget_downloader
+    folder = downloader.local_folder
+    urls = [f'https://server/{year}/' for year in range(1990, 1995)]
+    check_output = mocker.patch(
+        'esmvaltool.cmorizers.data.downloaders.wget.subprocess.check_output',
+        side_effect=_fake_wget(fail_urls=urls[-1:]))
+    with pytest.raises(subprocess.CalledProcessError):
+        with downloader.concurrent():
+            for url in urls:
+                downloader.download_folder(url, ['--quiet'])
+    assert check_output.call_count == 5
+    commands = [c[0][0] for c in check_output.call_args_list]
+    assert len({c[3] for c in commands}) == 5
+    assert all(c[:3] == ['wget', '--quiet', '--continue'] for c in commands)
+    for url in urls[:-1]:
+        assert downloader.manifest.is_folder_complete(url)
+    assert not downloader.manifest.is_folder_complete(urls[-1])
+    assert sorted(os.listdir(folder)) == [
+        '.download_manifest.jsonl', '.wget', '19900', '19901', '19910',
+        '19911', '19920', '19921', '19930', '19931'
+    ]
+
+    # Only the incomplete folder is downloaded again
+    check_output.side_effect = _fake_wget()
+    for url in urls:
+        downloader.download_folder(url, ['--quiet'])
+    assert check_output.call_count == 6
+    assert not os.path.exists(f'{folder}/.wget')
+    with open(f'{folder}/19940', encoding='utf-8') as file:
+        assert file.read() == urls[-1] * 2
+
+
+def test_patmos_x_download_dataset(mocker, tmp_path):
+    """Test that the index file is removed after the downloads finished."""
+    config = {'rootpath': {'RAWOBS': [str(tmp_path)]}}
+    check_output = mocker.patch(
+        'esmvaltool.cmorizers.data.downloaders.wget.subprocess.check_output',
+        side_effect=_fake_wget(index=True))
+    start = datetime(2000, 1, 1)
+    end = datetime(2001, 1, 1)
+    patmos_x.download_dataset(config, 'PATMOS-x', {'tier': 2}, start, end,
+                              False)
+    assert check_output.call_count == 2
+    folder = tmp_path / 'Tier2' / 'PATMOS-x'
+    assert 'index.html' not in os.listdir(folder)
+
+    # All folders were downloaded before
+    patmos_x.download_dataset(config, 'PATMOS-x', {'tier': 2}, start, end,
+                              False)
+    assert check_output.call_count == 2
@@ -0,0 +1,162 @@
+"""Tests for the module :mod:`esmvaltool.cmorizers.data.manifest`."""
+import os
+
+from esmvaltool.cmorizers.data import manifest as manifest_module
+from esmvaltool.cmorizers.data.manifest import (
+    MANIFEST_FILE,
+    Manifest,
+    file_checksum,
+)
+
+
+def _extract_variable(in_files, var, cfg, out_dir):
+    """Pretend to CMORize a variable."""
+
+
+def _cmorization(in_dir, out_dir, cfg):
+    """Pretend to CMORize a dataset."""
+
+
+def _setup(tmp_path):
+    """Create an input file and an output directory."""
+    in_file = tmp_path / 'raw' / 'tas_2000.nc'
+    in_file.parent.mkdir()
+    in_file.write_text('raw data')
+    out_dir = tmp_path / 'run' / 'Tier3' / 'DATASET'
+    out_dir.mkdir(parents=True)
+    target_dir = tmp_path / 'OBS' / 'Tier3' / 'DATASET'
+    return str(in_file), str(out_dir), target_dir
+
+
+def _run(manifest, job, out_dir, name='OBS6_tas_200001-200012.nc'):
+    """Run the outdated jobs and record their output."""
+    jobs, records = manifest.outdated([job])
+    for index, _ in enumerate(jobs):
+        output = os.path.join(out_dir, name)
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write('cmorized data')
+        manifest.record(*records[index], [output])
+    manifest.save()
+    return jobs
+
+
+def test_file_checksum(tmp_path):
+    """Test the checksum of a file."""
+    path = tmp_path / 'file.txt'
+    path.write_text('abc')
+    assert file_checksum(path) == (
+        'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad')
+
+
+def test_incremental(tmp_path):
+    """Test that only jobs with changed input are run again."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    cfg = {'attributes': {'version': '1'}}
+    job = (_extract_variable, ([in_file], {'short_name': 'tas'}, cfg, out_dir))
+
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    assert _run(manifest, job, out_dir) == [job]
+    assert (target_dir / MANIFEST_FILE).exists()
+    assert (target_dir / 'OBS6_tas_200001-200012.nc').exists()
+    assert not os.listdir(out_dir)
+
+    # Unchanged input and a different output directory
+    new_out_dir = str(tmp_path / 'run2')
+    manifest = Manifest(target_dir, ignore={'out_dir': new_out_dir})
+    job = (_extract_variable, ([in_file], {'short_name': 'tas'}, cfg,
+                               new_out_dir))
+    assert manifest.outdated([job])[0] == []
+
+    # Modification time changed, but not the content
+    os.utime(in_file, (0, 0))
+    assert manifest.outdated([job])[0] == []
+
+    # Content changed
+    with open(in_file, 'a', encoding='utf-8') as file:
+        file.write(' and more')
+    assert manifest.outdated([job])[0] == [job]
+
+
+def test_incremental_config_changed(tmp_path):
+    """Test that jobs are run again if their configuration changed."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    job = (_extract_variable, ([in_file], {'short_name': 'tas'}, {}, out_dir))
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    _run(manifest, job, out_dir)
+
+    new_job = (_extract_variable, ([in_file], {'short_name': 'tas'}, {
+        'attributes': {'version': '2'}
+    }, out_dir))
+    assert _run(manifest, new_job, out_dir) == [new_job]
+    assert len(manifest.entries) == 1
+
+    # The old configuration no longer owns the output
+    assert manifest.outdated([job])[0] == [job]
+
+
+def test_incremental_output_missing(tmp_path):
+    """Test that jobs are run again if their output is missing."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    job = (_extract_variable, ([in_file], {'short_name': 'tas'}, {}, out_dir))
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    _run(manifest, job, out_dir)
+
+    (target_dir / 'OBS6_tas_200001-200012.nc').unlink()
+
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    assert manifest.outdated([job])[0] == [job]
+
+
+def test_no_output_not_recorded(tmp_path):
+    """Test that jobs without tracked output are always run."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    job = (_extract_variable, ([in_file], {}, {}, out_dir))
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    _, records = manifest.outdated([job])
+    manifest.record(*records[0], [])
+
+    assert manifest.outdated([job])[0] == [job]
+
+
+def test_checksum_once_per_run(tmp_path, mocker):
+    """Test that shared input files are only checksummed once."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    checksum = mocker.spy(manifest_module, 'file_checksum')
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    for short_name in ('tas', 'pr'):
+        job = (_extract_variable, ([in_file], {
+            'short_name': short_name
+        }, {}, out_dir))
+        _run(manifest, job, out_dir, name=f'OBS6_{short_name}.nc')
+    paths = [call.args[0] for call in checksum.call_args_list]
+    assert paths.count(in_file) == 1
+
+
+def test_directory_input(tmp_path):
+    """Test that directories are only inputs of jobs without files."""
+    in_file, out_dir, target_dir = _setup(tmp_path)
+    in_dir = os.path.dirname(in_file)
+    other_file = os.path.join(in_dir, 'tas_2001.nc')
+    with open(other_file, 'w', encoding='utf-8') as file:
+        file.write('more raw data')
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+
+    job = (_cmorization, (in_dir, out_dir, {}))
+    _, record = manifest.fingerprint(job)
+    assert sorted(record['inputs']) == sorted([in_file, other_file])
+
+    job = (_extract_variable, ([in_file], in_dir, {}, out_dir))
+    _, record = manifest.fingerprint(job)
+    assert list(record['inputs']) == [in_file]
+
+
+def test_install_untracked(tmp_path):
+    """Test that untracked output is moved into place."""
+    _, out_dir, target_dir = _setup(tmp_path)
+    output = os.path.join(out_dir, 'OBS_DATASET_sat_1_Amon_tas.nc')
+    with open(output, 'w', encoding='utf-8') as file:
+        file.write('cmorized data')
+    manifest = Manifest(target_dir, ignore={'out_dir': out_dir})
+    assert manifest.install([output]) == ['OBS_DATASET_sat_1_Amon_tas.nc']
+    assert (target_dir / 'OBS_DATASET_sat_1_Amon_tas.nc').exists()
+    assert not manifest.entries
@@ -0,0 +1,64 @@
+"""Tests for the module :mod:`esmvaltool.cmorizers.data.scheduler`."""
+import pytest
+
+from esmvaltool.cmorizers.data.scheduler import get_n_workers, run_jobs
+
+
+def _write(path, text):
+    """Write text to a file."""
+    path.write_text(text)
+
+
+def _fail(message):
+    """Raise an error."""
+    raise ValueError(message)
+
+
+@pytest.mark.parametrize('config, n_workers', [
+    ({'max_parallel_tasks': 1}, 1),
+    ({'max_parallel_tasks': 4}, 4),
+    ({'max_parallel_tasks': 0}, 1),
+])
+def test_get_n_workers(config, n_workers):
+    """Test getting the number of workers."""
+    assert get_n_workers(config) == n_workers
+
+
+def test_get_n_workers_default(mocker):
+    """Test that the number of CPUs is used by default."""
+    mocker.patch('esmvaltool.cmorizers.data.scheduler.os.cpu_count',
+                 return_value=8)
+    assert get_n_workers({'max_parallel_tasks': None}) == 8
+    assert get_n_workers({}) == 8
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_run_jobs(tmp_path, n_workers):
+    """Test running jobs for multiple datasets."""
+    jobs = {
+        'A': [(_write, (tmp_path / f'a{i}.txt', 'a')) for i in range(3)],
+        'B': [(_write, (tmp_path / 'b.txt', 'b'))],
+        'C': [],
+    }
+
+    failed = run_jobs(jobs, n_workers)
+
+    assert failed == []
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'a0.txt', 'a1.txt', 'a2.txt', 'b.txt'
+    ]
+
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_run_jobs_failed(tmp_path, n_workers):
+    """Test that a failing job only affects its own dataset."""
+    jobs = {
+        'A': [(_fail, ('error', )), (_write, (tmp_path / 'a.txt', 'a'))],
+        'B': [(_write, (tmp_path / 'b.txt', 'b'))],
+    }
+
+    failed = run_jobs(jobs, n_workers)
+
+    assert failed == ['A']
+    assert (tmp_path / 'a.txt').read_text() == 'a'
+    assert (tmp_path / 'b.txt').read_text() == 'b'
@@ -1,5 +1,8 @@
 """Tests for the module :mod:`esmvaltool.cmorizers.data.utilities`."""
 
+import gzip
+import os
+import tarfile
 from unittest.mock import Mock
 
 import dask.array as da
@@ -338,3 +341,124 @@ def test_read_cmor_config():
     assert 'thetao' in cfg['variables']
     assert 'Omon' in cfg['cmor_table'].tables
     assert 'thetao' in cfg['cmor_table'].tables['Omon']
+
+
+def _write_archives(folder):
+    """Create nested archives in a folder."""
+    (folder / 'a.txt').write_text('a' * 100)
+    with gzip.open(folder / 'b.txt.gz', 'wt') as file:
+        file.write('b' * 100)
+    with tarfile.open(folder / 'c.tar.gz', 'w:gz') as tar:
+        tar.add(folder / 'b.txt.gz', arcname='c/b.txt.gz')
+        tar.add(folder / 'a.txt', arcname='c/a.txt')
+    (folder / 'sub').mkdir()
+    with tarfile.open(folder / 'sub' / 'd.tar', 'w') as tar:
+        tar.add(folder / 'a.txt', arcname='d.txt')
+    (folder / 'a.txt').unlink()
+
+
+def _list_files(folder):
+    """List the files in a folder without hidden files."""
+    return sorted(f for f in os.listdir(folder) if not f.startswith('.'))
+
+
+@pytest.mark.parametrize('n_workers', [1, 4])
+def test_unpack_files_in_folder(tmp_path, n_workers):
+    """Test unpacking nested archives."""
+    _write_archives(tmp_path)
+
+    utils.unpack_files_in_folder(str(tmp_path), n_workers=n_workers)
+
+    assert _list_files(tmp_path) == ['a.txt', 'b.txt', 'd.txt']
+    assert (tmp_path / 'b.txt').read_text() == 'b' * 100
+    assert (tmp_path / 'd.txt').read_text() == 'a' * 100
+
+
+def test_unpack_files_in_folder_present(tmp_path, mocker):
+    """Test that files which are already present are not unpacked again."""
+    _write_archives(tmp_path)
+    utils.unpack_files_in_folder(str(tmp_path))
+    (tmp_path / 'd.txt').write_text('y' * 99)
+
+    _write_archives(tmp_path)
+    gzip_open = mocker.spy(utils.gzip, 'open')
+    utils.unpack_files_in_folder(str(tmp_path))
+
+    assert _list_files(tmp_path) == ['a.txt', 'b.txt', 'd.txt']
+    assert (tmp_path / 'b.txt').read_text() == 'b' * 100
+    assert (tmp_path / 'd.txt').read_text() == 'a' * 100
+    gzip_open.assert_not_called()
+
+
+def test_gunzip_changed(tmp_path):
+    """Test that unpacked files are replaced if they or the archive change."""
+    with gzip.open(tmp_path / 'b.txt.gz', 'wt') as file:
+        file.write('b' * 100)
+    assert utils._gunzip(str(tmp_path / 'b.txt.gz'), str(tmp_path)) == 100
+    assert utils._gunzip(str(tmp_path / 'b.txt.gz'), str(tmp_path)) == 0
+
+    # Existing file changed
+    (tmp_path / 'b.txt').write_text('x' * 100)
+    os.utime(tmp_path / 'b.txt', (0, 0))
+    assert utils._gunzip(str(tmp_path / 'b.txt.gz'), str(tmp_path)) == 100
+    assert (tmp_path / 'b.txt').read_text() == 'b' * 100
+
+    # Archive changed
+    with gzip.open(tmp_path / 'b.txt.gz', 'wt') as file:
+        file.write('c' * 100)
+    assert utils._gunzip(str(tmp_path / 'b.txt.gz'), str(tmp_path)) == 100
+    assert (tmp_path / 'b.txt').read_text() == 'c' * 100
+
+
+def test_gunzip_unknown_file(tmp_path):
+    """Test that files that were not unpacked before are replaced."""
+    with gzip.open(tmp_path / 'b.txt.gz', 'wt') as file:
+        file.write('b' * 100)
+    (tmp_path / 'b.txt').write_text('x' * 100)
+
+    utils.unpack_files_in_folder(str(tmp_path))
+
+    assert _list_files(tmp_path) == ['b.txt']
+    assert (tmp_path / 'b.txt').read_text() == 'b' * 100
+
+
+def test_gunzip_multiple_members(tmp_path):
+    """Test that the trailer of the last member is not trusted."""
+    with open(tmp_path / 'b.txt.gz', 'wb') as file:
+        file.write(gzip.compress(b'a' * 50))
+        file.write(gzip.compress(b'b' * 100))
+    (tmp_path / 'b.txt').write_text('b' * 100)
+
+    utils.unpack_files_in_folder(str(tmp_path))
+
+    assert _list_files(tmp_path) == ['b.txt']
+    assert (tmp_path / 'b.txt').read_text() == 'a' * 50 + 'b' * 100
+
+
+def test_untar_nested_members(tmp_path):
+    """Test that nested members are compared with their own target."""
+    (tmp_path / 'a.txt').write_text('a' * 100)
+    with tarfile.open(tmp_path / 'e.tar', 'w') as tar:
+        tar.add(tmp_path / 'a.txt', arcname='e/x.txt')
+    (tmp_path / 'a.txt').unlink()
+    # Unrelated file with the same name and size
+    (tmp_path / 'x.txt').write_text('x' * 100)
+    (tmp_path / 'e').mkdir()
+
+    assert utils._untar(str(tmp_path / 'e.tar'), str(tmp_path)) == 100
+    assert (tmp_path / 'e' / 'x.txt').read_text() == 'a' * 100
+    assert (tmp_path / 'x.txt').read_text() == 'x' * 100
+    assert sorted(os.listdir(tmp_path / 'e')) == ['x.txt']
+
+    # Already present
+    assert utils._untar(str(tmp_path / 'e.tar'), str(tmp_path)) == 0
+
+
+def test_untar_outside_folder(tmp_path):
+    """Test that members outside of the folder are rejected."""
+    (tmp_path / 'a.txt').write_text('a')
+    with tarfile.open(tmp_path / 'e.tar', 'w') as tar:
+        tar.add(tmp_path / 'a.txt', arcname='../a.txt')
+    (tmp_path / 'out').mkdir()
+    with pytest.raises(tarfile.TarError):
+        utils._untar(str(tmp_path / 'e.tar'), str(tmp_path / 'out'))
@@ -0,0 +1,174 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.arctic_ocean.getdata`."""
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+from esmvaltool.diag_scripts.arctic_ocean.getdata import (
+    hofm_data,
+    hofm_extract_regions,
+    hofm_region_weights,
+    load_meta,
+)
+from esmvaltool.diag_scripts.arctic_ocean.regions import hofm_regions
+from esmvaltool.diag_scripts.arctic_ocean.utils import genfilename
+
+LON = np.arange(0.0, 360.0, 20.0)
+LAT = np.arange(50.0, 90.0, 5.0)
+LEV = np.array([5.0, 50.0, 150.0, 500.0, 1500.0, 3000.0])
+REGIONS = ['EB', 'AB', 'Barents_sea']
+N_TIME = 7
+
+
+def write_data(path, climatology=False):
+    """Write netCDF files with ocean data and cell areas."""
+    random_state = np.random.RandomState(0)
+    shape = (N_TIME, len(LEV), len(LAT), len(LON))
+    data = np.ma.masked_array(random_state.normal(loc=1.0, size=shape))
+    # Randomly masked cells
+    data[random_state.uniform(size=shape) < 0.2] = np.ma.masked
+    # Land (masked for all levels and time steps)
+    data[:, :, 6, 2:4] = np.ma.masked
+    # Sea floor in the Barents Sea above the deepest level
+    data[:, 2:, 4:7, 1:3] = np.ma.masked
+    # A time step where all cells of a level are masked
+    data[3, 1] = np.ma.masked
+    if climatology:
+        data = data[0]
+
+    areacello = np.ma.masked_array(
+        np.cos(np.deg2rad(LAT))[:, np.newaxis] *
+        random_state.uniform(0.5, 1.5, size=(len(LAT), len(LON))))
+    areacello[6, 2:4] = np.ma.masked
+
+    filename = str(path / 'thetao.nc')
+    with Dataset(filename, 'w') as dataset:
+        dataset.createDimension('time', None)
+        dataset.createDimension('lev', len(LEV))
+        dataset.createDimension('lat', len(LAT))
+        dataset.createDimension('lon', len(LON))
+        time = dataset.createVariable('time', 'f8', ('time', ))
+        time.units = 'days since 2000-01-01'
+        time[:] = np.arange(1 if climatology else N_TIME) * 30.0 + 15.0
+        dataset.createVariable('lev', 'f8', ('lev', ))[:] = LEV
+        dataset.createVariable('lat', 'f8', ('lat', ))[:] = LAT
+        dataset.createVariable('lon', 'f8', ('lon', ))[:] = LON
+        dims = ('lev', 'lat', 'lon')
+        if not climatology:
+            dims = ('time', ) + dims
+        variable = dataset.createVariable('thetao', 'f8', dims,
+                                          fill_value=1e20)
+        variable[:] = data
+    fx_filename = str(path / 'areacello.nc')
+    with Dataset(fx_filename, 'w') as dataset:
+        dataset.createDimension('lat', len(LAT))
+        dataset.createDimension('lon', len(LON))
+        variable = dataset.createVariable('areacello', 'f8', ('lat', 'lon'),
+                                          fill_value=1e20)
+        variable[:] = areacello
+    return (filename, fx_filename, data, areacello)
+
+
+def get_expected_means(data, areacello, region, n_levels):
+    """Straightforward area weighted mean for each level and time step."""
+    if data.ndim < 4:
+        data = data[np.newaxis]
+    lon2d, lat2d = np.meshgrid(LON, LAT)
+    (indexesi, indexesj) = hofm_regions(region, lon2d, lat2d)
+    expected = np.full((n_levels, data.shape[0]), np.nan)
+    for time in range(data.shape[0]):
+        for level in range(n_levels):
+            total = 0.0
+            total_area = 0.0
+            for (idx_i, idx_j) in zip(indexesi, indexesj):
+                value = data[time, level, idx_i, idx_j]
+                area = areacello[idx_i, idx_j]
+                if value is np.ma.masked or area is np.ma.masked:
+                    continue
+                total += area * value
+                total_area += area
+            if total_area > 0.0:
+                expected[level, time] = total / total_area
+    return expected
+
+
+def test_hofm_extract_regions(tmp_path):
+    """Test means over the regions for a block of data."""
+    (filename, fx_filename, data, areacello) = write_data(tmp_path)
+    metadata = load_meta(filename, fx_filename)
+    (window, region_weights) = hofm_region_weights(metadata, REGIONS)
+    variable = metadata['datafile'].variables['thetao']
+    block = variable[:, :, window[0], window[1]]
+    result = hofm_extract_regions(block, region_weights)
+    metadata['datafile'].close()
+    assert list(result) == REGIONS
+    for region in REGIONS:
+        expected = get_expected_means(data, areacello, region, len(LEV))
+        assert result[region].shape == (len(LEV), N_TIME)
+        np.testing.assert_allclose(result[region], expected, rtol=1e-12)
+        assert np.isnan(result[region][1, 3])
+
+
+def test_hofm_extract_regions_zero_as_missing():
+    """Test that zeros are treated as missing values in unmasked data."""
+    lon2d, lat2d = np.meshgrid(LON, LAT)
+    metadata = {
+        'lon2d': lon2d,
+        'lat2d': lat2d,
+        'areacello': np.ones(lon2d.shape),
+    }
+    (window, region_weights) = hofm_region_weights(metadata, ['Barents_sea'])
+    data = np.ones((1, 2) + lon2d.shape)
+    data[0, 0, 4, 1] = 0.0
+    data[0, 1, 4, 1:3] = 0.0
+    data[0, 0, 5, 2] = 4.0
+    result = hofm_extract_regions(data[..., window[0], window[1]],
+                                  region_weights)
+    n_points = len(hofm_regions('Barents_sea', lon2d, lat2d)[0])
+    expected_mean = (n_points - 2 + 4.0) / (n_points - 1)
+    np.testing.assert_allclose(result['Barents_sea'][:, 0],
+                               [expected_mean, 1.0])
+
+
+@pytest.mark.parametrize('block_size', [1, 3, 5, 12])
+@pytest.mark.parametrize('climatology', [False, True])
+def test_hofm_data(tmp_path, block_size, climatology):
+    """Test Hovmoeller data saved by ``hofm_data``."""
+    (filename, fx_filename, data, areacello) = write_data(tmp_path,
+                                                          climatology)
+    (tmp_path / 'run').mkdir()
+    (tmp_path / 'work').mkdir()
+    cfg = {
+        'hofm_block_size': block_size,
+        'hofm_depth': 1000,
+        'input_data': {
+            fx_filename: {
+                'dataset': 'MODEL',
+                'filename': fx_filename,
+                'short_name': 'areacello',
+            },
+        },
+        'run_dir': str(tmp_path / 'run'),
+        'work_dir': str(tmp_path / 'work'),
+    }
+    hofm_data(cfg, {'MODEL': filename}, 'MODEL', 'thetao', REGIONS)
+
+    # All levels down to hofm_depth and the next deeper level
+    n_levels = 5
+    for region in REGIONS:
+        ofilename = genfilename(str(tmp_path / 'work'),
+                                variable='thetao',
+                                mmodel='MODEL',
+                                region=region,
+                                data_type='hofm')
+        result = np.load(ofilename + '.npy')
+        expected = get_expected_means(data, areacello, region, n_levels)
+        assert result.shape == (n_levels, 1 if climatology else N_TIME)
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+    barents_sea = np.load(
+        genfilename(str(tmp_path / 'work'),
+                    variable='thetao',
+                    mmodel='MODEL',
+                    region='Barents_sea',
+                    data_type='hofm') + '.npy')
+    assert np.all(np.isnan(barents_sea[2:]))
@@ -0,0 +1,128 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.iht_toa.poisson_solver`."""
+
+import logging
+
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.iht_toa.poisson_solver import (
+    SphericalPoisson,
+    sparse_laplacian,
+    stencil_coefficients,
+    swap_bounds,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_source(shape, seed=0):
+    """Get smooth source terms (in W) with zero weighted mean."""
+    random_state = np.random.RandomState(seed)
+    lat = np.pi * ((np.arange(shape[-2]) + 0.5) / shape[-2] - 0.5)[:, None]
+    lon = np.linspace(0.0, 2.0 * np.pi, shape[-1], endpoint=False)
+    source = []
+    for (amp_1, amp_2) in random_state.uniform(size=(int(np.prod(shape[:-2])),
+                                                     2)):
+        field = (np.cos(2.0 * lat) + amp_1 * np.sin(lon) * np.cos(lat) +
+                 amp_2 * np.cos(3.0 * lon) * np.cos(lat)**3)
+        weights = np.broadcast_to(np.cos(lat), field.shape)
+        source.append(field - np.average(field, weights=weights))
+    return np.reshape(source, shape) * 6371e3**2
+
+
+def test_swap_bounds():
+    """Test that the halo is periodic and wraps across the poles."""
+    array = np.zeros((2, 5, 6))
+    array[:, 1:-1, 1:-1] = np.arange(24.0).reshape(2, 3, 4)
+    swap_bounds(array)
+    np.testing.assert_array_equal(array[0, 0], [1, 2, 3, 0, 1, 2])
+    np.testing.assert_array_equal(array[0, -1], [9, 10, 11, 8, 9, 10])
+    np.testing.assert_array_equal(array[1, 2], [19, 16, 17, 18, 19, 16])
+
+
+def test_sparse_laplacian():
+    """Test that the sparse matrix is the symmetric five-point stencil."""
+    shape = (6, 8)
+    (hpi, _) = stencil_coefficients(shape)
+    matrix = sparse_laplacian(shape)
+    solver = SphericalPoisson(logger, np.zeros(shape))
+    x_matrix = np.zeros((8, 10))
+    x_matrix[1:-1, 1:-1] = np.random.RandomState(0).normal(size=shape)
+    expected = solver.calc_ax(x_matrix)[1:-1, 1:-1] * hpi[:, np.newaxis]
+    np.testing.assert_allclose((matrix @ x_matrix[1:-1, 1:-1].ravel()),
+                               expected.ravel())
+    assert abs(matrix - matrix.T).max() == 0.0
+    np.testing.assert_allclose(matrix.sum(axis=1), 0.0, atol=1e-10)
+
+
+@pytest.mark.parametrize('solver', ['iterative', 'direct'])
+def test_sparse_solvers(solver):
+    """Test that the sparse solvers agree with the stencil solver."""
+    source = get_source((3, 36, 72))
+    results = {}
+    for name in ('stencil', solver):
+        poisson = SphericalPoisson(logger, source, solver=name)
+        poisson.solve()
+        poisson.calc_meridional_heat_transport()
+        results[name] = poisson
+    efp = results[solver].energy_flux_potential
+    ref_efp = results['stencil'].energy_flux_potential
+    assert efp.shape == (3, 38, 74)
+    np.testing.assert_allclose(
+        efp - efp.mean(axis=(1, 2), keepdims=True),
+        ref_efp - ref_efp.mean(axis=(1, 2), keepdims=True),
+        atol=1e-3 * np.abs(ref_efp).max())
+    mht = results[solver].meridional_heat_transport
+    ref_mht = results['stencil'].meridional_heat_transport
+    assert mht.shape == (3, 36)
+    np.testing.assert_allclose(mht, ref_mht,
+                               atol=1e-3 * np.abs(ref_mht).max())
+
+    poisson = SphericalPoisson(logger, source[1], solver=solver)
+    poisson.solve()
+    np.testing.assert_allclose(poisson.energy_flux_potential, efp[1])
+
+
+def test_invalid_solver():
+    """Test invalid solver."""
+    with pytest.raises(ValueError, match='Poisson solver'):
+        SphericalPoisson(logger, np.zeros((4, 8)), solver='fft')
+
+
+def test_set_matrices():
+    """Test the preconditioner factors against a loop over the grid."""
+    shape = (6, 8)
+    (_, a_matrix) = stencil_coefficients(shape)
+    alf = 0.9
+    expected = np.zeros((5, shape[0] + 1, shape[1] + 1))
+    expected[4] += 1.0
+    for j in range(1, shape[0] + 1):
+        for i in range(1, shape[1] + 1):
+            expected[2, j, i] = (a_matrix[2, j - 1, i - 1] /
+                                 (1.0 + alf * expected[0, j - 1, i]))
+            expected[1, j, i] = (a_matrix[1, j - 1, i - 1] /
+                                 (1.0 + alf * expected[3, j, i - 1]))
+            expected[4, j, i] = 1.0 / (
+                a_matrix[4, j - 1, i - 1] - expected[2, j, i] *
+                (expected[3, j - 1, i] - alf * expected[0, j - 1, i]) -
+                expected[1, j, i] *
+                (expected[0, j, i - 1] - alf * expected[3, j, i - 1]))
+            expected[0, j, i] = (
+                (a_matrix[0, j - 1, i - 1] -
+                 alf * expected[2, j, i] * expected[0, j - 1, i]) *
+                expected[4, j, i])
+            expected[3, j, i] = (
+                (a_matrix[3, j - 1, i - 1] -
+                 alf * expected[1, j, i] * expected[3, j, i - 1]) *
+                expected[4, j, i])
+    solver = SphericalPoisson(logger, np.zeros(shape))
+    np.testing.assert_allclose(solver.m_matrix, expected, rtol=1e-14)
+
+
+def test_stencil_coefficients_read_only():
+    """Test that the cached coefficients cannot be modified."""
+    (hpi, a_matrix) = stencil_coefficients((6, 8))
+    with pytest.raises(ValueError):
+        hpi[0] = 0.0
+    with pytest.raises(ValueError):
+        a_matrix[0, 0, 0] = 0.0
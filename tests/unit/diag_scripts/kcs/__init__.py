@@ -0,0 +1 @@
+"""Unit tests for the module :mod:`esmvaltool.diag_scripts.kcs`."""
@@ -0,0 +1,91 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.kcs.local_resampling`."""
+
+from itertools import product
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from esmvaltool.diag_scripts.kcs import local_resampling
+
+
+def _brute_force_top1000(segment_means, target):
+    """Select the best combinations by evaluating all of them at once."""
+    n_segments = len(segment_means.segment)
+    n_members = len(segment_means.ensemble_member)
+    values = segment_means.values
+    results = []
+    for combination in product(range(n_members), repeat=n_segments):
+        results.append(
+            list(combination) +
+            [abs(values[range(n_segments), combination].mean() - target)])
+    dataframe = pd.DataFrame(results,
+                             columns=list(range(n_segments)) + ['distance'])
+    return dataframe.sort_values('distance', kind='stable').head(1000)
+
+
+@pytest.mark.parametrize('branch_and_bound', [False, True])
+@pytest.mark.parametrize('chunk_size', [7, 1000, 2**20])
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_find_single_top1000(dtype, chunk_size, branch_and_bound):
+    """Test that the chunked search reproduces the full search."""
+    rng = np.random.default_rng(42)
+    segment_means = xr.DataArray(rng.gamma(2.0, 1.0, (5, 6)).astype(dtype),
+                                 dims=['segment', 'ensemble_member'])
+    target = segment_means.mean().values * 1.05
+    expected = _brute_force_top1000(segment_means, target)
+
+    top1000 = local_resampling._find_single_top1000(
+        segment_means,
+        target,
+        chunk_size=chunk_size,
+        branch_and_bound=branch_and_bound,
+    )
+
+    np.testing.assert_array_equal(top1000.index, expected.index)
+    pd.testing.assert_frame_equal(top1000, expected)
+
+
+def test_subset_penalties():
+    """Test that the batched penalties match the penalties per subset."""
+    rng = np.random.default_rng(42)
+    subsets = rng.integers(4, size=(100, 8, 6))
+    expected = []
+    for subset in subsets:
+        penalty = 0
+        for segment in subset.T:
+            _, counts = np.unique(segment, return_counts=True)
+            penalty += local_resampling._penalties(counts).sum()
+        expected.append(penalty)
+
+    penalties = local_resampling._subset_penalties(subsets, 4)
+
+    np.testing.assert_array_equal(penalties, expected)
+
+
+@pytest.mark.parametrize('refine', [False, True])
+def test_best_subset(refine):
+    """Test that the selection is reproducible and refinement helps."""
+    rng = np.random.default_rng(42)
+    combinations = pd.Series([rng.integers(3, size=6) for _ in range(12)])
+
+    subset = local_resampling._best_subset(combinations,
+                                           seed=1,
+                                           n_draws=50,
+                                           refine=refine)
+    unrefined = local_resampling._best_subset(combinations,
+                                              seed=1,
+                                              n_draws=50)
+
+    assert subset.shape == (8, 6)
+    pd.testing.assert_frame_equal(
+        subset,
+        local_resampling._best_subset(combinations,
+                                      seed=1,
+                                      n_draws=50,
+                                      refine=refine))
+    penalty = local_resampling._subset_penalties(subset.values[np.newaxis], 3)
+    unrefined_penalty = local_resampling._subset_penalties(
+        unrefined.values[np.newaxis], 3)
+    assert penalty <= unrefined_penalty
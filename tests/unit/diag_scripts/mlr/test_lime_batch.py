@@ -0,0 +1,87 @@
+"""Unit tests for the module :mod:`esmvaltool.diag_scripts.mlr.lime_batch`."""
+
+import numpy as np
+import pytest
+from lime.lime_tabular import LimeTabularExplainer
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+
+from esmvaltool.diag_scripts.mlr.lime_batch import LimeBatchExplainer
+
+
+def get_explainer(n_features, categorical_features, clf=None):
+    """Get fitted model and :class:`LimeTabularExplainer`."""
+    random_state = np.random.RandomState(0)
+    x_data = random_state.normal(size=(200, n_features))
+    x_data[:, 1] *= 5.0
+    for idx in categorical_features:
+        x_data[:, idx] = random_state.randint(0, 3, 200)
+    y_data = x_data[:, 0] + np.sin(x_data[:, 1]) + 0.1 * x_data[:, -1]**2
+    if clf is None:
+        clf = GradientBoostingRegressor(n_estimators=20, random_state=0)
+    clf.fit(x_data, y_data)
+    explainer = LimeTabularExplainer(
+        x_data,
+        mode='regression',
+        training_labels=y_data,
+        categorical_features=categorical_features,
+        discretize_continuous=False,
+        sample_around_instance=True,
+        random_state=1,
+    )
+    return (x_data, clf, explainer)
+
+
+TEST_EXPLAIN_BATCH = [
+    (4, []),
+    (4, [2]),
+    (13, []),
+    (13, [0, 5]),
+]
+
+
+@pytest.mark.parametrize('n_features,categorical_features',
+                         TEST_EXPLAIN_BATCH)
+def test_explain_batch_same_as_lime(n_features, categorical_features):
+    """Test that explanations are identical to LIME's."""
+    (x_data, clf, explainer) = get_explainer(n_features,
+                                             categorical_features)
+    batch_explainer = LimeBatchExplainer(explainer, num_samples=500)
+    for (seed, x_single) in enumerate(x_data[:3]):
+        explainer.random_state = np.random.RandomState(seed)
+        exp = explainer.explain_instance(x_single, clf.predict,
+                                         num_samples=500)
+        expected = np.zeros(n_features)
+        for (idx, coef) in exp.local_exp[1]:
+            expected[idx] = coef
+        coefs = batch_explainer._explain_batch(x_single[np.newaxis],
+                                               clf.predict, seed)
+        assert coefs.shape == (1, n_features)
+        np.testing.assert_allclose(coefs[0], expected, rtol=1e-8, atol=1e-10)
+        assert np.count_nonzero(coefs) == min(n_features, 10)
+
+
+def test_explain_linear_model():
+    """Test explanations of a linear model."""
+    (x_data, clf, explainer) = get_explainer(3, [], LinearRegression())
+    batch_explainer = LimeBatchExplainer(explainer, num_samples=1000)
+    coefs = batch_explainer.explain(x_data[:7], clf.predict, batch_size=3)
+    assert coefs.shape == (7, 3)
+    expected = clf.coef_ * explainer.scaler.scale_
+    np.testing.assert_allclose(coefs, np.broadcast_to(expected, (7, 3)),
+                               rtol=0.05)
+
+
+def test_explain_reproducible():
+    """Test that results do not depend on the number of jobs."""
+    (x_data, clf, _) = get_explainer(4, [3])
+    results = []
+    for n_jobs in (1, 2):
+        (_, _, explainer) = get_explainer(4, [3])
+        batch_explainer = LimeBatchExplainer(explainer, num_samples=200)
+        results.append(batch_explainer.explain(x_data[:10], clf.predict,
+                                               batch_size=4, n_jobs=n_jobs))
+    np.testing.assert_array_equal(results[0], results[1])
+    (_, _, explainer) = get_explainer(4, [3])
+    coefs = LimeBatchExplainer(explainer).explain(x_data[:0], clf.predict)
+    assert coefs.shape == (0, 4)
@@ -0,0 +1,147 @@
+"""Unit tests for the CV cache of :mod:`esmvaltool.diag_scripts.mlr.models`."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import Lasso, Ridge
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV
+from sklearn.preprocessing import StandardScaler
+
+from esmvaltool.diag_scripts.mlr.custom_sklearn import (
+    AdvancedPipeline,
+    AdvancedTransformedTargetRegressor,
+)
+from esmvaltool.diag_scripts.mlr.models import MLRModel
+
+PARAM_GRID = {'final__regressor__alpha': [0.1, 1.0, 10.0]}
+
+
+class RidgeModel(MLRModel):
+    """Minimal MLR model using ridge regression."""
+
+    _CLF_TYPE = Ridge
+
+
+def _get_data(seed=0, n_points=40):
+    """Get training data frame."""
+    rng = np.random.default_rng(seed)
+    x_data = rng.normal(size=(n_points, 2))
+    y_data = x_data @ [1.0, -2.0] + rng.normal(scale=0.1, size=n_points)
+    columns = pd.MultiIndex.from_tuples(
+        [('x', 'feature1'), ('x', 'feature2'), ('y', 'label')])
+    return pd.DataFrame(np.column_stack((x_data, y_data)), columns=columns)
+
+
+def _get_model(tmp_path, cv_cache_dir='cv_cache', regressor=Ridge,
+               seed=0):
+    """Get bare MLR model without reading any input data."""
+    model = RidgeModel.__new__(RidgeModel)
+    model._cfg = {
+        'cv_cache_dir': cv_cache_dir,
+        'fit_kwargs': {},
+        'log_level': 'info',
+        'n_jobs': 1,
+        'work_dir': str(tmp_path),
+    }
+    model._data = {'train': _get_data(seed=seed)}
+    model._random_state = np.random.RandomState(42)
+    model._clf = AdvancedPipeline([
+        ('final', AdvancedTransformedTargetRegressor(
+            transformer=StandardScaler(), regressor=regressor())),
+    ])
+    model._parameters = model._get_clf_parameters()
+    model._load_lime_explainer = lambda: None
+    return model
+
+
+def _cache_files(tmp_path):
+    """Get files in CV cache directory."""
+    cache_dir = tmp_path / 'cv_cache'
+    if not cache_dir.is_dir():
+        return []
+    return sorted(os.listdir(cache_dir))
+
+
+@pytest.mark.parametrize('successive_halving,cv_estimator', [
+    (False, GridSearchCV),
+    (True, HalvingGridSearchCV),
+])
+def test_grid_search_cv_cache(mocker, tmp_path, successive_halving,
+                              cv_estimator):
+    """Test cache miss and hit of ``grid_search_cv``."""
+    fit = mocker.spy(cv_estimator, 'fit')
+    kwargs = {'cv': 3, 'successive_halving': successive_halving}
+    if successive_halving:
+        kwargs.update(min_resources=10, factor=2)
+
+    # Miss
+    model = _get_model(tmp_path)
+    model.grid_search_cv(PARAM_GRID, **kwargs)
+    assert fit.call_count == 1
+    assert len(_cache_files(tmp_path)) == 1
+    params = model.parameters['final__regressor__alpha']
+
+    # Hit
+    model = _get_model(tmp_path)
+    model.grid_search_cv(PARAM_GRID, **kwargs)
+    assert fit.call_count == 1
+    assert len(_cache_files(tmp_path)) == 1
+    assert model.parameters['final__regressor__alpha'] == params
+
+    # Miss due to different training data
+    model = _get_model(tmp_path, seed=1)
+    model.grid_search_cv(PARAM_GRID, **kwargs)
+    assert fit.call_count == 2
+    assert len(_cache_files(tmp_path)) == 2
+
+
+def test_grid_search_cv_cache_estimator_type(mocker, tmp_path):
+    """Test that different estimator types do not share cache entries."""
+    fit = mocker.spy(GridSearchCV, 'fit')
+    model = _get_model(tmp_path)
+    model.grid_search_cv(PARAM_GRID, cv=3)
+    model = _get_model(tmp_path, regressor=Lasso)
+    model.grid_search_cv(PARAM_GRID, cv=3)
+    assert fit.call_count == 2
+    assert len(_cache_files(tmp_path)) == 2
+    assert isinstance(model._clf.steps[-1][1].regressor, Lasso)
+
+
+def test_grid_search_cv_cache_different_splits(mocker, tmp_path):
+    """Test that different CV splits do not share cache entries."""
+    fit = mocker.spy(GridSearchCV, 'fit')
+    model = _get_model(tmp_path)
+    model.grid_search_cv(PARAM_GRID, cv=3)
+    model = _get_model(tmp_path)
+    model.grid_search_cv(PARAM_GRID, cv=4)
+    assert fit.call_count == 2
+    assert len(_cache_files(tmp_path)) == 2
+
+
+def test_grid_search_cv_no_cache(mocker, tmp_path):
+    """Test that no cache key is calculated without ``cv_cache_dir``."""
+    model = _get_model(tmp_path, cv_cache_dir=None)
+    get_key = mocker.spy(model, '_get_cv_cache_key')
+    model.grid_search_cv(PARAM_GRID, cv=3)
+    get_key.assert_not_called()
+    assert _cache_files(tmp_path) == []
+
+
+def test_get_cv_cache_key(tmp_path):
+    """Test ``_get_cv_cache_key``."""
+    model = _get_model(tmp_path)
+    clf = GridSearchCV(model._clf, PARAM_GRID, cv=3)
+    key = model._get_cv_cache_key(clf, clf.cv)
+    assert isinstance(key, str)
+    assert model._get_cv_cache_key(clf, clf.cv) == key
+
+    # Parameters that do not affect the result are ignored
+    clf.set_params(n_jobs=2, verbose=1)
+    assert model._get_cv_cache_key(clf, clf.cv) == key
+
+    # Parameters of nested estimators affect the key
+    clf.set_params(estimator__final__regressor__fit_intercept=False)
+    assert model._get_cv_cache_key(clf, clf.cv) != key
@@ -0,0 +1,105 @@
+"""Unit tests for the module :mod:`esmvaltool.diag_scripts.mlr.postprocess`."""
+
+from unittest import mock
+
+import numpy as np
+import pytest
+
+import esmvaltool.diag_scripts.mlr.postprocess as postprocess
+
+
+def dense_corrcoef(array, weights=None):
+    """Pearson coefficients of the rows of an array (dense reference)."""
+    mean = np.ma.average(array, axis=1, weights=weights).reshape(-1, 1)
+    sqrt_weights = 1.0 if weights is None else np.ma.sqrt(weights)
+    demean = (array - mean) * sqrt_weights
+    res = np.ma.dot(demean, demean.T)
+    row_norms = np.ma.sqrt(np.ma.sum(demean**2, axis=1))
+    return res / np.ma.outer(row_norms, row_norms)
+
+
+def get_data(shape, seed=0):
+    """Get masked random data."""
+    random_state = np.random.RandomState(seed)
+    data = random_state.normal(size=shape)
+    return np.ma.masked_array(data, mask=random_state.rand(*shape) < 0.1)
+
+
+@pytest.mark.parametrize('weighted', [True, False])
+def test_normalized_anomalies(weighted):
+    """Test normalized anomalies."""
+    array = get_data((6, 8))
+    array[2] = 1.0
+    array[4] = np.ma.masked
+    weights = np.ma.array(np.random.RandomState(1).rand(6, 8))
+    if not weighted:
+        weights = None
+    anomalies = postprocess._normalized_anomalies(array, weights=weights)
+    expected = dense_corrcoef(array, weights=weights)
+    assert isinstance(anomalies, np.ndarray)
+    assert not np.ma.isMaskedArray(anomalies)
+    np.testing.assert_allclose(anomalies @ anomalies.T,
+                               np.ma.filled(expected, 0.0), atol=1e-12)
+    anomalies_t = postprocess._normalized_anomalies(array.T, rowvar=False)
+    np.testing.assert_allclose(
+        anomalies_t, postprocess._normalized_anomalies(array))
+
+
+@pytest.mark.parametrize('block_size', [1, 4, 100])
+def test_blocked_row_norms(block_size):
+    """Test blocked calculation of row norms of a matrix product."""
+    left = np.arange(21.0).reshape(7, 3)
+    right = np.arange(12.0).reshape(3, 4) - 5.0
+    norms = postprocess._blocked_row_norms(left, right, block_size)
+    np.testing.assert_allclose(norms, np.linalg.norm(left @ right, axis=1))
+
+
+def test_estim_cov_differing_shape():
+    """Test estimation of real error with covariance from larger dataset."""
+    error = np.ma.abs(get_data((3, 4), seed=1))
+    cov_est = get_data((10, 3, 4), seed=2)
+    weights = np.ma.array(np.random.RandomState(3).rand(3, 4),
+                          mask=np.ma.getmaskarray(error))
+    squared_error_cube = mock.Mock(data=error**2, shape=error.shape)
+    cov_est_cube = mock.Mock(data=cov_est, shape=cov_est.shape)
+    real_error = postprocess._estim_cov_differing_shape(
+        {}, squared_error_cube, cov_est_cube, weights)
+
+    pearson_coeffs = dense_corrcoef(cov_est.reshape(10, -1).T)
+    weighted_error = np.ma.filled(error, 0.0).ravel() * weights.data.ravel()
+    expected = np.ma.sqrt(np.ma.sum(
+        pearson_coeffs * np.outer(weighted_error, weighted_error)))
+    np.testing.assert_allclose(real_error, expected)
+
+
+def test_estim_cov_identical_shape():
+    """Test estimation of real error with covariance from same shape."""
+    error = np.ma.abs(get_data((5, 2, 3), seed=1))
+    cov_est = get_data((5, 2, 3), seed=2)
+    weights = np.ma.array(np.random.RandomState(3).rand(5, 2, 3),
+                          mask=np.ma.getmaskarray(error))
+    squared_error_cube = mock.Mock(data=error**2, shape=error.shape)
+    cov_est_cube = mock.Mock(data=cov_est, shape=cov_est.shape)
+    real_error = postprocess._estim_cov_identical_shape(
+        {'cov_estimate_block_size': 2}, squared_error_cube, cov_est_cube,
+        weights)
+
+    error = np.ma.filled(error, 0.0).reshape(5, -1)
+    cov_est = cov_est.reshape(5, -1)
+    weights = weights.reshape(5, -1)
+    weighted_error = error * weights.data
+    pearson_dim0 = dense_corrcoef(cov_est, weights=weights)
+    pearson_dim1 = dense_corrcoef(cov_est.T, weights=weights.T)
+    error_dim0 = np.ma.sqrt(np.ma.sum(
+        np.einsum('ai,aj->aij', weighted_error, weighted_error) *
+        pearson_dim1, axis=(1, 2)))
+    error_dim1 = np.ma.sqrt(np.ma.sum(
+        np.einsum('ia,ja->aij', weighted_error, weighted_error) *
+        pearson_dim0, axis=(1, 2)))
+    expected = max(
+        np.ma.sqrt(np.ma.sum(pearson_dim0 *
+                             np.ma.outer(error_dim0, error_dim0))),
+        np.ma.sqrt(np.ma.sum(pearson_dim1 *
+                             np.ma.outer(error_dim1, error_dim1))),
+    )
+    np.testing.assert_allclose(real_error, expected)
@@ -0,0 +1,88 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.monitor.compute_eofs`."""
+
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+from eofs.iris import Eof
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+from esmvaltool.diag_scripts.monitor.compute_eofs import LeadingEofs
+
+
+def get_cube(n_time=120, masked=False):
+    """Get lazy test cube with a dominant leading mode."""
+    time = DimCoord(np.arange(n_time, dtype=float),
+                    standard_name='time',
+                    units='days since 2000-01-01')
+    lat = DimCoord(np.linspace(-80.0, 80.0, 9),
+                   standard_name='latitude',
+                   units='degrees_north')
+    lon = DimCoord(np.linspace(0.0, 350.0, 12),
+                   standard_name='longitude',
+                   units='degrees_east')
+    random_state = np.random.RandomState(0)
+    pattern = np.outer(np.sin(np.deg2rad(lat.points)),
+                       np.cos(np.deg2rad(lon.points)))
+    signal = 3.0 * random_state.normal(size=n_time)
+    data = (signal[:, None, None] * pattern +
+            random_state.normal(size=(n_time, 9, 12)) + 5.0)
+    data = np.ma.masked_array(data, mask=np.zeros(data.shape, dtype=bool))
+    if masked:
+        data[:, 2:4, 5] = np.ma.masked
+    cube = Cube(da.from_array(data, chunks=(25, 9, 12)),
+                var_name='tas',
+                units='K',
+                dim_coords_and_dims=[(time, 0), (lat, 1), (lon, 2)])
+    return cube
+
+
+@pytest.mark.parametrize('masked', [False, True])
+@pytest.mark.parametrize('method', ['randomized', 'incremental'])
+def test_leading_eofs(method, masked):
+    """Test that leading EOF and PC agree with :class:`eofs.iris.Eof`."""
+    cube = get_cube(masked=masked)
+    expected = Eof(cube.copy(cube.core_data().compute()), weights='coslat')
+    solver = LeadingEofs(cube, method=method, block_size=30)
+    assert cube.has_lazy_data()
+
+    eof = solver.eofs(neofs=1)
+    expected_eof = expected.eofs(neofs=1)
+    assert eof.shape == (1, 9, 12)
+    assert eof.var_name == expected_eof.var_name
+    assert eof.long_name == expected_eof.long_name
+    assert eof.coord('latitude') == cube.coord('latitude')
+    np.testing.assert_array_equal(np.ma.getmaskarray(eof.data),
+                                  np.ma.getmaskarray(expected_eof.data))
+    sign = np.sign(np.ma.sum(eof.data * expected_eof.data))
+    np.testing.assert_allclose(eof.data, sign * expected_eof.data,
+                               atol=1e-5)
+
+    pcomp = solver.pcs(npcs=1, pcscaling=1)
+    expected_pcomp = expected.pcs(npcs=1, pcscaling=1)
+    assert pcomp.shape == (120, 1)
+    assert pcomp.long_name == expected_pcomp.long_name
+    assert pcomp.coord('time') == cube.coord('time')
+    np.testing.assert_allclose(pcomp.data, sign * expected_pcomp.data,
+                               atol=1e-4)
+
+
+def test_leading_eofs_invalid_method():
+    """Test invalid EOF method."""
+    with pytest.raises(ValueError, match="EOF method"):
+        LeadingEofs(get_cube(), method='full')
+
+
+def test_leading_eofs_invalid_block_size():
+    """Test too small blocks for incremental EOFs."""
+    with pytest.raises(ValueError, match="block size"):
+        LeadingEofs(get_cube(), method='incremental', block_size=5)
+
+
+def test_leading_eofs_sign():
+    """Test that signs are deterministic."""
+    cube = get_cube()
+    eof = LeadingEofs(cube).eofs(neofs=1).data
+    assert eof.flat[np.argmax(np.abs(eof))] > 0.0
+    assert iris.util.is_masked(eof) is False
@@ -0,0 +1,187 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.monitor.monitor`."""
+
+import shutil
+
+import iris
+import iris.analysis
+import numpy as np
+import pytest
+from cf_units import Unit
+from esmvalcore.preprocessor import climate_statistics
+from iris.coords import AuxCoord, DimCoord
+from iris.cube import Cube
+
+from esmvaltool.diag_scripts.monitor.monitor import SEASONS, Monitor
+
+PLOTS = {
+    'annual_cycle': {},
+    'monclim': {},
+    'seasonclim': {},
+    'clim': {},
+}
+
+
+def get_cube():
+    """Get monthly test cube spanning three years."""
+    time = DimCoord(np.arange(36) * 30.0 + 15.0,
+                    bounds=np.stack((np.arange(36) * 30.0,
+                                     np.arange(1, 37) * 30.0), axis=-1),
+                    standard_name='time',
+                    var_name='time',
+                    units=Unit('days since 2000-01-01', calendar='360_day'))
+    lat = DimCoord([-45.0, 0.0, 45.0],
+                   standard_name='latitude',
+                   var_name='lat',
+                   units='degrees_north')
+    lon = DimCoord([0.0, 90.0, 180.0, 270.0],
+                   standard_name='longitude',
+                   var_name='lon',
+                   units='degrees_east')
+    random_state = np.random.RandomState(0)
+    data = np.ma.masked_array(
+        random_state.normal(loc=280.0, size=(36, 3, 4)),
+        mask=np.zeros((36, 3, 4), dtype=bool),
+    )
+    data[:, 0, 1] = np.ma.masked
+    return Cube(data.astype(np.float32),
+                var_name='tas',
+                standard_name='air_temperature',
+                units='K',
+                dim_coords_and_dims=[(time, 0), (lat, 1), (lon, 2)])
+
+
+def old_seasonal_climatology(cube):
+    """Old computation of the seasonal climatology in ``seasonclim``."""
+    cube = cube.copy()
+    points = [SEASONS[point] for point in cube.coord('month_number').points]
+    cube.add_aux_coord(AuxCoord(points, var_name='season'),
+                       cube.coord_dims('month_number'))
+    return cube.aggregated_by('season', iris.analysis.MEAN)
+
+
+def old_climatology(cube):
+    """Old computation of the full climatology in ``clim``."""
+    if cube.coords('month_number'):
+        return cube.collapsed('month_number', iris.analysis.MEAN)
+    return cube.collapsed('season', iris.analysis.MEAN)
+
+
+def assert_cubes_equal(cube, expected):
+    """Check that data and coordinates of cubes agree."""
+    assert cube.shape == expected.shape
+    np.testing.assert_array_equal(np.ma.getmaskarray(cube.data),
+                                  np.ma.getmaskarray(expected.data))
+    np.testing.assert_allclose(cube.data, expected.data, rtol=1e-6)
+    for name in ('month_number', 'season', 'latitude', 'longitude'):
+        if expected.coords(name, dim_coords=False) or expected.coords(name):
+            np.testing.assert_array_equal(cube.coord(name).points,
+                                          expected.coord(name).points)
+
+
+def get_monitor(tmp_path, cache_dir):
+    """Get monitor diagnostic."""
+    cfg = {
+        'plot_dir': str(tmp_path / 'plots'),
+        'work_dir': str(tmp_path / 'work'),
+        'plots': PLOTS,
+    }
+    if cache_dir is not None:
+        cfg['climatology_cache_dir'] = str(tmp_path / cache_dir)
+    return Monitor(cfg)
+
+
+def save_and_load(cube, path):
+    """Save cube to netCDF file and load it again."""
+    iris.save(cube, str(path))
+    var_info = {
+        'filename': str(path),
+        'short_name': 'tas',
+        'variable_group': 'tas',
+    }
+    return (iris.load_cube(str(path)), var_info)
+
+
+@pytest.mark.parametrize('cache_dir', [None, 'cache'])
+def test_climatologies_from_time_series(tmp_path, cache_dir):
+    """Test climatologies of a time series against the old computations."""
+    (cube, var_info) = save_and_load(get_cube(), tmp_path / 'tas.nc')
+    monthly = climate_statistics(cube.copy(), period='month')
+    expected = {
+        'month': monthly,
+        'season': old_seasonal_climatology(monthly),
+        'full': old_climatology(monthly),
+    }
+
+    monitor = get_monitor(tmp_path, cache_dir)
+    climatologies = monitor.compute_climatologies(cube, var_info)
+    assert list(climatologies) == ['month', 'season', 'full']
+    for (period, climatology) in climatologies.items():
+        assert_cubes_equal(climatology, expected[period])
+        assert_cubes_equal(monitor.get_climatology(cube, var_info, period),
+                           expected[period])
+    assert cube.coords('time')
+    assert not cube.coords('season')
+
+
+@pytest.mark.parametrize('cache_dir', [None, 'cache'])
+def test_climatologies_from_monthly_climatology(tmp_path, cache_dir):
+    """Test climatologies of a monthly climatology (``monclim`` input)."""
+    monthly = climate_statistics(get_cube(), period='month')
+    (cube, var_info) = save_and_load(monthly, tmp_path / 'tas.nc')
+    expected = {
+        'month': cube,
+        'season': old_seasonal_climatology(cube),
+        'full': old_climatology(cube),
+    }
+
+    monitor = get_monitor(tmp_path, cache_dir)
+    climatologies = monitor.compute_climatologies(cube, var_info)
+    for (period, climatology) in climatologies.items():
+        assert_cubes_equal(climatology, expected[period])
+    assert climatologies['month'] is cube
+
+
+def test_climatology_from_seasonal_climatology(tmp_path):
+    """Test full climatology of a seasonal climatology (``clim`` input)."""
+    cube = old_seasonal_climatology(
+        climate_statistics(get_cube(), period='month'))
+    cube.remove_coord('month_number')
+    var_info = {'filename': str(tmp_path / 'tas.nc'), 'variable_group': 'tas'}
+    monitor = get_monitor(tmp_path, None)
+    assert monitor.get_climatology(cube, var_info, 'season') == cube
+    assert_cubes_equal(monitor.get_climatology(cube, var_info, 'full'),
+                       old_climatology(cube))
+
+
+def test_climatology_cache(tmp_path, mocker):
+    """Test that cached climatologies are reused across recipe runs."""
+    (cube, var_info) = save_and_load(get_cube(), tmp_path / 'tas.nc')
+    monitor = get_monitor(tmp_path, 'cache')
+    expected = monitor.compute_climatologies(cube, var_info)
+    assert len(list((tmp_path / 'cache').iterdir())) == 3
+
+    # Same file contents in a different location (i.e., another recipe run)
+    other_path = tmp_path / 'other_run' / 'tas_renamed.nc'
+    other_path.parent.mkdir()
+    shutil.copy(tmp_path / 'tas.nc', other_path)
+    other_var_info = dict(var_info, filename=str(other_path))
+    aggregated_by = mocker.spy(iris.cube.Cube, 'aggregated_by')
+    collapsed = mocker.spy(iris.cube.Cube, 'collapsed')
+    monitor = get_monitor(tmp_path, 'cache')
+    climatologies = monitor.compute_climatologies(cube, other_var_info)
+    aggregated_by.assert_not_called()
+    collapsed.assert_not_called()
+    assert len(list((tmp_path / 'cache').iterdir())) == 3
+    for (period, climatology) in climatologies.items():
+        assert_cubes_equal(climatology, expected[period])
+        assert climatology.var_name == cube.var_name
+
+    # Different file contents
+    modified = get_cube()
+    modified.data = modified.data + 1.0
+    (cube, var_info) = save_and_load(modified, tmp_path / 'tas.nc')
+    monitor = get_monitor(tmp_path, 'cache')
+    climatologies = monitor.compute_climatologies(cube, var_info)
+    assert len(list((tmp_path / 'cache').iterdir())) == 6
+    np.testing.assert_allclose(climatologies['full'].data,
+                               expected['full'].data + 1.0, rtol=1e-6)
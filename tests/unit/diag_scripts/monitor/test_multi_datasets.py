@@ -0,0 +1,164 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.monitor.multi_datasets`."""
+
+import iris
+import numpy as np
+import yaml
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+from esmvaltool.diag_scripts.monitor import multi_datasets
+from esmvaltool.diag_scripts.monitor.multi_datasets import MultiDatasets
+
+DATASETS = ['MODEL1', 'MODEL2', 'OBS']
+SHORT_NAMES = ['ta', 'ua']
+
+
+def get_cube(short_name, offset):
+    """Get zonal mean profile cube."""
+    plev = DimCoord([100000.0, 85000.0, 50000.0, 20000.0],
+                    standard_name='air_pressure',
+                    var_name='plev',
+                    units='Pa')
+    lat = DimCoord([-60.0, -20.0, 20.0, 60.0],
+                   standard_name='latitude',
+                   var_name='lat',
+                   units='degrees_north')
+    data = np.arange(16.0).reshape(4, 4) + offset
+    return Cube(data,
+                var_name=short_name,
+                long_name=short_name,
+                units='K',
+                dim_coords_and_dims=[(plev, 0), (lat, 1)])
+
+
+def get_cfg(tmp_path, **kwargs):
+    """Get diagnostic configuration with input data on disk."""
+    (tmp_path / 'preproc').mkdir(parents=True, exist_ok=True)
+    input_data = {}
+    for short_name in SHORT_NAMES:
+        for (idx, dataset) in enumerate(DATASETS):
+            filename = str(tmp_path / 'preproc' / f'{short_name}_{dataset}.nc')
+            iris.save(get_cube(short_name, idx), filename)
+            input_data[filename] = {
+                'alias': dataset,
+                'dataset': dataset,
+                'exp': 'historical',
+                'filename': filename,
+                'long_name': short_name,
+                'mip': 'Amon',
+                'project': 'CMIP6',
+                'reference_for_monitor_diags': dataset == 'OBS',
+                'short_name': short_name,
+                'units': 'K',
+                'variable_group': short_name,
+            }
+    for name in ('plot_dir', 'run_dir', 'work_dir'):
+        (tmp_path / name).mkdir(exist_ok=True)
+    cfg = {
+        'input_data': input_data,
+        'output_file_type': 'png',
+        'plot_dir': str(tmp_path / 'plot_dir'),
+        'plot_filename': '{plot_type}_{real_name}_{dataset}',
+        'plot_folder': '{plot_dir}',
+        'plots': {'zonal_mean_profile': {'show_stats': False}},
+        'run_dir': str(tmp_path / 'run_dir'),
+        'work_dir': str(tmp_path / 'work_dir'),
+        **kwargs,
+    }
+    return cfg
+
+
+def load_provenance(cfg, base_dir):
+    """Load provenance records relative to the output directories."""
+    with open(f"{cfg['run_dir']}/diagnostic_provenance.yml") as file:
+        records = yaml.safe_load(file)
+    base_dir = str(base_dir)
+    return [
+        (path.replace(base_dir, ''), record['caption'],
+         [ancestor.replace(base_dir, '') for ancestor in record['ancestors']])
+        for (path, record) in records.items()
+    ]
+
+
+def test_get_plot_tasks(tmp_path):
+    """Test that tasks are split per dataset with the reference dataset."""
+    cfg = get_cfg(tmp_path, n_jobs=2)
+    cfg['plots']['1d_profile'] = {}
+    diagnostic = MultiDatasets(cfg)
+    tasks = diagnostic._get_plot_tasks()
+    task_datasets = [(method_name, [d['filename'] for d in datasets])
+                     for (method_name, datasets) in tasks]
+    expected = []
+    for short_name in SHORT_NAMES:
+        ref = str(tmp_path / 'preproc' / f'{short_name}_OBS.nc')
+        expected.append(('create_zonal_mean_profile_plot', [
+            str(tmp_path / 'preproc' / f'{short_name}_MODEL1.nc'), ref]))
+        expected.append(('create_zonal_mean_profile_plot', [
+            str(tmp_path / 'preproc' / f'{short_name}_MODEL2.nc'), ref]))
+        expected.append(('create_1d_profile_plot', [
+            str(tmp_path / 'preproc' / f'{short_name}_{dataset}.nc')
+            for dataset in DATASETS]))
+    assert task_datasets == expected
+
+
+def test_get_plot_tasks_without_reference(tmp_path):
+    """Test that tasks are split per dataset without reference dataset."""
+    cfg = get_cfg(tmp_path, n_jobs=2)
+    for dataset in cfg['input_data'].values():
+        dataset['reference_for_monitor_diags'] = False
+    tasks = MultiDatasets(cfg)._get_plot_tasks()
+    assert len(tasks) == len(SHORT_NAMES) * len(DATASETS)
+    for (_, datasets) in tasks:
+        assert len(datasets) == 1
+
+
+def test_lazy_loading(tmp_path, mocker):
+    """Test that cubes are only loaded when they are used."""
+    load_cube = mocker.spy(MultiDatasets, '_load_cube')
+    diagnostic = MultiDatasets(get_cfg(tmp_path, lazy_loading=True))
+    load_cube.assert_not_called()
+    for dataset in diagnostic.input_data:
+        assert 'cube' not in dataset
+
+    dataset = diagnostic.input_data[0]
+    cube = diagnostic._get_cube(dataset)
+    assert dataset['cube'] is cube
+    assert diagnostic._get_cube(dataset) is cube
+    assert load_cube.call_count == 1
+    for other_dataset in diagnostic.input_data[1:]:
+        assert 'cube' not in other_dataset
+
+
+def test_no_lazy_loading(tmp_path):
+    """Test that all cubes are loaded initially by default."""
+    diagnostic = MultiDatasets(get_cfg(tmp_path))
+    assert not diagnostic.cfg['lazy_loading']
+    for dataset in diagnostic.input_data:
+        assert isinstance(dataset['cube'], Cube)
+
+
+def test_compute_parallel(tmp_path, mocker):
+    """Test that a parallel run gives the same output as a serial run."""
+    serial_dir = tmp_path / 'serial'
+    cfg = get_cfg(serial_dir)
+    MultiDatasets(cfg).compute()
+    serial = load_provenance(cfg, serial_dir)
+
+    parallel_dir = tmp_path / 'parallel'
+    cfg = get_cfg(parallel_dir, n_jobs=2)
+    executor = mocker.spy(multi_datasets, 'ProcessPoolExecutor')
+    diagnostic = MultiDatasets(cfg)
+    diagnostic.compute()
+    parallel = load_provenance(cfg, parallel_dir)
+
+    executor.assert_called_once()
+    assert executor.call_args.kwargs['max_workers'] == 2
+    plots = [path for (path, _, _) in serial if path.endswith('.png')]
+    assert len(plots) == len(SHORT_NAMES) * 2
+    assert parallel == serial
+    for (path, _, _) in parallel:
+        assert (parallel_dir / path.lstrip('/')).is_file()
+
+    # Cubes are only loaded in the worker processes
+    for dataset in diagnostic.input_data:
+        assert 'cube' not in dataset
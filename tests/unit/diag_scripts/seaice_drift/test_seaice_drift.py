@@ -0,0 +1,135 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.seaice_drift.seaice_drift`."""
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+import shapely
+from iris.coords import AuxCoord
+from iris.cube import Cube
+from shapely.geometry import Point
+
+from esmvaltool.diag_scripts.seaice_drift import seaice_drift
+from esmvaltool.diag_scripts.seaice_drift.seaice_drift import (
+    InsidePolygonFactory,
+)
+
+POLYGON = [
+    (-30.0, 80.0),
+    (60.0, 80.0),
+    (150.0, 75.0),
+    (-120.0, 75.0),
+]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Use an empty cache of polygon masks in each test."""
+    monkeypatch.setattr(seaice_drift, '_INSIDE_POLYGON_CACHE', OrderedDict())
+
+
+def get_grid():
+    """Get curvilinear grid with longitudes in [0, 360)."""
+    lon = np.arange(0.0, 360.0, 7.5)
+    lat = np.arange(60.0, 90.0, 2.5)
+    (lon, lat) = np.meshgrid(lon, lat)
+    lon = lon + 0.3 * lat
+    lon = np.where(lon >= 360.0, lon - 360.0, lon)
+    return (lat, lon)
+
+
+def get_cube(lat, lon, var_name):
+    """Get cube with 2D latitude and longitude coordinates."""
+    lat = AuxCoord(lat, standard_name='latitude', units='degrees_north')
+    lon = AuxCoord(lon, standard_name='longitude', units='degrees_east')
+    return Cube(np.zeros(lat.shape),
+                var_name=var_name,
+                aux_coords_and_dims=[(lat, (0, 1)), (lon, (0, 1))])
+
+
+def old_in_polygon(factory, lat, lon):
+    """Old per-point check if points are inside the polygon."""
+    def in_polygon(lat, lon):
+        if lon > 180:
+            lon -= 360
+        point = factory.transformer.transform(lon, lat)
+        try:
+            contained = factory.polygon.contains(Point(point[0], point[1]))
+        except shapely.errors.TopologicalError:
+            return np.nan
+        if contained:
+            return 1.
+        return np.nan
+
+    return np.vectorize(in_polygon)(lat, lon)
+
+
+def test_in_polygon():
+    """Test mask against the per-point computation."""
+    (lat, lon) = get_grid()
+    assert np.any(lon > 180.0)
+    factory = InsidePolygonFactory(list(POLYGON))
+    mask = factory._in_polygon(lat, lon)
+    expected = old_in_polygon(factory, lat, lon)
+    np.testing.assert_array_equal(mask, expected)
+    assert np.any(mask == 1.0)
+    assert np.any(mask[lon > 180.0] == 1.0)
+    assert np.any(np.isnan(mask))
+
+
+def test_polygon_not_modified():
+    """Test that the polygon given by the user is not modified."""
+    polygon = list(POLYGON)
+    InsidePolygonFactory(polygon)
+    assert polygon == POLYGON
+
+
+def test_inside_polygon_coord_cached(mocker):
+    """Test that cubes on the same grid share the derived mask."""
+    in_polygon = mocker.spy(InsidePolygonFactory, '_in_polygon')
+    (lat, lon) = get_grid()
+    masks = []
+    for var_name in ('siconc', 'sithick'):
+        cube = get_cube(lat, lon, var_name)
+        cube.add_aux_factory(
+            InsidePolygonFactory(list(POLYGON), cube.coord('latitude'),
+                                 cube.coord('longitude')))
+        masks.append(cube.coord('Inside polygon').points)
+    assert in_polygon.call_count == 1
+    np.testing.assert_array_equal(masks[0], masks[1])
+    np.testing.assert_array_equal(masks[0], old_in_polygon(
+        InsidePolygonFactory(list(POLYGON)), lat, lon))
+
+    # The cached mask is not modified through the coordinate
+    masks[0][...] = 0.0
+    factory = InsidePolygonFactory(list(POLYGON))
+    np.testing.assert_array_equal(factory._derive(lat, lon), masks[1])
+    assert in_polygon.call_count == 1
+
+    # Different grid
+    factory._derive(lat[:-1], lon[:-1])
+    assert in_polygon.call_count == 2
+
+    # Different polygon
+    InsidePolygonFactory(POLYGON[:3])._derive(lat, lon)
+    assert in_polygon.call_count == 3
+
+
+def test_inside_polygon_cache_size(monkeypatch, mocker):
+    """Test that only the most recently used masks are cached."""
+    monkeypatch.setattr(seaice_drift, '_INSIDE_POLYGON_CACHE_SIZE', 2)
+    in_polygon = mocker.spy(InsidePolygonFactory, '_in_polygon')
+    (lat, lon) = get_grid()
+    factory = InsidePolygonFactory(list(POLYGON))
+    factory._derive(lat, lon)
+    factory._derive(lat[1:], lon[1:])
+    factory._derive(lat, lon)
+    factory._derive(lat[2:], lon[2:])
+    assert in_polygon.call_count == 3
+    assert len(seaice_drift._INSIDE_POLYGON_CACHE) == 2
+
+    # Least recently used grid has been removed
+    factory._derive(lat, lon)
+    assert in_polygon.call_count == 3
+    factory._derive(lat[1:], lon[1:])
+    assert in_polygon.call_count == 4
@@ -0,0 +1,62 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.shapeselect`."""
+
+import numpy as np
+import pytest
+from shapely.geometry import Polygon, box
+
+import esmvaltool.diag_scripts.shapeselect.diag_shapeselect as shapeselect
+
+LON, LAT = (x.ravel() for x in np.meshgrid(np.arange(0.5, 360.0),
+                                           np.arange(-89.5, 90.0)))
+
+
+def test_polygon_weights_mean_inside():
+    """Test weights of grid points inside polygons."""
+    geometries = [
+        box(10.0, 20.0, 13.0, 22.0),
+        box(-2.0, 0.0, 2.0, 1.0),
+        Polygon([(5.1, 5.1), (5.4, 5.1), (5.4, 5.4)]),
+    ]
+    weights, reprcells = shapeselect.polygon_weights(LON, LAT, geometries,
+                                                     'mean_inside')
+    assert weights.shape == (3, LON.size)
+    np.testing.assert_allclose(weights.sum(axis=1).A1, 1.0)
+    assert weights[0].nnz == 6
+    inside = weights[1].indices
+    np.testing.assert_array_equal(np.sort(LON[inside]),
+                                  [0.5, 1.5, 358.5, 359.5])
+    np.testing.assert_array_equal(LAT[inside], 0.5)
+    np.testing.assert_array_equal(weights[2].indices, reprcells[2])
+    assert (LON[reprcells[2]], LAT[reprcells[2]]) == (5.5, 5.5)
+
+
+def test_polygon_weights_representative():
+    """Test weights of representative grid points."""
+    geometries = [box(10.0, 20.0, 13.0, 22.0), box(-2.0, 0.0, 2.0, 1.0)]
+    weights, reprcells = shapeselect.polygon_weights(LON, LAT, geometries,
+                                                     'representative')
+    np.testing.assert_array_equal(weights.indices, reprcells)
+    np.testing.assert_allclose(weights.data, 1.0)
+    with pytest.raises(ValueError):
+        shapeselect.polygon_weights(LON, LAT, geometries, 'median')
+
+
+def test_apply_weights():
+    """Test averaging of (masked) data over polygons."""
+    weights, _ = shapeselect.polygon_weights(
+        LON, LAT, [box(10.0, 20.0, 13.0, 22.0)], 'mean_inside')
+    cells = weights.indices
+    data = np.arange(2.0 * LON.size).reshape(2, -1)
+    expected = data[:, cells].mean(axis=1)
+    ncts = shapeselect.apply_weights(data.reshape(2, 180, 360), weights)
+    assert ncts.shape == (2, 1)
+    np.testing.assert_allclose(ncts[:, 0], expected)
+
+    mask = np.zeros(data.shape, dtype=bool)
+    mask[0, cells] = True
+    mask[1, cells[0]] = True
+    data = np.ma.masked_array(data, mask=mask).reshape(2, 180, 360)
+    ncts = shapeselect.apply_weights(data, weights)
+    assert np.isnan(ncts[0, 0])
+    valid = data.reshape(2, -1)[1, cells]
+    np.testing.assert_allclose(ncts[1, 0], valid.mean())
@@ -1,5 +1,6 @@
 import logging
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pytest
@@ -73,6 +74,70 @@ def test_provenance_logger_duplicate_raises(tmp_path):
             prov.log('output.nc', record)
 
 
+def test_provenance_logger_empty(tmp_path):
+
+    with shared.ProvenanceLogger({'run_dir': str(tmp_path)}):
+        pass
+    provenance_file = tmp_path / 'diagnostic_provenance.yml'
+    assert yaml.safe_load(provenance_file.read_bytes()) == {}
+
+    record = {'attribute1': 'xyz'}
+    with shared.ProvenanceLogger({'run_dir': str(tmp_path)}) as prov:
+        prov.log(Path('output.nc'), record)
+        assert prov.table == {'output.nc': record}
+
+    assert yaml.safe_load(provenance_file.read_bytes()) == {
+        'output.nc': record}
+
+
+def test_provenance_logger_appends(tmp_path):
+
+    provenance_file = tmp_path / 'diagnostic_provenance.yml'
+    records = {f'output{idx}.nc': {'caption': f'Plot\n{idx}', 'idx': idx}
+               for idx in range(3)}
+    for (filename, record) in records.items():
+        with shared.ProvenanceLogger({'run_dir': str(tmp_path)}) as prov:
+            prov.log(filename, record)
+
+    # Existing records are not read again
+    provenance_file.write_text(
+        provenance_file.read_text().replace('idx: 0', 'idx: 5'))
+    with provenance_file.open('a') as file:
+        file.write('? output3.nc\n: caption: NCL\n')
+
+    with shared.ProvenanceLogger({'run_dir': str(tmp_path)}) as prov:
+        assert prov.table['output0.nc'] == records['output0.nc']
+        assert prov.table['output3.nc'] == {'caption': 'NCL'}
+        with pytest.raises(KeyError):
+            prov.log('output3.nc', {})
+        prov.log('output4.nc', {'caption': 'x'})
+
+    provenance = yaml.safe_load(provenance_file.read_bytes())
+    assert len(provenance) == 5
+    assert provenance['output0.nc']['idx'] == 5
+    assert provenance['output4.nc'] == {'caption': 'x'}
+
+
+def _log_provenance(run_dir, idx):
+    with shared.ProvenanceLogger({'run_dir': run_dir}) as prov:
+        for sub_idx in range(20):
+            prov.log(f'output_{idx}_{sub_idx}.nc', {'caption': idx})
+
+
+def test_provenance_logger_multiple_processes(tmp_path):
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_log_provenance, [str(tmp_path)] * 8, range(8)))
+
+    provenance = yaml.safe_load(
+        (tmp_path / 'diagnostic_provenance.yml').read_bytes())
+
+    assert provenance == {
+        f'output_{idx}_{sub_idx}.nc': {'caption': idx}
+        for idx in range(8) for sub_idx in range(20)
+    }
+
+
 def test_select_metadata():
 
     metadata = [
@@ -178,6 +243,99 @@ def test_group_metadata_sorted_true():
     }
 
 
+def get_metadata_list(n_datasets=200):
+    metadata = []
+    for idx in range(n_datasets):
+        attributes = {
+            'dataset': f'dataset{idx % 7}',
+            'short_name': ['tas', 'pr', 'ta'][idx % 3],
+            'exp': [None, 'historical'][idx % 2],
+            'filename': f'file{idx}.nc',
+        }
+        if idx % 5:
+            attributes['ensemble'] = f'r{idx % 4}i1p1'
+        if idx % 11 == 0:
+            attributes['ancestors'] = ['a.nc']
+        metadata.append(shared.Metadata(attributes))
+    return shared.MetadataList(metadata)
+
+
+@pytest.mark.parametrize('attributes', [
+    {},
+    {'dataset': 'dataset3'},
+    {'dataset': 'dataset3', 'short_name': 'ta'},
+    {'dataset': 'dataset3', 'ensemble': '*'},
+    {'exp': None},
+    {'ensemble': 'r1i1p1', 'exp': 'historical', 'short_name': 'pr'},
+    {'dataset': 'dataset10'},
+    {'ancestors': ['a.nc']},
+    {'short_name': 'tas', 'ancestors': '*'},
+])
+def test_select_metadata_indexed(attributes):
+
+    metadata = get_metadata_list()
+    expected = shared.select_metadata(list(metadata), **attributes)
+    for _ in range(2):
+        result = shared.select_metadata(metadata, **attributes)
+        assert isinstance(result, shared.MetadataList)
+        assert [id(m) for m in result] == [id(m) for m in expected]
+
+
+@pytest.mark.parametrize('attribute', ['dataset', 'exp', 'ensemble', 'x'])
+def test_group_metadata_indexed(attribute):
+
+    metadata = get_metadata_list()
+    expected = shared.group_metadata(list(metadata), attribute)
+    result = shared.group_metadata(metadata, attribute)
+    assert list(result) == list(expected)
+    for key in expected:
+        assert isinstance(result[key], shared.MetadataList)
+        assert [id(m) for m in result[key]] == [id(m) for m in expected[key]]
+
+
+def test_metadata_list_modified():
+
+    metadata = get_metadata_list(10)
+    assert len(shared.select_metadata(metadata, dataset='dataset1')) == 2
+    metadata[0]['dataset'] = 'dataset1'
+    assert len(shared.select_metadata(metadata, dataset='dataset1')) == 3
+    metadata[2].update(dataset='dataset1')
+    metadata.append(shared.Metadata(dataset='dataset1'))
+    assert len(shared.select_metadata(metadata, dataset='dataset1')) == 5
+    metadata.pop(1)
+    del metadata[0]['dataset']
+    assert shared.select_metadata(metadata, dataset='dataset1') == [
+        metadata[1], metadata[7], metadata[9]]
+
+    # Plain dictionaries are not indexed
+    metadata.append({'dataset': 'dataset1'})
+    assert len(shared.select_metadata(metadata, dataset='dataset1')) == 4
+    metadata[-1]['dataset'] = 'dataset2'
+    assert len(shared.select_metadata(metadata, dataset='dataset1')) == 3
+
+
+def test_input_data():
+
+    input_data = shared.InputData(
+        {'file1.nc': shared.Metadata(dataset='dataset1')})
+    values = input_data.values()
+    assert isinstance(values, shared.MetadataList)
+    assert input_data.values() is values
+    assert shared.select_metadata(values, dataset='dataset1') == [
+        {'dataset': 'dataset1'}]
+
+    input_data['file2.nc'] = shared.Metadata(dataset='dataset1')
+    assert len(shared.select_metadata(input_data.values(),
+                                      dataset='dataset1')) == 2
+    assert yaml.safe_load(yaml.safe_dump({'input_data': input_data})) == {
+        'input_data': {
+            'file1.nc': {'dataset': 'dataset1'},
+            'file2.nc': {'dataset': 'dataset1'},
+        },
+    }
+    assert yaml.safe_dump(values) == yaml.safe_dump(list(values))
+
+
 def test_sorted_metadata():
 
     metadata = [
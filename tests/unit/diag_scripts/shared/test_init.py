@@ -0,0 +1,60 @@
+"""Tests for the lazy imports of :mod:`esmvaltool.diag_scripts.shared`."""
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = [
+    'cartopy',
+    'distributed',
+    'esmvalcore',
+    'iris',
+    'matplotlib',
+]
+
+
+def test_import_is_lightweight():
+    """Test that importing the package does not import heavy modules."""
+    script = ("import sys; import esmvaltool.diag_scripts.shared; "
+              "print(' '.join(sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script],
+                            capture_output=True,
+                            check=True,
+                            text=True).stdout
+    modules = {m.split('.')[0] for m in output.split()}
+    assert modules.isdisjoint(HEAVY_MODULES)
+
+
+@pytest.mark.parametrize('name', [
+    'io',
+    'iris_helpers',
+    'plot',
+    'apply_supermeans',
+    'get_control_exper_obs',
+])
+def test_lazy_attributes(name):
+    """Test that lazily imported attributes are available."""
+    import esmvaltool.diag_scripts.shared as shared
+    assert name in shared.__all__
+    assert name in dir(shared)
+    assert getattr(shared, name) is not None
+
+
+def test_missing_attribute():
+    """Test that unknown attributes raise an AttributeError."""
+    import esmvaltool.diag_scripts.shared as shared
+    with pytest.raises(AttributeError):
+        shared.does_not_exist
+
+
+@pytest.mark.parametrize('name', ['io', 'iris_helpers'])
+def test_lazy_import_configures_iris(name):
+    """Test that iris options are set when iris is imported lazily."""
+    script = ("import esmvaltool.diag_scripts.shared as shared; "
+              f"shared.{name}; import iris; "
+              "print(iris.FUTURE.save_split_attrs)")
+    output = subprocess.run([sys.executable, '-c', script],
+                            capture_output=True,
+                            check=True,
+                            text=True).stdout
+    assert output.split()[-1] == 'True'
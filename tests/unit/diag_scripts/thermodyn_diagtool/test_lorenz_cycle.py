@@ -0,0 +1,435 @@
+"""Unit tests for the Lorenz energy cycle of the thermodynamics diagnostic.
+
+The vectorized computations are compared with the former implementation,
+which looped over time steps, levels and latitudes and is included here as
+reference.
+"""
+
+import numpy as np
+import pytest
+
+from esmvaltool.diag_scripts.thermodyn_diagtool.lorenz_cycle import (
+    AA,
+    CP,
+    R,
+    averages,
+    stabil,
+    time_means,
+    weights,
+)
+
+LEV = np.array([100000.0, 85000.0, 70000.0, 50000.0, 30000.0, 20000.0])
+LAT = np.array([-70.0, -45.0, -15.0, 10.0, 40.0, 65.0, 80.0])
+NTIME = 9
+NTP = 6
+TERMS = ('ek', 'ape', 'a2k', 'ae2az', 'ke2kz', 'at2as', 'kt2ks')
+
+
+def loop_stabil(ta_gmn, p_l, nlev):
+    """Reference implementation of ``stabil`` using loops."""
+    cpdr = CP / R
+    t_g = ta_gmn
+    g_s = np.zeros(nlev)
+    for i_l in range(nlev):
+        if i_l == 0:
+            dtdp = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
+        elif i_l == nlev - 1:
+            dtdp = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
+        else:
+            dtdp1 = (t_g[i_l + 1] - t_g[i_l]) / (p_l[i_l + 1] - p_l[i_l])
+            dtdp2 = (t_g[i_l] - t_g[i_l - 1]) / (p_l[i_l] - p_l[i_l - 1])
+            dtdp = ((dtdp1 * (p_l[i_l] - p_l[i_l - 1]) + dtdp2 *
+                     (p_l[i_l + 1] - p_l[i_l])) /
+                    (p_l[i_l + 1] - p_l[i_l - 1]))
+        g_s[i_l] = CP / (t_g[i_l] - p_l[i_l] * dtdp * cpdr)
+    return g_s
+
+
+def loop_makek(u_t, v_t):
+    """Reference implementation of ``makek`` using loops."""
+    ck1 = u_t * np.conj(u_t)
+    ck2 = v_t * np.conj(v_t)
+    e_k = np.real(ck1 + ck2)
+    e_k[:, :, 0] = 0.5 * np.real(u_t[:, :, 0] * u_t[:, :, 0] +
+                                 v_t[:, :, 0] * v_t[:, :, 0])
+    return e_k
+
+
+def loop_makea(t_t, t_g, gam):
+    """Reference implementation of ``makea`` using loops."""
+    ape = gam[:, np.newaxis, np.newaxis] * np.real(t_t * np.conj(t_t))
+    ape[:, :, 0] = (gam[:, np.newaxis] * 0.5 * np.real(
+        (t_t[:, :, 0] - t_g[:, np.newaxis]) *
+        (t_t[:, :, 0] - t_g[:, np.newaxis])))
+    return ape
+
+
+def loop_mka2k(wap, t_t, w_g, t_g, p_l):
+    """Reference implementation of ``mka2k`` using loops."""
+    a2k = -np.real(R / p_l[:, np.newaxis, np.newaxis] *
+                   (t_t * np.conj(wap) + np.conj(t_t) * wap))
+    a2k[:, :, 0] = -np.real(R / p_l[:, np.newaxis] *
+                            (t_t[:, :, 0] - t_g[:, np.newaxis]) *
+                            (wap[:, :, 0] - w_g[:, np.newaxis]))
+    return a2k
+
+
+def loop_mkaeaz(v_t, wap, t_t, ttt, ttg, p_l, lat, gam, nlat, nlev):
+    """Reference implementation of ``mkaeaz`` using loops."""
+    dtdp = np.zeros([nlev, nlat])
+    dtdy = np.zeros([nlev, nlat])
+    ttt = np.real(ttt)
+    for l_l in np.arange(nlev):
+        if l_l == 0:
+            t_1 = ttt[l_l, :, 0] - ttg[l_l]
+            t_2 = ttt[l_l + 1, :, 0] - ttg[l_l + 1]
+            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
+        elif l_l == nlev - 1:
+            t_1 = ttt[l_l - 1, :, 0] - ttg[l_l - 1]
+            t_2 = ttt[l_l, :, 0] - ttg[l_l]
+            dtdp[l_l, :] = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
+        else:
+            t_1 = ttt[l_l, :, 0] - ttg[l_l]
+            t_2 = ttt[l_l + 1, :, 0] - ttg[l_l + 1]
+            dtdp1 = (t_2 - t_1) / (p_l[l_l + 1] - p_l[l_l])
+            t_2 = t_1
+            t_1 = ttt[l_l - 1, :, 0] - ttg[l_l - 1]
+            dtdp2 = (t_2 - t_1) / (p_l[l_l] - p_l[l_l - 1])
+            dtdp[l_l, :] = ((dtdp1 * (p_l[l_l] - p_l[l_l - 1]) + dtdp2 *
+                             (p_l[l_l + 1] - p_l[l_l])) /
+                            (p_l[l_l + 1] - p_l[l_l - 1]))
+        dtdp[l_l, :] = dtdp[l_l, :] - (R / (CP * p_l[l_l]) *
+                                       (ttt[l_l, :, 0] - ttg[l_l]))
+    for i_l in np.arange(nlat):
+        if i_l == 0:
+            t_1 = ttt[:, i_l, 0]
+            t_2 = ttt[:, i_l + 1, 0]
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l])
+        elif i_l == nlat - 1:
+            t_1 = ttt[:, i_l - 1, 0]
+            t_2 = ttt[:, i_l, 0]
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l] - lat[i_l - 1])
+        else:
+            t_1 = ttt[:, i_l - 1, 0]
+            t_2 = ttt[:, i_l + 1, 0]
+            dtdy[:, i_l] = (t_2 - t_1) / (lat[i_l + 1] - lat[i_l - 1])
+    dtdy = dtdy / AA
+    c_1 = np.real(v_t * np.conj(t_t) + t_t * np.conj(v_t))
+    c_2 = np.real(wap * np.conj(t_t) + t_t * np.conj(wap))
+    ae2az = (gam[:, np.newaxis, np.newaxis] *
+             (dtdy[:, :, np.newaxis] * c_1 + dtdp[:, :, np.newaxis] * c_2))
+    ae2az[:, :, 0] = 0.
+    return ae2az
+
+
+def loop_mkkekz(u_t, v_t, wap, utt, vtt, p_l, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkkekz`` using loops."""
+    dudp = np.zeros([nlev, nlat])
+    dvdp = np.zeros([nlev, nlat])
+    dudy = np.zeros([nlev, nlat])
+    dvdy = np.zeros([nlev, nlat])
+    for l_l in np.arange(nlev):
+        if l_l == 0:
+            dudp[l_l, :] = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
+                            (p_l[l_l + 1] - p_l[l_l]))
+            dvdp[l_l, :] = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
+                            (p_l[l_l + 1] - p_l[l_l]))
+        elif l_l == nlev - 1:
+            dudp[l_l, :] = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
+                            (p_l[l_l] - p_l[l_l - 1]))
+            dvdp[l_l, :] = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
+                            (p_l[l_l] - p_l[l_l - 1]))
+        else:
+            dudp1 = ((np.real(utt[l_l + 1, :, 0] - utt[l_l, :, 0])) /
+                     (p_l[l_l + 1] - p_l[l_l]))
+            dvdp1 = ((np.real(vtt[l_l + 1, :, 0] - vtt[l_l, :, 0])) /
+                     (p_l[l_l + 1] - p_l[l_l]))
+            dudp2 = ((np.real(utt[l_l, :, 0] - utt[l_l - 1, :, 0])) /
+                     (p_l[l_l] - p_l[l_l - 1]))
+            dvdp2 = ((np.real(vtt[l_l, :, 0] - vtt[l_l - 1, :, 0])) /
+                     (p_l[l_l] - p_l[l_l - 1]))
+            dudp[l_l, :] = ((dudp1 * (p_l[l_l] - p_l[l_l - 1]) + dudp2 *
+                             (p_l[l_l + 1] - p_l[l_l])) /
+                            (p_l[l_l + 1] - p_l[l_l - 1]))
+            dvdp[l_l, :] = ((dvdp1 * (p_l[l_l] - p_l[l_l - 1]) + dvdp2 *
+                             (p_l[l_l + 1] - p_l[l_l])) /
+                            (p_l[l_l + 1] - p_l[l_l - 1]))
+    for i_l in np.arange(nlat):
+        if i_l == 0:
+            dudy[:, i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l, 0])) /
+                            (lat[i_l + 1] - lat[i_l]))
+            dvdy[:, i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l, 0])) /
+                            (lat[i_l + 1] - lat[i_l]))
+        elif i_l == nlat - 1:
+            dudy[:, i_l] = ((np.real(utt[:, i_l, 0] - utt[:, i_l - 1, 0])) /
+                            (lat[i_l] - lat[i_l - 1]))
+            dvdy[:, i_l] = ((np.real(vtt[:, i_l, 0] - vtt[:, i_l - 1, 0])) /
+                            (lat[i_l] - lat[i_l - 1]))
+        else:
+            dudy[:,
+                 i_l] = ((np.real(utt[:, i_l + 1, 0] - utt[:, i_l - 1, 0])) /
+                         (lat[i_l + 1] - lat[i_l - 1]))
+            dvdy[:,
+                 i_l] = ((np.real(vtt[:, i_l + 1, 0] - vtt[:, i_l - 1, 0])) /
+                         (lat[i_l + 1] - lat[i_l - 1]))
+    dudy = dudy / AA
+    dvdy = dvdy / AA
+    c_1 = np.zeros([nlev, nlat, ntp - 1])
+    c_2 = np.zeros([nlev, nlat, ntp - 1])
+    c_3 = np.zeros([nlev, nlat, ntp - 1])
+    c_4 = np.zeros([nlev, nlat, ntp - 1])
+    c_5 = np.zeros([nlev, nlat, ntp - 1])
+    c_6 = np.zeros([nlev, nlat, ntp - 1])
+    u_u = np.real(u_t * np.conj(u_t) + u_t * np.conj(u_t))
+    u_v = np.real(u_t * np.conj(v_t) + v_t * np.conj(u_t))
+    v_v = np.real(v_t * np.conj(v_t) + v_t * np.conj(v_t))
+    u_w = np.real(u_t * np.conj(wap) + wap * np.conj(u_t))
+    v_w = np.real(v_t * np.conj(wap) + wap * np.conj(v_t))
+    for i_l in np.arange(nlat):
+        c_1[:, i_l, :] = dudy[:, i_l][:, np.newaxis] * u_v[:, i_l, :]
+        c_2[:, i_l, :] = dvdy[:, i_l][:, np.newaxis] * v_v[:, i_l, :]
+        c_5[:, i_l, :] = (np.tan(lat[i_l]) / AA *
+                          np.real(utt[:, i_l, 0])[:, np.newaxis] *
+                          (u_v[:, i_l, :]))
+        c_6[:, i_l, :] = -(np.tan(lat[i_l]) / AA *
+                           np.real(vtt[:, i_l, 0])[:, np.newaxis] *
+                           (u_u[:, i_l, :]))
+    for l_l in np.arange(nlev):
+        c_3[l_l, :, :] = dudp[l_l, :][:, np.newaxis] * u_w[l_l, :, :]
+        c_4[l_l, :, :] = dvdp[l_l, :][:, np.newaxis] * v_w[l_l, :, :]
+    ke2kz = (c_1 + c_2 + c_3 + c_4 + c_5 + c_6)
+    ke2kz[:, :, 0] = 0.
+    return ke2kz
+
+
+def loop_mkatas(u_t, v_t, wap, t_t, ttt, g_w, p_l, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkatas`` using loops."""
+    t_r = np.fft.ifft(t_t, axis=2)
+    u_r = np.fft.ifft(u_t, axis=2)
+    v_r = np.fft.ifft(v_t, axis=2)
+    w_r = np.fft.ifft(wap, axis=2)
+    tur = t_r * u_r
+    tvr = t_r * v_r
+    twr = t_r * w_r
+    t_u = np.fft.fft(tur, axis=2)
+    t_v = np.fft.fft(tvr, axis=2)
+    t_w = np.fft.fft(twr, axis=2)
+    c_1 = (t_u * np.conj(ttt[:, :, np.newaxis]) -
+           ttt[:, :, np.newaxis] * np.conj(t_u))
+    c_6 = (t_w * np.conj(ttt[:, :, np.newaxis]) -
+           ttt[:, :, np.newaxis] * np.conj(t_w))
+    c_2 = np.zeros([nlev, nlat, ntp - 1])
+    c_3 = np.zeros([nlev, nlat, ntp - 1])
+    c_5 = np.zeros([nlev, nlat, ntp - 1])
+    for i_l in range(nlat):
+        if i_l == 0:
+            c_2[:, i_l, :] = np.real(
+                t_v[:, i_l, :] / (AA * (lat[i_l + 1] - lat[i_l])) *
+                np.conj(ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
+            c_3[:, i_l, :] = np.real(
+                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l + 1] - lat[i_l])) *
+                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l, np.newaxis]))
+        elif i_l == nlat - 1:
+            c_2[:, i_l, :] = np.real(
+                t_v[:, i_l, :] / (AA * (lat[i_l] - lat[i_l - 1])) *
+                np.conj(ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+            c_3[:, i_l, :] = np.real(
+                np.conj(t_v[:, i_l, :]) / (AA * (lat[i_l] - lat[i_l - 1])) *
+                (ttt[:, i_l, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+        else:
+            c_2[:, i_l, :] = np.real(t_v[:, i_l, :] /
+                                     (AA * (lat[i_l + 1] - lat[i_l - 1])) *
+                                     np.conj(ttt[:, i_l + 1, np.newaxis] -
+                                             ttt[:, i_l - 1, np.newaxis]))
+            c_3[:, i_l, :] = np.real(
+                np.conj(t_v[:, i_l, :]) / (AA *
+                                           (lat[i_l + 1] - lat[i_l - 1])) *
+                (ttt[:, i_l + 1, np.newaxis] - ttt[:, i_l - 1, np.newaxis]))
+    for l_l in range(nlev):
+        if l_l == 0:
+            c_5[l_l, :, :] = (
+                (ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
+                (p_l[l_l + 1] - p_l[l_l]))
+        elif l_l == nlev - 1:
+            c_5[l_l, :, :] = (
+                (ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
+                (p_l[l_l] - p_l[l_l - 1]))
+        else:
+            c51 = ((ttt[l_l + 1, :, np.newaxis] - ttt[l_l, :, np.newaxis]) /
+                   (p_l[l_l + 1] - p_l[l_l]))
+            c52 = ((ttt[l_l, :, np.newaxis] - ttt[l_l - 1, :, np.newaxis]) /
+                   (p_l[l_l] - p_l[l_l - 1]))
+            c_5[l_l, :, :] = ((c51 * (p_l[l_l] - p_l[l_l - 1]) + c52 *
+                               (p_l[l_l + 1] - p_l[l_l])) /
+                              (p_l[l_l + 1] - p_l[l_l - 1]))
+    k_k = np.arange(0, ntp - 1)
+    at2as = (((k_k - 1)[np.newaxis, np.newaxis, :] * np.imag(c_1) /
+              (AA * np.cos(lat[np.newaxis, :, np.newaxis])) +
+              np.real(t_w * np.conj(c_5) + np.conj(t_w) * c_5) +
+              np.real(c_2 + c_3) + R /
+              (CP * p_l[:, np.newaxis, np.newaxis]) * np.real(c_6)) *
+             g_w[:, :, np.newaxis])
+    at2as[:, :, 0] = 0.
+    return at2as
+
+
+def loop_mkktks(u_t, v_t, utt, vtt, lat, nlat, ntp, nlev):
+    """Reference implementation of ``mkktks`` using loops."""
+    dut = np.zeros([nlev, nlat, ntp - 1])
+    dvt = np.zeros([nlev, nlat, ntp - 1])
+    dlat = np.zeros([nlat])
+    utt = np.real(utt)
+    vtt = np.real(vtt)
+    u_r = np.fft.irfft(u_t, axis=2)
+    v_r = np.fft.irfft(v_t, axis=2)
+    uur = u_r * u_r
+    uvr = u_r * v_r
+    vvr = v_r * v_r
+    u_u = np.fft.rfft(uur, axis=2)
+    v_v = np.fft.rfft(vvr, axis=2)
+    u_v = np.fft.rfft(uvr, axis=2)
+    c_1 = u_u * np.conj(u_t) - u_t * np.conj(u_u)
+    # c_3 = u_v * np.conj(u_t) + u_t * np.conj(u_v)
+    c_5 = u_u * np.conj(v_t) + v_t * np.conj(u_u)
+    c_6 = u_v * np.conj(v_t) - v_t * np.conj(u_v)
+    for i_l in range(nlat):
+        if i_l == 0:
+            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l, :])
+            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l, :])
+            dlat[i_l] = (lat[i_l + 1] - lat[i_l])
+        elif i_l == nlat - 1:
+            dut[:, i_l, :] = (utt[:, i_l, :] - utt[:, i_l - 1, :])
+            dvt[:, i_l, :] = (vtt[:, i_l, :] - vtt[:, i_l - 1, :])
+            dlat[i_l] = (lat[i_l] - lat[i_l - 1])
+        else:
+            dut[:, i_l, :] = (utt[:, i_l + 1, :] - utt[:, i_l - 1, :])
+            dvt[:, i_l, :] = (vtt[:, i_l + 1, :] - vtt[:, i_l - 1, :])
+            dlat[i_l] = (lat[i_l + 1] - lat[i_l - 1])
+    c21 = np.conj(u_u) * dut / dlat[np.newaxis, :, np.newaxis]
+    c22 = u_u * np.conj(dut) / dlat[np.newaxis, :, np.newaxis]
+    c41 = np.conj(v_v) * dvt / dlat[np.newaxis, :, np.newaxis]
+    c42 = v_v * np.conj(dvt) / dlat[np.newaxis, :, np.newaxis]
+    k_k = np.arange(0, ntp - 1)
+    kt2ks = (np.real(c21 + c22 + c41 + c42) / AA +
+             np.tan(lat)[np.newaxis, :, np.newaxis] * np.real(c_1 - c_5) / AA +
+             np.imag(c_1 + c_6) * (k_k - 1)[np.newaxis, np.newaxis, :] /
+             (AA * np.cos(lat)[np.newaxis, :, np.newaxis]))
+    kt2ks[:, :, 0] = 0
+    return kt2ks
+
+
+def loop_time_means(fields, lev, lat, g_w):
+    """Reference time means of the transient terms (loop over time)."""
+    ta_c, ua_c, va_c, wap_c = fields
+    (nlev, ntime, nlat, nwaves) = ta_c.shape
+    ntp = nwaves + 1
+    ta_tmn = np.nanmean(ta_c, axis=1)
+    ta_ztmn, ta_gmn = averages(ta_tmn, g_w)
+    ua_tmn = np.nanmean(ua_c, axis=1)
+    va_tmn = np.nanmean(va_c, axis=1)
+    wap_tmn = np.nanmean(wap_c, axis=1)
+    gam_ztmn = np.zeros([nlev, nlat])
+    for l_l in range(nlat):
+        gam_ztmn[:, l_l] = loop_stabil(ta_ztmn[:, l_l], lev, nlev)
+    gam_tmn = loop_stabil(ta_gmn, lev, nlev)
+    terms = {name: np.zeros([nlev, ntime, nlat, ntp - 1]) for name in TERMS}
+    for t_t in range(ntime):
+        ta_tan = ta_c[:, t_t, :, :] - ta_tmn
+        ua_tan = ua_c[:, t_t, :, :] - ua_tmn
+        va_tan = va_c[:, t_t, :, :] - va_tmn
+        wap_tan = wap_c[:, t_t, :, :] - wap_tmn
+        _, ta_tgan = averages(ta_tan, g_w)
+        _, wap_tgan = averages(wap_tan, g_w)
+        terms['ek'][:, t_t] = loop_makek(ua_tan, va_tan)
+        terms['ape'][:, t_t] = loop_makea(ta_tan, ta_tgan, gam_tmn)
+        terms['a2k'][:, t_t] = loop_mka2k(wap_tan, ta_tan, wap_tgan, ta_tgan,
+                                          lev)
+        terms['ae2az'][:, t_t] = loop_mkaeaz(va_tan, wap_tan, ta_tan, ta_tmn,
+                                             ta_gmn, lev, lat, gam_tmn, nlat,
+                                             nlev)
+        terms['ke2kz'][:, t_t] = loop_mkkekz(ua_tan, va_tan, wap_tan, ua_tmn,
+                                             va_tmn, lev, lat, nlat, ntp,
+                                             nlev)
+        terms['at2as'][:, t_t] = loop_mkatas(ua_tan, va_tan, wap_tan, ta_tan,
+                                             ta_ztmn, gam_ztmn, lev, lat,
+                                             nlat, ntp, nlev)
+        terms['kt2ks'][:, t_t] = loop_mkktks(ua_tan, va_tan, ua_tmn, va_tmn,
+                                             lat, nlat, ntp, nlev)
+    return {name: np.nanmean(term, axis=1) for (name, term) in terms.items()}
+
+
+def get_fields(seed=0):
+    """Get Fourier coefficients of t, u, v and wap (lev, time, lat, wave)."""
+    random_state = np.random.RandomState(seed)
+    shape = (len(LEV), NTIME, len(LAT), NTP - 1)
+    fields = []
+    for (mean, scale) in ((250.0, 5.0), (10.0, 8.0), (0.0, 4.0),
+                          (0.0, 0.1)):
+        field = scale * (random_state.normal(size=shape) +
+                         1j * random_state.normal(size=shape))
+        field[..., 0] = mean + scale * random_state.normal(size=shape[:-1])
+        fields.append(field)
+    fields[0][..., 0] += 40.0 * (LEV / LEV[0])[:, None, None]
+    return fields
+
+
+def assert_close(actual, expected, rtol):
+    """Check that arrays agree relative to their magnitude."""
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual,
+                               expected,
+                               rtol=rtol,
+                               atol=rtol * np.nanmax(np.abs(expected)))
+
+
+def test_stabil():
+    """Test stability parameter for vertical and zonal mean profiles."""
+    (_, _, g_w) = weights(LEV, len(LEV), LAT)
+    ta_tmn = np.nanmean(get_fields()[0], axis=1)
+    (ta_ztmn, ta_gmn) = averages(ta_tmn, g_w)
+
+    expected = loop_stabil(ta_gmn, LEV, len(LEV))
+    assert_close(stabil(ta_gmn, LEV), expected, 1e-12)
+
+    expected = np.zeros(ta_ztmn.shape)
+    for l_l in range(len(LAT)):
+        expected[:, l_l] = loop_stabil(ta_ztmn[:, l_l], LEV, len(LEV))
+    gam_ztmn = stabil(ta_ztmn, LEV)
+    assert gam_ztmn.shape == (len(LEV), len(LAT))
+    assert_close(gam_ztmn, expected, 1e-12)
+
+
+@pytest.mark.parametrize('with_nan', [False, True])
+@pytest.mark.parametrize('chunk_size', [None, 1, 4])
+def test_time_means(chunk_size, with_nan):
+    """Test time means of transient terms against loop over time steps."""
+    fields = get_fields()
+    if with_nan:
+        fields[1][2, 3, 1, :] = np.nan
+    (_, y_l, g_w) = weights(LEV, len(LEV), LAT)
+    expected = loop_time_means(fields, LEV, y_l, g_w)
+
+    tmns = [np.nanmean(field, axis=1) for field in fields]
+    (ta_ztmn, ta_gmn) = averages(tmns[0], g_w)
+    gams = [stabil(ta_gmn, LEV), stabil(ta_ztmn, LEV)]
+    tmean = time_means(fields, tmns, LEV, y_l, g_w, gams,
+                       chunk_size=chunk_size)
+    assert set(tmean) == set(TERMS)
+    for name in TERMS:
+        assert tmean[name].shape == (len(LEV), len(LAT), NTP - 1)
+        assert_close(tmean[name], expected[name], 1e-9)
+
+
+def test_time_means_float32():
+    """Test time means accumulated in single precision."""
+    fields = get_fields(seed=1)
+    (_, y_l, g_w) = weights(LEV, len(LEV), LAT)
+    expected = loop_time_means(fields, LEV, y_l, g_w)
+
+    tmns = [np.nanmean(field, axis=1) for field in fields]
+    (ta_ztmn, ta_gmn) = averages(tmns[0], g_w)
+    gams = [stabil(ta_gmn, LEV), stabil(ta_ztmn, LEV)]
+    tmean = time_means(fields, tmns, LEV, y_l, g_w, gams, chunk_size=4,
+                       dtype=np.float32)
+    for name in TERMS:
+        assert_close(tmean[name], expected[name], 1e-5)
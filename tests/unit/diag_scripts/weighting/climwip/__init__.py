@@ -0,0 +1 @@
+"""Unit tests for :mod:`esmvaltool.diag_scripts.weighting.climwip`."""
@@ -0,0 +1,180 @@
+"""Unit tests for the ClimWIP performance sigma calibration."""
+
+import numpy as np
+import pytest
+import xarray as xr
+from scipy.optimize import brute
+
+from esmvaltool.diag_scripts.weighting.climwip import calibrate_sigmas
+from esmvaltool.diag_scripts.weighting.climwip.calibrate_sigmas import (
+    PERCENTILES,
+    SIGMA_RANGE,
+    SIGMA_STEPS,
+    calculate_weights_matrices,
+    compute_cost_function,
+    evaluate_target,
+    find_best_sigma,
+)
+from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
+    calculate_weights,
+    weighted_quantile,
+)
+
+N_MODELS = 12
+MODELS = [f'model{i}' for i in range(N_MODELS)]
+
+
+def get_data(seed, nan_distances=False):
+    """Get synthetic performance, independence and target data."""
+    random_state = np.random.RandomState(seed)
+    # Models scattered around a common truth, the target is the distance
+    # from the truth plus noise
+    positions = random_state.normal(size=(N_MODELS, 3))
+    distances = np.linalg.norm(positions[:, np.newaxis] - positions, axis=-1)
+    performance = distances / distances.mean()
+    independence = 0.5 * distances / distances.mean()
+    target = (positions[:, 0] + 0.3 * random_state.normal(size=N_MODELS))
+    if nan_distances:
+        performance[2, 5] = np.nan
+        independence[7, 3] = np.nan
+    performance = xr.DataArray(performance,
+                               dims=('perfect_model_ensemble',
+                                     'model_ensemble'),
+                               coords={
+                                   'perfect_model_ensemble': MODELS,
+                                   'model_ensemble': MODELS,
+                               })
+    independence = xr.DataArray(independence,
+                                dims=('model_ensemble',
+                                      'model_ensemble_reference'),
+                                coords={
+                                    'model_ensemble': MODELS,
+                                    'model_ensemble_reference': MODELS,
+                                })
+    target = xr.DataArray(target,
+                          dims='model_ensemble',
+                          coords={'model_ensemble': MODELS})
+    return (performance, independence, target)
+
+
+def old_cost_function(performance_sigma, overall_performance, target,
+                      overall_independence, independence_sigma):
+    """Old cost function of a single sigma evaluated by scipy's brute."""
+    performance_sigma = performance_sigma[0]
+    overall_performance = overall_performance.copy()
+    idx_diag = np.diag_indices(overall_performance['model_ensemble'].size)
+    overall_performance.values[idx_diag] = np.nan
+    weights_matrix = calculate_weights(overall_performance,
+                                       overall_independence, performance_sigma,
+                                       independence_sigma)
+    percentiles = xr.DataArray(PERCENTILES, dims='percentile')
+    target_perfect = target.rename(
+        {'model_ensemble': 'perfect_model_ensemble'})
+    percentiles_data = xr.apply_ufunc(
+        weighted_quantile,
+        target,
+        percentiles,
+        weights_matrix,
+        input_core_dims=[['model_ensemble'], ['percentile'],
+                         ['model_ensemble']],
+        output_core_dims=[['percentile']],
+        vectorize=True,
+    )
+    inside_count = np.logical_and(
+        target_perfect >= percentiles_data.isel(percentile=0),
+        target_perfect <= percentiles_data.isel(percentile=1)).values
+    inside_ratio = inside_count.sum() / len(inside_count)
+    difference = inside_ratio - (PERCENTILES[1] - PERCENTILES[0])
+    if difference < 0:
+        return 99 - difference
+    return performance_sigma
+
+
+@pytest.mark.parametrize('nan_distances', [False, True])
+@pytest.mark.parametrize('with_independence', [False, True])
+def test_calculate_weights_matrices(nan_distances, with_independence):
+    """Test batched weights against calculate_weights for each sigma."""
+    (performance, independence, _) = get_data(0, nan_distances)
+    performance.values[np.diag_indices(N_MODELS)] = np.nan
+    independence_sigma = 0.4
+    if not with_independence:
+        independence = None
+        independence_sigma = None
+    sigmas = np.array([0.1, 0.35, 1.0, 2.0])
+
+    weights = calculate_weights_matrices(
+        performance.values,
+        None if independence is None else independence.values, sigmas,
+        independence_sigma)
+
+    assert weights.shape == (4, N_MODELS, N_MODELS)
+    for (idx, sigma) in enumerate(sigmas):
+        expected = calculate_weights(performance, independence, sigma,
+                                     independence_sigma)
+        expected = expected.transpose('perfect_model_ensemble',
+                                      'model_ensemble')
+        np.testing.assert_allclose(weights[idx], expected.values, rtol=1e-12)
+    assert np.all(np.isnan(weights[:, np.arange(N_MODELS),
+                                   np.arange(N_MODELS)]))
+    if nan_distances:
+        assert np.all(np.isnan(weights[:, 2, 5]))
+        if with_independence:
+            # Unless model 3 is the perfect model and therefore excluded
+            assert np.all(np.isnan(np.delete(weights[:, :, 7], 3, axis=1)))
+            assert np.all(np.isfinite(weights[:, 3, :3]))
+
+
+def test_compute_cost_function():
+    """Test the cost function for confident and overconfident sigmas."""
+    cost = compute_cost_function(np.array([0.5, 0.8, 1.0]),
+                                 np.array([0.1, 0.2, 0.3]))
+    np.testing.assert_allclose(cost, [99.3, 0.2, 0.3])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2, 3])
+@pytest.mark.parametrize('with_independence', [False, True])
+def test_find_best_sigma(seed, with_independence):
+    """Test that the same sigma as the old exhaustive search is found."""
+    (performance, independence, target) = get_data(seed)
+    independence_sigma = 0.4
+    if not with_independence:
+        independence = None
+        independence_sigma = None
+    args = (performance, target, independence, independence_sigma)
+
+    (expected_sigma, expected_cost, grid, costs) = brute(
+        old_cost_function,
+        ranges=(SIGMA_RANGE, ),
+        Ns=SIGMA_STEPS,
+        finish=None,
+        args=args,
+        full_output=True,
+    )
+
+    (sigma, confidence) = find_best_sigma(
+        lambda sigmas: evaluate_target(sigmas, *args))
+    np.testing.assert_allclose(confidence['sigma'], grid)
+    np.testing.assert_allclose(confidence['cost_function'], costs)
+    assert sigma == pytest.approx(expected_sigma)
+    assert float(confidence['cost_function'].min()) == pytest.approx(
+        expected_cost)
+
+    # The refined grid includes the initial grid
+    (refined_sigma, refined) = find_best_sigma(
+        lambda sigmas: evaluate_target(sigmas, *args), refinement_steps=11)
+    assert refined['sigma'].size > SIGMA_STEPS
+    assert np.all(np.diff(refined['sigma']) > 0)
+    assert float(refined['cost_function'].min()) <= expected_cost
+    if expected_cost < 99:
+        assert expected_sigma - 0.02 < refined_sigma <= expected_sigma
+
+
+def test_evaluate_target_batches(monkeypatch):
+    """Test that the result does not depend on the batch size."""
+    (performance, independence, target) = get_data(0)
+    args = (performance, target, independence, 0.4)
+    sigmas = np.linspace(*SIGMA_RANGE, SIGMA_STEPS)
+    expected = evaluate_target(sigmas, *args)
+    monkeypatch.setattr(calibrate_sigmas, 'MAX_BATCH_SIZE', 7 * N_MODELS**2)
+    result = evaluate_target(sigmas, *args)
+    xr.testing.assert_allclose(result, expected)
@@ -0,0 +1,115 @@
+"""Unit tests for the ClimWIP core functions."""
+
+import numpy as np
+import pytest
+import xarray as xr
+from scipy.spatial.distance import pdist, squareform
+
+from esmvaltool.diag_scripts.weighting.climwip import core_functions
+from esmvaltool.diag_scripts.weighting.climwip.core_functions import (
+    batched_weighted_quantile,
+    weighted_quantile,
+)
+
+
+@pytest.mark.parametrize('n_values', [1, 2, 17])
+def test_batched_weighted_quantile(n_values):
+    """Test that batched quantiles equal the ones of weighted_quantile."""
+    random_state = np.random.RandomState(n_values)
+    values = random_state.normal(size=n_values)
+    values[random_state.rand(n_values) < 0.1] = np.nan
+    weights = random_state.rand(4, 3, n_values)
+    weights[random_state.rand(4, 3, n_values) < 0.2] = np.nan
+    quantiles = [0.0, 0.1, 0.5, 0.9, 1.0]
+    result = batched_weighted_quantile(values, quantiles, weights)
+    assert result.shape == (4, 3, 5)
+    for idx in np.ndindex(4, 3):
+        if np.any(np.isfinite(values) & np.isfinite(weights[idx])):
+            expected = weighted_quantile(values, quantiles, weights[idx])
+        else:
+            expected = np.full(5, np.nan)
+        np.testing.assert_allclose(result[idx], expected)
+
+
+def test_batched_weighted_quantile_invalid():
+    """Test invalid quantiles."""
+    with pytest.raises(ValueError):
+        batched_weighted_quantile([1.0, 2.0], [1.5], [1.0, 1.0])
+
+
+@pytest.mark.parametrize('chunk_size', [7, 2**24])
+def test_distance_matrix(monkeypatch, chunk_size):
+    """Test chunked distances against scipy's pdist."""
+    monkeypatch.setattr(core_functions, 'DISTANCE_CHUNK_SIZE', chunk_size)
+    random_state = np.random.RandomState(0)
+    values = 280.0 + random_state.normal(size=(5, 4, 6))
+    values[random_state.rand(5, 4, 6) < 0.1] = np.nan
+    weights = np.broadcast_to(random_state.rand(4, 6), values.shape)
+
+    flat_values = values.reshape(5, -1)
+    flat_weights = weights[0].ravel()
+    common = np.all(np.isfinite(flat_values), axis=0)
+    expected = squareform(
+        pdist(flat_values[:, common], w=flat_weights[common]))
+    np.testing.assert_allclose(
+        core_functions.distance_matrix(values, weights), expected)
+
+    distances = core_functions.distance_matrix(values, weights,
+                                               pairwise_complete=True)
+    for (idx, jdx) in np.ndindex(5, 5):
+        valid = np.isfinite(flat_values[idx]) & np.isfinite(flat_values[jdx])
+        expected = np.sqrt(
+            np.sum(flat_weights[valid] *
+                   (flat_values[idx, valid] - flat_values[jdx, valid])**2))
+        np.testing.assert_allclose(distances[idx, jdx], expected, atol=1e-9)
+
+
+def _old_calculate_model_distances(data_array):
+    """Distances as calculated with pdist for the full data array."""
+    values = data_array.transpose('model_ensemble', 'lat', 'lon').values
+    values = values.reshape(values.shape[0], -1)
+    weights = np.cos(np.radians(data_array.lat.values))
+    weights = np.broadcast_to(weights[:, np.newaxis],
+                              (data_array.sizes['lat'],
+                               data_array.sizes['lon'])).ravel()
+    not_nan = np.all(np.isfinite(values), axis=0)
+    return squareform(
+        pdist(values[:, not_nan], metric='euclidean', w=weights[not_nan]))
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_calculate_all_model_distances(monkeypatch, n_jobs):
+    """Test chunked lazy distances against the full pdist calculation."""
+    monkeypatch.setattr(core_functions, 'DISTANCE_CHUNK_SIZE', 40)
+    random_state = np.random.RandomState(0)
+    members = ['model_a', 'model_b', 'model_c', 'model_d']
+    data_arrays = []
+    for (name, shape) in (('tas', (4, 9, 5)), ('pr', (4, 7, 3))):
+        values = 280.0 + random_state.normal(size=shape)
+        values[random_state.rand(*shape) < 0.1] = np.nan
+        data_array = xr.DataArray(
+            values,
+            dims=('model_ensemble', 'lat', 'lon'),
+            coords={
+                'model_ensemble': members,
+                'lat': np.linspace(-80.0, 80.0, shape[1]),
+                'lon': np.linspace(0.0, 350.0, shape[2]),
+            },
+            name=name,
+            attrs={'units': 'K'},
+        )
+        data_arrays.append(data_array.chunk({'lat': 2}))
+
+    results = core_functions.calculate_all_model_distances(data_arrays,
+                                                           n_jobs=n_jobs)
+
+    for (data_array, result) in zip(data_arrays, results):
+        assert data_array.chunks is not None
+        assert result.dims == ('model_ensemble_reference', 'model_ensemble')
+        assert list(result.model_ensemble_reference.values) == members
+        assert list(result.model_ensemble.values) == members
+        assert result.name == f'd{data_array.name}'
+        assert result.attrs['variable_group'] == data_array.name
+        assert result.attrs['units'] == 'K'
+        np.testing.assert_allclose(
+            result.values, _old_calculate_model_distances(data_array))
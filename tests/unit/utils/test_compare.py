@@ -1,6 +1,14 @@
 """Test the esmvaltool.utils.testing.regression.compare module."""
+import json
 import os
+from pathlib import Path
 
+import numpy as np
+import pytest
+import xarray as xr
+from PIL import Image
+
+from esmvaltool.utils.testing.regression import compare
 from esmvaltool.utils.testing.regression.compare import (
     get_recipe_name_from_file
 )
@@ -14,3 +22,104 @@ def test_get_recipe_name_from_file(tmp_path):
     print("Obtained: %s", obtained)
     print("Expected: name_from_file0/recipe_python")
     assert obtained == "name_from_file0/recipe_python"
+
+
+def write_nc(path, data, **attributes):
+    """Write a NetCDF file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dataset = xr.Dataset(
+        {'tas': (('time', 'lat'), data, {'units': 'K'})},
+        coords={'time': np.arange(data.shape[0]), 'lat': [0.0, 1.0]},
+        attrs=attributes,
+    )
+    dataset.to_netcdf(path)
+
+
+def write_png(path, value):
+    """Write a PNG file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = np.zeros((64, 64), dtype=np.uint8)
+    data[:, :32] = value
+    Image.fromarray(data).save(path)
+
+
+@pytest.fixture
+def recipe_dirs(tmp_path):
+    """Reference and current recipe run with some files."""
+    ref_dir = tmp_path / 'ref' / 'recipe_test_20220101_000000'
+    cur_dir = tmp_path / 'cur' / 'recipe_test_20220202_000000'
+    data = np.arange(20.0).reshape(10, 2)
+    data[3, 1] = np.nan
+    for (recipe_dir, history) in ((ref_dir, 'a'), (cur_dir, 'b')):
+        write_nc(recipe_dir / 'work' / 'same.nc', data, history=history)
+        write_nc(recipe_dir / 'work' / 'copy.nc', data)
+        write_png(recipe_dir / 'plots' / 'same.png', 255)
+        (recipe_dir / 'work' / 'same.txt').write_text('text')
+    write_nc(ref_dir / 'work' / 'different.nc', data)
+    write_nc(cur_dir / 'work' / 'different.nc', data + 1.0)
+    write_png(ref_dir / 'plots' / 'different.png', 255)
+    write_png(cur_dir / 'plots' / 'different.png', 0)
+    (ref_dir / 'work' / 'different.txt').write_text('text')
+    (cur_dir / 'work' / 'different.txt').write_text('texT')
+    return (ref_dir, cur_dir)
+
+
+@pytest.mark.parametrize('block_size', [1, 40, 2**26])
+def test_compare_nc(recipe_dirs, monkeypatch, block_size):
+    """Test blocked comparison of NetCDF files."""
+    (ref_dir, cur_dir) = recipe_dirs
+    monkeypatch.setattr(compare, 'NC_BLOCK_SIZE', block_size)
+    for name in ('same.nc', 'copy.nc'):
+        ref_file = ref_dir / 'work' / name
+        cur_file = cur_dir / 'work' / name
+        assert compare.compare_nc(ref_file, cur_file)
+        assert compare.load_nc(cur_file).identical(compare.load_nc(ref_file))
+    assert not compare.compare_nc(ref_dir / 'work' / 'different.nc',
+                                  cur_dir / 'work' / 'different.nc')
+    assert not compare.compare_nc(ref_dir / 'work' / 'same.nc',
+                                  cur_dir / 'work' / 'different.nc')
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_compare_files(recipe_dirs, n_jobs):
+    """Test comparison of files."""
+    (ref_dir, cur_dir) = recipe_dirs
+    files = sorted(compare.find_files(ref_dir))
+    assert len(files) == 7
+    different = compare.compare_files(ref_dir, cur_dir, files, False, n_jobs)
+    assert different == [
+        'plots/different.png',
+        'work/different.nc',
+        'work/different.txt',
+    ]
+
+    with (ref_dir / compare.REFERENCE_INDEX_FILE).open() as file:
+        index = json.load(file)
+    assert sorted(index) == [str(f) for f in files]
+    assert 'phash' in index['plots/different.png']
+    assert 'phash' not in index['work/different.nc']
+    assert 'digest' in index['work/copy.nc']
+
+
+def test_compare_files_cached_phash(recipe_dirs, monkeypatch):
+    """Test that perceptual hashes of reference files are cached."""
+    (ref_dir, cur_dir) = recipe_dirs
+    files = [Path('plots', 'different.png')]
+    compare.compare_files(ref_dir, cur_dir, files, False)
+
+    phash = compare.imagehash.phash
+    hashed = []
+
+    def counting_phash(img, hash_size):
+        hashed.append(img.size)
+        return phash(img, hash_size=hash_size)
+
+    monkeypatch.setattr(compare.imagehash, 'phash', counting_phash)
+    different = compare.compare_files(ref_dir, cur_dir, files, False)
+    assert different == ['plots/different.png']
+    assert len(hashed) == 1
+
+    # Changed reference files are hashed again
+    write_png(ref_dir / 'plots' / 'different.png', 0)
+    os.utime(ref_dir / 'plots' / 'different.png', ns=(0, 0))
+    assert not compare.compare_files(ref_dir, cur_dir, files, False)